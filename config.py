@@ -53,6 +53,41 @@ FALLBACK_TRADING_SYMBOLS = [
     'DOTUSDT'    # Polkadot
 ]
 
+# Список инструментов меняется редко: обновление раз в 6 часов (или по запросу)
+INSTRUMENTS_CACHE_TTL_HOURS = 6
+
+# Предварительный отбор символов перед ML анализом (по одному снимку get_tickers)
+SCREENER_CONFIG = {
+    'enabled': True,
+    'top_k': 30,                   # Символов в ML анализ за цикл (плюс символы с позициями)
+    'min_turnover_24h': 100000.0,  # Минимальный оборот за 24ч, USDT
+    'max_spread': 0.005,           # Максимальный спред 0.5%
+    'max_abs_change_24h': 0.30,    # Исключать движения больше 30% за 24ч
+    'max_change_zscore': 3.0,      # Исключать выбросы изменения за 24ч (z-оценка)
+    'require_model': False,        # Только символы с обученной моделью
+}
+
+# Конвейер торгового цикла: загрузка свечей -> ML анализ -> лимиты -> ордера
+TRADING_PIPELINE_CONFIG = {
+    'fetch_workers': 4,           # Потоков загрузки свечей
+    'queue_size': 32,             # Емкость очередей между этапами
+    'batch_size': 16,             # Символов в одном пакетном предсказании
+    'batch_wait': 0.05,           # Ожидание дополнения пакета, с
+    'prefetch_chunk': 16,         # Символов в одном пакетном обновлении свечей
+    'balance_ttl_seconds': 5.0,   # Снимок баланса для проверки лимитов
+}
+
+# Планировщик торгового потока: анализ по закрытию свечи, баланс и позиции - по своему периоду
+CYCLE_SCHEDULER_CONFIG = {
+    'analysis_interval': '240',        # Свеча, по закрытию которой запускается анализ
+    'candle_close_delay_seconds': 15,  # Ожидание публикации закрытой свечи биржей
+    'account_period_seconds': 5,       # Обновление баланса и позиций
+    'error_retry_seconds': 10,         # Повтор задачи после ошибки
+    'max_publish_attempts': 3,         # Попыток дождаться публикации закрытой свечи символа
+    'max_backoff': 8,                  # Максимальное увеличение периода при перерасходе
+    'max_sleep_seconds': 1.0,          # Сон между проверками остановки потока
+}
+
 # Таймфреймы для анализа
 ANALYSIS_TIMEFRAMES = {
     'primary': '1h',    # Основной таймфрейм
@@ -237,6 +272,7 @@ def get_trading_config():
         'max_position_percent': MAX_POSITION_PERCENT,
         'min_position_size': MIN_POSITION_SIZE,
         'fallback_trading_symbols': FALLBACK_TRADING_SYMBOLS,
+        'screener': SCREENER_CONFIG,
         'analysis_timeframes': ANALYSIS_TIMEFRAMES,
         'kline_limit': KLINE_LIMIT
     }
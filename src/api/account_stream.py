@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Приватный WebSocket поток Bybit v5 (order, execution, wallet, position)
+Локальное состояние счета обновляется инкрементально из потока;
+REST используется только для первичного снимка и сверки после переподключения
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .bybit_client import ServerClock
+from .market_stream import MarketDataStream
+
+
+PRIVATE_WS_URLS = {
+    True: "wss://stream-testnet.bybit.com/v5/private",
+    False: "wss://stream.bybit.com/v5/private",
+}
+
+
+class AccountState:
+    """Локальное состояние счета с чтением за O(1) без обращений к API"""
+
+    # Статусы, после которых ордер больше не считается открытым
+    CLOSED_ORDER_STATUSES = {
+        'Filled', 'Cancelled', 'Rejected', 'Deactivated', 'PartiallyFilledCanceled'
+    }
+
+    def __init__(self, max_executions: int = 500):
+        self._lock = threading.Lock()
+        self._accounts: Dict[str, Dict] = {}
+        self._orders: Dict[str, Dict] = {}
+        self._positions: Dict[Tuple[str, str, int], Dict] = {}
+        self._executions = deque(maxlen=max_executions)
+        self.ready = False  # Снимок загружен и соответствует потоку
+        self.last_update: Optional[float] = None
+        self.last_reconcile: Optional[float] = None
+        self.generation = 0
+        # Обновления потока за время загрузки снимка (None - снимок не загружается)
+        self._replay: Optional[List[Tuple[str, List[Dict]]]] = None
+
+    def _touch(self):
+        self.last_update = time.time()
+        self.generation += 1
+
+    # ---- Применение данных ----
+
+    def begin_snapshot(self):
+        """Начало загрузки REST снимка: обновления потока запоминаются для повтора"""
+        with self._lock:
+            if self._replay is None:
+                self._replay = []
+
+    def abort_snapshot(self):
+        """Снимок не загружен: накопленные обновления уже применены к текущему состоянию"""
+        with self._lock:
+            self._replay = None
+
+    def load_snapshot(self, wallet: List[Dict], orders: List[Dict],
+                      positions: List[Dict] = None):
+        """Замена состояния REST снимком (первичная загрузка и сверка)
+
+        Обновления потока, пришедшие во время загрузки снимка, применяются поверх него;
+        ордер из потока не перекрывает более новую (по updatedTime) версию из снимка
+        """
+        with self._lock:
+            self._accounts = {}
+            for account in wallet or []:
+                self._accounts[account.get('accountType', 'UNIFIED')] = dict(account)
+            self._orders = {
+                o['orderId']: dict(o) for o in orders or []
+                if o.get('orderId') and o.get('orderStatus') not in self.CLOSED_ORDER_STATUSES
+            }
+            self._positions = {}
+            for position in positions or []:
+                if self._position_open(position):
+                    self._positions[self._position_key(position)] = dict(position)
+
+            snapshot_times = {order_id: self._updated_time(o) for order_id, o in self._orders.items()}
+            for kind, items in self._replay or []:
+                if kind == 'orders':
+                    items = [o for o in items
+                             if self._updated_time(o) >= snapshot_times.get(o.get('orderId'), 0)]
+                self._APPLIERS[kind](self, items)
+            self._replay = None
+
+            self.ready = True
+            self.last_reconcile = time.time()
+            self._touch()
+
+    def _apply(self, kind: str, items: Iterable[Dict]):
+        items = list(items)
+        with self._lock:
+            self._APPLIERS[kind](self, items)
+            if self._replay is not None:
+                self._replay.append((kind, items))
+            self._touch()
+
+    def apply_wallet(self, accounts: Iterable[Dict]):
+        self._apply('wallet', accounts)
+
+    def apply_orders(self, orders: Iterable[Dict]):
+        self._apply('orders', orders)
+
+    def apply_executions(self, executions: Iterable[Dict]):
+        # Снимок не содержит исполнений, поэтому они не повторяются
+        with self._lock:
+            for execution in executions:
+                self._executions.append(dict(execution))
+            self._touch()
+
+    def apply_positions(self, positions: Iterable[Dict]):
+        self._apply('positions', positions)
+
+    def _merge_wallet(self, accounts: List[Dict]):
+        for account in accounts:
+            account_type = account.get('accountType', 'UNIFIED')
+            current = self._accounts.get(account_type, {})
+            merged = dict(current)
+            merged.update({k: v for k, v in account.items() if k != 'coin'})
+
+            # Монеты объединяются по имени: поток может прислать только изменившиеся
+            coins = {c.get('coin'): c for c in current.get('coin', [])}
+            for coin in account.get('coin', []):
+                coins[coin.get('coin')] = dict(coin)
+            merged['coin'] = list(coins.values())
+
+            self._accounts[account_type] = merged
+
+    def _merge_orders(self, orders: List[Dict]):
+        for order in orders:
+            order_id = order.get('orderId')
+            if not order_id:
+                continue
+            if order.get('orderStatus') in self.CLOSED_ORDER_STATUSES:
+                self._orders.pop(order_id, None)
+            else:
+                self._orders[order_id] = dict(order)
+
+    def _merge_positions(self, positions: List[Dict]):
+        for position in positions:
+            key = self._position_key(position)
+            if self._position_open(position):
+                self._positions[key] = dict(position)
+            else:
+                self._positions.pop(key, None)
+
+    _APPLIERS = {'wallet': _merge_wallet, 'orders': _merge_orders, 'positions': _merge_positions}
+
+    @staticmethod
+    def _updated_time(order: Dict) -> int:
+        try:
+            return int(order.get('updatedTime') or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    @staticmethod
+    def _position_key(position: Dict) -> Tuple[str, str, int]:
+        return (position.get('category', 'linear'), position.get('symbol', ''),
+                int(position.get('positionIdx', 0) or 0))
+
+    @staticmethod
+    def _position_open(position: Dict) -> bool:
+        try:
+            return float(position.get('size', 0) or 0) != 0
+        except (TypeError, ValueError):
+            return False
+
+    # ---- Чтение ----
+
+    def get_wallet_balance(self, account_type: str = "UNIFIED") -> Optional[Dict]:
+        """Баланс в формате ответа REST get_wallet_balance ({'list': [...]})"""
+        with self._lock:
+            account = self._accounts.get(account_type)
+            if account is None:
+                return None
+            account = dict(account)
+            account['coin'] = [dict(c) for c in account.get('coin', [])]
+            return {'list': [account]}
+
+    def get_open_orders(self, category: str = None, symbol: str = None) -> Dict:
+        """Открытые ордера в формате ответа REST get_open_orders"""
+        with self._lock:
+            orders = [dict(o) for o in self._orders.values()
+                      if (category is None or o.get('category', category) == category)
+                      and (symbol is None or o.get('symbol') == symbol)]
+        orders.sort(key=lambda o: int(o.get('createdTime', 0) or 0), reverse=True)
+        return {'category': category, 'list': orders}
+
+    def get_positions(self, category: str = None, symbol: str = None) -> List[Dict]:
+        with self._lock:
+            return [dict(p) for (cat, sym, _), p in self._positions.items()
+                    if (category is None or cat == category)
+                    and (symbol is None or sym == symbol)]
+
+    def get_executions(self, symbol: str = None, limit: int = 50) -> List[Dict]:
+        """Последние исполнения, новые первыми"""
+        with self._lock:
+            executions = [dict(e) for e in reversed(self._executions)
+                          if symbol is None or e.get('symbol') == symbol]
+        return executions[:limit]
+
+
+class AccountStream(MarketDataStream):
+    """Авторизованный приватный поток с локальным состоянием счета"""
+
+    PRIVATE_TOPICS = ('order', 'execution', 'wallet', 'position')
+
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True,
+                 url: str = None, snapshot_loader: Callable[[], Dict] = None,
+                 clock: ServerClock = None, ping_interval: float = 20.0,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        super().__init__(category="private", testnet=testnet,
+                         url=url or PRIVATE_WS_URLS[bool(testnet)],
+                         ping_interval=ping_interval, reconnect_delay=reconnect_delay,
+                         max_reconnect_delay=max_reconnect_delay)
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.clock = clock
+        self.snapshot_loader = snapshot_loader
+        self.state = AccountState()
+        self.reconciles = 0
+        self.subscribe(self.PRIVATE_TOPICS)
+
+    def _expires_ms(self) -> int:
+        # Последнее известное смещение без синхронного запроса к серверу внутри цикла событий
+        now_ms = self.clock.current_ms() if self.clock is not None else int(time.time() * 1000)
+        return now_ms + 10000
+
+    async def _authenticate(self, ws):
+        expires = self._expires_ms()
+        signature = hmac.new(
+            self.api_secret.encode('utf-8'),
+            f"GET/realtime{expires}".encode('utf-8'),
+            hashlib.sha256
+        ).hexdigest()
+        await ws.send(json.dumps({"op": "auth", "args": [self.api_key, expires, signature]}))
+
+        response = json.loads(await asyncio.wait_for(ws.recv(), timeout=10))
+        if response.get('op') != 'auth' or not response.get('success', False):
+            raise Exception(f"Ошибка авторизации WebSocket: {response.get('ret_msg', response)}")
+
+    async def _on_subscribed(self):
+        # Сверка в фоне, чтобы не задерживать прием сообщений и heartbeat;
+        # обновления с этого момента будут повторены поверх снимка
+        self.state.begin_snapshot()
+        loop = asyncio.get_event_loop()
+        loop.run_in_executor(None, self.reconcile)
+
+    def _on_disconnected(self):
+        # Пока нет соединения и сверки, локальное состояние считается устаревшим
+        self.state.ready = False
+
+    def reconcile(self) -> bool:
+        """Загрузка REST снимка и замена им локального состояния с повтором обновлений потока"""
+        if self.snapshot_loader is None:
+            return False
+        self.state.begin_snapshot()
+        try:
+            snapshot = self.snapshot_loader()
+            self.state.load_snapshot(
+                wallet=snapshot.get('wallet', []),
+                orders=snapshot.get('orders', []),
+                positions=snapshot.get('positions', [])
+            )
+            self.reconciles += 1
+            self._dispatch({'type': 'reconcile', 'data': None, 'ts': int(time.time() * 1000)})
+            return True
+        except Exception as e:
+            self.state.abort_snapshot()
+            self.logger.error(f"Ошибка сверки состояния счета: {e}")
+            return False
+
+    def _handle_topic(self, topic: str, message: Dict):
+        data = message.get('data') or []
+        base_topic = topic.split('.', 1)[0]
+
+        if base_topic == 'wallet':
+            self.state.apply_wallet(data)
+        elif base_topic == 'order':
+            self.state.apply_orders(data)
+        elif base_topic == 'execution':
+            self.state.apply_executions(data)
+        elif base_topic == 'position':
+            self.state.apply_positions(data)
+        else:
+            return
+
+        self._dispatch({'type': base_topic, 'data': data,
+                        'ts': message.get('creationTime', message.get('ts'))})
+
+    @property
+    def is_ready(self) -> bool:
+        """Соединение активно и состояние сверено с REST снимком"""
+        return self.is_connected and self.state.ready
+
+
+def rest_account_snapshot(client, order_categories: Iterable[str] = ('spot',),
+                          position_categories: Iterable[str] = ('linear',)) -> Callable[[], Dict]:
+    """Загрузчик REST снимка счета для AccountStream на основе BybitClient"""
+    def _load() -> Dict:
+        wallet = client.get_wallet_balance()
+        if not wallet or 'list' not in wallet:
+            raise Exception(f"Некорректный ответ баланса: {wallet}")
+
+        orders = []
+        for category in order_categories:
+            response = client.get_open_orders(category=category)
+            for order in response.get('list', []):
+                order.setdefault('category', category)
+                orders.append(order)
+
+        positions = []
+        for category in position_categories:
+            # Ошибка запроса прерывает снимок: пустой список стер бы открытые позиции
+            for position in client.get_positions(category=category, raise_on_error=True):
+                position.setdefault('category', category)
+                positions.append(position)
+
+        return {'wallet': wallet['list'], 'orders': orders, 'positions': positions}
+    return _load
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Асинхронный Bybit API клиент (aiohttp)
+Одна keep-alive сессия, ограничение параллелизма и общий rate limiter
+для одновременной загрузки данных по сотням символов
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+import aiohttp
+
+from .bybit_client import (
+    RateLimiter, ServerClock, INTERVAL_MAP, generate_signature
+)
+
+
+class AsyncBybitClient:
+    """Асинхронный клиент Bybit API с тем же набором методов, что и BybitClient"""
+
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True,
+                 max_concurrency: int = 20, rate_limiter: RateLimiter = None,
+                 clock: ServerClock = None):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.testnet = testnet
+        self.recv_window = 20000
+
+        if testnet:
+            self.base_url = "https://api-testnet.bybit.com"
+        else:
+            self.base_url = "https://api.bybit.com"
+
+        # Лимиты и часы можно разделять с синхронным BybitClient
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.clock = clock or ServerClock(None, self.base_url, sync_interval=0)
+
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._session = None
+
+        self.logger = logging.getLogger(__name__)
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Ленивое создание общей keep-alive сессии"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                keepalive_timeout=60,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=10),
+                headers={'User-Agent': 'TradingBot/1.0'}
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self):
+        """Закрытие HTTP сессии"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _acquire(self, endpoint: str):
+        """Ожидание токена rate limiter без блокировки event loop"""
+        while True:
+            wait_time = self.rate_limiter.try_acquire(endpoint)
+            if wait_time <= 0:
+                return
+            await asyncio.sleep(wait_time)
+
+    async def sync_clock(self, force: bool = False, samples: int = 4) -> bool:
+        """Замер смещения часов через асинхронную сессию"""
+        session = await self._get_session()
+        self.clock.last_attempt = time.time()
+        new_samples = []
+        for _ in range(samples):
+            try:
+                t0 = time.time() * 1000
+                async with session.get(f"{self.base_url}/v5/market/time", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                    t1 = time.time() * 1000
+                    server_ms = ServerClock.parse_server_time(await response.json(content_type=None))
+                if server_ms is not None:
+                    new_samples.append((t1 - t0, server_ms - (t0 + t1) / 2))
+            except Exception as e:
+                self.logger.debug(f"Ошибка замера времени сервера: {e}")
+        return self.clock.add_samples(new_samples, force=force)
+
+    async def _timestamp(self) -> str:
+        """Время сервера для подписи запроса"""
+        if self.clock.last_attempt is None:
+            await self.sync_clock()
+        return str(self.clock.current_ms())
+
+    async def _make_request(self, method: str, endpoint: str, params: Dict = None, body: Dict = None) -> Dict:
+        """Выполнение HTTP запроса к API"""
+        session = await self._get_session()
+        method = method.upper()
+
+        query_string = ''
+        if params and method == 'GET':
+            query_string = '&'.join([f"{k}={v}" for k, v in sorted(params.items())])
+
+        body_str = ''
+        if method != 'GET':
+            payload_obj = body if body is not None else params
+            if payload_obj:
+                body_str = json.dumps(payload_obj, separators=(',', ':'))
+
+        payload = query_string if method == 'GET' else body_str
+        # Отправляем ровно ту строку запроса, которая была подписана
+        url = f"{self.base_url}{endpoint}" + (f"?{query_string}" if query_string else '')
+
+        async with self._semaphore:
+            for attempt in range(2):
+                await self._acquire(endpoint)
+
+                timestamp = await self._timestamp()
+                headers = {
+                    'X-BAPI-API-KEY': self.api_key,
+                    'X-BAPI-TIMESTAMP': timestamp,
+                    'X-BAPI-SIGN': generate_signature(self.api_key, self.api_secret, self.recv_window, timestamp, payload),
+                    'X-BAPI-RECV-WINDOW': str(self.recv_window),
+                    'Content-Type': 'application/json'
+                }
+
+                try:
+                    if method == 'GET':
+                        request = session.get(url, headers=headers)
+                    elif method == 'POST':
+                        request = session.post(url, data=body_str or None, headers=headers)
+                    else:
+                        raise ValueError(f"Неподдерживаемый HTTP метод: {method}")
+
+                    async with request as response:
+                        self.rate_limiter.update_from_headers(endpoint, response.headers, self.clock.offset_ms)
+                        response.raise_for_status()
+                        data = await response.json(content_type=None)
+                except aiohttp.ClientError as e:
+                    self.logger.error(f"Ошибка HTTP запроса: {e}")
+                    raise Exception(f"Ошибка соединения с API: {e}")
+                except asyncio.TimeoutError:
+                    self.logger.error(f"Таймаут запроса {endpoint}")
+                    raise Exception(f"Ошибка соединения с API: таймаут {endpoint}")
+                except json.JSONDecodeError as e:
+                    self.logger.error(f"Ошибка парсинга JSON: {e}")
+                    raise Exception(f"Некорректный ответ API: {e}")
+
+                if data.get('retCode') in ServerClock.TIMESTAMP_ERROR_CODES and attempt == 0:
+                    self.logger.warning(f"Ошибка времени запроса ({data.get('retMsg')}), пересинхронизация часов")
+                    await self.sync_clock(force=True)
+                    continue
+
+                if data.get('retCode') != 0:
+                    error_msg = data.get('retMsg', 'Неизвестная ошибка API')
+                    self.logger.error(f"API ошибка: {error_msg}")
+                    raise Exception(f"API ошибка: {error_msg}")
+
+                return data.get('result', {})
+
+    async def get_kline(self, category: str, symbol: str, interval: str, limit: int = 200,
+                        start: int = None, end: int = None) -> List[Dict]:
+        """Получение исторических данных (свечи) в формате BybitClient.get_kline"""
+        params = {
+            'category': category,
+            'symbol': symbol,
+            'interval': INTERVAL_MAP.get(interval, interval),
+            'limit': limit
+        }
+        if start is not None:
+            params['start'] = int(start)
+        if end is not None:
+            params['end'] = int(end)
+
+        result = await self._make_request('GET', '/v5/market/kline', params)
+        return [
+            {
+                'timestamp': int(kline[0]),
+                'open': float(kline[1]),
+                'high': float(kline[2]),
+                'low': float(kline[3]),
+                'close': float(kline[4]),
+                'volume': float(kline[5])
+            }
+            for kline in result.get('list', [])
+        ]
+
+    async def get_tickers(self, category: str = "linear", symbol: str = None) -> List[Dict]:
+        """Получение тикеров"""
+        params = {'category': category}
+        if symbol:
+            params['symbol'] = symbol
+        result = await self._make_request('GET', '/v5/market/tickers', params)
+        return result.get('list', [])
+
+    async def get_wallet_balance(self, account_type: str = "UNIFIED", coin: str = None) -> Dict:
+        """Получение баланса кошелька"""
+        params = {'accountType': account_type}
+        if coin:
+            params['coin'] = coin
+        try:
+            return await self._make_request('GET', '/v5/account/wallet-balance', params)
+        except Exception as e:
+            self.logger.error(f"Ошибка получения баланса кошелька: {e}")
+            return {}
+
+    async def place_order(self, category: str, symbol: str, side: str, order_type: str,
+                          qty: str, price: str = None, **kwargs) -> Dict:
+        """Размещение ордера"""
+        params = {
+            'category': category,
+            'symbol': symbol,
+            'side': side,
+            'orderType': order_type,
+            'qty': qty
+        }
+        if price:
+            params['price'] = price
+        params.update(kwargs)
+        return await self._make_request('POST', '/v5/order/create', params)
+
+    async def get_open_orders(self, category: str = "spot", symbol: str = None, limit: int = 50) -> Dict:
+        """Получение открытых ордеров"""
+        params = {'category': category, 'limit': limit}
+        if symbol:
+            params['symbol'] = symbol
+        return await self._make_request('GET', '/v5/order/realtime', params)
+
+    async def get_instruments_info(self, category: str, symbol: str = None) -> List[Dict]:
+        """Получение информации об инструментах"""
+        params = {'category': category}
+        if symbol:
+            params['symbol'] = symbol
+        result = await self._make_request('GET', '/v5/market/instruments-info', params)
+        return result.get('list', [])
+
+    async def get_klines_bulk(self, requests: Iterable[Tuple[str, str]], interval: str,
+                              limit: int = 200) -> Dict[str, List[Dict]]:
+        """Параллельная загрузка свечей для множества символов
+
+        Args:
+            requests: Пары (category, symbol)
+            interval: Интервал свечей
+            limit: Количество свечей на символ
+
+        Returns:
+            Dict[str, List[Dict]]: Свечи по символам (пустой список при ошибке)
+        """
+        requests = list(requests)
+        results = await asyncio.gather(
+            *[self.get_kline(category, symbol, interval, limit) for category, symbol in requests],
+            return_exceptions=True
+        )
+
+        klines_by_symbol = {}
+        for (category, symbol), result in zip(requests, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"Не удалось загрузить свечи {symbol} ({category}): {result}")
+                klines_by_symbol[symbol] = []
+            else:
+                klines_by_symbol[symbol] = result
+        return klines_by_symbol
+
+    async def get_klines_batch(self, requests: Iterable[Dict]) -> List[Optional[List[Dict]]]:
+        """Параллельное выполнение запросов свечей с произвольными start/end/limit
+
+        Args:
+            requests: Словари с ключами category, symbol, interval, limit, start, end
+
+        Returns:
+            List: Свечи в порядке запросов (None при ошибке запроса)
+        """
+        requests = list(requests)
+        results = await asyncio.gather(
+            *[self.get_kline(r['category'], r['symbol'], r['interval'], r.get('limit', 200),
+                             r.get('start'), r.get('end')) for r in requests],
+            return_exceptions=True
+        )
+
+        batch = []
+        for request, result in zip(requests, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"Не удалось загрузить свечи {request['symbol']}: {result}")
+                batch.append(None)
+            else:
+                batch.append(result)
+        return batch
+
+
+class AsyncBybitFacade:
+    """Синхронный фасад над AsyncBybitClient
+
+    Держит собственный event loop в фоновом потоке, поэтому им можно
+    пользоваться из QThread и консольного кода без asyncio.
+    """
+
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True,
+                 max_concurrency: int = 20, rate_limiter: RateLimiter = None,
+                 clock: ServerClock = None):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="AsyncBybitLoop", daemon=True)
+        self._thread.start()
+        self.client = AsyncBybitClient(
+            api_key, api_secret, testnet,
+            max_concurrency=max_concurrency,
+            rate_limiter=rate_limiter,
+            clock=clock
+        )
+
+    @classmethod
+    def from_client(cls, client, max_concurrency: int = 20) -> 'AsyncBybitFacade':
+        """Фасад с ключами, лимитами и часами существующего BybitClient"""
+        return cls(
+            client.api_key, client.api_secret, client.testnet,
+            max_concurrency=max_concurrency,
+            rate_limiter=client.rate_limiter,
+            clock=client.clock
+        )
+
+    def _run(self, coro, timeout: Optional[float] = None) -> Any:
+        """Выполнение корутины в фоновом event loop"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def get_kline(self, category: str, symbol: str, interval: str, limit: int = 200,
+                  start: int = None, end: int = None) -> List[Dict]:
+        return self._run(self.client.get_kline(category, symbol, interval, limit, start, end))
+
+    def get_tickers(self, category: str = "linear", symbol: str = None) -> List[Dict]:
+        return self._run(self.client.get_tickers(category, symbol))
+
+    def get_wallet_balance(self, account_type: str = "UNIFIED", coin: str = None) -> Dict:
+        return self._run(self.client.get_wallet_balance(account_type, coin))
+
+    def place_order(self, category: str, symbol: str, side: str, order_type: str,
+                    qty: str, price: str = None, **kwargs) -> Dict:
+        return self._run(self.client.place_order(category, symbol, side, order_type, qty, price, **kwargs))
+
+    def get_open_orders(self, category: str = "spot", symbol: str = None, limit: int = 50) -> Dict:
+        return self._run(self.client.get_open_orders(category, symbol, limit))
+
+    def get_instruments_info(self, category: str, symbol: str = None) -> List[Dict]:
+        return self._run(self.client.get_instruments_info(category, symbol))
+
+    def get_klines_bulk(self, requests: Iterable[Tuple[str, str]], interval: str,
+                        limit: int = 200) -> Dict[str, List[Dict]]:
+        """Параллельная загрузка свечей для множества пар (category, symbol)"""
+        return self._run(self.client.get_klines_bulk(requests, interval, limit))
+
+    def get_klines_batch(self, requests: Iterable[Dict]) -> List[Optional[List[Dict]]]:
+        """Параллельное выполнение запросов свечей с произвольными start/end/limit"""
+        return self._run(self.client.get_klines_batch(requests))
+
+    def close(self):
+        """Закрытие сессии и остановка event loop"""
+        try:
+            self._run(self.client.close(), timeout=5)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
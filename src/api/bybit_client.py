@@ -17,36 +17,334 @@ import threading
 from decimal import Decimal
 
 
+def generate_signature(api_key: str, api_secret: str, recv_window: int, timestamp: str, payload: str) -> str:
+    """Подпись запроса Bybit V5: HMAC-SHA256(timestamp + api_key + recv_window + payload)"""
+    sign_str = f"{timestamp}{api_key.strip()}{recv_window}{payload}"
+    return hmac.new(
+        api_secret.strip().encode('utf-8'),
+        sign_str.encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+
+
+# Соответствие форматов интервалов формату Bybit API
+INTERVAL_MAP = {
+    # Минутные интервалы
+    "1": "1", "1m": "1", "1min": "1",
+    "3": "3", "3m": "3", "3min": "3",
+    "5": "5", "5m": "5", "5min": "5",
+    "15": "15", "15m": "15", "15min": "15",
+    "30": "30", "30m": "30", "30min": "30",
+    
+    # Часовые интервалы
+    "60": "60", "1h": "60", "1hour": "60",
+    "120": "120", "2h": "120", "2hour": "120",
+    "240": "240", "4h": "240", "4hour": "240",
+    "360": "360", "6h": "360", "6hour": "360",
+    "720": "720", "12h": "720", "12hour": "720",
+    
+    # Дневные и недельные интервалы
+    "D": "D", "1d": "D", "1day": "D", "daily": "D",
+    "W": "W", "1w": "W", "1week": "W", "weekly": "W",
+    "M": "M", "1M": "M", "1month": "M", "monthly": "M"
+}
+
+
+class TokenBucket:
+    """Корзина токенов: capacity запросов с пополнением refill_rate токенов в секунду"""
+    
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        # До этого момента (monotonic) запросы запрещены по данным сервера
+        self.blocked_until = 0.0
+    
+    def _refill(self, now: float):
+        """Пополнение токенов за прошедшее время (O(1))"""
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated = now
+    
+    def wait_time(self, now: float) -> float:
+        """Время ожидания до появления токена (0 - токен есть), без списания"""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.refill_rate
+    
+    def try_acquire(self, now: float) -> float:
+        """Попытка взять токен. Возвращает 0 при успехе или время ожидания в секундах"""
+        wait_time = self.wait_time(now)
+        if wait_time <= 0:
+            self.tokens -= 1
+        return wait_time
+
+
 class RateLimiter:
-    """Контроль частоты запросов к API"""
+    """Контроль частоты запросов к API
+    
+    Отдельная корзина токенов для каждой группы эндпоинтов Bybit, поэтому
+    публичные запросы рыночных данных не ждут в очереди за приватными
+    запросами ордеров. Заголовки ответа X-Bapi-Limit-Status /
+    X-Bapi-Limit-Reset-Timestamp описывают лимит конкретного эндпоинта,
+    поэтому по ним ведется отдельная корзина эндпоинта, а корзина группы
+    не урезается. Ожидание выполняется вне блокировки.
+    """
     
-    def __init__(self, max_requests: int = 120, time_window: int = 60):
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = []
+    # Группа: (емкость корзины, пополнение в секунду)
+    DEFAULT_LIMITS = {
+        'market': (100, 20),
+        'order': (10, 10),
+        'position': (10, 10),
+        'account': (10, 10),
+        'default': (10, 5),
+    }
+    
+    ENDPOINT_GROUPS = (
+        ('/v5/market/', 'market'),
+        ('/v5/order/', 'order'),
+        ('/v5/execution/', 'order'),
+        ('/v5/position/', 'position'),
+        ('/v5/account/', 'account'),
+        ('/v5/asset/', 'account'),
+    )
+    
+    def __init__(self, limits: Dict[str, tuple] = None):
+        self.limits = dict(self.DEFAULT_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.buckets = {
+            group: TokenBucket(capacity, rate) for group, (capacity, rate) in self.limits.items()
+        }
+        # Корзины эндпоинтов, о лимитах которых сообщил сервер
+        self.endpoint_buckets: Dict[str, TokenBucket] = {}
         self.lock = threading.Lock()
     
-    def wait_if_needed(self):
-        """Ожидание если превышен лимит запросов"""
+    def get_group(self, endpoint: str = None) -> str:
+        """Определение группы лимитов по пути эндпоинта"""
+        if endpoint:
+            for prefix, group in self.ENDPOINT_GROUPS:
+                if endpoint.startswith(prefix):
+                    return group
+        return 'default'
+    
+    def try_acquire(self, endpoint: str = None) -> float:
+        """Неблокирующая попытка взять токен: 0 при успехе или время ожидания в секундах"""
+        buckets = [self.buckets[self.get_group(endpoint)]]
         with self.lock:
-            now = time.time()
-            # Удаляем старые запросы
-            self.requests = [req_time for req_time in self.requests 
-                           if now - req_time < self.time_window]
-            
-            if len(self.requests) >= self.max_requests:
-                sleep_time = self.time_window - (now - self.requests[0]) + 1
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-                    self.requests = []
-            
-            self.requests.append(now)
+            if endpoint in self.endpoint_buckets:
+                buckets.append(self.endpoint_buckets[endpoint])
+            now = time.monotonic()
+            # Токен списывается только если он есть и в группе, и у эндпоинта
+            wait_time = max(bucket.wait_time(now) for bucket in buckets)
+            if wait_time <= 0:
+                for bucket in buckets:
+                    bucket.tokens -= 1
+            return wait_time
+    
+    def wait_if_needed(self, endpoint: str = None):
+        """Ожидание если превышен лимит запросов для группы эндпоинта"""
+        while True:
+            wait_time = self.try_acquire(endpoint)
+            if wait_time <= 0:
+                return
+            time.sleep(wait_time)
+    
+    def update_from_headers(self, endpoint: str, headers, clock_offset_ms: float = 0.0):
+        """Корректировка бюджета по заголовкам лимитов из ответа Bybit
+        
+        Args:
+            endpoint: Путь эндпоинта
+            headers: Заголовки HTTP ответа
+            clock_offset_ms: Смещение часов сервера относительно локальных (server - local)
+        """
+        remaining = headers.get('X-Bapi-Limit-Status')
+        if remaining is None:
+            return
+        
+        try:
+            remaining = int(remaining)
+            limit = int(headers.get('X-Bapi-Limit', 0)) or max(remaining, 1)
+            reset_ms = int(headers.get('X-Bapi-Limit-Reset-Timestamp', 0))
+        except (TypeError, ValueError):
+            return
+        
+        with self.lock:
+            now = time.monotonic()
+            bucket = self.endpoint_buckets.get(endpoint)
+            if bucket is None or bucket.capacity != limit:
+                # Лимиты Bybit задаются на окно в 1 секунду
+                bucket = TokenBucket(limit, limit)
+                bucket.updated = now
+                self.endpoint_buckets[endpoint] = bucket
+            bucket._refill(now)
+            # Сервер знает точный остаток: не тратим больше, чем он разрешает
+            bucket.tokens = min(bucket.tokens, float(remaining))
+            if remaining <= 0 and reset_ms:
+                local_reset = (reset_ms - clock_offset_ms) / 1000
+                wait_time = max(0.0, local_reset - time.time())
+                bucket.blocked_until = max(bucket.blocked_until, now + wait_time)
+
+
+class ServerClock:
+    """Синхронизация локальных часов с временем сервера Bybit
+
+    Смещение (server - local) измеряется запросами к /v5/market/time.
+    Из последних замеров берется замер с минимальным RTT (как в NTP):
+    у него наименьшая погрешность, вносимая сетью. Смещение обновляется
+    в фоновом потоке, а подпись запросов использует local_time + offset
+    без дополнительного обращения к серверу.
+    """
+
+    # Коды ошибок Bybit, связанные с timestamp/recv_window
+    TIMESTAMP_ERROR_CODES = (10002,)
+
+    def __init__(self, session: requests.Session, base_url: str, sync_interval: float = 300.0,
+                 samples_per_sync: int = 4, history_size: int = 16, drift_threshold_ms: float = 500.0):
+        self.session = session
+        self.base_url = base_url
+        self.sync_interval = sync_interval
+        self.samples_per_sync = samples_per_sync
+        self.history_size = history_size
+        self.drift_threshold_ms = drift_threshold_ms
+
+        self.offset_ms = 0.0
+        self.rtt_ms = None
+        self.last_sync = None
+        self.last_attempt = None
+        self.synced = False
+        self.samples = []  # [(rtt_ms, offset_ms), ...]
+
+        self.lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger(__name__)
+
+    def _measure(self) -> Optional[tuple]:
+        """Один замер смещения: (rtt_ms, offset_ms) или None при ошибке"""
+        try:
+            url = f"{self.base_url}/v5/market/time"
+            t0 = time.time() * 1000
+            response = self.session.get(url, timeout=5)
+            t1 = time.time() * 1000
+            response.raise_for_status()
+            server_ms = self.parse_server_time(response.json())
+            if server_ms is None:
+                return None
+
+            # Считаем, что сервер ответил в середине интервала запроса
+            rtt = t1 - t0
+            offset = server_ms - (t0 + t1) / 2
+            return rtt, offset
+        except Exception as e:
+            self.logger.debug(f"Ошибка замера времени сервера: {e}")
+            return None
+
+    def sync(self, force: bool = False) -> bool:
+        """Синхронизация смещения часов
+
+        Args:
+            force: Сбросить накопленные замеры (после ошибки timestamp или дрейфа)
+        """
+        self.last_attempt = time.time()
+        new_samples = []
+        for _ in range(self.samples_per_sync):
+            sample = self._measure()
+            if sample:
+                new_samples.append(sample)
+
+        return self.add_samples(new_samples, force=force)
+
+    def add_samples(self, new_samples: List[tuple], force: bool = False) -> bool:
+        """Учет новых замеров (rtt_ms, offset_ms) и пересчет смещения
+
+        Используется как синхронным sync(), так и асинхронным клиентом,
+        который делает замеры через собственную сессию.
+        """
+        if not new_samples:
+            self.logger.warning("Не удалось синхронизировать время с сервером Bybit")
+            return False
+
+        with self.lock:
+            if force:
+                self.samples = []
+            self.samples.extend(new_samples)
+            self.samples = self.samples[-self.history_size:]
+
+            best_rtt, best_offset = min(self.samples, key=lambda s: s[0])
+
+            # Детекция дрейфа: свежий лучший замер сильно расходится с текущим смещением
+            fresh_rtt, fresh_offset = min(new_samples, key=lambda s: s[0])
+            drift = fresh_offset - self.offset_ms
+            if self.synced and abs(drift) > self.drift_threshold_ms:
+                self.logger.warning(f"Обнаружен дрейф часов: {drift:.0f} мс, сбрасываем историю замеров")
+                self.samples = list(new_samples)
+                best_rtt, best_offset = fresh_rtt, fresh_offset
+
+            self.offset_ms = best_offset
+            self.rtt_ms = best_rtt
+            self.last_sync = time.time()
+            self.synced = True
+
+        self.logger.debug(f"Время синхронизировано: offset={best_offset:.1f} мс, rtt={best_rtt:.1f} мс")
+        return True
+
+    @staticmethod
+    def parse_server_time(data: Dict) -> Optional[float]:
+        """Время сервера в мс из ответа /v5/market/time"""
+        if data.get('retCode') != 0:
+            return None
+        result = data.get('result', {})
+        if result.get('timeNano'):
+            server_ms = int(result['timeNano']) / 1_000_000
+        else:
+            server_ms = int(result.get('timeSecond', 0)) * 1000
+        return server_ms if server_ms > 0 else None
+
+    def current_ms(self) -> int:
+        """Локальное время с учетом последнего известного смещения"""
+        with self.lock:
+            return int(time.time() * 1000 + self.offset_ms)
+
+    def now_ms(self) -> int:
+        """Текущее время сервера в миллисекундах (local + offset)"""
+        # Первая синхронизация выполняется синхронно; при неудаче используем
+        # локальное время, а повторная попытка будет сделана фоновым потоком
+        if self.last_attempt is None:
+            self.sync()
+        self.start()
+        return self.current_ms()
+
+    def _run(self):
+        """Фоновое обновление смещения"""
+        while not self._stop_event.wait(self.sync_interval):
+            self.sync()
+
+    def start(self):
+        """Запуск фонового потока синхронизации (однократно)"""
+        if self._thread is not None or self.sync_interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="BybitClockSync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Остановка фонового потока синхронизации"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
 
 
 class BybitClient:
     """Клиент для работы с Bybit API"""
     
-    def __init__(self, api_key: str, api_secret: str, testnet: bool = True):
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True,
+                 time_sync_interval: float = 300.0):
         self.api_key = api_key
         self.api_secret = api_secret
         self.testnet = testnet
@@ -74,6 +372,9 @@ class BybitClient:
             'Content-Type': 'application/json',
             'User-Agent': 'TradingBot/1.0'
         })
+        
+        # Синхронизация часов с сервером (смещение обновляется в фоне)
+        self.clock = ServerClock(self.session, self.base_url, sync_interval=time_sync_interval)
     
     def _generate_signature(self, timestamp: str, payload: str) -> str:
         """Генерация подписи для запроса согласно спецификации Bybit V5
@@ -81,42 +382,18 @@ class BybitClient:
         Строка для подписи: timestamp + api_key + recv_window + payload
         где payload - это query string для GET или raw body для POST
         """
-        # Очистка API ключа и секрета от пробелов и невидимых символов
-        api_key = self.api_key.strip()
-        api_secret = self.api_secret.strip()
-        
-        # Формирование строки для подписи
-        sign_str = f"{timestamp}{api_key}{self.recv_window}{payload}"
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Строка для подписи: {timestamp}{self.api_key.strip()}{self.recv_window}{payload}")
         
-        self.logger.debug(f"Строка для подписи: {sign_str}")
-        
-        # Генерация подписи
-        return hmac.new(
-            api_secret.encode('utf-8'),
-            sign_str.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
+        return generate_signature(self.api_key, self.api_secret, self.recv_window, timestamp, payload)
     
     def _get_server_time_raw(self) -> int:
-        """Получение времени сервера без аутентификации"""
-        try:
-            url = f"{self.base_url}/v5/market/time"
-            response = self.session.get(url, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            if data.get('retCode') == 0:
-                return int(data.get('result', {}).get('timeSecond', 0)) * 1000
-        except:
-            pass
-        return int(time.time() * 1000)
+        """Время сервера по локальным часам с учетом смещения"""
+        return self.clock.now_ms()
     
     def _make_request(self, method: str, endpoint: str, params: Dict = None, body: Dict = None) -> Dict:
         """Выполнение HTTP запроса к API"""
-        self.rate_limiter.wait_if_needed()
-        
         url = f"{self.base_url}{endpoint}"
-        # Получаем серверное время для синхронизации
-        timestamp = str(self._get_server_time_raw())
         
         # Подготовка query string для GET запросов
         query_string = ''
@@ -134,44 +411,60 @@ class BybitClient:
         # Определение payload для подписи
         payload = query_string if method.upper() == 'GET' else body_str
         
-        # Генерация подписи
-        signature = self._generate_signature(timestamp, payload)
-        
-        # Заголовки
-        headers = {
-            'X-BAPI-API-KEY': self.api_key,
-            'X-BAPI-TIMESTAMP': timestamp,
-            'X-BAPI-SIGN': signature,
-            'X-BAPI-RECV-WINDOW': str(self.recv_window),
-            'Content-Type': 'application/json'
-        }
-        
-        try:
-            if method.upper() == 'GET':
-                response = self.session.get(url, params=params, headers=headers, timeout=10)
-            elif method.upper() == 'POST':
-                request_body = body if body is not None else params
-                response = self.session.post(url, data=body_str if body_str else None, json=request_body if not body_str else None, headers=headers, timeout=10)
-            else:
-                raise ValueError(f"Неподдерживаемый HTTP метод: {method}")
+        # Вторая попытка выполняется только после ошибки timestamp/recv_window
+        for attempt in range(2):
+            self.rate_limiter.wait_if_needed(endpoint)
             
-            response.raise_for_status()
-            data = response.json()
+            # Время сервера по синхронизированным локальным часам
+            timestamp = str(self._get_server_time_raw())
             
-            # Проверка ответа API
-            if data.get('retCode') != 0:
-                error_msg = data.get('retMsg', 'Неизвестная ошибка API')
-                self.logger.error(f"API ошибка: {error_msg}")
-                raise Exception(f"API ошибка: {error_msg}")
+            # Генерация подписи
+            signature = self._generate_signature(timestamp, payload)
             
-            return data.get('result', {})
+            # Заголовки
+            headers = {
+                'X-BAPI-API-KEY': self.api_key,
+                'X-BAPI-TIMESTAMP': timestamp,
+                'X-BAPI-SIGN': signature,
+                'X-BAPI-RECV-WINDOW': str(self.recv_window),
+                'Content-Type': 'application/json'
+            }
             
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Ошибка HTTP запроса: {e}")
-            raise Exception(f"Ошибка соединения с API: {e}")
-        except json.JSONDecodeError as e:
-            self.logger.error(f"Ошибка парсинга JSON: {e}")
-            raise Exception(f"Некорректный ответ API: {e}")
+            try:
+                if method.upper() == 'GET':
+                    response = self.session.get(url, params=params, headers=headers, timeout=10)
+                elif method.upper() == 'POST':
+                    request_body = body if body is not None else params
+                    response = self.session.post(url, data=body_str if body_str else None, json=request_body if not body_str else None, headers=headers, timeout=10)
+                else:
+                    raise ValueError(f"Неподдерживаемый HTTP метод: {method}")
+                
+                # Обратная связь по лимитам (в том числе для ответов 429)
+                self.rate_limiter.update_from_headers(endpoint, response.headers, self.clock.offset_ms)
+                
+                response.raise_for_status()
+                data = response.json()
+                
+                # Ошибка timestamp/recv_window: пересинхронизируем часы и повторяем запрос
+                if data.get('retCode') in ServerClock.TIMESTAMP_ERROR_CODES and attempt == 0:
+                    self.logger.warning(f"Ошибка времени запроса ({data.get('retMsg')}), пересинхронизация часов")
+                    self.clock.sync(force=True)
+                    continue
+                
+                # Проверка ответа API
+                if data.get('retCode') != 0:
+                    error_msg = data.get('retMsg', 'Неизвестная ошибка API')
+                    self.logger.error(f"API ошибка: {error_msg}")
+                    raise Exception(f"API ошибка: {error_msg}")
+                
+                return data.get('result', {})
+                
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"Ошибка HTTP запроса: {e}")
+                raise Exception(f"Ошибка соединения с API: {e}")
+            except json.JSONDecodeError as e:
+                self.logger.error(f"Ошибка парсинга JSON: {e}")
+                raise Exception(f"Некорректный ответ API: {e}")
     
     def _get_cached_data(self, cache_key: str) -> Optional[Dict]:
         """Получение данных из кэша"""
@@ -273,8 +566,14 @@ class BybitClient:
         
         return self._make_request('GET', '/v5/asset/transfer/query-transfer-coin-list', params)
     
-    def get_positions(self, category: str = "linear", symbol: str = None, settle_coin: str = "USDT") -> List[Dict]:
-        """Получение позиций"""
+    def get_positions(self, category: str = "linear", symbol: str = None, settle_coin: str = "USDT",
+                      raise_on_error: bool = False) -> List[Dict]:
+        """Получение позиций
+
+        Args:
+            raise_on_error: Пробросить ошибку запроса вместо пустого списка
+                (для снимка счета, где пустой список означает "позиций нет")
+        """
         # Отключаем кэширование для отладки
         # cache_key = f"positions_{category}_{symbol or 'all'}_{settle_coin}"
         # cached_data = self._get_cached_data(cache_key)
@@ -303,6 +602,8 @@ class BybitClient:
             return positions
         except Exception as e:
             self.logger.error(f"Ошибка получения позиций: {e}")
+            if raise_on_error:
+                raise
             import traceback
             self.logger.error(traceback.format_exc())
             return []
@@ -465,29 +766,7 @@ class BybitClient:
         ожидаемом в trading_bot_main.py
         """
         try:
-            # Расширенная карта интервалов с поддержкой множественных форматов
-            interval_map = {
-                # Минутные интервалы
-                "1": "1", "1m": "1", "1min": "1",
-                "3": "3", "3m": "3", "3min": "3",
-                "5": "5", "5m": "5", "5min": "5",
-                "15": "15", "15m": "15", "15min": "15",
-                "30": "30", "30m": "30", "30min": "30",
-                
-                # Часовые интервалы
-                "60": "60", "1h": "60", "1hour": "60",
-                "120": "120", "2h": "120", "2hour": "120",
-                "240": "240", "4h": "240", "4hour": "240",
-                "360": "360", "6h": "360", "6hour": "360",
-                "720": "720", "12h": "720", "12hour": "720",
-                
-                # Дневные и недельные интервалы
-                "D": "D", "1d": "D", "1day": "D", "daily": "D",
-                "W": "W", "1w": "W", "1week": "W", "weekly": "W",
-                "M": "M", "1M": "M", "1month": "M", "monthly": "M"
-            }
-            
-            api_interval = interval_map.get(interval, interval)
+            api_interval = INTERVAL_MAP.get(interval, interval)
             
             # Получаем данные через базовый метод
             klines = self._make_request('GET', '/v5/market/kline', {
@@ -660,6 +939,11 @@ class BybitClient:
             self.logger.error(f"Ошибка соединения: {e}")
             return False
     
+    def close(self):
+        """Остановка фоновых задач и закрытие HTTP сессии"""
+        self.clock.stop()
+        self.session.close()
+    
     def get_server_time(self) -> int:
         """Получение времени сервера"""
         result = self._make_request('GET', '/v5/market/time')
@@ -672,4 +956,18 @@ class BybitClient:
             params['symbol'] = symbol
         
         result = self._make_request('GET', '/v5/market/instruments-info', params)
-        return result.get('list', [])
\ No newline at end of file
+        return result.get('list', [])
+    
+    def get_all_instruments_info(self, category: str, limit: int = 1000) -> List[Dict]:
+        """Все инструменты категории с обходом страниц (nextPageCursor)"""
+        instruments = []
+        cursor = None
+        while True:
+            params = {'category': category, 'limit': limit}
+            if cursor:
+                params['cursor'] = cursor
+            result = self._make_request('GET', '/v5/market/instruments-info', params)
+            instruments.extend(result.get('list', []))
+            cursor = result.get('nextPageCursor')
+            if not cursor or not result.get('list'):
+                return instruments
\ No newline at end of file
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Кэш списка инструментов Bybit (spot/linear) с долгим TTL
+Инструменты загружаются постранично, хранятся в памяти с быстрым поиском
+по символу и сохраняются в таблицу available_symbols. При обновлении
+подписчики получают списки добавленных и исключенных символов
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_CATEGORIES = ('spot', 'linear')
+
+
+def _to_float(value, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_instrument(instrument: Dict, category: str) -> Dict:
+    """Плоская запись инструмента (формат upsert_available_symbols) из ответа instruments-info"""
+    price_filter = instrument.get('priceFilter') or {}
+    lot_filter = instrument.get('lotSizeFilter') or {}
+    leverage_filter = instrument.get('leverageFilter') or {}
+    tick_size = price_filter.get('tickSize', instrument.get('tickSize'))
+    # У спота шаг количества задает basePrecision, у деривативов - qtyStep
+    qty_step = lot_filter.get('qtyStep', lot_filter.get('basePrecision', instrument.get('qtyStep')))
+    return {
+        'symbol': instrument.get('symbol', ''),
+        'category': category,
+        'baseCoin': instrument.get('baseCoin', ''),
+        'quoteCoin': instrument.get('quoteCoin', ''),
+        'priceScale': int(_to_float(instrument.get('priceScale'))),
+        'takerFee': _to_float(instrument.get('takerFee')),
+        'makerFee': _to_float(instrument.get('makerFee')),
+        'minLeverage': _to_float(leverage_filter.get('minLeverage', instrument.get('minLeverage'))),
+        'maxLeverage': _to_float(leverage_filter.get('maxLeverage', instrument.get('maxLeverage'))),
+        'leverageStep': _to_float(leverage_filter.get('leverageStep', instrument.get('leverageStep'))),
+        'minPrice': _to_float(price_filter.get('minPrice', instrument.get('minPrice'))),
+        'maxPrice': _to_float(price_filter.get('maxPrice', instrument.get('maxPrice'))),
+        'tickSize': _to_float(tick_size),
+        'minOrderQty': _to_float(lot_filter.get('minOrderQty', instrument.get('minOrderQty'))),
+        'maxOrderQty': _to_float(lot_filter.get('maxOrderQty', instrument.get('maxOrderQty'))),
+        'qtyStep': _to_float(qty_step),
+        'postOnlyMaxOrderQty': _to_float(lot_filter.get('postOnlyMaxOrderQty', instrument.get('postOnlyMaxOrderQty'))),
+        'status': instrument.get('status', ''),
+    }
+
+
+class InstrumentsCache:
+    """Инструменты по категориям с TTL, сохранением в БД и оповещением об изменениях"""
+
+    def __init__(self, client, db_manager=None, categories: Iterable[str] = DEFAULT_CATEGORIES,
+                 ttl_seconds: float = 6 * 3600):
+        """
+        Args:
+            client: BybitClient (get_all_instruments_info или get_instruments_info)
+            db_manager: DatabaseManager для сохранения в available_symbols (необязательно)
+            categories: Категории инструментов
+            ttl_seconds: Время жизни списка
+        """
+        self.client = client
+        self.db_manager = db_manager
+        self.categories = tuple(categories)
+        self.ttl_seconds = ttl_seconds
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._raw: Dict[str, List[Dict]] = {}
+        self._records: Dict[Tuple[str, str], Dict] = {}
+        self._categories_by_symbol: Dict[str, List[str]] = {}
+        self._trading: Dict[str, set] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._subscribers: List[Callable[[Dict], None]] = []
+
+        self.refresh_count = 0
+        if db_manager is not None:
+            self._load_from_db()
+
+    # ---- Загрузка ----
+
+    def _load_from_db(self):
+        """Начальное состояние из available_symbols (база для списков изменений)"""
+        try:
+            rows = self.db_manager.get_available_symbols(limit=100000)
+        except Exception as e:
+            self.logger.warning(f"Не удалось прочитать инструменты из БД: {e}")
+            return
+        by_category: Dict[str, List[Dict]] = {}
+        for row in rows:
+            row = dict(row)
+            if row.get('category') not in self.categories:
+                continue
+            by_category.setdefault(row['category'], []).append({
+                'symbol': row['symbol'], 'category': row['category'],
+                'baseCoin': row['base_coin'], 'quoteCoin': row['quote_coin'],
+                'priceScale': row['price_scale'], 'takerFee': row['taker_fee'], 'makerFee': row['maker_fee'],
+                'minLeverage': row['min_leverage'], 'maxLeverage': row['max_leverage'],
+                'leverageStep': row['leverage_step'], 'minPrice': row['min_price'], 'maxPrice': row['max_price'],
+                'tickSize': row['tick_size'], 'minOrderQty': row['min_order_qty'],
+                'maxOrderQty': row['max_order_qty'], 'qtyStep': row['qty_step'],
+                'postOnlyMaxOrderQty': row['post_only_max_order_qty'], 'status': row['symbol_status'],
+            })
+        with self._lock:
+            for category, records in by_category.items():
+                # Записи из БД устаревшие: loaded_at не выставляется, первый ensure_fresh обновит их
+                self._apply(category, records, raw=None)
+        if by_category:
+            self.logger.info(f"Из БД загружено инструментов: {sum(map(len, by_category.values()))}")
+
+    def _fetch(self, category: str) -> List[Dict]:
+        fetch = getattr(self.client, 'get_all_instruments_info', None) or self.client.get_instruments_info
+        return fetch(category=category)
+
+    def refresh(self, force: bool = True) -> Dict[str, Dict[str, List[str]]]:
+        """Обновление списка инструментов
+
+        Args:
+            force: Обновить все категории независимо от TTL
+
+        Returns:
+            {category: {'listed': [...], 'delisted': [...]}} для изменившихся категорий
+        """
+        with self._refresh_lock:
+            diffs = {}
+            fetched = []
+            for category in self.categories:
+                if not force and not self._is_stale(category):
+                    continue
+                try:
+                    raw = self._fetch(category)
+                except Exception as e:
+                    self.logger.error(f"Ошибка загрузки инструментов категории {category}: {e}")
+                    continue
+                if not raw:
+                    # Пустой ответ не должен исключить все символы категории
+                    self.logger.warning(f"Пустой список инструментов категории {category}, оставлен прежний")
+                    continue
+
+                records = [normalize_instrument(instrument, category) for instrument in raw]
+                with self._lock:
+                    had_baseline = category in self._trading
+                    before = self._trading.get(category, set())
+                    self._apply(category, records, raw)
+                    self._loaded_at[category] = time.time()
+                    after = self._trading[category]
+                fetched.append(category)
+
+                listed, delisted = sorted(after - before), sorted(before - after)
+                if had_baseline and (listed or delisted):
+                    diffs[category] = {'listed': listed, 'delisted': delisted}
+
+            if fetched:
+                self.refresh_count += 1
+                self._persist(fetched)
+        for category, diff in diffs.items():
+            self.logger.info(f"Инструменты {category}: добавлено {len(diff['listed'])}, "
+                             f"исключено {len(diff['delisted'])}")
+            self._notify({'category': category, **diff})
+        return diffs
+
+    def ensure_fresh(self) -> Dict[str, Dict[str, List[str]]]:
+        """Обновление только категорий с истекшим TTL"""
+        if not any(self._is_stale(category) for category in self.categories):
+            return {}
+        return self.refresh(force=False)
+
+    def _is_stale(self, category: str) -> bool:
+        loaded_at = self._loaded_at.get(category)
+        return loaded_at is None or time.time() - loaded_at >= self.ttl_seconds
+
+    def _apply(self, category: str, records: List[Dict], raw: Optional[List[Dict]]):
+        self._raw[category] = raw if raw is not None else [
+            {**record, 'priceFilter': {'tickSize': record['tickSize']},
+             'lotSizeFilter': {'qtyStep': record['qtyStep'], 'minOrderQty': record['minOrderQty']}}
+            for record in records
+        ]
+        for key in [key for key in self._records if key[1] == category]:
+            del self._records[key]
+        for record in records:
+            self._records[(record['symbol'], category)] = record
+        self._trading[category] = {r['symbol'] for r in records if r['status'] == 'Trading'}
+
+        categories_by_symbol: Dict[str, List[str]] = {}
+        for symbol, record_category in self._records:
+            categories_by_symbol.setdefault(symbol, []).append(record_category)
+        self._categories_by_symbol = categories_by_symbol
+
+    def _persist(self, categories: List[str]):
+        """Сохранение обновленных категорий (остальные категории в БД не трогаются)"""
+        if self.db_manager is None:
+            return
+        with self._lock:
+            records = [record for (_, category), record in self._records.items() if category in categories]
+        try:
+            stats = self.db_manager.upsert_available_symbols(records, categories=categories)
+            self.logger.info(f"Инструменты сохранены в БД: изменено {stats['written']}, удалено {stats['removed']}")
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения инструментов в БД: {e}")
+
+    # ---- Подписка на изменения ----
+
+    def subscribe(self, callback: Callable[[Dict], None]):
+        """callback({'category', 'listed', 'delisted'}) после обновления"""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Dict], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _notify(self, diff: Dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(diff)
+            except Exception as e:
+                self.logger.error(f"Ошибка в подписчике изменений инструментов: {e}")
+
+    # ---- Поиск ----
+
+    def get_instruments(self, category: str) -> List[Dict]:
+        """Инструменты категории в формате ответа instruments-info (обновляются по TTL)"""
+        if self._is_stale(category):
+            self.ensure_fresh()
+        with self._lock:
+            return list(self._raw.get(category, []))
+
+    def get(self, symbol: str, category: str = 'spot') -> Optional[Dict]:
+        """Плоская запись инструмента или None"""
+        with self._lock:
+            record = self._records.get((symbol, category))
+            return dict(record) if record else None
+
+    def symbols(self, category: str = 'spot', quote_coin: Optional[str] = None,
+                trading_only: bool = True) -> List[str]:
+        """Символы категории (по умолчанию только торгуемые)"""
+        with self._lock:
+            return sorted(
+                symbol for (symbol, record_category), record in self._records.items()
+                if record_category == category
+                and (not trading_only or record['status'] == 'Trading')
+                and (quote_coin is None or record['quoteCoin'] == quote_coin)
+            )
+
+    def categories_for(self, symbol: str, trading_only: bool = True) -> List[str]:
+        """Категории, в которых есть символ"""
+        with self._lock:
+            categories = self._categories_by_symbol.get(symbol, [])
+            if trading_only:
+                categories = [c for c in categories if symbol in self._trading.get(c, ())]
+            return list(categories)
+
+    def tick_size(self, symbol: str, category: str = 'spot') -> Optional[float]:
+        record = self.get(symbol, category)
+        return record['tickSize'] if record else None
+
+    def qty_step(self, symbol: str, category: str = 'spot') -> Optional[float]:
+        record = self.get(symbol, category)
+        return record['qtyStep'] if record else None
+
+    def min_order_qty(self, symbol: str, category: str = 'spot') -> Optional[float]:
+        record = self.get(symbol, category)
+        return record['minOrderQty'] if record else None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+
+_caches: Dict[int, InstrumentsCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_instruments_cache(client, db_manager=None, ttl_seconds: Optional[float] = None) -> InstrumentsCache:
+    """Общий кэш инструментов для клиента API - один список на процесс"""
+    with _caches_lock:
+        cache = _caches.get(id(client))
+        if cache is None or cache.client is not client:
+            if ttl_seconds is None:
+                try:
+                    from config import INSTRUMENTS_CACHE_TTL_HOURS
+                    ttl_seconds = INSTRUMENTS_CACHE_TTL_HOURS * 3600
+                except ImportError:
+                    ttl_seconds = 6 * 3600
+            cache = InstrumentsCache(client, db_manager, ttl_seconds=ttl_seconds)
+            _caches[id(client)] = cache
+        elif db_manager is not None and cache.db_manager is None:
+            cache.db_manager = db_manager
+        return cache
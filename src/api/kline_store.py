@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Инкрементальное хранилище свечей по (category, symbol, interval)
+После первичной загрузки окна запрашивается только дельта через start=,
+пропуски внутри окна догружаются, хранится скользящее окно свечей
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .bybit_client import INTERVAL_MAP
+
+
+# Длительность интервалов в миллисекундах (месячные свечи всегда загружаются целиком)
+INTERVAL_MS = {
+    "1": 60_000, "3": 180_000, "5": 300_000, "15": 900_000, "30": 1_800_000,
+    "60": 3_600_000, "120": 7_200_000, "240": 14_400_000, "360": 21_600_000,
+    "720": 43_200_000, "D": 86_400_000, "W": 604_800_000,
+}
+
+# Максимум свечей в одном ответе /v5/market/kline
+MAX_KLINES_PER_REQUEST = 1000
+
+KlineKey = Tuple[str, str, str]
+
+
+class KlineStore:
+    """Скользящее окно свечей с загрузкой только новых данных
+
+    Окно возвращается в порядке REST ответа Bybit (новые свечи первыми),
+    чтобы стратегия получала те же данные, что и при полной загрузке.
+    """
+
+    def __init__(self, fetcher: Callable[..., List[Dict]], window: int = 200,
+                 max_staleness: float = 60.0, now_ms: Callable[[], int] = None,
+                 batch_fetcher: Callable[[List[Dict]], List[List[Dict]]] = None):
+        """
+        Args:
+            fetcher: Функция как BybitClient.get_kline(category, symbol, interval, limit, start, end)
+            window: Размер скользящего окна свечей
+            max_staleness: Как часто (сек) обновлять незакрытую свечу без новых данных
+            now_ms: Источник текущего времени биржи в мс (по умолчанию локальные часы)
+            batch_fetcher: Параллельная загрузка списка запросов (AsyncBybitFacade.get_klines_batch)
+        """
+        self.fetcher = fetcher
+        self.batch_fetcher = batch_fetcher
+        self.window = window
+        self.max_staleness = max_staleness
+        self.now_ms = now_ms or (lambda: int(time.time() * 1000))
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._candles: Dict[KlineKey, Dict[int, Dict]] = {}
+        self._last_fetch: Dict[KlineKey, float] = {}
+        self._unfillable: Dict[KlineKey, set] = {}
+        # Число свечей последней полной REST загрузки (ряды без нее догружаются целиком)
+        self._full_loaded: Dict[KlineKey, int] = {}
+
+        # Статистика трафика
+        self.requests = 0
+        self.candles_fetched = 0
+        self.full_loads = 0
+        self.gap_fills = 0
+
+    @staticmethod
+    def make_key(category: str, symbol: str, interval: str) -> KlineKey:
+        return (category, symbol, INTERVAL_MAP.get(interval, interval))
+
+    # ---- Слияние данных ----
+
+    def merge(self, category: str, symbol: str, interval: str, klines: Iterable[Dict],
+              mark_fresh: bool = False) -> int:
+        """Слияние свечей (REST или WebSocket), возвращает число новых свечей
+
+        mark_fresh - данные актуальны (например, из WebSocket), REST-обновление
+        незакрытой свечи откладывается на max_staleness
+        """
+        key = self.make_key(category, symbol, interval)
+        added = 0
+        with self._lock:
+            candles = self._candles.setdefault(key, {})
+            for kline in klines:
+                ts = int(kline['timestamp'])
+                if ts not in candles:
+                    added += 1
+                candles[ts] = {
+                    'timestamp': ts,
+                    'open': float(kline['open']),
+                    'high': float(kline['high']),
+                    'low': float(kline['low']),
+                    'close': float(kline['close']),
+                    'volume': float(kline['volume'])
+                }
+            # Скользящее окно: старые свечи отбрасываются
+            if len(candles) > self.window:
+                for ts in sorted(candles)[:len(candles) - self.window]:
+                    del candles[ts]
+            if mark_fresh:
+                self._last_fetch[key] = time.time()
+        return added
+
+    def merge_ws_kline(self, category: str, symbol: str, interval: str, kline: Dict) -> int:
+        """Свеча из WebSocket попадает только в уже загруженный через REST ряд
+
+        Иначе ряд из одной свечи выглядел бы свежим и окно не загрузилось бы целиком
+        """
+        key = self.make_key(category, symbol, interval)
+        with self._lock:
+            if key not in self._full_loaded:
+                return 0
+        return self.merge(category, symbol, interval, [kline], mark_fresh=True)
+
+    # ---- Планирование запросов ----
+
+    def _find_gaps(self, key: KlineKey, timestamps: List[int]) -> List[Tuple[int, int]]:
+        step = INTERVAL_MS.get(key[2])
+        if not step:
+            return []
+        skipped = self._unfillable.get(key, set())
+        return [(prev + step, cur - step) for prev, cur in zip(timestamps, timestamps[1:])
+                if cur - prev > step and prev + step not in skipped]
+
+    def plan(self, key: KlineKey, now_ms: int = None, force: bool = False) -> List[Dict]:
+        """Запросы, необходимые для актуализации окна (пустой список - данные свежие)"""
+        category, symbol, interval = key
+        now_ms = now_ms if now_ms is not None else self.now_ms()
+        step = INTERVAL_MS.get(interval)
+        base = {'category': category, 'symbol': symbol, 'interval': interval}
+
+        with self._lock:
+            timestamps = sorted(self._candles.get(key, {}))
+            last_fetch = self._last_fetch.get(key, 0)
+            full_loaded = self._full_loaded.get(key)
+
+        # Нет данных, интервал без фиксированной длины, ряд не загружался через REST
+        # или в нем меньше свечей, чем отдала биржа при полной загрузке - полное окно
+        if not timestamps or not step or full_loaded is None or \
+                len(timestamps) < min(self.window, full_loaded):
+            return [dict(base, limit=self.window, kind='full')]
+
+        last_ts = timestamps[-1]
+        # Последняя свеча закрыта - значит, началась новая
+        candle_closed = now_ms >= last_ts + step
+        stale = time.time() - last_fetch >= self.max_staleness
+        requests = []
+
+        if force or candle_closed or stale:
+            # Дельта с последней закрытой свечи (незакрытая свеча перезапрашивается)
+            last_closed = last_ts if candle_closed else last_ts - step
+            missing = (now_ms - last_closed) // step + 1
+            if missing >= self.window:
+                return [dict(base, limit=self.window, kind='full')]
+            requests.append(dict(base, start=last_closed, end=now_ms,
+                                 limit=min(int(missing) + 1, MAX_KLINES_PER_REQUEST), kind='delta'))
+
+        for gap_start, gap_end in self._find_gaps(key, timestamps):
+            count = (gap_end - gap_start) // step + 1
+            requests.append(dict(base, start=gap_start, end=gap_end,
+                                 limit=min(int(count), MAX_KLINES_PER_REQUEST), kind='gap'))
+        return requests
+
+    def apply(self, request: Dict, klines: List[Dict]):
+        """Применение результата запроса, построенного plan()"""
+        key = self.make_key(request['category'], request['symbol'], request['interval'])
+        # apply вызывается из нескольких потоков загрузки - счетчики под блокировкой
+        with self._lock:
+            self.requests += 1
+            self.candles_fetched += len(klines)
+            if request['kind'] == 'full':
+                self.full_loads += 1
+                self._candles[key] = {}
+                self._unfillable.pop(key, None)
+                self._full_loaded[key] = len(klines)
+            elif request['kind'] == 'gap':
+                self.gap_fills += 1
+                if not klines:
+                    # Биржа не вернула свечей за этот промежуток - больше не запрашиваем
+                    self._unfillable.setdefault(key, set()).add(request['start'])
+
+        self.merge(*key, klines, mark_fresh=True)
+
+    def _fetch(self, request: Dict) -> List[Dict]:
+        return self.fetcher(
+            category=request['category'], symbol=request['symbol'],
+            interval=request['interval'], limit=request['limit'],
+            start=request.get('start'), end=request.get('end')
+        )
+
+    # ---- Публичный интерфейс ----
+
+    def refresh_many(self, keys: Iterable[KlineKey], force: bool = False) -> int:
+        """Актуализация нескольких окон; запросы выполняются пакетом, если есть batch_fetcher"""
+        now_ms = self.now_ms()
+        requests = []
+        for key in keys:
+            requests.extend(self.plan(self.make_key(*key), now_ms, force))
+        if not requests:
+            return 0
+
+        if self.batch_fetcher is not None:
+            results = self.batch_fetcher(requests)
+        else:
+            results = []
+            for request in requests:
+                try:
+                    results.append(self._fetch(request))
+                except Exception as e:
+                    self.logger.warning(f"Не удалось загрузить свечи {request['symbol']}: {e}")
+                    results.append(None)
+
+        for request, klines in zip(requests, results):
+            # None - ошибка запроса: окно не трогаем, повторим в следующий раз
+            if klines is not None:
+                self.apply(request, klines)
+        return len(requests)
+
+    def refresh(self, category: str, symbol: str, interval: str, force: bool = False) -> int:
+        return self.refresh_many([(category, symbol, interval)], force)
+
+    def get_window(self, category: str, symbol: str, interval: str, limit: int = None,
+                   refresh: bool = True, newest_first: bool = True) -> List[Dict]:
+        """Скользящее окно свечей (по умолчанию новые первыми, как в ответе API)"""
+        if refresh:
+            self.refresh(category, symbol, interval)
+        key = self.make_key(category, symbol, interval)
+        with self._lock:
+            candles = self._candles.get(key, {})
+            window = [dict(candles[ts]) for ts in sorted(candles)]
+        if limit:
+            window = window[-limit:]
+        if newest_first:
+            window.reverse()
+        return window
+
+    def last_closed_timestamp(self, category: str, symbol: str, interval: str,
+                              now_ms: int = None) -> Optional[int]:
+        """Время открытия последней закрытой свечи"""
+        key = self.make_key(category, symbol, interval)
+        step = INTERVAL_MS.get(key[2])
+        now_ms = now_ms if now_ms is not None else self.now_ms()
+        with self._lock:
+            timestamps = sorted(self._candles.get(key, {}))
+        for ts in reversed(timestamps):
+            if step is None or ts + step <= now_ms:
+                return ts
+        return None
+
+    @classmethod
+    def expected_last_closed(cls, interval: str, now_ms: int) -> Optional[int]:
+        """Время открытия последней закрытой к now_ms свечи по часам, без обращения к данным"""
+        step = INTERVAL_MS.get(INTERVAL_MAP.get(interval, interval))
+        if not step:
+            return None
+        return (now_ms // step - 1) * step
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'series': len(self._candles),
+                'requests': self.requests,
+                'candles_fetched': self.candles_fetched,
+                'full_loads': self.full_loads,
+                'gap_fills': self.gap_fills,
+            }
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Поток рыночных данных Bybit v5 через публичный WebSocket
+Одно соединение на категорию, подписки пакетами, heartbeat,
+автоматическое переподключение с повторной подпиской и общий
+живой снимок тикеров/свечей для всех окон и торгового потока
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import websockets
+
+from .bybit_client import INTERVAL_MAP
+
+
+PUBLIC_WS_URLS = {
+    True: "wss://stream-testnet.bybit.com/v5/public/{category}",
+    False: "wss://stream.bybit.com/v5/public/{category}",
+}
+
+
+class LiveMarketSnapshot:
+    """Потокобезопасный снимок тикеров и последних свечей"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tickers: Dict[str, Dict] = {}
+        self._klines: Dict[Tuple[str, str], Dict] = {}
+        self.last_update: Optional[float] = None
+        self.generation = 0  # Увеличивается при каждом изменении
+
+    def load_tickers(self, tickers: Iterable[Dict]) -> int:
+        """Заполнение снимка из REST ответа get_tickers"""
+        count = 0
+        with self._lock:
+            for ticker in tickers:
+                symbol = ticker.get('symbol')
+                if symbol:
+                    self._tickers[symbol] = dict(ticker)
+                    count += 1
+            self._touch()
+        return count
+
+    def apply_ticker(self, data: Dict, is_snapshot: bool = True) -> Optional[Dict]:
+        """Применение snapshot/delta сообщения тикера, возвращает итоговый тикер"""
+        symbol = data.get('symbol')
+        if not symbol:
+            return None
+        with self._lock:
+            current = self._tickers.get(symbol)
+            if is_snapshot or current is None:
+                current = dict(data)
+            else:
+                # В delta приходят только изменившиеся поля
+                current = dict(current)
+                current.update(data)
+            self._tickers[symbol] = current
+            self._touch()
+            return dict(current)
+
+    def apply_kline(self, interval: str, symbol: str, kline: Dict) -> Dict:
+        """Сохранение последней свечи по символу и интервалу"""
+        formatted = {
+            'timestamp': int(kline.get('start', 0)),
+            'open': float(kline.get('open', 0)),
+            'high': float(kline.get('high', 0)),
+            'low': float(kline.get('low', 0)),
+            'close': float(kline.get('close', 0)),
+            'volume': float(kline.get('volume', 0)),
+            'turnover': float(kline.get('turnover', 0)),
+            'confirm': bool(kline.get('confirm', False)),
+        }
+        with self._lock:
+            self._klines[(symbol, interval)] = formatted
+            self._touch()
+        return dict(formatted)
+
+    def _touch(self):
+        self.last_update = time.time()
+        self.generation += 1
+
+    def get_tickers(self) -> List[Dict]:
+        """Копия всех тикеров в формате REST get_tickers"""
+        with self._lock:
+            return [dict(t) for t in self._tickers.values()]
+
+    def get_ticker(self, symbol: str) -> Optional[Dict]:
+        with self._lock:
+            ticker = self._tickers.get(symbol)
+            return dict(ticker) if ticker else None
+
+    def get_last_price(self, symbol: str) -> Optional[float]:
+        """Последняя цена символа или None, если данных нет"""
+        ticker = self.get_ticker(symbol)
+        if not ticker:
+            return None
+        try:
+            price = float(ticker.get('lastPrice', 0))
+        except (TypeError, ValueError):
+            return None
+        return price if price > 0 else None
+
+    def get_kline(self, symbol: str, interval: str) -> Optional[Dict]:
+        interval = INTERVAL_MAP.get(interval, interval)
+        with self._lock:
+            kline = self._klines.get((symbol, interval))
+            return dict(kline) if kline else None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tickers)
+
+
+class MarketDataStream:
+    """Публичный WebSocket поток Bybit v5 с fan-out через callbacks и очереди"""
+
+    # Bybit принимает не более 10 топиков в одном запросе подписки (spot)
+    SUBSCRIBE_BATCH_SIZE = 10
+
+    def __init__(self, category: str = "spot", testnet: bool = True, url: str = None,
+                 ping_interval: float = 20.0, reconnect_delay: float = 1.0,
+                 max_reconnect_delay: float = 30.0, batch_size: int = None):
+        self.category = category
+        self.testnet = testnet
+        self.url = url or PUBLIC_WS_URLS[bool(testnet)].format(category=category)
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.batch_size = batch_size or self.SUBSCRIBE_BATCH_SIZE
+
+        self.snapshot = LiveMarketSnapshot()
+        self.logger = logging.getLogger(__name__)
+
+        self._topics: List[str] = []
+        self._topics_lock = threading.Lock()
+        self._callbacks: List[Callable[[Dict], None]] = []
+        self._queues: List[queue.Queue] = []
+        self._fanout_lock = threading.Lock()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ws = None
+        self._running = False
+        self._connected = threading.Event()
+
+        # Статистика соединения
+        self.reconnects = 0
+        self.messages_received = 0
+        self.last_message_time: Optional[float] = None
+
+    # ---- Подписки ----
+
+    def subscribe(self, topics: Iterable[str]) -> List[str]:
+        """Добавление топиков; при активном соединении подписка отправляется сразу"""
+        with self._topics_lock:
+            new_topics = [t for t in dict.fromkeys(topics) if t not in self._topics]
+            self._topics.extend(new_topics)
+        if new_topics and self._connected.is_set() and self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._send_op("subscribe", new_topics), self._loop)
+        return new_topics
+
+    def unsubscribe(self, topics: Iterable[str]) -> List[str]:
+        with self._topics_lock:
+            removed = [t for t in dict.fromkeys(topics) if t in self._topics]
+            self._topics = [t for t in self._topics if t not in removed]
+        if removed and self._connected.is_set() and self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._send_op("unsubscribe", removed), self._loop)
+        return removed
+
+    def subscribe_tickers(self, symbols: Iterable[str]) -> List[str]:
+        return self.subscribe(f"tickers.{s}" for s in symbols)
+
+    def subscribe_klines(self, symbols: Iterable[str], interval: str) -> List[str]:
+        interval = INTERVAL_MAP.get(interval, interval)
+        return self.subscribe(f"kline.{interval}.{s}" for s in symbols)
+
+    def bootstrap_tickers(self, tickers: List[Dict]) -> int:
+        """Заполнение снимка REST-ответом и подписка на все его символы"""
+        count = self.snapshot.load_tickers(tickers)
+        self.subscribe_tickers(t['symbol'] for t in tickers if t.get('symbol'))
+        return count
+
+    @property
+    def topics(self) -> List[str]:
+        with self._topics_lock:
+            return list(self._topics)
+
+    # ---- Fan-out ----
+
+    def add_callback(self, callback: Callable[[Dict], None]):
+        """Callback вызывается в потоке WebSocket для каждого события"""
+        with self._fanout_lock:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[Dict], None]):
+        with self._fanout_lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def create_queue(self, maxsize: int = 1000) -> queue.Queue:
+        """Очередь событий для потребителя; при переполнении старые события отбрасываются"""
+        q = queue.Queue(maxsize=maxsize)
+        with self._fanout_lock:
+            self._queues.append(q)
+        return q
+
+    def remove_queue(self, q: queue.Queue):
+        with self._fanout_lock:
+            if q in self._queues:
+                self._queues.remove(q)
+
+    def _dispatch(self, event: Dict):
+        with self._fanout_lock:
+            callbacks = list(self._callbacks)
+            queues = list(self._queues)
+
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                self.logger.error(f"Ошибка в обработчике рыночных данных: {e}")
+
+        for q in queues:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    q.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    # ---- Обработка сообщений ----
+
+    def _handle_message(self, raw: str):
+        try:
+            message = json.loads(raw)
+        except (TypeError, ValueError):
+            self.logger.warning(f"Некорректное сообщение WebSocket: {raw!r}")
+            return
+
+        self.messages_received += 1
+        self.last_message_time = time.time()
+
+        op = message.get('op')
+        if op in ('ping', 'pong'):
+            return
+        if op in ('subscribe', 'unsubscribe'):
+            if not message.get('success', False):
+                self.logger.warning(f"Ошибка {op}: {message.get('ret_msg')}")
+            return
+
+        topic = message.get('topic')
+        if topic:
+            self._handle_topic(topic, message)
+
+    def _handle_topic(self, topic: str, message: Dict):
+        """Обработка данных топика (переопределяется в приватном потоке)"""
+        data = message.get('data')
+        is_snapshot = message.get('type', 'snapshot') == 'snapshot'
+
+        if topic.startswith('tickers.'):
+            ticker = self.snapshot.apply_ticker(data or {}, is_snapshot)
+            if ticker:
+                self._dispatch({'type': 'ticker', 'symbol': ticker['symbol'],
+                                'data': ticker, 'ts': message.get('ts')})
+        elif topic.startswith('kline.'):
+            _, interval, symbol = topic.split('.', 2)
+            for kline in data or []:
+                formatted = self.snapshot.apply_kline(interval, symbol, kline)
+                self._dispatch({'type': 'kline', 'symbol': symbol, 'interval': interval,
+                                'data': formatted, 'ts': message.get('ts')})
+
+    # ---- Соединение ----
+
+    async def _send_op(self, op: str, topics: List[str]):
+        ws = self._ws
+        if ws is None:
+            return
+        for i in range(0, len(topics), self.batch_size):
+            batch = topics[i:i + self.batch_size]
+            try:
+                await ws.send(json.dumps({"op": op, "args": batch}))
+            except Exception as e:
+                self.logger.warning(f"Не удалось отправить {op} для {len(batch)} топиков: {e}")
+                return
+
+    async def _authenticate(self, ws):
+        """Авторизация соединения (публичному потоку не требуется)"""
+
+    async def _on_subscribed(self):
+        """Вызывается после (повторной) подписки на все топики"""
+
+    def _on_disconnected(self):
+        """Вызывается при потере соединения"""
+
+    async def _heartbeat(self, ws):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send(json.dumps({"op": "ping"}))
+
+    async def _session(self):
+        async with websockets.connect(self.url, ping_interval=None,
+                                      open_timeout=10, close_timeout=2) as ws:
+            self._ws = ws
+            try:
+                await self._authenticate(ws)
+                self._connected.set()
+                self.logger.info(f"WebSocket подключен: {self.url}")
+
+                # Повторная подписка на все топики после (пере)подключения
+                await self._send_op("subscribe", self.topics)
+                await self._on_subscribed()
+
+                heartbeat = asyncio.ensure_future(self._heartbeat(ws))
+                try:
+                    while self._running:
+                        # Нет сообщений (включая pong) за два интервала - соединение мертво
+                        raw = await asyncio.wait_for(ws.recv(), timeout=self.ping_interval * 2)
+                        self._handle_message(raw)
+                finally:
+                    heartbeat.cancel()
+            finally:
+                self._connected.clear()
+                self._ws = None
+                self._on_disconnected()
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while self._running:
+            started = time.time()
+            try:
+                await self._session()
+            except asyncio.CancelledError:
+                break
+            except asyncio.TimeoutError:
+                self.logger.warning("WebSocket не отвечает, переподключение...")
+            except Exception as e:
+                self.logger.warning(f"Соединение WebSocket потеряно: {e}")
+
+            if not self._running:
+                break
+
+            # Сбрасываем задержку, если соединение успело поработать
+            if time.time() - started > self.max_reconnect_delay:
+                delay = self.reconnect_delay
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def start(self):
+        """Запуск потока WebSocket в отдельном event loop"""
+        if self._running:
+            return
+        self._running = True
+        self._loop = asyncio.new_event_loop()
+
+        def _worker():
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self._run())
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=_worker, name="MarketDataStream", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Остановка потока и закрытие соединения"""
+        if not self._running:
+            return
+        self._running = False
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            def _cancel_all():
+                for task in asyncio.all_tasks(loop):
+                    task.cancel()
+            loop.call_soon_threadsafe(_cancel_all)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._connected.clear()
+
+    def wait_connected(self, timeout: float = None) -> bool:
+        return self._connected.wait(timeout)
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected.is_set()
+
+    def is_live(self, max_age: float = 30.0) -> bool:
+        """Соединение активно и снимок обновлялся за последние max_age секунд
+        (иначе потребителям снимка стоит вернуться к REST)"""
+        last_update = self.snapshot.last_update
+        return self.is_connected and len(self.snapshot) > 0 and last_update is not None \
+            and time.time() - last_update < max_age
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+
+_streams: Dict[Tuple[str, bool], MarketDataStream] = {}
+_streams_lock = threading.Lock()
+
+
+def get_market_stream(category: str = "spot", testnet: bool = True) -> MarketDataStream:
+    """Общий запущенный поток для категории - один снимок на процесс"""
+    key = (category, bool(testnet))
+    with _streams_lock:
+        stream = _streams.get(key)
+        if stream is None:
+            stream = MarketDataStream(category=category, testnet=testnet)
+            _streams[key] = stream
+        if not stream.is_running:
+            stream.start()
+        return stream
+
+
+def stop_market_streams():
+    """Остановка всех общих потоков (при закрытии приложения)"""
+    with _streams_lock:
+        streams = list(_streams.values())
+        _streams.clear()
+    for stream in streams:
+        stream.stop()
@@ -9,17 +9,19 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 import json
 import time
-from pathlib import Path
+
+from .kline_archive import KlineArchive
 
 
 class AsyncHistoricalDataLoader:
     """Асинхронный загрузчик исторических данных с поддержкой больших объемов"""
     
     def __init__(self, api_base_url: str = "https://api-testnet.bybit.com", 
-                 data_cache_path: str = "data/historical_cache"):
+                 data_cache_path: str = "data/kline_archive"):
         self.api_base_url = api_base_url
-        self.cache_path = Path(data_cache_path)
-        self.cache_path.mkdir(parents=True, exist_ok=True)
+        # Колоночный архив свечей вместо JSON файлов по диапазонам дат
+        self.archive = KlineArchive(data_cache_path)
+        self.cache_path = self.archive.root_path
         self.logger = logging.getLogger(__name__)
         
         # Настройки для пакетной загрузки
@@ -42,15 +44,20 @@ class AsyncHistoricalDataLoader:
             List[Dict]: Список исторических свечей
         """
         try:
-            # Проверяем кэш
-            cache_key = f"{symbol}_{interval}_{start_time.strftime('%Y%m%d')}_{end_time.strftime('%Y%m%d')}"
-            cached_data = self._load_from_cache(cache_key)
-            if cached_data:
-                self.logger.info(f"Загружены данные из кэша для {symbol} {interval}")
-                return cached_data
+            bybit_interval = self._convert_interval_to_bybit(interval)
+            start_ms = int(start_time.timestamp() * 1000)
+            end_ms = int(end_time.timestamp() * 1000)
+            
+            # Загружаем из API только участки, которых нет в архиве
+            missing_ranges = self._missing_ranges(symbol, bybit_interval, start_time, end_time)
+            if not missing_ranges:
+                self.logger.info(f"Загружены данные из архива для {symbol} {interval}")
+                return self.archive.read_klines(symbol, bybit_interval, start_ms, end_ms)
             
             # Разбиваем период на части для пакетной загрузки
-            time_chunks = self._split_time_range(start_time, end_time, interval)
+            time_chunks = []
+            for range_start, range_end in missing_ranges:
+                time_chunks.extend(self._split_time_range(range_start, range_end, interval))
             
             # Создаем семафор для ограничения количества одновременных запросов
             semaphore = asyncio.Semaphore(self.max_concurrent_requests)
@@ -68,29 +75,35 @@ class AsyncHistoricalDataLoader:
             
             # Объединяем результаты
             all_klines = []
-            for result in chunk_results:
+            checked = []
+            for (chunk_start, chunk_end), result in zip(time_chunks, chunk_results):
                 if isinstance(result, Exception):
                     self.logger.error(f"Ошибка загрузки чанка: {result}")
                     continue
-                if result:
-                    all_klines.extend(result)
+                if result is None:
+                    continue
+                all_klines.extend(result)
+                # Ответ не обрезан лимитом: других свечей в чанке нет
+                if len(result) < self.max_klines_per_request:
+                    checked.append((int(chunk_start.timestamp() * 1000), int(chunk_end.timestamp() * 1000)))
             
             # Сортируем по времени и удаляем дубликаты
             all_klines = self._deduplicate_klines(all_klines)
             
-            # Сохраняем в кэш
-            self._save_to_cache(cache_key, all_klines)
+            # Дописываем в архив и отдаем запрошенный диапазон целиком
+            added = self.archive.write(symbol, bybit_interval, all_klines)
+            self._mark_checked(symbol, bybit_interval, checked)
             
-            self.logger.info(f"Загружено {len(all_klines)} свечей для {symbol} {interval}")
-            return all_klines
+            self.logger.info(f"Загружено {len(all_klines)} свечей для {symbol} {interval} (новых в архиве: {added})")
+            return self.archive.read_klines(symbol, bybit_interval, start_ms, end_ms)
             
         except Exception as e:
             self.logger.error(f"Ошибка загрузки исторических данных: {e}")
             return []
     
     async def _fetch_chunk_data(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
-                              symbol: str, interval: str, start_time: datetime, end_time: datetime) -> List[Dict]:
-        """Загрузка одного чанка данных"""
+                              symbol: str, interval: str, start_time: datetime, end_time: datetime) -> Optional[List[Dict]]:
+        """Загрузка одного чанка данных (None - ошибка запроса, [] - свечей в чанке нет)"""
         async with semaphore:
             try:
                 # Задержка между запросами
@@ -135,11 +148,11 @@ class AsyncHistoricalDataLoader:
                     else:
                         self.logger.warning(f"HTTP ошибка: {response.status}")
                 
-                return []
+                return None
                 
             except Exception as e:
                 self.logger.error(f"Ошибка загрузки чанка {start_time}-{end_time}: {e}")
-                return []
+                return None
     
     def _split_time_range(self, start_time: datetime, end_time: datetime, interval: str) -> List[tuple]:
         """Разбивка временного диапазона на чанки"""
@@ -153,6 +166,10 @@ class AsyncHistoricalDataLoader:
         else:
             chunk_hours = 720  # 1 месяц для дневных интервалов
         
+        # Пропуск из одной свечи: start и end запроса включительные
+        if start_time == end_time:
+            return [(start_time, end_time)]
+        
         current_time = start_time
         while current_time < end_time:
             chunk_end = min(current_time + timedelta(hours=chunk_hours), end_time)
@@ -186,29 +203,60 @@ class AsyncHistoricalDataLoader:
         sorted_klines = sorted(unique_klines.values(), key=lambda x: x['timestamp'])
         return sorted_klines
     
-    def _load_from_cache(self, cache_key: str) -> Optional[List[Dict]]:
-        """Загрузка данных из кэша"""
-        try:
-            cache_file = self.cache_path / f"{cache_key}.json"
-            if cache_file.exists():
-                # Проверяем возраст кэша (не старше 1 дня)
-                file_age = time.time() - cache_file.stat().st_mtime
-                if file_age < 86400:  # 24 часа
-                    with open(cache_file, 'r') as f:
-                        return json.load(f)
-            return None
-        except Exception as e:
-            self.logger.error(f"Ошибка загрузки из кэша: {e}")
-            return None
+    def _mark_checked(self, symbol: str, bybit_interval: str, checked: List[tuple]):
+        """Загруженные целиком чанки до последней свечи архива больше не запрашиваются;
+        после нее биржа еще допишет новые свечи"""
+        archived = self.archive.time_range(symbol, bybit_interval)
+        if archived is None:
+            return
+        self.archive.mark_checked(symbol, bybit_interval, [
+            (start, min(end, archived[1])) for start, end in checked if start <= archived[1]])
+
+    def _missing_ranges(self, symbol: str, bybit_interval: str,
+                        start_time: datetime, end_time: datetime) -> List[tuple]:
+        """Диапазоны, которых нет в архиве: до начала, пропуски внутри и после конца
+        (последняя свеча всегда перезапрашивается), без уже загруженных целиком"""
+        archived = self.archive.time_range(symbol, bybit_interval)
+        if archived is None:
+            return [(start_time, end_time)]
+        
+        first = datetime.fromtimestamp(archived[0] / 1000)
+        last = datetime.fromtimestamp(archived[1] / 1000)
+        ranges = []
+        if start_time < first:
+            ranges.append((start_time, first))
+        start_ms = int(start_time.timestamp() * 1000)
+        end_ms = int(end_time.timestamp() * 1000)
+        for gap_start, gap_end in self.archive.gaps(symbol, bybit_interval, start_ms, end_ms):
+            ranges.append((max(datetime.fromtimestamp(gap_start / 1000), start_time),
+                           min(datetime.fromtimestamp(gap_end / 1000), end_time)))
+        if end_time > last:
+            ranges.append((max(last, start_time), end_time))
+        
+        # До листинга и в пропусках торгов свечей нет: такие диапазоны не перезапрашиваются
+        for checked_start, checked_end in self.archive.checked_ranges(symbol, bybit_interval):
+            checked_start = datetime.fromtimestamp(checked_start / 1000)
+            checked_end = datetime.fromtimestamp(checked_end / 1000)
+            remaining = []
+            for range_start, range_end in ranges:
+                if checked_end < range_start or checked_start > range_end:
+                    remaining.append((range_start, range_end))
+                    continue
+                if range_start < checked_start:
+                    remaining.append((range_start, checked_start))
+                if checked_end < range_end:
+                    remaining.append((checked_end, range_end))
+            ranges = remaining
+        return ranges
     
-    def _save_to_cache(self, cache_key: str, data: List[Dict]):
-        """Сохранение данных в кэш"""
-        try:
-            cache_file = self.cache_path / f"{cache_key}.json"
-            with open(cache_file, 'w') as f:
-                json.dump(data, f)
-        except Exception as e:
-            self.logger.error(f"Ошибка сохранения в кэш: {e}")
+    def get_archived_arrays(self, symbol: str, interval: str, start_time: datetime = None,
+                            end_time: datetime = None) -> Dict[str, Any]:
+        """Колонки свечей из архива без копирования (numpy.memmap срезы)"""
+        return self.archive.read(
+            symbol, self._convert_interval_to_bybit(interval),
+            int(start_time.timestamp() * 1000) if start_time else None,
+            int(end_time.timestamp() * 1000) if end_time else None
+        )
     
     async def load_multiple_symbols(self, symbols: List[str], interval: str, 
                                   days_back: int = 30) -> Dict[str, List[Dict]]:
@@ -244,27 +292,27 @@ class AsyncHistoricalDataLoader:
     
     def get_cache_info(self) -> Dict[str, Any]:
         """Получение информации о кэше"""
-        cache_files = list(self.cache_path.glob("*.json"))
-        total_size = sum(f.stat().st_size for f in cache_files)
+        info = self.archive.get_info()
         
         return {
-            'cache_files_count': len(cache_files),
-            'total_cache_size_mb': round(total_size / (1024 * 1024), 2),
-            'cache_path': str(self.cache_path)
+            'cache_files_count': info['series_count'],
+            'total_cache_size_mb': info['total_size_mb'],
+            'cache_path': info['archive_path']
         }
     
     def clear_cache(self, older_than_days: int = 7):
-        """Очистка старого кэша"""
+        """Очистка серий архива, которые не обновлялись дольше указанного срока"""
         try:
             cutoff_time = time.time() - (older_than_days * 86400)
             removed_count = 0
             
-            for cache_file in self.cache_path.glob("*.json"):
-                if cache_file.stat().st_mtime < cutoff_time:
-                    cache_file.unlink()
+            for symbol, interval in self.archive.series():
+                meta_file = self.archive.series_path(symbol, interval) / self.archive.META_FILE
+                if meta_file.stat().st_mtime < cutoff_time:
+                    self.archive.delete(symbol, interval)
                     removed_count += 1
             
-            self.logger.info(f"Удалено {removed_count} старых файлов кэша")
+            self.logger.info(f"Удалено {removed_count} устаревших серий архива")
             
         except Exception as e:
             self.logger.error(f"Ошибка очистки кэша: {e}")
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Колоночный архив свечей на диске с доступом через numpy.memmap
+Один каталог на пару символ/интервал: по файлу на колонку
+(int64 timestamp, float64 open/high/low/close/volume), строки
+отсортированы по времени и только дописываются в конец
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class KlineArchive:
+    """Колоночный append-only архив свечей с бинарным поиском по времени"""
+
+    COLUMNS = (
+        ('timestamp', '<i8'),
+        ('open', '<f8'),
+        ('high', '<f8'),
+        ('low', '<f8'),
+        ('close', '<f8'),
+        ('volume', '<f8'),
+    )
+    META_FILE = 'meta.json'
+
+    def __init__(self, root_path: str = "data/kline_archive"):
+        self.root_path = Path(root_path)
+        self.root_path.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+
+    # ---- Служебные методы ----
+
+    def series_path(self, symbol: str, interval: str) -> Path:
+        """Каталог серии (interval в формате API Bybit: 60, 240, D ...)"""
+        return self.root_path / f"{symbol}_{interval}"
+
+    def _read_meta(self, path: Path) -> Dict:
+        try:
+            with open(path / self.META_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _read_length(self, path: Path) -> int:
+        """Число зафиксированных строк (хвост недописанной строки игнорируется)"""
+        try:
+            return int(self._read_meta(path).get('length', 0))
+        except (TypeError, ValueError):
+            return 0
+
+    def _write_length(self, path: Path, length: int, checked: List[List[int]] = None):
+        if checked is None:
+            checked = self._read_meta(path).get('checked', [])
+        tmp_file = path / (self.META_FILE + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'length': length, 'columns': [name for name, _ in self.COLUMNS],
+                       'checked': checked}, f)
+        os.replace(tmp_file, path / self.META_FILE)
+
+    @classmethod
+    def _to_columns(cls, klines) -> Dict[str, np.ndarray]:
+        """Список словарей или словарь массивов -> отсортированные колонки без дубликатов"""
+        if isinstance(klines, dict):
+            columns = {name: np.asarray(klines[name], dtype=dtype) for name, dtype in cls.COLUMNS}
+        else:
+            klines = list(klines)
+            columns = {
+                name: np.fromiter((k[name] for k in klines), dtype=dtype, count=len(klines))
+                for name, dtype in cls.COLUMNS
+            }
+        # Сортировка по времени; при повторах побеждает последняя запись
+        ts = columns['timestamp']
+        order = np.argsort(ts, kind='stable')
+        ts_sorted = ts[order]
+        keep = np.ones(len(ts_sorted), dtype=bool)
+        keep[:-1] = ts_sorted[1:] != ts_sorted[:-1]
+        order = order[keep]
+        return {name: col[order] for name, col in columns.items()}
+
+    # ---- Чтение ----
+
+    def count(self, symbol: str, interval: str) -> int:
+        return self._read_length(self.series_path(symbol, interval))
+
+    def read(self, symbol: str, interval: str, start_ms: int = None,
+             end_ms: int = None) -> Dict[str, np.ndarray]:
+        """Колонки за диапазон [start_ms, end_ms] без копирования (memmap срезы)"""
+        path = self.series_path(symbol, interval)
+        length = self._read_length(path)
+        if length == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in self.COLUMNS}
+
+        columns = {
+            name: np.memmap(path / f"{name}.bin", dtype=dtype, mode='r', shape=(length,))
+            for name, dtype in self.COLUMNS
+        }
+        ts = columns['timestamp']
+        lo = int(np.searchsorted(ts, start_ms, side='left')) if start_ms is not None else 0
+        hi = int(np.searchsorted(ts, end_ms, side='right')) if end_ms is not None else length
+        return {name: col[lo:hi] for name, col in columns.items()}
+
+    def read_klines(self, symbol: str, interval: str, start_ms: int = None,
+                    end_ms: int = None, limit: int = None) -> List[Dict]:
+        """Свечи в формате списка словарей (от старых к новым)"""
+        columns = self.read(symbol, interval, start_ms, end_ms)
+        if limit:
+            columns = {name: col[-limit:] for name, col in columns.items()}
+        ts = columns['timestamp'].tolist()
+        values = {name: columns[name].tolist() for name, _ in self.COLUMNS[1:]}
+        return [
+            {'timestamp': ts[i], 'open': values['open'][i], 'high': values['high'][i],
+             'low': values['low'][i], 'close': values['close'][i], 'volume': values['volume'][i]}
+            for i in range(len(ts))
+        ]
+
+    def time_range(self, symbol: str, interval: str) -> Optional[Tuple[int, int]]:
+        """Первая и последняя метка времени серии"""
+        ts = self.read(symbol, interval)['timestamp']
+        if len(ts) == 0:
+            return None
+        return int(ts[0]), int(ts[-1])
+
+    def gaps(self, symbol: str, interval: str, start_ms: int = None,
+             end_ms: int = None) -> List[Tuple[int, int]]:
+        """Пропуски внутри серии: (первая, последняя) отсутствующие метки времени
+
+        Шаг серии - минимальный интервал между соседними свечами
+        """
+        ts = self.read(symbol, interval)['timestamp']
+        if len(ts) < 3:
+            return []
+        diffs = np.diff(ts)
+        step = int(diffs.min())
+        if step <= 0:
+            return []
+        result = []
+        for i in np.nonzero(diffs > step)[0]:
+            gap_start, gap_end = int(ts[i]) + step, int(ts[i + 1]) - step
+            if (end_ms is None or gap_start <= end_ms) and (start_ms is None or gap_end >= start_ms):
+                result.append((gap_start, gap_end))
+        return result
+
+    def checked_ranges(self, symbol: str, interval: str) -> List[Tuple[int, int]]:
+        """Диапазоны, загруженные с биржи целиком: свечей вне архива в них нет
+        (время до листинга символа, пропуски торгов)"""
+        return [(int(start), int(end))
+                for start, end in self._read_meta(self.series_path(symbol, interval)).get('checked', [])]
+
+    def mark_checked(self, symbol: str, interval: str, ranges: List[Tuple[int, int]]):
+        """Запомнить загруженные целиком диапазоны (пересекающиеся объединяются)"""
+        with self._lock:
+            path = self.series_path(symbol, interval)
+            length = self._read_length(path)
+            if length == 0:
+                return
+            merged: List[List[int]] = []
+            for start, end in sorted(self.checked_ranges(symbol, interval) + list(ranges)):
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            self._write_length(path, length, merged)
+
+    def series(self) -> List[Tuple[str, str]]:
+        """Все серии в архиве (symbol, interval)"""
+        result = []
+        for path in self.root_path.iterdir():
+            if path.is_dir() and (path / self.META_FILE).exists() and '_' in path.name:
+                symbol, interval = path.name.rsplit('_', 1)
+                result.append((symbol, interval))
+        return sorted(result)
+
+    # ---- Запись ----
+
+    def write(self, symbol: str, interval: str, klines) -> int:
+        """Добавление свечей, возвращает число новых строк
+
+        Свечи новее последней дописываются в конец; последняя свеча может
+        быть перезаписана (незакрытая свеча). Более ранние данные вне архива
+        приводят к однократной перезаписи серии.
+        """
+        new = self._to_columns(klines)
+        if len(new['timestamp']) == 0:
+            return 0
+
+        with self._lock:
+            path = self.series_path(symbol, interval)
+            path.mkdir(parents=True, exist_ok=True)
+            length = self._read_length(path)
+            last_ts = self._last_timestamp(path, length)
+
+            if length == 0 or new['timestamp'][0] >= last_ts:
+                return self._append(path, length, last_ts, new)
+
+            # Данные внутри или до существующего диапазона (копия, а не memmap:
+            # открытое отображение не дало бы заменить файлы в Windows)
+            existing = {
+                name: np.fromfile(path / f"{name}.bin", dtype=dtype, count=length)
+                for name, dtype in self.COLUMNS
+            }
+            if np.isin(new['timestamp'], existing['timestamp']).all():
+                return 0
+            merged = self._to_columns({
+                name: np.concatenate([existing[name], new[name]]) for name, _ in self.COLUMNS
+            })
+            try:
+                return self._rewrite(path, merged) - length
+            except OSError as e:
+                self.logger.warning(f"Не удалось перезаписать серию {symbol} {interval}: {e}")
+                return 0
+
+    def _last_timestamp(self, path: Path, length: int) -> Optional[int]:
+        if length == 0:
+            return None
+        with open(path / "timestamp.bin", 'rb') as f:
+            f.seek((length - 1) * 8)
+            return int(np.frombuffer(f.read(8), dtype='<i8')[0])
+
+    def _append(self, path: Path, length: int, last_ts: Optional[int],
+                new: Dict[str, np.ndarray]) -> int:
+        start = 0
+        if length and new['timestamp'][0] == last_ts:
+            # Обновление последней (возможно незакрытой) свечи на месте
+            for name, dtype in self.COLUMNS[1:]:
+                with open(path / f"{name}.bin", 'r+b') as f:
+                    f.seek((length - 1) * np.dtype(dtype).itemsize)
+                    f.write(new[name][:1].tobytes())
+            start = 1
+
+        appended = len(new['timestamp']) - start
+        if appended <= 0:
+            return 0
+
+        itemsize = {name: np.dtype(dtype).itemsize for name, dtype in self.COLUMNS}
+        for name, _ in self.COLUMNS:
+            committed = length * itemsize[name]
+            with open(path / f"{name}.bin", 'r+b' if length else 'wb') as f:
+                # Отбрасываем недописанный хвост от прерванной записи
+                f.seek(0, os.SEEK_END)
+                if f.tell() > committed:
+                    f.truncate(committed)
+                f.seek(committed)
+                f.write(new[name][start:].tobytes())
+
+        # Длина фиксируется последней - читатели видят только полные строки
+        self._write_length(path, length + appended)
+        return appended
+
+    def _rewrite(self, path: Path, columns: Dict[str, np.ndarray]) -> int:
+        tmp_path = path.with_name(path.name + '.tmp')
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+        for name, _ in self.COLUMNS:
+            columns[name].tofile(tmp_path / f"{name}.bin")
+        length = len(columns['timestamp'])
+        self._write_length(tmp_path, length, self._read_meta(path).get('checked', []))
+
+        old_path = path.with_name(path.name + '.old')
+        if old_path.exists():
+            shutil.rmtree(old_path)
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return length
+
+    def delete(self, symbol: str, interval: str):
+        with self._lock:
+            shutil.rmtree(self.series_path(symbol, interval), ignore_errors=True)
+
+    def get_info(self) -> Dict:
+        """Размер архива на диске"""
+        files = [f for f in self.root_path.rglob('*.bin')]
+        return {
+            'series_count': len(self.series()),
+            'total_size_mb': round(sum(f.stat().st_size for f in files) / (1024 * 1024), 2),
+            'archive_path': str(self.root_path)
+        }
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Живая таблица тикеров в разделяемой памяти для программы просмотра тикеров,
+торгового бота и тренеров
+Один процесс-производитель пишет слоты фиксированного размера (по слоту на символ),
+остальные процессы читают их без разбора JSON. Каждый слот защищен seqlock:
+счетчик нечетный во время записи, читатель повторяет чтение при его изменении
+и никогда не ждет писателя
+"""
+
+import logging
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from multiprocessing import resource_tracker
+except ImportError:  # pragma: no cover
+    resource_tracker = None
+
+
+DEFAULT_TABLE_NAME = 'bybit_tickers_spot'
+MAGIC = 0x5449434B45525331  # 'TICKERS1'
+SYMBOL_SIZE = 32
+
+HEADER_DTYPE = np.dtype([
+    ('magic', '<u8'),
+    ('capacity', '<i8'),
+    ('count', '<i8'),         # Число занятых слотов (индекс символов только дописывается)
+    ('generation', '<u8'),    # Увеличивается при каждой записи производителя
+    ('producer_pid', '<i8'),
+    ('closed', '<i8'),        # Производитель завершился, таблицу нужно переоткрыть
+    ('last_update', '<f8'),
+    ('reserved', '<u8'),
+])
+
+# Поля слота (float64) и соответствующие ключи тикера Bybit
+FIELDS = ('last_price', 'high_24h', 'low_24h', 'volume_24h', 'turnover_24h', 'change_24h', 'updated_at')
+TICKER_KEYS = ('lastPrice', 'highPrice24h', 'lowPrice24h', 'volume24h', 'turnover24h', 'price24hPcnt')
+SLOT_WIDTH = 1 + len(FIELDS)  # seq + поля, 64 байта на слот
+
+
+class SharedTickerTable:
+    """Таблица тикеров в multiprocessing.shared_memory"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+        self.logger = logging.getLogger(__name__)
+
+        self._header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        capacity = int(self._header['capacity'])
+        symbols_offset = HEADER_DTYPE.itemsize
+        slots_offset = symbols_offset + SYMBOL_SIZE * capacity
+
+        self.capacity = capacity
+        self._symbols = np.ndarray((capacity,), dtype=f'S{SYMBOL_SIZE}', buffer=shm.buf, offset=symbols_offset)
+        self._seq = np.ndarray((capacity,), dtype='<u8', buffer=shm.buf, offset=slots_offset,
+                               strides=(SLOT_WIDTH * 8,))
+        self._values = np.ndarray((capacity, len(FIELDS)), dtype='<f8', buffer=shm.buf,
+                                  offset=slots_offset + 8, strides=(SLOT_WIDTH * 8, 8))
+
+        # Локальная копия индекса символ -> слот
+        self._index: Dict[str, int] = {}
+        self._names: List[str] = []
+        # Seqlock допускает одного писателя: потоки производителя пишут по очереди
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def _size(capacity: int) -> int:
+        return HEADER_DTYPE.itemsize + SYMBOL_SIZE * capacity + SLOT_WIDTH * 8 * capacity
+
+    @classmethod
+    def create(cls, name: str = DEFAULT_TABLE_NAME, capacity: int = 4096) -> 'SharedTickerTable':
+        """Создание таблицы процессом-производителем (оставшаяся после сбоя таблица пересоздается)"""
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=cls._size(capacity))
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            np.ndarray((), dtype=HEADER_DTYPE, buffer=stale.buf)['closed'] = 1
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=cls._size(capacity))
+
+        shm.buf[:cls._size(capacity)] = bytes(cls._size(capacity))
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        header['capacity'] = capacity
+        header['producer_pid'] = os.getpid()
+        header['magic'] = MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str = DEFAULT_TABLE_NAME) -> 'SharedTickerTable':
+        """Подключение потребителя к таблице производителя
+
+        Raises:
+            FileNotFoundError: Производитель не запущен
+            ValueError: Блок памяти не является таблицей тикеров
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf) if shm.size >= HEADER_DTYPE.itemsize else None
+        if header is None or int(header['magic']) != MAGIC:
+            del header
+            shm.close()
+            raise ValueError(f"Блок разделяемой памяти {name} не является таблицей тикеров")
+        producer_pid = int(header['producer_pid'])
+        del header
+
+        if resource_tracker is not None and os.name == 'posix' and producer_pid != os.getpid():
+            # Иначе трекер потребителя удалит чужой блок при выходе процесса
+            try:
+                resource_tracker.unregister(shm._name, 'shared_memory')
+            except Exception:
+                pass
+        return cls(shm, owner=False)
+
+    # ---- Запись (производитель) ----
+
+    def update(self, ticker: Dict) -> bool:
+        """Запись одного тикера в формате Bybit get_tickers / WebSocket tickers"""
+        return self.update_many([ticker]) == 1
+
+    def update_many(self, tickers: Iterable[Dict]) -> int:
+        """Запись тикеров; возвращает число записанных слотов"""
+        now = time.time()
+        written = 0
+        with self._write_lock:
+            if self._shm is None:
+                return 0
+            for ticker in tickers:
+                symbol = ticker.get('symbol')
+                if not symbol:
+                    continue
+                slot = self._slot_for_write(symbol)
+                if slot is None:
+                    continue
+
+                values = [self._to_float(ticker.get(key)) for key in TICKER_KEYS]
+                values.append(now)
+
+                self._seq[slot] += 1    # нечетный: запись идет
+                self._values[slot] = values
+                self._seq[slot] += 1    # четный: запись завершена
+                written += 1
+
+            if written:
+                self._header['last_update'] = now
+                self._header['generation'] += 1
+        return written
+
+    def _slot_for_write(self, symbol: str) -> Optional[int]:
+        slot = self._index.get(symbol)
+        if slot is not None:
+            return slot
+
+        count = int(self._header['count'])
+        if count >= self.capacity:
+            self.logger.warning(f"Таблица тикеров заполнена ({self.capacity}), {symbol} пропущен")
+            return None
+        encoded = symbol.encode('ascii', 'ignore')[:SYMBOL_SIZE]
+        self._symbols[count] = encoded
+        # Счетчик увеличивается после записи имени, читатель не увидит пустой слот
+        self._header['count'] = count + 1
+        self._index[symbol] = count
+        self._names.append(symbol)
+        return count
+
+    @staticmethod
+    def _to_float(value) -> float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return float('nan')
+
+    # ---- Чтение (потребители) ----
+
+    def _sync_index(self):
+        count = int(self._header['count'])
+        for slot in range(len(self._names), count):
+            name = self._symbols[slot].decode('ascii')
+            self._index[name] = slot
+            self._names.append(name)
+
+    def _read_slot(self, slot: int, retries: int = 100) -> Optional[np.ndarray]:
+        for _ in range(retries):
+            before = int(self._seq[slot])
+            if before & 1:
+                continue
+            values = self._values[slot].copy()
+            if int(self._seq[slot]) == before:
+                return values
+        return None
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        """Тикер символа в формате Bybit или None"""
+        slot = self._index.get(symbol)
+        if slot is None:
+            self._sync_index()
+            slot = self._index.get(symbol)
+            if slot is None:
+                return None
+        values = self._read_slot(slot)
+        if values is None:
+            return None
+        return self._to_ticker(symbol, values, int(self._seq[slot]) // 2)
+
+    def get_last_price(self, symbol: str) -> Optional[float]:
+        ticker = self.get(symbol)
+        if not ticker:
+            return None
+        price = ticker['lastPrice']
+        return price if price > 0 else None
+
+    def read_arrays(self) -> Dict:
+        """Согласованная копия всех слотов колонками (без создания словарей по символам)
+
+        Returns:
+            {'symbols': [symbol], 'seqno': ndarray, <поле>: ndarray float64}
+        """
+        self._sync_index()
+        count = len(self._names)
+        before = self._seq[:count].copy()
+        values = self._values[:count].copy()
+        after = self._seq[:count].copy()
+
+        # Слоты, которые писались во время копирования, перечитываются по одному
+        for slot in np.flatnonzero((before != after) | (before & 1).astype(bool)):
+            slot_values = self._read_slot(int(slot))
+            values[slot] = slot_values if slot_values is not None else np.nan
+            after[slot] = self._seq[slot]
+
+        columns = {'symbols': list(self._names), 'seqno': after // 2}
+        for i, field in enumerate(FIELDS):
+            columns[field] = values[:, i]
+        return columns
+
+    def get_all(self) -> Dict[str, Dict]:
+        """Все тикеры в формате Bybit по символам"""
+        columns = self.read_arrays()
+        values = np.column_stack([columns[field] for field in FIELDS]) if columns['symbols'] else []
+        return {symbol: self._to_ticker(symbol, values[i], int(columns['seqno'][i]))
+                for i, symbol in enumerate(columns['symbols']) if columns['seqno'][i] > 0}
+
+    @staticmethod
+    def _to_ticker(symbol: str, values, seqno: int) -> Dict:
+        ticker = {'symbol': symbol}
+        for i, key in enumerate(TICKER_KEYS):
+            ticker[key] = float(values[i])
+        ticker['seqno'] = seqno
+        ticker['updated_at'] = float(values[len(TICKER_KEYS)])
+        return ticker
+
+    @property
+    def generation(self) -> int:
+        return int(self._header['generation'])
+
+    @property
+    def last_update(self) -> Optional[float]:
+        return float(self._header['last_update']) or None
+
+    @property
+    def closed(self) -> bool:
+        return self._header is None or bool(self._header['closed'])
+
+    def __len__(self):
+        return int(self._header['count'])
+
+    def close(self):
+        """Отключение; производитель помечает таблицу закрытой и удаляет блок"""
+        with self._write_lock:
+            if self._shm is None:
+                return
+            if self.owner:
+                self._header['closed'] = 1
+            # Представления numpy держат буфер, их нужно освободить до закрытия блока
+            self._header = self._symbols = self._seq = self._values = None
+            shm, self._shm = self._shm, None
+        shm.close()
+        if self.owner:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Общее хранилище тикеров и исторических свечей для программы просмотра тикеров,
+торгового бота и тренеров (замена tickers_data.json)
+SQLite в режиме WAL: строка на символ, каждая запись увеличивает счетчик
+поколений, измененные строки помечаются номером поколения. Писатель обновляет
+только изменившиеся символы, читатель забирает только строки новее своего поколения
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+class TickerStore:
+    """Хранилище тикеров и свечей с инкрементальным чтением по поколениям"""
+
+    FILE_NAME = 'tickers.db'
+
+    def __init__(self, data_path):
+        """
+        Args:
+            data_path: Каталог данных (файл tickers.db внутри)
+        """
+        self.path = Path(data_path) / self.FILE_NAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+
+        self._conn = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value REAL NOT NULL
+                )
+            """)
+            for table in ('tickers', 'historical'):
+                self._conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        symbol TEXT PRIMARY KEY,
+                        generation INTEGER NOT NULL,
+                        deleted INTEGER NOT NULL DEFAULT 0,
+                        data BLOB
+                    )
+                """)
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_generation ON {table}(generation)")
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('updated_at', 0)")
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        return json.dumps(value, separators=(',', ':'), sort_keys=True, default=str).encode('utf-8')
+
+    # ---- Запись ----
+
+    def put_tickers(self, tickers: Iterable[Dict], replace_all: bool = True) -> int:
+        """Запись тикеров одной транзакцией
+
+        Args:
+            tickers: Тикеры (словари с ключом symbol)
+            replace_all: Передан полный список, отсутствующие символы помечаются удаленными
+
+        Returns:
+            Текущее поколение (не меняется, если данные не изменились)
+        """
+        rows = {ticker['symbol']: self._encode(ticker) for ticker in tickers if ticker.get('symbol')}
+        return self._write('tickers', rows, replace_all)
+
+    def put_historical(self, symbol: str, klines: List[Dict]) -> int:
+        """Атомарная замена свечей одного символа"""
+        return self._write('historical', {symbol: self._encode(klines)}, replace_all=False)
+
+    def _write(self, table: str, rows: Dict[str, bytes], replace_all: bool) -> int:
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                generation = int(conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]) + 1
+                changes_before = conn.total_changes
+
+                # Строки с тем же содержимым не перезаписываются и не получают новое поколение
+                conn.executemany(f"""
+                    INSERT INTO {table} (symbol, generation, deleted, data) VALUES (?, ?, 0, ?)
+                    ON CONFLICT(symbol) DO UPDATE SET
+                        generation = excluded.generation, deleted = 0, data = excluded.data
+                    WHERE {table}.deleted = 1 OR {table}.data IS NOT excluded.data
+                """, [(symbol, generation, data) for symbol, data in rows.items()])
+
+                if replace_all:
+                    live = [row[0] for row in conn.execute(f"SELECT symbol FROM {table} WHERE deleted = 0")]
+                    conn.executemany(f"UPDATE {table} SET deleted = 1, data = NULL, generation = ? WHERE symbol = ?",
+                                     [(generation, symbol) for symbol in live if symbol not in rows])
+
+                if conn.total_changes == changes_before:
+                    conn.execute("ROLLBACK")
+                    return generation - 1
+
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (generation,))
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'updated_at'", (time.time(),))
+                conn.execute("COMMIT")
+                return generation
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    # ---- Чтение ----
+
+    def generation(self) -> int:
+        """Номер последнего поколения (дешевая проверка наличия изменений)"""
+        with self._lock:
+            return int(self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0])
+
+    def changes_since(self, generation: int = 0) -> Dict:
+        """Строки, измененные после поколения generation (согласованный снимок)
+
+        Returns:
+            {'generation', 'updated_at', 'tickers': {symbol: ticker}, 'historical': {symbol: klines},
+             'removed_tickers': [symbol], 'removed_historical': [symbol]}
+        """
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN")
+            try:
+                meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+                result = {'generation': int(meta['generation']), 'updated_at': meta['updated_at']}
+                for table in ('tickers', 'historical'):
+                    rows = conn.execute(f"SELECT symbol, deleted, data FROM {table} WHERE generation > ?",
+                                        (generation,)).fetchall()
+                    result[table] = {symbol: json.loads(data) for symbol, deleted, data in rows if not deleted}
+                    result[f'removed_{table}'] = [symbol for symbol, deleted, _ in rows if deleted]
+            finally:
+                conn.execute("COMMIT")
+        return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TickerStoreReader:
+    """Локальная копия хранилища, дополняемая только изменившимися строками"""
+
+    def __init__(self, store: TickerStore):
+        self.store = store
+        self.generation = 0
+        self.updated_at: Optional[float] = None
+        self.tickers: Dict[str, Dict] = {}
+        self.historical: Dict[str, List[Dict]] = {}
+
+    def has_updates(self) -> bool:
+        return self.store.generation() != self.generation
+
+    def refresh(self) -> Dict[str, int]:
+        """Применение изменений с последнего чтения; возвращает число измененных строк"""
+        current = self.store.generation()
+        if current == self.generation:
+            return {'tickers': 0, 'historical': 0}
+        if current < self.generation:
+            # Хранилище пересоздано - читаем заново
+            self.generation = 0
+            self.tickers.clear()
+            self.historical.clear()
+
+        changes = self.store.changes_since(self.generation)
+        self.tickers.update(changes['tickers'])
+        self.historical.update(changes['historical'])
+        for symbol in changes['removed_tickers']:
+            self.tickers.pop(symbol, None)
+        for symbol in changes['removed_historical']:
+            self.historical.pop(symbol, None)
+        self.generation = changes['generation']
+        self.updated_at = changes['updated_at'] or None
+        return {'tickers': len(changes['tickers']) + len(changes['removed_tickers']),
+                'historical': len(changes['historical']) + len(changes['removed_historical'])}
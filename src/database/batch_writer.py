@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Фоновая пакетная запись в SQLite
+Один поток-писатель забирает операции из ограниченной очереди и фиксирует их
+группами: подряд идущие одинаковые запросы выполняются через executemany
+в одной транзакции. Вызывающий поток не ждет диска и не держит блокировок.
+"""
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Настройки соединения: WAL позволяет читать параллельно с записью,
+# synchronous=NORMAL в режиме WAL не теряет целостность при сбое процесса
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA busy_timeout=30000",
+)
+
+
+def apply_pragmas(conn: sqlite3.Connection):
+    """Настройка соединения SQLite для работы в режиме WAL"""
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+
+
+class _Barrier:
+    """Метка в очереди: событие срабатывает после фиксации всего, что было до нее"""
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+class BatchWriter:
+    """Поток-писатель SQLite с ограниченной очередью и групповой фиксацией"""
+
+    def __init__(self, db_path, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.2):
+        """
+        Args:
+            db_path: Путь к базе данных
+            max_queue: Максимум операций в очереди (при переполнении запись отбрасывается)
+            batch_size: Максимум операций в одной транзакции
+            flush_interval: Максимальная задержка фиксации, сек
+        """
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._last_drop_warning = 0.0
+
+        # Статистика
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_batch = 0
+
+        self._thread = threading.Thread(target=self._run, name='SQLiteBatchWriter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def submit(self, sql: str, params: Sequence[Any] = (), block: bool = False,
+               timeout: float = 1.0) -> bool:
+        """Постановка запроса в очередь записи
+
+        Args:
+            block: Ждать места в очереди (для записей, которые нельзя терять)
+            timeout: Максимальное ожидание при block=True, сек
+
+        Returns:
+            False, если писатель остановлен или очередь переполнена
+        """
+        if self._closed:
+            return False
+        try:
+            self._queue.put((sql, tuple(params)), block=block, timeout=timeout if block else None)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            now = time.time()
+            if now - self._last_drop_warning > 10:
+                self._last_drop_warning = now
+                self.logger.warning(f"Очередь записи в БД переполнена, отброшено записей: {self.dropped}")
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Ожидание фиксации всех операций, поставленных до вызова"""
+        if self._closed or not self._thread.is_alive():
+            return self._queue.empty()
+        barrier = _Barrier()
+        try:
+            self._queue.put(barrier, timeout=timeout)
+        except queue.Full:
+            return False
+        return barrier.event.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Фиксация оставшихся операций и остановка потока"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        # Если поток-писатель завершился аварийно, очередь может быть полной
+        if self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                self.logger.error("Поток записи в БД не освободил очередь, остановка без ожидания")
+        self._thread.join(timeout)
+        try:
+            atexit.unregister(self.close)
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'max_batch': self.max_batch,
+        }
+
+    # ---- Поток-писатель ----
+
+    def _run(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30.0, isolation_level=None,
+                               check_same_thread=False)
+        try:
+            apply_pragmas(conn)
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.flush_interval
+                stop = False
+                # Добор пакета: все, что уже в очереди, но не дольше flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                    if isinstance(item, _Barrier):
+                        break
+                self._write_batch(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[Any]):
+        barriers = [item for item in batch if isinstance(item, _Barrier)]
+        operations = [item for item in batch if not isinstance(item, _Barrier)]
+
+        if operations:
+            try:
+                conn.execute("BEGIN")
+                for sql, rows in self._group(operations):
+                    conn.executemany(sql, rows)
+                conn.execute("COMMIT")
+                self.written += len(operations)
+                self.batches += 1
+                self.max_batch = max(self.max_batch, len(operations))
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                self.logger.error(f"Ошибка пакетной записи в БД ({len(operations)} операций): {e}")
+                self._write_one_by_one(conn, operations)
+
+        for barrier in barriers:
+            barrier.event.set()
+
+    def _write_one_by_one(self, conn: sqlite3.Connection, operations: List[Tuple[str, tuple]]):
+        """Повтор пакета по одной операции, чтобы ошибочная запись не теряла остальные"""
+        for sql, params in operations:
+            try:
+                conn.execute(sql, params)
+                self.written += 1
+            except sqlite3.Error as e:
+                self.errors += 1
+                self.logger.error(f"Ошибка записи в БД: {e}")
+
+    @staticmethod
+    def _group(operations: List[Tuple[str, tuple]]) -> List[Tuple[str, List[tuple]]]:
+        """Подряд идущие операции с одинаковым запросом - в один executemany"""
+        groups: List[Tuple[str, List[tuple]]] = []
+        for sql, params in operations:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+        return groups
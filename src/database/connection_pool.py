@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Постоянные соединения SQLite по потокам и метрики запросов
+Каждый поток получает свое соединение один раз и переиспользует его вместе
+с кэшем подготовленных выражений; читатели открывают базу только на чтение
+и в режиме WAL не ждут поток-писатель
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .batch_writer import apply_pragmas
+
+# Верхние границы интервалов гистограммы времени запросов, мс
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+
+class ConnectionPool:
+    """Соединения SQLite, закрепленные за потоками"""
+
+    def __init__(self, db_path, read_only: bool = False, cached_statements: int = 256):
+        """
+        Args:
+            db_path: Путь к базе данных
+            read_only: Открывать соединения только для чтения
+            cached_statements: Размер кэша подготовленных выражений соединения
+        """
+        self.db_path = Path(db_path)
+        self.read_only = read_only
+        self.cached_statements = cached_statements
+        self.logger = logging.getLogger(__name__)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[Tuple[threading.Thread, sqlite3.Connection]] = []
+        self.opened = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        """Соединение текущего потока (создается при первом обращении)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._reap()
+                self._connections.append((threading.current_thread(), conn))
+                self.opened += 1
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        if self.read_only:
+            try:
+                conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, timeout=30.0,
+                                       check_same_thread=False, cached_statements=self.cached_statements)
+                conn.execute("PRAGMA busy_timeout=30000")
+            except sqlite3.Error as e:
+                # Например, нет прав на создание -shm файла WAL рядом с базой
+                self.logger.warning(f"Соединение только для чтения недоступно, используется обычное: {e}")
+                conn = sqlite3.connect(str(self.db_path), timeout=30.0, check_same_thread=False,
+                                       cached_statements=self.cached_statements)
+                conn.execute("PRAGMA busy_timeout=30000")
+                conn.execute("PRAGMA query_only=ON")
+        else:
+            conn = sqlite3.connect(str(self.db_path), timeout=30.0, check_same_thread=False,
+                                   cached_statements=self.cached_statements)
+            apply_pragmas(conn)
+        conn.row_factory = sqlite3.Row  # Для доступа к колонкам по имени
+        return conn
+
+    def _reap(self):
+        """Закрытие соединений завершившихся потоков"""
+        alive = []
+        for thread, conn in self._connections:
+            if thread.is_alive():
+                alive.append((thread, conn))
+            else:
+                conn.close()
+        self._connections = alive
+
+    def discard(self):
+        """Закрытие соединения текущего потока (например, после ошибки соединения)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._connections = [(t, c) for t, c in self._connections if c is not conn]
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            for _, conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    @property
+    def size(self) -> int:
+        return len(self._connections)
+
+
+class QueryMetrics:
+    """Число запросов, ошибки и гистограмма времени по методам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods: Dict[str, Dict] = {}
+
+    @contextmanager
+    def track(self, method: str):
+        start_time = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.record(method, (time.perf_counter() - start_time) * 1000, failed)
+
+    def record(self, method: str, elapsed_ms: float, failed: bool = False):
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = {
+                    'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)
+                }
+            stats['count'] += 1
+            stats['errors'] += int(failed)
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound),
+                          len(LATENCY_BUCKETS_MS))
+            stats['buckets'][bucket] += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        with self._lock:
+            return {
+                method: {
+                    'count': stats['count'],
+                    'errors': stats['errors'],
+                    'avg_ms': round(stats['total_ms'] / stats['count'], 3),
+                    'max_ms': round(stats['max_ms'], 3),
+                    'histogram': dict(zip(labels, stats['buckets'])),
+                }
+                for method, stats in self._methods.items()
+            }
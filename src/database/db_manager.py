@@ -7,13 +7,18 @@
 
 import sqlite3
 import json
+import struct
+import hashlib
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Any, Optional, Tuple
 from pathlib import Path
 import threading
 from contextlib import contextmanager
 
+from .batch_writer import BatchWriter, apply_pragmas
+from .connection_pool import ConnectionPool, QueryMetrics
+
 class DatabaseManager:
     """
     Менеджер базы данных для торгового бота
@@ -31,35 +36,74 @@ class DatabaseManager:
         else:
             self.db_path = Path(db_path)
         
-        # Блокировка для потокобезопасности
-        self._lock = threading.Lock()
+        # Постоянные соединения по потокам: запись и отдельно чтение (только чтение, WAL)
+        self.pool = ConnectionPool(self.db_path)
+        self.read_pool = ConnectionPool(self.db_path, read_only=True)
+        self.metrics = QueryMetrics()
+        
+        self._upsert_lock = threading.Lock()
+        
+        # Фоновая очистка по сроку хранения (start_retention_job)
+        self._retention_stop = threading.Event()
+        self._retention_thread: Optional[threading.Thread] = None
         
         # Инициализация базы данных
         self.init_database()
         
+        # Журналы пишутся фоновым потоком пакетами, вызывающий поток не блокируется
+        self.writer = BatchWriter(self.db_path)
+        
         self.logger.info(f"Инициализирован менеджер БД: {self.db_path}")
     
     @contextmanager
     def get_connection(self):
-        """Контекстный менеджер для безопасной работы с БД"""
+        """Контекстный менеджер для безопасной работы с БД (соединение потока)"""
         conn = None
         try:
-            conn = sqlite3.connect(str(self.db_path), timeout=30.0)
-            conn.row_factory = sqlite3.Row  # Для доступа к колонкам по имени
+            conn = self.pool.acquire()
             yield conn
         except Exception as e:
             if conn:
-                conn.rollback()
+                self._recover(self.pool, conn)
             self.logger.error(f"Ошибка работы с БД: {e}")
             raise
-        finally:
+    
+    @contextmanager
+    def read_connection(self, method: str):
+        """Соединение потока только для чтения с учетом времени запроса в метриках"""
+        conn = None
+        try:
+            with self.metrics.track(method):
+                conn = self.read_pool.acquire()
+                yield conn
+        except Exception as e:
             if conn:
-                conn.close()
+                self._recover(self.read_pool, conn)
+            self.logger.error(f"Ошибка чтения из БД ({method}): {e}")
+            raise
+    
+    @staticmethod
+    def _recover(pool: ConnectionPool, conn: sqlite3.Connection):
+        """Откат незавершенной транзакции; неработающее соединение закрывается"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            pool.discard()
+    
+    def get_query_stats(self) -> Dict[str, Any]:
+        """Метрики запросов по методам, соединений и очереди записи"""
+        return {
+            'queries': self.metrics.snapshot(),
+            'connections': {'write': self.pool.size, 'read': self.read_pool.size},
+            'writer': self.writer.get_stats()
+        }
     
     def init_database(self):
         """Инициализация структуры базы данных"""
         try:
             with self.get_connection() as conn:
+                apply_pragmas(conn)
                 cursor = conn.cursor()
                 
                 # Таблица для логирования всех действий системы
@@ -115,7 +159,9 @@ class DatabaseManager:
                         position_status TEXT,
                         auto_add_margin INTEGER,
                         position_data TEXT,
-                        last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
+                        last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        position_key TEXT,
+                        content_hash TEXT
                     )
                 """)
                 
@@ -137,7 +183,8 @@ class DatabaseManager:
                         change_7d REAL,
                         change_30d REAL,
                         change_180d REAL,
-                        last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
+                        last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        content_hash TEXT
                     )
                 """)
                 
@@ -165,19 +212,71 @@ class DatabaseManager:
                         post_only_max_order_qty REAL,
                         symbol_status TEXT,
                         last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        content_hash TEXT,
                         UNIQUE(symbol, category)
                     )
                 """)
                 
+                # Таблица результатов анализа ML стратегии (признаки - упакованный float32)
+                self._migrate_legacy_analysis_table(cursor)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS ml_analysis (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        symbol TEXT NOT NULL,
+                        timeframe TEXT,
+                        current_price REAL,
+                        signal TEXT,
+                        confidence REAL,
+                        model_used INTEGER,
+                        regime TEXT,
+                        regime_confidence REAL,
+                        volatility REAL,
+                        trend_strength REAL,
+                        execution_time_ms REAL,
+                        feature_count INTEGER,
+                        features BLOB
+                    )
+                """)
+                
+                # Почасовые агрегаты удаленных по сроку хранения записей
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS ml_analysis_hourly (
+                        symbol TEXT NOT NULL,
+                        hour DATETIME NOT NULL,
+                        samples INTEGER NOT NULL,
+                        buy_signals INTEGER NOT NULL,
+                        sell_signals INTEGER NOT NULL,
+                        confidence_sum REAL NOT NULL,
+                        confidence_max REAL,
+                        price_sum REAL NOT NULL,
+                        price_min REAL,
+                        price_max REAL,
+                        execution_time_sum REAL NOT NULL,
+                        PRIMARY KEY (symbol, hour)
+                    ) WITHOUT ROWID
+                """)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS system_logs_hourly (
+                        hour DATETIME NOT NULL,
+                        level TEXT NOT NULL,
+                        component TEXT NOT NULL,
+                        entries INTEGER NOT NULL,
+                        execution_time_sum REAL NOT NULL,
+                        PRIMARY KEY (hour, level, component)
+                    ) WITHOUT ROWID
+                """)
+                
                 # Индексы для оптимизации запросов
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON system_logs(timestamp)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades(timestamp)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades(symbol)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_positions_symbol ON positions(symbol)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_positions_timestamp ON positions(timestamp)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_price_history_symbol ON price_history(symbol)")
+                self._migrate_upsert_keys(cursor)
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_price_history_timestamp ON price_history(timestamp)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_available_symbols_symbol ON available_symbols(symbol)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_ml_analysis_symbol_timestamp ON ml_analysis(symbol, timestamp)")
                 
                 conn.commit()
                 self.logger.info("База данных инициализирована")
@@ -186,30 +285,74 @@ class DatabaseManager:
             self.logger.error(f"Ошибка инициализации БД: {e}")
             raise
     
+    def _migrate_upsert_keys(self, cursor):
+        """Колонки и уникальные индексы для пакетного upsert (в т.ч. для существующих баз)"""
+        for table, column in (('positions', 'position_key'), ('positions', 'content_hash'),
+                              ('price_history', 'content_hash'), ('available_symbols', 'content_hash')):
+            columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+        
+        # Одна запись истории цен на символ: дубликаты удаляются, индекс становится уникальным
+        cursor.execute("""
+            DELETE FROM price_history
+            WHERE id NOT IN (SELECT MAX(id) FROM price_history GROUP BY symbol)
+        """)
+        cursor.execute("DROP INDEX IF EXISTS idx_price_history_symbol")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_price_history_symbol_unique ON price_history(symbol)")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_positions_position_key ON positions(position_key)")
+    
+    @staticmethod
+    def _utc_timestamp() -> str:
+        """Время постановки записи в формате CURRENT_TIMESTAMP SQLite"""
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    
+    def _write(self, sql: str, params: tuple, block: bool = False):
+        """Запись через фоновый поток; после остановки писателя - напрямую
+
+        block=True - запись нельзя терять: если очередь не освободилась за время
+        ожидания, запрос выполняется напрямую в вызывающем потоке
+        """
+        if self.writer.submit(sql, params, block=block):
+            return
+        if block or self.writer.closed:
+            with self.get_connection() as conn:
+                conn.execute(sql, params)
+                conn.commit()
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Ожидание записи всех поставленных в очередь журналов"""
+        return self.writer.flush(timeout)
+    
+    def close(self):
+        """Запись оставшихся журналов, остановка фоновых потоков и закрытие соединений"""
+        self._retention_stop.set()
+        if self._retention_thread is not None:
+            self._retention_thread.join(timeout=5)
+            self._retention_thread = None
+        self.writer.close()
+        self.read_pool.close()
+        self.pool.close()
+    
     def log_system_action(self, level: str, component: str, action: str, 
                          details: Optional[Dict] = None, execution_time_ms: Optional[float] = None,
                          session_id: Optional[str] = None):
-        """Логирование системного действия"""
+        """Логирование системного действия (без ожидания записи)"""
         try:
-            with self._lock:
-                with self.get_connection() as conn:
-                    cursor = conn.cursor()
-                    
-                    cursor.execute("""
-                        INSERT INTO system_logs 
-                        (level, component, action, details, execution_time_ms, session_id, thread_id)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        level,
-                        component,
-                        action,
-                        json.dumps(details) if details else None,
-                        execution_time_ms,
-                        session_id,
-                        str(threading.current_thread().ident)
-                    ))
-                    
-                    conn.commit()
+            self._write("""
+                INSERT INTO system_logs 
+                (timestamp, level, component, action, details, execution_time_ms, session_id, thread_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                self._utc_timestamp(),
+                level,
+                component,
+                action,
+                json.dumps(details, default=str) if details else None,
+                execution_time_ms,
+                session_id,
+                str(threading.current_thread().ident)
+            ))
                     
         except Exception as e:
             self.logger.error(f"Ошибка логирования системного действия: {e}")
@@ -217,96 +360,145 @@ class DatabaseManager:
     def log_trade(self, trade_info: Dict):
         """Логирование торговой операции"""
         try:
-            with self._lock:
-                with self.get_connection() as conn:
-                    cursor = conn.cursor()
-                    
-                    cursor.execute("""
-                        INSERT INTO trades 
-                        (symbol, side, order_type, quantity, price, order_id, status, 
-                         pnl, commission, analysis_data, execution_time_ms)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        trade_info.get('symbol'),
-                        trade_info.get('side'),
-                        trade_info.get('order_type', 'Market'),
-                        trade_info.get('size', 0),
-                        trade_info.get('price'),
-                        trade_info.get('order_id'),
-                        trade_info.get('status', 'Executed'),
-                        trade_info.get('pnl'),
-                        trade_info.get('commission'),
-                        json.dumps(trade_info.get('analysis', {})),
-                        trade_info.get('execution_time_ms')
-                    ))
-                    
-                    conn.commit()
-                    
-                    # Логирование системного действия
-                    self.log_system_action(
-                        'INFO', 'TRADING', 'TRADE_EXECUTED',
-                        {'symbol': trade_info.get('symbol'), 'side': trade_info.get('side')}
-                    )
+            # Сделки не отбрасываются при переполнении очереди
+            self._write("""
+                INSERT INTO trades 
+                (timestamp, symbol, side, order_type, quantity, price, order_id, status, 
+                 pnl, commission, analysis_data, execution_time_ms)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                self._utc_timestamp(),
+                trade_info.get('symbol'),
+                trade_info.get('side'),
+                trade_info.get('order_type', 'Market'),
+                trade_info.get('size', 0),
+                trade_info.get('price'),
+                trade_info.get('order_id'),
+                trade_info.get('status', 'Executed'),
+                trade_info.get('pnl'),
+                trade_info.get('commission'),
+                json.dumps(trade_info.get('analysis', {}), default=str),
+                trade_info.get('execution_time_ms')
+            ), block=True)
+            
+            # Логирование системного действия
+            self.log_system_action(
+                'INFO', 'TRADING', 'TRADE_EXECUTED',
+                {'symbol': trade_info.get('symbol'), 'side': trade_info.get('side')}
+            )
                     
         except Exception as e:
             self.logger.error(f"Ошибка логирования торговой операции: {e}")
     
     def log_analysis(self, analysis_data: Dict):
-        """Логирование результатов анализа ML стратегии"""
+        """Логирование результатов анализа ML стратегии
+        
+        Сигнал и уверенность берутся из analysis_data или из вложенного prediction.
+        """
         try:
-            with self._lock:
-                with self.get_connection() as conn:
-                    cursor = conn.cursor()
-                    
-                    # Создаем таблицу для анализа если не существует
-                    cursor.execute("""
-                        CREATE TABLE IF NOT EXISTS ml_analysis (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                            symbol TEXT,
-                            current_price REAL,
-                            features TEXT,
-                            regime TEXT,
-                            prediction TEXT,
-                            confidence REAL,
-                            signal TEXT
-                        )
-                    """)
-                    
-                    # Вставляем данные анализа
-                    cursor.execute("""
-                        INSERT INTO ml_analysis 
-                        (symbol, current_price, features, regime, prediction, confidence, signal)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        analysis_data.get('symbol'),
-                        analysis_data.get('current_price'),
-                        json.dumps(analysis_data.get('features', [])),
-                        json.dumps(analysis_data.get('regime', {})),
-                        json.dumps(analysis_data.get('prediction', {})),
-                        analysis_data.get('prediction', {}).get('confidence', 0.0),
-                        analysis_data.get('prediction', {}).get('signal')
-                    ))
-                    
-                    conn.commit()
-                    
-                    # Логирование системного действия
-                    self.log_system_action(
-                        'INFO', 'ML_STRATEGY', 'ANALYSIS_COMPLETED',
-                        {
-                            'symbol': analysis_data.get('symbol'),
-                            'signal': analysis_data.get('prediction', {}).get('signal'),
-                            'confidence': analysis_data.get('prediction', {}).get('confidence', 0.0)
-                        }
-                    )
+            prediction = analysis_data.get('prediction') or {}
+            regime = analysis_data.get('regime') or prediction.get('regime') or {}
+            features = analysis_data.get('features') or []
+            
+            self._write("""
+                INSERT INTO ml_analysis 
+                (timestamp, symbol, timeframe, current_price, signal, confidence, model_used,
+                 regime, regime_confidence, volatility, trend_strength, execution_time_ms,
+                 feature_count, features)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                self._utc_timestamp(),
+                analysis_data.get('symbol'),
+                analysis_data.get('timeframe'),
+                self._to_float(analysis_data.get('current_price')),
+                analysis_data.get('signal', prediction.get('signal')),
+                self._to_float(analysis_data.get('confidence', prediction.get('confidence'))),
+                int(bool(prediction.get('model_used'))) if 'model_used' in prediction else None,
+                regime.get('regime'),
+                self._to_float(regime.get('confidence')),
+                self._to_float(regime.get('volatility')),
+                self._to_float(regime.get('trend_strength')),
+                self._to_float(analysis_data.get('execution_time_ms')),
+                len(features),
+                self.pack_features(features)
+            ))
                     
         except Exception as e:
-            self.logger.error(f"Ошибка логирования торговли: {e}")
+            self.logger.error(f"Ошибка логирования анализа: {e}")
+    
+    @staticmethod
+    def pack_features(features) -> Optional[bytes]:
+        """Признаки в виде little-endian float32"""
+        if not features:
+            return None
+        return struct.pack(f'<{len(features)}f', *[float(value) for value in features])
+    
+    @staticmethod
+    def unpack_features(blob: Optional[bytes]) -> List[float]:
+        if not blob:
+            return []
+        return list(struct.unpack(f'<{len(blob) // 4}f', blob))
+    
+    @staticmethod
+    def _to_float(value) -> Optional[float]:
+        try:
+            return float(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+    
+    def _migrate_legacy_analysis_table(self, cursor):
+        """Прежняя таблица ml_analysis (JSON в тексте) переименовывается в ml_analysis_legacy"""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(ml_analysis)")}
+        if 'prediction' not in columns:
+            return
+        if cursor.execute("SELECT COUNT(*) FROM ml_analysis").fetchone()[0] == 0:
+            cursor.execute("DROP TABLE ml_analysis")
+            return
+        legacy_exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ml_analysis_legacy'").fetchone()
+        if legacy_exists:
+            cursor.execute("INSERT INTO ml_analysis_legacy SELECT * FROM ml_analysis")
+            cursor.execute("DROP TABLE ml_analysis")
+        else:
+            cursor.execute("ALTER TABLE ml_analysis RENAME TO ml_analysis_legacy")
+        self.logger.info("Прежняя таблица ml_analysis сохранена как ml_analysis_legacy")
+    
+    def get_analysis_history(self, symbol: Optional[str] = None, hours_back: int = 24,
+                             limit: int = 1000) -> List[Dict]:
+        """Последние результаты анализа с распакованными признаками"""
+        try:
+            cutoff = (datetime.now(timezone.utc) - timedelta(hours=hours_back)).strftime('%Y-%m-%d %H:%M:%S')
+            with self.read_connection('get_analysis_history') as conn:
+                if symbol:
+                    rows = conn.execute("""
+                        SELECT * FROM ml_analysis
+                        WHERE symbol = ? AND timestamp >= ?
+                        ORDER BY timestamp DESC
+                        LIMIT ?
+                    """, (symbol, cutoff, limit)).fetchall()
+                else:
+                    rows = conn.execute("""
+                        SELECT * FROM ml_analysis
+                        WHERE timestamp >= ?
+                        ORDER BY timestamp DESC
+                        LIMIT ?
+                    """, (cutoff, limit)).fetchall()
+            
+            history = []
+            for row in rows:
+                record = dict(row)
+                record['features'] = self.unpack_features(record['features'])
+                history.append(record)
+            return history
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка получения истории анализа: {e}")
+            return []
     
     def get_recent_trades(self, limit: int = 100, symbol: Optional[str] = None) -> List[Dict]:
         """Получение последних торговых операций"""
         try:
-            with self.get_connection() as conn:
+            with self.read_connection('get_recent_trades') as conn:
                 cursor = conn.cursor()
                 
                 if symbol:
@@ -330,42 +522,119 @@ class DatabaseManager:
             self.logger.error(f"Ошибка получения торговых операций: {e}")
             return []
             
+    # ---- Пакетный upsert состояния ----
+    
+    @staticmethod
+    def _content_hash(values: tuple) -> str:
+        return hashlib.blake2b(repr(values).encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _bulk_upsert(self, table: str, key_columns: Tuple[str, ...], columns: Tuple[str, ...],
+                     rows: List[tuple], replace_all: bool,
+                     scope: Optional[Tuple[str, Iterable[str]]] = None) -> Dict[str, int]:
+        """Upsert строк одной транзакцией через executemany
+        
+        Хэши содержимого читаются внутри транзакции записи: базу параллельно
+        пишут другие процессы (бот, тренеры, validate_symbols.py).
+        
+        Args:
+            table: Таблица
+            key_columns: Уникальный ключ (первые колонки columns)
+            columns: Колонки значений rows
+            rows: Значения строк
+            replace_all: rows - полное состояние, строки с другими ключами удаляются
+            scope: (колонка, значения) - состояние и удаление только среди строк с этими значениями
+        
+        Returns:
+            Число записанных, пропущенных (без изменений) и удаленных строк
+        """
+        key_size = len(key_columns)
+        select = f"SELECT {', '.join(key_columns)}, content_hash FROM {table}"
+        params: tuple = ()
+        if scope is not None:
+            scope_column, scope_values = scope[0], tuple(scope[1])
+            select += f" WHERE {scope_column} IN ({', '.join('?' * len(scope_values))})"
+            params = scope_values
+        
+        all_columns = columns + ('content_hash',)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in all_columns[key_size:])
+        sql = f"""
+            INSERT INTO {table} ({', '.join(all_columns)}, last_updated)
+            VALUES ({', '.join('?' * len(all_columns))}, CURRENT_TIMESTAMP)
+            ON CONFLICT({', '.join(key_columns)}) DO UPDATE SET
+                {updates}, last_updated = CURRENT_TIMESTAMP
+            WHERE {table}.content_hash IS NOT excluded.content_hash
+        """
+        key_filter = ' AND '.join(f"{column} IS ?" for column in key_columns)
+        
+        with self._upsert_lock, self.get_connection() as conn:
+            if conn.in_transaction:
+                conn.commit()
+            # Блокировка записи до чтения хэшей: между чтением и записью их никто не изменит
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if scope is not None and not params:
+                    hashes = {}
+                else:
+                    hashes = {tuple(row[:-1]): row[-1] for row in conn.execute(select, params)}
+                changed = {}
+                for values in rows:
+                    key = tuple(values[:key_size])
+                    digest = self._content_hash(values)
+                    if hashes.get(key) != digest or key in changed:
+                        changed[key] = values + (digest,)
+                seen = {tuple(values[:key_size]) for values in rows}
+                removed = [key for key in hashes if key not in seen] if replace_all else []
+                
+                if changed:
+                    conn.executemany(sql, list(changed.values()))
+                if removed:
+                    conn.executemany(f"DELETE FROM {table} WHERE {key_filter}", removed)
+                if changed or removed:
+                    conn.commit()
+                else:
+                    conn.rollback()
+            except Exception:
+                conn.rollback()
+                raise
+        return {'written': len(changed), 'unchanged': len(seen) - len(changed), 'removed': len(removed)}
+    
+    def upsert_positions(self, positions_data: List[Dict]) -> Dict[str, int]:
+        """Полное состояние позиций (ордеров): изменившиеся записываются, исчезнувшие удаляются"""
+        rows = []
+        for position in positions_data:
+            # Спотовые ордера различаются по orderId, позиции - по символу, стороне и индексу
+            position_key = position.get('orderId') or ':'.join(str(position.get(field, '')) for field in (
+                'symbol', 'category', 'side', 'positionIdx'))
+            rows.append((
+                str(position_key),
+                position.get('symbol', ''),
+                position.get('category', ''),
+                position.get('side', ''),
+                float(position.get('size', 0)),
+                float(position.get('entryPrice', 0)),
+                float(position.get('markPrice', 0)),
+                float(position.get('unrealisedPnl', 0)),
+                position.get('leverage', ''),
+                float(position.get('positionValue', 0)),
+                int(position.get('positionIdx', 0)),
+                int(position.get('riskId', 0)) if position.get('riskId') else None,
+                position.get('positionStatus', ''),
+                int(position.get('autoAddMargin', 0)),
+                json.dumps(position, sort_keys=True, default=str)
+            ))
+        return self._bulk_upsert('positions', ('position_key',), (
+            'position_key', 'symbol', 'category', 'side', 'size', 'entry_price', 'mark_price', 'pnl',
+            'leverage', 'position_value', 'position_idx', 'risk_id', 'position_status',
+            'auto_add_margin', 'position_data'
+        ), rows, replace_all=True)
+    
     def save_positions(self, positions_data):
         """Сохранение позиций в базу данных"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                # Сначала удаляем все старые записи, так как мы всегда сохраняем актуальное состояние
-                cursor.execute("DELETE FROM positions")
-                
-                # Вставляем новые данные
-                for position in positions_data:
-                    position_data_json = json.dumps(position)
-                    cursor.execute("""
-                        INSERT INTO positions (
-                            symbol, category, side, size, entry_price, mark_price, pnl,
-                            leverage, position_value, position_idx, risk_id, position_status,
-                            auto_add_margin, position_data, last_updated
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                    """, (
-                        position.get('symbol', ''),
-                        position.get('category', ''),
-                        position.get('side', ''),
-                        float(position.get('size', 0)),
-                        float(position.get('entryPrice', 0)),
-                        float(position.get('markPrice', 0)),
-                        float(position.get('unrealisedPnl', 0)),
-                        position.get('leverage', ''),
-                        float(position.get('positionValue', 0)),
-                        int(position.get('positionIdx', 0)),
-                        int(position.get('riskId', 0)) if position.get('riskId') else None,
-                        position.get('positionStatus', ''),
-                        int(position.get('autoAddMargin', 0)),
-                        position_data_json
-                    ))
-                conn.commit()
-                self.logger.info(f"Сохранено {len(positions_data)} позиций в базу данных")
-                return True
+            stats = self.upsert_positions(positions_data)
+            self.logger.info(f"Сохранено {len(positions_data)} позиций в базу данных "
+                             f"(изменено {stats['written']}, удалено {stats['removed']})")
+            return True
         except Exception as e:
             self.logger.error(f"Ошибка при сохранении позиций в базу данных: {e}")
             return False
@@ -373,7 +642,7 @@ class DatabaseManager:
     def get_positions(self, limit=100):
         """Получение текущих позиций из базы данных"""
         try:
-            with self.get_connection() as conn:
+            with self.read_connection('get_positions') as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     SELECT * FROM positions 
@@ -388,7 +657,7 @@ class DatabaseManager:
     def get_price_history(self, symbol=None):
         """Получение истории цен из базы данных"""
         try:
-            with self.get_connection() as conn:
+            with self.read_connection('get_price_history') as conn:
                 cursor = conn.cursor()
                 if symbol:
                     cursor.execute("""
@@ -405,67 +674,20 @@ class DatabaseManager:
             self.logger.error(f"Ошибка при получении истории цен из базы данных: {e}")
             return None
             
+    def upsert_price_history(self, price_by_symbol: Dict[str, Dict]) -> Dict[str, int]:
+        """История цен по символам одной транзакцией (символы без изменений пропускаются)"""
+        fields = ('price', 'price_1h_ago', 'price_24h_ago', 'price_7d_ago', 'price_30d_ago', 'price_180d_ago',
+                  'volume_24h', 'change_1h', 'change_24h', 'change_7d', 'change_30d', 'change_180d')
+        rows = [(symbol,) + tuple(float(price_data.get(field, 0)) for field in fields)
+                for symbol, price_data in price_by_symbol.items()]
+        return self._bulk_upsert('price_history', ('symbol',), ('symbol',) + fields, rows, replace_all=False)
+    
     def save_price_history(self, symbol, price_data):
         """Сохранение истории цен в базу данных"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Проверяем, есть ли уже запись для этого символа
-                cursor.execute("SELECT id FROM price_history WHERE symbol = ?", (symbol,))
-                existing_record = cursor.fetchone()
-                
-                if existing_record:
-                    # Обновляем существующую запись
-                    cursor.execute("""
-                        UPDATE price_history SET 
-                            price = ?, price_1h_ago = ?, price_24h_ago = ?, 
-                            price_7d_ago = ?, price_30d_ago = ?, price_180d_ago = ?,
-                            volume_24h = ?, change_1h = ?, change_24h = ?, 
-                            change_7d = ?, change_30d = ?, change_180d = ?,
-                            last_updated = CURRENT_TIMESTAMP
-                        WHERE symbol = ?
-                    """, (
-                        float(price_data.get('price', 0)),
-                        float(price_data.get('price_1h_ago', 0)),
-                        float(price_data.get('price_24h_ago', 0)),
-                        float(price_data.get('price_7d_ago', 0)),
-                        float(price_data.get('price_30d_ago', 0)),
-                        float(price_data.get('price_180d_ago', 0)),
-                        float(price_data.get('volume_24h', 0)),
-                        float(price_data.get('change_1h', 0)),
-                        float(price_data.get('change_24h', 0)),
-                        float(price_data.get('change_7d', 0)),
-                        float(price_data.get('change_30d', 0)),
-                        float(price_data.get('change_180d', 0)),
-                        symbol
-                    ))
-                else:
-                    # Вставляем новую запись
-                    cursor.execute("""
-                        INSERT INTO price_history (
-                            symbol, price, price_1h_ago, price_24h_ago, price_7d_ago,
-                            price_30d_ago, price_180d_ago, volume_24h, change_1h,
-                            change_24h, change_7d, change_30d, change_180d
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        symbol,
-                        float(price_data.get('price', 0)),
-                        float(price_data.get('price_1h_ago', 0)),
-                        float(price_data.get('price_24h_ago', 0)),
-                        float(price_data.get('price_7d_ago', 0)),
-                        float(price_data.get('price_30d_ago', 0)),
-                        float(price_data.get('price_180d_ago', 0)),
-                        float(price_data.get('volume_24h', 0)),
-                        float(price_data.get('change_1h', 0)),
-                        float(price_data.get('change_24h', 0)),
-                        float(price_data.get('change_7d', 0)),
-                        float(price_data.get('change_30d', 0)),
-                        float(price_data.get('change_180d', 0))
-                    ))
-                conn.commit()
-                self.logger.info(f"Сохранена история цен для {symbol} в базу данных")
-                return True
+            self.upsert_price_history({symbol: price_data})
+            self.logger.info(f"Сохранена история цен для {symbol} в базу данных")
+            return True
         except Exception as e:
             self.logger.error(f"Ошибка при сохранении истории цен в базу данных: {e}")
             return False
@@ -473,7 +695,7 @@ class DatabaseManager:
     def get_price_history(self, symbol=None, limit=100):
         """Получение истории цен из базы данных"""
         try:
-            with self.get_connection() as conn:
+            with self.read_connection('get_price_history') as conn:
                 cursor = conn.cursor()
                 if symbol:
                     cursor.execute("""
@@ -493,46 +715,48 @@ class DatabaseManager:
             self.logger.error(f"Ошибка при получении истории цен из базы данных: {e}")
             return []
             
+    def upsert_available_symbols(self, symbols_data: List[Dict],
+                                 categories: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Полный список доступных символов: изменившиеся записываются, исчезнувшие удаляются
+        
+        Args:
+            symbols_data: Инструменты
+            categories: Категории, которые представляет symbols_data (по умолчанию - все)
+        """
+        rows = [(
+            symbol_data.get('symbol', ''),
+            symbol_data.get('category', ''),
+            symbol_data.get('baseCoin', ''),
+            symbol_data.get('quoteCoin', ''),
+            int(symbol_data.get('priceScale', 0)),
+            float(symbol_data.get('takerFee', 0)),
+            float(symbol_data.get('makerFee', 0)),
+            float(symbol_data.get('minLeverage', 0)),
+            float(symbol_data.get('maxLeverage', 0)),
+            float(symbol_data.get('leverageStep', 0)),
+            float(symbol_data.get('minPrice', 0)),
+            float(symbol_data.get('maxPrice', 0)),
+            float(symbol_data.get('tickSize', 0)),
+            float(symbol_data.get('minOrderQty', 0)),
+            float(symbol_data.get('maxOrderQty', 0)),
+            float(symbol_data.get('qtyStep', 0)),
+            float(symbol_data.get('postOnlyMaxOrderQty', 0)),
+            symbol_data.get('status', '')
+        ) for symbol_data in symbols_data]
+        return self._bulk_upsert('available_symbols', ('symbol', 'category'), (
+            'symbol', 'category', 'base_coin', 'quote_coin', 'price_scale',
+            'taker_fee', 'maker_fee', 'min_leverage', 'max_leverage', 'leverage_step',
+            'min_price', 'max_price', 'tick_size', 'min_order_qty', 'max_order_qty',
+            'qty_step', 'post_only_max_order_qty', 'symbol_status'
+        ), rows, replace_all=True, scope=('category', categories) if categories is not None else None)
+    
     def save_available_symbols(self, symbols_data):
         """Сохранение доступных символов в базу данных"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                # Сначала удаляем все старые записи, так как мы всегда сохраняем актуальное состояние
-                cursor.execute("DELETE FROM available_symbols")
-                
-                # Вставляем новые данные
-                for symbol_data in symbols_data:
-                    cursor.execute("""
-                        INSERT INTO available_symbols (
-                            symbol, category, base_coin, quote_coin, price_scale,
-                            taker_fee, maker_fee, min_leverage, max_leverage, leverage_step,
-                            min_price, max_price, tick_size, min_order_qty, max_order_qty,
-                            qty_step, post_only_max_order_qty, symbol_status
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        symbol_data.get('symbol', ''),
-                        symbol_data.get('category', ''),
-                        symbol_data.get('baseCoin', ''),
-                        symbol_data.get('quoteCoin', ''),
-                        int(symbol_data.get('priceScale', 0)),
-                        float(symbol_data.get('takerFee', 0)),
-                        float(symbol_data.get('makerFee', 0)),
-                        float(symbol_data.get('minLeverage', 0)),
-                        float(symbol_data.get('maxLeverage', 0)),
-                        float(symbol_data.get('leverageStep', 0)),
-                        float(symbol_data.get('minPrice', 0)),
-                        float(symbol_data.get('maxPrice', 0)),
-                        float(symbol_data.get('tickSize', 0)),
-                        float(symbol_data.get('minOrderQty', 0)),
-                        float(symbol_data.get('maxOrderQty', 0)),
-                        float(symbol_data.get('qtyStep', 0)),
-                        float(symbol_data.get('postOnlyMaxOrderQty', 0)),
-                        symbol_data.get('status', '')
-                    ))
-                conn.commit()
-                self.logger.info(f"Сохранено {len(symbols_data)} доступных символов в базу данных")
-                return True
+            stats = self.upsert_available_symbols(symbols_data)
+            self.logger.info(f"Сохранено {len(symbols_data)} доступных символов в базу данных "
+                             f"(изменено {stats['written']}, удалено {stats['removed']})")
+            return True
         except Exception as e:
             self.logger.error(f"Ошибка при сохранении доступных символов в базу данных: {e}")
             return False
@@ -540,7 +764,7 @@ class DatabaseManager:
     def get_available_symbols(self, category=None, limit=1000):
         """Получение доступных символов из базы данных"""
         try:
-            with self.get_connection() as conn:
+            with self.read_connection('get_available_symbols') as conn:
                 cursor = conn.cursor()
                 if category:
                     cursor.execute("""
@@ -564,7 +788,7 @@ class DatabaseManager:
                        hours_back: int = 24, limit: int = 1000) -> List[Dict]:
         """Получение системных логов"""
         try:
-            with self.get_connection() as conn:
+            with self.read_connection('get_system_logs') as conn:
                 cursor = conn.cursor()
                 
                 query = """
@@ -594,6 +818,109 @@ class DatabaseManager:
             self.logger.error(f"Ошибка получения системных логов: {e}")
             return []
     
+    # ---- Срок хранения и почасовые агрегаты ----
+    
+    _ANALYSIS_ROLLUP_SQL = """
+        INSERT INTO ml_analysis_hourly
+        (symbol, hour, samples, buy_signals, sell_signals, confidence_sum, confidence_max,
+         price_sum, price_min, price_max, execution_time_sum)
+        SELECT symbol, strftime('%Y-%m-%d %H:00:00', timestamp), COUNT(*),
+               COUNT(CASE WHEN signal = 'BUY' THEN 1 END), COUNT(CASE WHEN signal = 'SELL' THEN 1 END),
+               TOTAL(confidence), MAX(confidence),
+               TOTAL(current_price), MIN(current_price), MAX(current_price), TOTAL(execution_time_ms)
+        FROM ml_analysis
+        WHERE id IN (SELECT id FROM ml_analysis WHERE timestamp < ? ORDER BY id LIMIT ?)
+        GROUP BY 1, 2
+        ON CONFLICT(symbol, hour) DO UPDATE SET
+            samples = samples + excluded.samples,
+            buy_signals = buy_signals + excluded.buy_signals,
+            sell_signals = sell_signals + excluded.sell_signals,
+            confidence_sum = confidence_sum + excluded.confidence_sum,
+            confidence_max = MAX(COALESCE(confidence_max, excluded.confidence_max),
+                                 COALESCE(excluded.confidence_max, confidence_max)),
+            price_sum = price_sum + excluded.price_sum,
+            price_min = MIN(COALESCE(price_min, excluded.price_min), COALESCE(excluded.price_min, price_min)),
+            price_max = MAX(COALESCE(price_max, excluded.price_max), COALESCE(excluded.price_max, price_max)),
+            execution_time_sum = execution_time_sum + excluded.execution_time_sum
+    """
+    
+    _SYSTEM_LOGS_ROLLUP_SQL = """
+        INSERT INTO system_logs_hourly (hour, level, component, entries, execution_time_sum)
+        SELECT strftime('%Y-%m-%d %H:00:00', timestamp), level, component, COUNT(*), TOTAL(execution_time_ms)
+        FROM system_logs
+        WHERE id IN (SELECT id FROM system_logs WHERE timestamp < ? ORDER BY id LIMIT ?)
+        GROUP BY 1, 2, 3
+        ON CONFLICT(hour, level, component) DO UPDATE SET
+            entries = entries + excluded.entries,
+            execution_time_sum = execution_time_sum + excluded.execution_time_sum
+    """
+    
+    def apply_retention(self, retention_days: Optional[int] = None, batch_size: int = 2000) -> Dict[str, int]:
+        """Свертка записей старше срока хранения в почасовые агрегаты и их удаление
+        
+        Каждая порция (свертка + удаление) выполняется в своей короткой транзакции,
+        поэтому запись журналов между порциями не блокируется.
+        
+        Args:
+            retention_days: Срок хранения сырых записей (по умолчанию LOG_RETENTION_DAYS)
+            batch_size: Число записей в одной транзакции
+        
+        Returns:
+            Число удаленных записей по таблицам
+        """
+        if retention_days is None:
+            from config import LOG_RETENTION_DAYS
+            retention_days = LOG_RETENTION_DAYS
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+        
+        removed = {}
+        for table, rollup_sql in (('ml_analysis', self._ANALYSIS_ROLLUP_SQL),
+                                  ('system_logs', self._SYSTEM_LOGS_ROLLUP_SQL)):
+            try:
+                removed[table] = self._rollup_and_prune(table, rollup_sql, cutoff, batch_size)
+            except Exception as e:
+                self.logger.error(f"Ошибка очистки таблицы {table}: {e}")
+                removed[table] = 0
+        
+        if any(removed.values()):
+            self.logger.info(f"Очистка по сроку хранения ({retention_days} дн.): {removed}")
+        return removed
+    
+    def _rollup_and_prune(self, table: str, rollup_sql: str, cutoff: str, batch_size: int) -> int:
+        removed = 0
+        while True:
+            with self.get_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(rollup_sql, (cutoff, batch_size))
+                    cursor = conn.execute(f"""
+                        DELETE FROM {table}
+                        WHERE id IN (SELECT id FROM {table} WHERE timestamp < ? ORDER BY id LIMIT ?)
+                    """, (cutoff, batch_size))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            removed += cursor.rowcount
+            if cursor.rowcount < batch_size or self._retention_stop.wait(0.01):
+                return removed
+    
+    def start_retention_job(self, retention_days: Optional[int] = None, interval_hours: Optional[float] = None):
+        """Фоновая очистка: сразу при запуске и далее раз в interval_hours (CLEANUP_INTERVAL_HOURS)"""
+        if self._retention_thread is not None:
+            return
+        if interval_hours is None:
+            from config import CLEANUP_INTERVAL_HOURS
+            interval_hours = CLEANUP_INTERVAL_HOURS
+        
+        def run():
+            while not self._retention_stop.is_set():
+                self.apply_retention(retention_days)
+                self._retention_stop.wait(interval_hours * 3600)
+        
+        self._retention_thread = threading.Thread(target=run, name='DatabaseRetention', daemon=True)
+        self._retention_thread.start()
+    
     def log_account_snapshot(self, account_data: Dict[str, Any]):
         """Логирование снимка состояния аккаунта"""
         try:
@@ -608,28 +935,6 @@ class DatabaseManager:
         except Exception as e:
             self.logger.error(f"Ошибка логирования снимка аккаунта: {e}")
     
-    def log_analysis(self, analysis_log: Dict):
-        """Логирование результатов ML-анализа"""
-        try:
-            details_json = {
-                'symbol': analysis_log.get('symbol'),
-                'current_price': analysis_log.get('current_price'),
-                'features': analysis_log.get('features'),
-                'regime': analysis_log.get('regime'),
-                'prediction': analysis_log.get('prediction')
-            }
-
-            self.log_system_action(
-                level='INFO',
-                component='ML_ANALYSIS',
-                action=f"Analysis for {analysis_log.get('symbol', 'unknown')}",
-                details=details_json,
-                execution_time_ms=None,
-                session_id=None
-            )
-        except Exception as e:
-            self.logger.error(f"Ошибка логирования анализа: {e}")
-
     def log_entry(self, entry: Dict[str, Any]):
         """Универсальный метод логирования с поддержкой нового формата"""
         try:
@@ -53,6 +53,10 @@ INTERVALS = {
     "1 месяц": "M"
 }
 
+# Перерисовка из живого WebSocket снимка и опрос REST без потока (секунды)
+STREAM_REFRESH_SECONDS = 5
+REST_REFRESH_SECONDS = 30
+
 class UpdateTickersThread(QThread):
     """Поток для обновления тикеров"""
     update_signal = Signal()
@@ -64,7 +68,8 @@ class UpdateTickersThread(QThread):
     def run(self):
         while self.running:
             self.update_signal.emit()
-            time.sleep(30)  # Обновление каждые 30 секунд
+            # REST опрашивается реже: poll_tickers пропускает лишние вызовы
+            time.sleep(STREAM_REFRESH_SECONDS)
     
     def stop(self):
         self.running = False
@@ -83,12 +88,18 @@ class PortfolioTab(QWidget):
         self.historical_data = {}
         self.all_tickers = []
         
+        # Общий WebSocket поток тикеров (главное окно передает свой через set_market_stream)
+        self.market_stream = None
+        self._drawn_generation = None
+        # Время последнего опроса REST (time.monotonic)
+        self._last_rest_refresh = None
+        
         # Настройка интерфейса
         self.setup_ui()
         
         # Запуск обновления данных в отдельном потоке
         self.update_thread = UpdateTickersThread(self)
-        self.update_thread.update_signal.connect(self.refresh_tickers)
+        self.update_thread.update_signal.connect(self.poll_tickers)
         self.update_thread.start()
     
     def initialize_bybit_client(self):
@@ -236,17 +247,58 @@ class PortfolioTab(QWidget):
             # Обновление каждые 30 секунд
             time.sleep(30)
     
+    def set_market_stream(self, stream):
+        """Использовать общий WebSocket поток тикеров"""
+        self.market_stream = stream
+        self._drawn_generation = None
+    
+    def get_market_stream(self):
+        """Общий поток тикеров; без главного окна создается собственный"""
+        if self.market_stream is None and self.client:
+            try:
+                from src.api.market_stream import get_market_stream
+                self.market_stream = get_market_stream(category="spot", testnet=self.client.testnet)
+            except ImportError as e:
+                logger.warning(f"WebSocket поток недоступен, тикеры обновляются через REST: {e}")
+        return self.market_stream
+    
+    def _stream_is_live(self, stream) -> bool:
+        """Поток подключен и снимок обновлялся за последние REST_REFRESH_SECONDS"""
+        return stream is not None and stream.is_live(REST_REFRESH_SECONDS)
+    
+    def poll_tickers(self):
+        """Периодическое обновление: живой снимок каждые STREAM_REFRESH_SECONDS,
+        без потока (не подключен или снимок не обновляется) - REST раз в REST_REFRESH_SECONDS"""
+        if not self._stream_is_live(self.get_market_stream()) and self._last_rest_refresh is not None \
+                and time.monotonic() - self._last_rest_refresh < REST_REFRESH_SECONDS:
+            return
+        self.refresh_tickers()
+    
     def refresh_tickers(self):
         """Обновление данных о тикерах"""
+        stream = self.get_market_stream()
+        if self._stream_is_live(stream):
+            # Живой снимок: перерисовываем только при изменениях
+            if stream.snapshot.generation == self._drawn_generation:
+                return
+            self._drawn_generation = stream.snapshot.generation
+            self.all_tickers = stream.snapshot.get_tickers()
+            self.update_ticker_table(self.all_tickers)
+            self.status_label.setText(f"Тикеров: {len(self.all_tickers)} (WebSocket)")
+            return
+        
         if not self.client:
             self.status_label.setText("Ошибка: клиент Bybit не инициализирован")
             return
         
         try:
             self.status_label.setText("Загрузка тикеров...")
+            self._last_rest_refresh = time.monotonic()
             
-            # Получение тикеров
+            # Получение тикеров: первичное заполнение снимка или поток отключен/не обновляется
             tickers = self.client.get_tickers(category="spot")
+            if stream is not None and tickers:
+                stream.bootstrap_tickers(tickers)
             
             if not tickers:
                 self.status_label.setText("Не удалось получить информацию о тикерах")
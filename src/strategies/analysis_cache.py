@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Кэш результатов анализа рынка
+Для 4h свечей окно между вызовами почти всегда одно и то же, поэтому результат
+переиспользуется, пока не закрылась новая свеча и не сменилась модель символа.
+Ключ: (symbol, interval, время последней закрытой свечи, версия модели)
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+AnalysisKey = Tuple[str, Optional[str], int, Hashable]
+
+
+def last_closed_timestamp(market_data: Dict) -> Optional[int]:
+    """Время последней закрытой свечи окна
+
+    Берется из market_data['last_closed_ts'], если его передал поставщик данных,
+    иначе самая новая свеча окна считается незакрытой (как в потоковых признаках)
+    """
+    if market_data.get('last_closed_ts') is not None:
+        return int(market_data['last_closed_ts'])
+    try:
+        timestamps = sorted(int(k['timestamp']) for k in market_data.get('klines') or [])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return timestamps[-2] if len(timestamps) > 1 else None
+
+
+class AnalysisCache:
+    """LRU кэш результатов analyze_market с инвалидацией по символу"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[AnalysisKey, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(market_data: Dict, model_version: Hashable) -> Optional[AnalysisKey]:
+        """Ключ кэша или None, если время закрытой свечи неизвестно (результат не кэшируется)"""
+        closed_ts = last_closed_timestamp(market_data)
+        if closed_ts is None:
+            return None
+        return (market_data.get('symbol', 'unknown'), market_data.get('timeframe'), closed_ts, model_version)
+
+    def get(self, key: Optional[AnalysisKey]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def contains(self, key: Optional[AnalysisKey]) -> bool:
+        """Есть ли результат для ключа; счетчики попаданий не меняются
+
+        Так этап загрузки свечей пропускает символ без запроса окна
+        """
+        if key is None:
+            return False
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def put(self, key: Optional[AnalysisKey], result: Dict[str, Any]):
+        if key is None:
+            return
+        with self._lock:
+            # Старые свечи и версии модели символа больше не понадобятся
+            for stale in [k for k in self._entries if k[0] == key[0] and k != key]:
+                del self._entries[stale]
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, symbol: Optional[str] = None) -> int:
+        """Сброс результатов символа (или всех), например после переобучения модели"""
+        with self._lock:
+            if symbol is None:
+                keys: List[AnalysisKey] = list(self._entries)
+            else:
+                keys = [k for k in self._entries if k[0] == symbol]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
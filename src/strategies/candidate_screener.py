@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Предварительный отбор символов перед ML анализом
+Один снимок get_tickers разбирается в колонки, фильтры и ранжирование считаются
+векторно по всему списку; дальше в дорогой анализ (свечи + модель) идут только
+лучшие top_k символов и символы с открытыми позициями
+"""
+
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+class CandidateScreener:
+    """Векторный отбор кандидатов по снимку тикеров"""
+
+    def __init__(self, config: Optional[Dict] = None):
+        """
+        Args:
+            config: Переопределения поверх SCREENER_CONFIG из config.py
+        """
+        from config import SCREENER_CONFIG
+        self.config = {**SCREENER_CONFIG, **(config or {})}
+        self.logger = logging.getLogger(__name__)
+        self.last_stats: Dict = {}
+
+    @staticmethod
+    def _column(tickers: List[Dict], key: str) -> np.ndarray:
+        values = np.full(len(tickers), np.nan)
+        for i, ticker in enumerate(tickers):
+            try:
+                values[i] = float(ticker.get(key))
+            except (TypeError, ValueError):
+                pass
+        return values
+
+    @staticmethod
+    def _zscore(values: np.ndarray) -> np.ndarray:
+        std = np.nanstd(values)
+        if not np.isfinite(std) or std == 0:
+            return np.zeros_like(values)
+        return (values - np.nanmean(values)) / std
+
+    def screen(self, tickers: List[Dict], universe: Optional[Iterable[str]] = None,
+               position_symbols: Iterable[str] = (),
+               has_model: Optional[Callable[[str], bool]] = None) -> List[str]:
+        """Отбор символов для анализа
+
+        Args:
+            tickers: Снимок get_tickers (формат Bybit)
+            universe: Допустимые символы (None - все символы снимка)
+            position_symbols: Символы с открытыми позициями (проходят всегда)
+            has_model: Проверка наличия модели для фильтра require_model
+
+        Returns:
+            Символы позиций, затем кандидаты по убыванию оценки
+        """
+        config = self.config
+        positions = list(dict.fromkeys(s for s in position_symbols if s))
+        stats = {'universe': 0, 'passed': {}, 'candidates': 0, 'positions': len(positions), 'timings_ms': {}}
+        self.last_stats = stats
+
+        # Разбор снимка в колонки
+        start_time = time.perf_counter()
+        allowed = set(universe) if universe is not None else None
+        rows = [t for t in tickers or [] if t.get('symbol') and (allowed is None or t['symbol'] in allowed)]
+        symbols = np.array([t['symbol'] for t in rows], dtype=object)
+        turnover = self._column(rows, 'turnover24h')
+        change = self._column(rows, 'price24hPcnt')
+        bid = self._column(rows, 'bid1Price')
+        ask = self._column(rows, 'ask1Price')
+        stats['universe'] = len(rows)
+        stats['timings_ms']['parse'] = (time.perf_counter() - start_time) * 1000
+
+        if not rows:
+            return positions
+
+        # Фильтры (NaN в спреде не отсекает символ: спотовые тикеры не всегда содержат стакан)
+        start_time = time.perf_counter()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            spread = (ask - bid) / ((ask + bid) / 2)
+            change_z = self._zscore(change)
+            masks = {
+                'turnover': turnover >= config['min_turnover_24h'],
+                'spread': ~(spread > config['max_spread']),
+                'change_24h': np.abs(change) <= config['max_abs_change_24h'],
+                'change_zscore': np.abs(change_z) <= config['max_change_zscore'],
+            }
+        if config['require_model'] and has_model is not None:
+            masks['model'] = np.fromiter((has_model(symbol) for symbol in symbols), dtype=bool, count=len(symbols))
+
+        passed = np.ones(len(rows), dtype=bool)
+        for name, mask in masks.items():
+            passed &= mask
+            stats['passed'][name] = int(passed.sum())
+        stats['timings_ms']['filter'] = (time.perf_counter() - start_time) * 1000
+
+        # Ранжирование: ликвидность плюс сила движения относительно рынка
+        start_time = time.perf_counter()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score = self._zscore(np.log1p(turnover)) + np.abs(change_z)
+        indices = np.flatnonzero(passed)
+        order = indices[np.argsort(-score[indices], kind='stable')]
+
+        position_set = set(positions)
+        candidates = [symbol for symbol in symbols[order] if symbol not in position_set][:config['top_k']]
+        stats['candidates'] = len(candidates)
+        stats['timings_ms']['rank'] = (time.perf_counter() - start_time) * 1000
+
+        return positions + candidates
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Компактный формат обученного леса для инференса без scikit-learn
+Деревья RandomForestClassifier и параметры StandardScaler выгружаются в плоские
+массивы NumPy (признак, порог, потомки, вероятности листьев); предсказание
+считается векторизованно сразу для всех строк и деревьев
+"""
+
+import io
+from typing import Dict
+
+import numpy as np
+
+
+class CompiledForest:
+    """Лес решающих деревьев в виде массивов NumPy со встроенной нормализацией"""
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes', 'mean', 'scale')
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, classes: np.ndarray,
+                 mean: np.ndarray, scale: np.ndarray, max_depth: int):
+        """
+        Args:
+            feature, threshold: Признак и порог узла (для листа - 0 и +inf)
+            left, right: Глобальные индексы потомков (лист ссылается на себя)
+            value: Нормированные вероятности классов в узлах (n_nodes, n_classes)
+            roots: Индексы корней деревьев
+            classes: Метки классов (как classes_ модели)
+            mean, scale: Параметры StandardScaler
+            max_depth: Наибольшая глубина деревьев
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.mean = mean
+        self.scale = scale
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.mean)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self._arrays().values())
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        return {name: (self.classes_ if name == 'classes' else getattr(self, name)) for name in self.ARRAYS}
+
+    def transform(self, X) -> np.ndarray:
+        """Нормализация как StandardScaler.transform"""
+        X = np.array(X, dtype=np.float64, ndmin=2)
+        X -= self.mean
+        X /= self.scale
+        return X
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Вероятности классов для строк X (признаки до нормализации)"""
+        # Деревья sklearn сравнивают признаки в float32
+        X = self.transform(X).astype(np.float32).astype(np.float64)
+        rows = np.arange(X.shape[0])
+
+        # Узлы всех деревьев для всех строк: (n_trees, n_rows)
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # Среднее по деревьям в порядке обхода, как в RandomForestClassifier
+        proba = np.zeros((X.shape[0], self.value.shape[1]))
+        for tree_nodes in nodes:
+            proba += self.value[tree_nodes]
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    # ---- Сериализация ----
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(buffer, max_depth=np.array(self.max_depth), **self._arrays())
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CompiledForest':
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            fields: Dict[str, np.ndarray] = {name: arrays[name] for name in cls.ARRAYS}
+            return cls(max_depth=int(arrays['max_depth']), **fields)
+
+
+def compile_forest(model, scaler=None) -> CompiledForest:
+    """Выгрузка обученного RandomForestClassifier (и StandardScaler) в CompiledForest
+
+    Raises:
+        ValueError: Модель не является обученным лесом деревьев классификации
+    """
+    estimators = getattr(model, 'estimators_', None)
+    if not estimators or not hasattr(estimators[0], 'tree_') or not hasattr(model, 'classes_'):
+        raise ValueError(f"Неподдерживаемая модель для компиляции: {type(model).__name__}")
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError("Поддерживаются только модели с одним выходом")
+
+    n_features = model.n_features_in_
+    n_classes = len(model.classes_)
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in estimators:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(tree.node_count)
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+        # Нормировка как DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :n_classes].astype(np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(value / normalizer)
+
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    mean = getattr(scaler, 'mean_', None) if scaler is not None else None
+    scale = getattr(scaler, 'scale_', None) if scaler is not None else None
+
+    return CompiledForest(
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        value=np.concatenate(values),
+        roots=np.asarray(roots, dtype=np.int32),
+        classes=np.asarray(model.classes_),
+        mean=np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64),
+        scale=np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64),
+        max_depth=max_depth
+    )
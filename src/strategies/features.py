@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пакетное построение матрицы признаков для обучения
+Строка k совпадает бит в бит с AdaptiveMLStrategy.extract_features(klines[j-window:j]),
+где j = window + k: индикаторы считаются сразу для всех окон (m, window)
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+from .indicators import VectorizedIndicators
+
+# Версия набора признаков extract_features; меняется при изменении состава
+# или порядка признаков, модели старой версии не используются.
+# 2: окна свечей от старых к новым (как в потоковом состоянии признаков)
+FEATURE_SCHEMA_VERSION = 2
+
+
+def chronological(klines: List[Dict]) -> List[Dict]:
+    """Свечи от старых к новым; без меток времени порядок не меняется"""
+    if not klines or any(k.get('timestamp') is None for k in klines):
+        return klines
+    return sorted(klines, key=lambda k: int(k['timestamp']))
+
+
+def _column(klines: List[Dict], name: str) -> np.ndarray:
+    return np.fromiter((float(k[name]) for k in klines), dtype=np.float64, count=len(klines))
+
+
+def _windows(values: np.ndarray, window: int, count: int) -> np.ndarray:
+    """Окна values[j-window:j] для j = window..window+count-1 (непрерывная копия)"""
+    view = np.lib.stride_tricks.sliding_window_view(values, window)[:count]
+    return np.ascontiguousarray(view)
+
+
+def build_feature_matrix(klines: List[Dict], window: int, stop: int = None,
+                         use_technical_indicators: bool = True) -> np.ndarray:
+    """Матрица признаков (m, n_features) для окон klines[j-window:j], j in range(window, stop)
+
+    Args:
+        klines: Свечи в том же порядке, что и при вызове extract_features
+        window: Размер окна (feature_window стратегии)
+        stop: Граница j (не включительно), по умолчанию len(klines)
+        use_technical_indicators: Как AdaptiveMLStrategy.use_technical_indicators
+    """
+    stop = len(klines) if stop is None else min(stop, len(klines))
+    count = max(stop - window, 0)
+    if count == 0 or window < 1:
+        return np.empty((0, 0), dtype=np.float64)
+
+    closes = _windows(_column(klines, 'close'), window, count)
+    volumes = _windows(_column(klines, 'volume'), window, count)
+    columns = []
+
+    # Ценовые признаки
+    current_price = closes[:, -1]
+    columns.append(current_price)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns.append(_price_change(closes, 1))
+        columns.append(_price_change(closes, 24))
+
+        if use_technical_indicators:
+            columns.extend(_indicator_columns(closes, current_price))
+        columns.extend(_volume_columns(volumes))
+        columns.append(_volatility(closes))
+
+    return np.column_stack(columns)
+
+
+def _price_change(closes: np.ndarray, lag: int) -> np.ndarray:
+    rows, width = closes.shape
+    if width <= lag:
+        return np.zeros(rows)
+    last, prev = closes[:, -1], closes[:, -1 - lag]
+    valid = (prev != 0) & np.isfinite(last) & np.isfinite(prev)
+    return np.where(valid, np.clip((last - prev) / prev, -0.5, 0.5), 0.0)
+
+
+def _indicator_columns(closes: np.ndarray, current_price: np.ndarray) -> List[np.ndarray]:
+    rows = closes.shape[0]
+    columns = []
+
+    # RSI
+    rsi = VectorizedIndicators.rsi(closes, 14)
+    columns.append(rsi[:, -1] if rsi.shape[1] else np.full(rows, 50.0))
+
+    # MACD
+    macd = VectorizedIndicators.macd(closes)
+    if macd['macd'].shape[1] and macd['signal'].shape[1]:
+        macd_value, signal_value = macd['macd'][:, -1], macd['signal'][:, -1]
+        columns.extend([macd_value, signal_value, macd_value - signal_value])
+    else:
+        columns.extend([np.zeros(rows)] * 3)
+
+    # Bollinger Bands
+    bands = VectorizedIndicators.bollinger_bands(closes)
+    if bands['middle'].shape[1]:
+        upper, lower = bands['upper'][:, -1], bands['lower'][:, -1]
+        valid = (upper != lower) & np.isfinite(upper) & np.isfinite(lower) & np.isfinite(current_price)
+        position = np.clip((current_price - lower) / (upper - lower), -2.0, 3.0)
+        columns.append(np.where(valid, position, 0.5))
+    else:
+        columns.append(np.full(rows, 0.5))
+
+    # Скользящие средние
+    sma_10 = VectorizedIndicators.sma(closes, 10)
+    sma_20 = VectorizedIndicators.sma(closes, 20)
+    if sma_10.shape[1] and sma_20.shape[1]:
+        fast, slow = sma_10[:, -1], sma_20[:, -1]
+        valid = (slow != 0) & np.isfinite(fast) & np.isfinite(slow)
+        columns.append(np.where(valid, np.clip(fast / slow, 0.5, 2.0), 1.0))
+    else:
+        columns.append(np.ones(rows))
+    return columns
+
+
+def _volume_columns(volumes: np.ndarray) -> List[np.ndarray]:
+    rows, width = volumes.shape
+    if width <= 1:
+        return [np.zeros(rows), np.ones(rows)]
+
+    last, prev = volumes[:, -1], volumes[:, -2]
+    valid = (prev > 0) & np.isfinite(last) & np.isfinite(prev)
+    volume_change = np.where(valid, (last - prev) / prev, 0.0)
+
+    # Последовательное сложение, как sum() по списку
+    tail = volumes[:, -10:]
+    total = np.zeros(rows)
+    for i in range(tail.shape[1]):
+        total = total + tail[:, i]
+    avg_volume = total / min(10, width)
+    valid = (avg_volume > 0) & np.isfinite(last) & np.isfinite(avg_volume)
+    volume_ratio = np.where(valid, last / avg_volume, 1.0)
+
+    return [np.clip(volume_change, -10.0, 10.0), np.clip(volume_ratio, 0.1, 10.0)]
+
+
+def _volatility(closes: np.ndarray) -> np.ndarray:
+    rows, width = closes.shape
+    if width <= 20:
+        return np.zeros(rows)
+
+    cur, prev = closes[:, 1:], closes[:, :-1]
+    valid = (prev != 0) & np.isfinite(cur) & np.isfinite(prev)
+    returns = np.where(valid, np.clip((cur - prev) / prev, -0.5, 0.5), 0.0)
+    # Непрерывные строки: np.std суммирует каждую строку так же, как одиночный ряд
+    volatility = np.std(np.ascontiguousarray(returns[:, -20:]), axis=1) * 100
+    return np.clip(volatility, 0, 50)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Векторизованный расчет технических индикаторов на NumPy
+Все функции принимают массивы float64 и считают по последней оси,
+поэтому одинаково работают для одного ряда (n,) и пачки окон (m, n)
+"""
+
+import logging
+from typing import Dict
+
+import numpy as np
+
+try:
+    from scipy.signal import lfilter
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+    logging.getLogger(__name__).warning(
+        "scipy не установлен. EMA/RSI будут считаться циклом NumPy.")
+
+
+def _as_array(data) -> np.ndarray:
+    return np.asarray(data, dtype=np.float64)
+
+
+def _empty_like(data: np.ndarray) -> np.ndarray:
+    return np.empty(data.shape[:-1] + (0,), dtype=np.float64)
+
+
+def _recursive_filter(x: np.ndarray, alpha: float, seed: np.ndarray) -> np.ndarray:
+    """y[t] = alpha * x[t] + (1 - alpha) * y[t-1], y[-1] = seed (по последней оси)"""
+    decay = 1.0 - alpha
+    if x.shape[-1] == 0:
+        return _empty_like(x)
+    zi = (decay * seed)[..., np.newaxis]
+    if SCIPY_AVAILABLE:
+        y, _ = lfilter([alpha], [1.0, -decay], x, axis=-1, zi=zi)
+        return y
+
+    y = np.empty_like(x)
+    prev = zi[..., 0]
+    for t in range(x.shape[-1]):
+        prev = alpha * x[..., t] + prev
+        y[..., t] = prev
+        prev = decay * prev
+    return y
+
+
+class VectorizedIndicators:
+    """Индикаторы с той же семантикой и длиной результата, что и TechnicalIndicators"""
+
+    @staticmethod
+    def sma(data, period: int) -> np.ndarray:
+        """Простая скользящая средняя через кумулятивную сумму"""
+        data = _as_array(data)
+        n = data.shape[-1]
+        if n < period:
+            return _empty_like(data)
+        csum = np.cumsum(data, axis=-1)
+        head = csum[..., period - 1:period]
+        tail = csum[..., period:] - csum[..., :n - period]
+        return np.concatenate([head, tail], axis=-1) / period
+
+    @staticmethod
+    def ema(data, period: int) -> np.ndarray:
+        """Экспоненциальная скользящая средняя (первое значение - SMA)"""
+        data = _as_array(data)
+        if data.shape[-1] < period:
+            return _empty_like(data)
+        seed = np.cumsum(data[..., :period], axis=-1)[..., -1] / period
+        alpha = 2 / (period + 1)
+        rest = _recursive_filter(data[..., period:], alpha, seed)
+        return np.concatenate([seed[..., np.newaxis], rest], axis=-1)
+
+    @staticmethod
+    def rsi(data, period: int = 14) -> np.ndarray:
+        """Индекс относительной силы со сглаживанием Уайлдера"""
+        data = _as_array(data)
+        if data.shape[-1] < period + 1:
+            return _empty_like(data)
+        deltas = np.diff(data, axis=-1)
+        gains = np.where(deltas > 0, deltas, 0.0)
+        losses = np.where(deltas < 0, -deltas, 0.0)
+
+        alpha = 1 / period
+        avg_gain = _recursive_filter(
+            gains[..., period:], alpha, np.cumsum(gains[..., :period], axis=-1)[..., -1] / period)
+        avg_loss = _recursive_filter(
+            losses[..., period:], alpha, np.cumsum(losses[..., :period], axis=-1)[..., -1] / period)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = avg_gain / avg_loss
+            return np.where(avg_loss == 0, 100.0, 100 - (100 / (1 + rs)))
+
+    @staticmethod
+    def macd(data, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+        """MACD индикатор (линии выровнены по последнему значению)"""
+        data = _as_array(data)
+        ema_fast = VectorizedIndicators.ema(data, fast)
+        ema_slow = VectorizedIndicators.ema(data, slow)
+
+        length = min(ema_fast.shape[-1], ema_slow.shape[-1])
+        macd_line = ema_fast[..., ema_fast.shape[-1] - length:] - ema_slow[..., ema_slow.shape[-1] - length:]
+        signal_line = VectorizedIndicators.ema(macd_line, signal)
+        histogram = macd_line[..., macd_line.shape[-1] - signal_line.shape[-1]:] - signal_line
+
+        return {
+            'macd': macd_line,
+            'signal': signal_line,
+            'histogram': histogram
+        }
+
+    @staticmethod
+    def bollinger_bands(data, period: int = 20, std_dev: float = 2) -> Dict[str, np.ndarray]:
+        """Полосы Боллинджера; дисперсия окна через суммы квадратов"""
+        data = _as_array(data)
+        middle = VectorizedIndicators.sma(data, period)
+        if middle.shape[-1] == 0:
+            return {'upper': middle, 'middle': middle, 'lower': middle}
+
+        # Сдвиг на первое значение снижает потерю точности в E[x^2] - E[x]^2
+        shifted = data - data[..., :1]
+        mean = VectorizedIndicators.sma(shifted, period)
+        mean_sq = VectorizedIndicators.sma(shifted * shifted, period)
+        std = np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+        return {
+            'upper': middle + std * std_dev,
+            'middle': middle,
+            'lower': middle - std * std_dev
+        }
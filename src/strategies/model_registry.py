@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Реестр ML моделей: один файл на символ (модель + скейлер + метрики + версия
+схемы признаков) и маленькая запись индекса на символ. Запись атомарная,
+модели загружаются лениво при первом обращении и держатся в памяти в LRU
+с ограничением объема. Записи индекса перечитываются при изменении каталога,
+поэтому модели, переобученные другим процессом, подхватываются без перезапуска.
+Рядом с артефактом может лежать скомпилированный лес (.npz), который
+загружается без scikit-learn
+"""
+
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from .compiled_forest import CompiledForest
+
+
+def atomic_write_bytes(path: Path, data: bytes):
+    """Запись через временный файл в том же каталоге и os.replace"""
+    fd, tmp_name = tempfile.mkstemp(prefix=path.name + '.', suffix='.tmp', dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+class ModelRegistry:
+    """Хранилище моделей по символам с ленивой загрузкой и LRU в памяти"""
+
+    # Прежний общий индекс: читается только для переноса записей
+    INDEX_FILE = 'index.json'
+    ENTRY_SUFFIX = '.meta.json'
+    # Изменения каталога моложе этого срока могут совпасть по mtime с последующими
+    RACY_MTIME_NS = 2_000_000_000
+
+    def __init__(self, root_path, schema_version: int, max_memory_mb: float = 512):
+        """
+        Args:
+            root_path: Каталог реестра
+            schema_version: Текущая версия схемы признаков; модели другой версии не загружаются
+            max_memory_mb: Ограничение объема моделей в памяти (по размеру артефактов)
+        """
+        self.root_path = Path(root_path)
+        self.root_path.mkdir(parents=True, exist_ok=True)
+        self.schema_version = schema_version
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.RLock()
+        self._index: Dict[str, Dict] = {}
+        # Подписи (inode, mtime) прочитанных записей индекса и mtime каталога при последнем просмотре
+        self._entry_mtimes: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._dir_mtime: Optional[int] = None
+        # Время последнего просмотра каталога (пока mtime свежий, просмотр не чаще раза в RACY_MTIME_NS)
+        self._scanned_at_ns = 0
+        # Ключ - символ (артефакт) или (символ, 'compiled') (скомпилированный лес)
+        self._resident: "OrderedDict[Any, Tuple[Any, int]]" = OrderedDict()
+        self._resident_bytes = 0
+
+        # Статистика
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self.reloads = 0
+        self.scans = 0
+
+        self._migrate_index()
+        self._refresh_index()
+
+    # ---- Индекс ----
+
+    def entry_path(self, symbol: str) -> Path:
+        return self.root_path / f"{symbol}{self.ENTRY_SUFFIX}"
+
+    def _read_entry(self, path: Path) -> Optional[Dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Ошибка чтения записи индекса {path.name}: {e}")
+            return None
+
+    def _write_entry(self, symbol: str, entry: Dict):
+        path = self.entry_path(symbol)
+        atomic_write_bytes(path, json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+        self._entry_mtimes[symbol] = self._signature(path.stat())
+
+    def _signature(self, stat: os.stat_result) -> Optional[Tuple[int, int]]:
+        """Подпись файла; для свежих файлов None (перечитать), т.к. mtime может совпасть со следующей записью"""
+        if time.time_ns() - stat.st_mtime_ns < self.RACY_MTIME_NS:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _migrate_index(self):
+        """Перенос записей из прежнего общего index.json в записи по символам"""
+        index_path = self.root_path / self.INDEX_FILE
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                models = json.load(f).get('models', {})
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Ошибка чтения индекса моделей: {e}")
+            return
+        with self._lock:
+            for symbol, entry in models.items():
+                if not self.entry_path(symbol).exists():
+                    self._write_entry(symbol, entry)
+                    self._index[symbol] = entry
+            self._unlink(index_path)
+
+    def _refresh_index(self):
+        """Перечитывание записей индекса, если каталог изменился (в том числе другим процессом)
+
+        Одна проверка mtime каталога на вызов; читаются только изменившиеся записи
+        (и свежие, mtime которых еще может совпасть со следующей записью). Пока mtime
+        каталога свежий, каталог просматривается не чаще раза в RACY_MTIME_NS: изменения
+        другого процесса видны с задержкой не более RACY_MTIME_NS
+        """
+        try:
+            dir_mtime = os.stat(self.root_path).st_mtime_ns
+        except OSError:
+            return
+        if dir_mtime == self._dir_mtime:
+            return
+
+        with self._lock:
+            # Свежий mtime мог не измениться при следующей записи в тот же тик часов ФС
+            now = time.time_ns()
+            racy = now - dir_mtime < self.RACY_MTIME_NS
+            if racy and now - self._scanned_at_ns < self.RACY_MTIME_NS:
+                return
+            self._dir_mtime = None if racy else dir_mtime
+            self._scanned_at_ns = now
+            self.scans += 1
+            seen = set()
+            for path in self.root_path.glob('*' + self.ENTRY_SUFFIX):
+                symbol = path.name[:-len(self.ENTRY_SUFFIX)]
+                try:
+                    signature = self._signature(path.stat())
+                except FileNotFoundError:
+                    continue
+                seen.add(symbol)
+                if signature is not None and self._entry_mtimes.get(symbol) == signature:
+                    continue
+                entry = self._read_entry(path)
+                if entry is None:
+                    continue
+                if symbol in self._index and self._index[symbol].get('saved_at') != entry.get('saved_at'):
+                    # Модель переобучена другим процессом
+                    self._forget(symbol)
+                    self.reloads += 1
+                self._index[symbol] = entry
+                self._entry_mtimes[symbol] = signature
+
+            for symbol in [s for s in self._index if s not in seen]:
+                del self._index[symbol]
+                self._entry_mtimes.pop(symbol, None)
+                self._forget(symbol)
+
+    def artifact_path(self, symbol: str) -> Path:
+        return self.root_path / f"{symbol}.pkl"
+
+    def compiled_path(self, symbol: str) -> Path:
+        return self.root_path / f"{symbol}.forest.npz"
+
+    def __contains__(self, symbol: str) -> bool:
+        self._refresh_index()
+        entry = self._index.get(symbol)
+        return entry is not None and entry.get('feature_schema_version') == self.schema_version
+
+    def __len__(self) -> int:
+        self._refresh_index()
+        return len(self._index)
+
+    def symbols(self) -> List[str]:
+        self._refresh_index()
+        with self._lock:
+            return sorted(self._index)
+
+    def version(self, symbol: str) -> Optional[float]:
+        """Версия модели символа (время сохранения) или None, если совместимой модели нет"""
+        self._refresh_index()
+        entry = self._index.get(symbol)
+        if entry is None or entry.get('feature_schema_version') != self.schema_version:
+            return None
+        return entry.get('saved_at')
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Метрики всех моделей из индекса (без загрузки моделей)"""
+        self._refresh_index()
+        with self._lock:
+            return {symbol: dict(entry.get('metrics', {})) for symbol, entry in self._index.items()}
+
+    # ---- Запись ----
+
+    def put(self, symbol: str, model, scaler, metrics: Dict[str, Any],
+            compiled: Optional[CompiledForest] = None):
+        """Атомарное сохранение артефакта символа и обновление индекса"""
+        artifact = {
+            'symbol': symbol,
+            'model': model,
+            'scaler': scaler,
+            'metrics': metrics,
+            'feature_schema_version': self.schema_version,
+            'saved_at': time.time()
+        }
+        data = pickle.dumps(artifact, protocol=pickle.HIGHEST_PROTOCOL)
+        compiled_data = compiled.to_bytes() if compiled is not None else None
+        with self._lock:
+            path = self.artifact_path(symbol)
+            atomic_write_bytes(path, data)
+            if compiled_data is not None:
+                atomic_write_bytes(self.compiled_path(symbol), compiled_data)
+            else:
+                self._unlink(self.compiled_path(symbol))
+            entry = {
+                'file': path.name,
+                'size': len(data),
+                'compiled': self.compiled_path(symbol).name if compiled_data is not None else None,
+                'metrics': metrics,
+                'feature_schema_version': self.schema_version,
+                'saved_at': artifact['saved_at']
+            }
+            # Пишется только запись символа: O(1) на модель, записи других процессов не затираются
+            self._write_entry(symbol, entry)
+            self._index[symbol] = entry
+            self._forget(symbol)
+            self._remember(symbol, artifact, len(data))
+            if compiled is not None:
+                self._remember((symbol, 'compiled'), compiled, len(compiled_data))
+
+    def delete(self, symbol: str):
+        with self._lock:
+            self._forget(symbol)
+            self._index.pop(symbol, None)
+            self._entry_mtimes.pop(symbol, None)
+            self._unlink(self.entry_path(symbol))
+            self._unlink(self.artifact_path(symbol))
+            self._unlink(self.compiled_path(symbol))
+
+    @staticmethod
+    def _unlink(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    # ---- Чтение ----
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        """Артефакт символа; загружается с диска при первом обращении"""
+        self._refresh_index()
+        with self._lock:
+            if symbol in self._resident:
+                self._resident.move_to_end(symbol)
+                self.hits += 1
+                return self._resident[symbol][0]
+
+            if symbol not in self:
+                return None
+            entry = self._index[symbol]
+            try:
+                with open(self.root_path / entry['file'], 'rb') as f:
+                    data = f.read()
+                artifact = pickle.loads(data)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+                self.logger.error(f"Ошибка загрузки модели {symbol}: {e}")
+                return None
+
+            self.loads += 1
+            self._remember(symbol, artifact, len(data))
+            return artifact
+
+    def has_compiled(self, symbol: str) -> bool:
+        return symbol in self and bool(self._index[symbol].get('compiled'))
+
+    def get_compiled(self, symbol: str) -> Optional[CompiledForest]:
+        """Скомпилированный лес символа (загрузка без scikit-learn) или None"""
+        self._refresh_index()
+        with self._lock:
+            key = (symbol, 'compiled')
+            if key in self._resident:
+                self._resident.move_to_end(key)
+                self.hits += 1
+                return self._resident[key][0]
+
+            if not self.has_compiled(symbol):
+                return None
+            try:
+                with open(self.root_path / self._index[symbol]['compiled'], 'rb') as f:
+                    data = f.read()
+                compiled = CompiledForest.from_bytes(data)
+            except (OSError, ValueError, KeyError) as e:
+                self.logger.error(f"Ошибка загрузки скомпилированной модели {symbol}: {e}")
+                return None
+
+            self.loads += 1
+            self._remember(key, compiled, len(data))
+            return compiled
+
+    def _remember(self, key, value, size: int):
+        self._drop(key)
+        self._resident[key] = (value, size)
+        self._resident_bytes += size
+        # Вытеснение давно не использованных моделей (последняя остается всегда)
+        while self._resident_bytes > self.max_memory_bytes and len(self._resident) > 1:
+            _, (_, evicted_size) = self._resident.popitem(last=False)
+            self._resident_bytes -= evicted_size
+            self.evictions += 1
+
+    def _forget(self, symbol: str):
+        self._drop(symbol)
+        self._drop((symbol, 'compiled'))
+
+    def _drop(self, key):
+        resident = self._resident.pop(key, None)
+        if resident is not None:
+            self._resident_bytes -= resident[1]
+
+    def get_stats(self) -> Dict:
+        return {
+            'models': len(self._index),
+            'resident': len(self._resident),
+            'resident_mb': round(self._resident_bytes / (1024 * 1024), 2),
+            'loads': self.loads,
+            'hits': self.hits,
+            'evictions': self.evictions,
+            'reloads': self.reloads,
+            'scans': self.scans,
+        }
+
+
+class RegistryView(Mapping):
+    """Словарь symbol -> модель (или скейлер) поверх реестра с ленивой загрузкой"""
+
+    def __init__(self, registry: ModelRegistry, field: str):
+        self.registry = registry
+        self.field = field
+
+    def __getitem__(self, symbol: str):
+        artifact = self.registry.get(symbol)
+        if artifact is None or artifact.get(self.field) is None:
+            raise KeyError(symbol)
+        return artifact[self.field]
+
+    def __contains__(self, symbol) -> bool:
+        return symbol in self.registry
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([symbol for symbol in self.registry.symbols() if symbol in self.registry])
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Потоковые (инкрементальные) индикаторы для живого анализа
+Каждая новая закрытая свеча обновляет состояние за O(1); состояние
+сериализуется в словарь (JSON), чтобы переживать перезапуск бота
+"""
+
+import math
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class StreamingEMA:
+    """EMA: первое значение - SMA первых period значений, как в TechnicalIndicators.ema"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.multiplier = 2 / (period + 1)
+        self.count = 0
+        self.total = 0.0
+        self.value: Optional[float] = None
+
+    def update(self, x: float) -> Optional[float]:
+        self.count += 1
+        if self.value is None:
+            self.total += x
+            if self.count == self.period:
+                self.value = self.total / self.period
+        else:
+            self.value = (x * self.multiplier) + (self.value * (1 - self.multiplier))
+        return self.value
+
+    def to_dict(self) -> Dict:
+        return {'period': self.period, 'count': self.count, 'total': self.total, 'value': self.value}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StreamingEMA':
+        ema = cls(data['period'])
+        ema.count, ema.total, ema.value = data['count'], data['total'], data['value']
+        return ema
+
+
+class StreamingRSI:
+    """RSI со сглаживанием Уайлдера (первое значение после period + 1 изменений цены)"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev: Optional[float] = None
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.value: Optional[float] = None
+
+    def update(self, x: float) -> Optional[float]:
+        if self.prev is None:
+            self.prev = x
+            return None
+        delta = x - self.prev
+        self.prev = x
+        gain = delta if delta > 0 else 0
+        loss = -delta if delta < 0 else 0
+        self.count += 1
+
+        if self.count <= self.period:
+            # Пока копятся суммы первых period изменений, затем - средние
+            self.avg_gain += gain
+            self.avg_loss += loss
+            if self.count == self.period:
+                self.avg_gain /= self.period
+                self.avg_loss /= self.period
+            return None
+
+        self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+        self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        if self.avg_loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100 - (100 / (1 + self.avg_gain / self.avg_loss))
+        return self.value
+
+    def to_dict(self) -> Dict:
+        return {'period': self.period, 'prev': self.prev, 'count': self.count,
+                'avg_gain': self.avg_gain, 'avg_loss': self.avg_loss, 'value': self.value}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StreamingRSI':
+        rsi = cls(data['period'])
+        rsi.prev, rsi.count, rsi.value = data['prev'], data['count'], data['value']
+        rsi.avg_gain, rsi.avg_loss = data['avg_gain'], data['avg_loss']
+        return rsi
+
+
+class StreamingMACD:
+    """MACD: разность EMA fast/slow и сигнальная EMA от линии MACD"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal)
+        self.macd: Optional[float] = None
+
+    def update(self, x: float):
+        fast, slow = self.fast.update(x), self.slow.update(x)
+        if slow is not None:
+            self.macd = fast - slow
+            self.signal.update(self.macd)
+
+    def to_dict(self) -> Dict:
+        return {'fast': self.fast.to_dict(), 'slow': self.slow.to_dict(),
+                'signal': self.signal.to_dict(), 'macd': self.macd}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StreamingMACD':
+        macd = cls()
+        macd.fast = StreamingEMA.from_dict(data['fast'])
+        macd.slow = StreamingEMA.from_dict(data['slow'])
+        macd.signal = StreamingEMA.from_dict(data['signal'])
+        macd.macd = data['macd']
+        return macd
+
+
+class RollingWindow:
+    """Скользящее окно со средним и дисперсией через суммы значений и квадратов
+
+    Суммы ведутся относительно опорного значения и пересчитываются заново раз
+    в size обновлений, чтобы ошибка округления не накапливалась (амортизированно O(1)).
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.offset = 0.0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.updates = 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def push(self, x: float):
+        if len(self.values) == self.size:
+            old = self.values[0] - self.offset
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(x)
+        self.updates += 1
+        if self.updates >= self.size:
+            self._resum()
+        else:
+            d = x - self.offset
+            self.total += d
+            self.total_sq += d * d
+
+    def _resum(self):
+        self.updates = 0
+        values = [v for v in self.values if math.isfinite(v)]
+        self.offset = sum(values) / len(values) if values else 0.0
+        self.total = sum(v - self.offset for v in self.values)
+        self.total_sq = sum((v - self.offset) ** 2 for v in self.values)
+
+    @property
+    def mean(self) -> float:
+        return self.offset + self.total / len(self.values)
+
+    @property
+    def std(self) -> float:
+        """Стандартное отклонение генеральной совокупности (как np.std)"""
+        n = len(self.values)
+        mean_d = self.total / n
+        return math.sqrt(max(self.total_sq / n - mean_d * mean_d, 0.0))
+
+    def to_dict(self) -> Dict:
+        return {'size': self.size, 'values': list(self.values)}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RollingWindow':
+        window = cls(data['size'])
+        window.values.extend(data['values'])
+        window._resum()
+        return window
+
+
+class StreamingFeatureState:
+    """Состояние признаков одного символа, обновляемое по закрытым свечам
+
+    Признаки идут в том же порядке, что и в AdaptiveMLStrategy.extract_features
+    для окна последних window свечей в хронологическом порядке. Скользящие
+    средние, полосы Боллинджера, объем и волатильность совпадают с расчетом по
+    окну; EMA/RSI/MACD учитывают всю историю, при окне 200 свечей отличие от
+    расчета по окну порядка 1e-6.
+    """
+
+    VERSION = 1
+
+    def __init__(self, window: int = 200, use_technical_indicators: bool = True):
+        self.window = window
+        self.use_technical_indicators = use_technical_indicators
+        self.count = 0
+        self.last_timestamp: Optional[int] = None
+
+        self.closes = deque(maxlen=25)
+        self.volumes = deque(maxlen=10)
+        self.rsi = StreamingRSI(14)
+        self.macd = StreamingMACD(12, 26, 9)
+        self.sma_10 = RollingWindow(10)
+        self.sma_20 = RollingWindow(20)  # также средняя линия Боллинджера
+        self.sma_30 = RollingWindow(30)
+        self.clipped_returns = RollingWindow(20)
+        self.returns = RollingWindow(max(window - 1, 1))
+
+    @property
+    def length(self) -> int:
+        """Число свечей в воображаемом окне (не больше window)"""
+        return min(self.count, self.window)
+
+    def update(self, kline: Dict) -> bool:
+        """Добавление закрытой свечи; устаревшие и повторные свечи пропускаются"""
+        timestamp = int(kline['timestamp']) if kline.get('timestamp') is not None else None
+        if timestamp is not None and self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return False
+        close, volume = float(kline['close']), float(kline['volume'])
+
+        if self.closes:
+            prev = self.closes[-1]
+            # Доходность для режима рынка считается без ограничений, как в detect_regime
+            self.returns.push((close - prev) / prev if prev != 0 else 0.0)
+            if prev != 0 and math.isfinite(close) and math.isfinite(prev):
+                self.clipped_returns.push(float(np.clip((close - prev) / prev, -0.5, 0.5)))
+            else:
+                self.clipped_returns.push(0.0)
+
+        self.closes.append(close)
+        self.volumes.append(volume)
+        self.rsi.update(close)
+        self.macd.update(close)
+        for window in (self.sma_10, self.sma_20, self.sma_30):
+            window.push(close)
+
+        self.count += 1
+        self.last_timestamp = timestamp
+        return True
+
+    def update_many(self, klines: List[Dict]) -> int:
+        return sum(1 for kline in klines if self.update(kline))
+
+    # ---- Признаки ----
+
+    def features(self) -> Optional[List[float]]:
+        """Вектор признаков последней закрытой свечи"""
+        if not self.closes:
+            return None
+        n = self.length
+        closes = self.closes
+        current_price = closes[-1]
+        features = [current_price,
+                    self._price_change(1) if n > 1 else 0,
+                    self._price_change(24) if n > 24 else 0]
+
+        if self.use_technical_indicators:
+            features.append(self.rsi.value if self.rsi.value is not None else 50)
+
+            if self.macd.macd is not None and self.macd.signal.value is not None:
+                macd_value, signal_value = self.macd.macd, self.macd.signal.value
+                features.extend([macd_value, signal_value, macd_value - signal_value])
+            else:
+                features.extend([0, 0, 0])
+
+            if len(self.sma_20) == 20:
+                middle, std = self.sma_20.mean, self.sma_20.std
+                upper, lower = middle + std * 2, middle - std * 2
+                if upper != lower and math.isfinite(upper) and math.isfinite(lower) and math.isfinite(current_price):
+                    features.append(float(np.clip((current_price - lower) / (upper - lower), -2.0, 3.0)))
+                else:
+                    features.append(0.5)
+            else:
+                features.append(0.5)
+
+            if len(self.sma_20) == 20 and self.sma_20.mean != 0 and \
+                    math.isfinite(self.sma_10.mean) and math.isfinite(self.sma_20.mean):
+                features.append(float(np.clip(self.sma_10.mean / self.sma_20.mean, 0.5, 2.0)))
+            else:
+                features.append(1.0)
+
+        volumes = list(self.volumes)[-n:]
+        if len(volumes) > 1:
+            last, prev = volumes[-1], volumes[-2]
+            volume_change = (last - prev) / prev if prev > 0 and math.isfinite(last) and math.isfinite(prev) else 0
+            avg_volume = sum(volumes[-10:]) / min(10, n)
+            volume_ratio = last / avg_volume if avg_volume > 0 and math.isfinite(last) and math.isfinite(avg_volume) else 1
+            features.extend([float(np.clip(volume_change, -10.0, 10.0)), float(np.clip(volume_ratio, 0.1, 10.0))])
+        else:
+            features.extend([0, 1])
+
+        if n > 20:
+            features.append(float(np.clip(self.clipped_returns.std * 100, 0, 50)))
+        else:
+            features.append(0)
+        return features
+
+    def _price_change(self, lag: int) -> float:
+        last, prev = self.closes[-1], self.closes[-1 - lag]
+        if prev != 0 and math.isfinite(last) and math.isfinite(prev):
+            return float(np.clip((last - prev) / prev, -0.5, 0.5))
+        return 0
+
+    def regime(self) -> Dict:
+        """Рыночный режим, как MarketRegimeDetector.detect_regime по окну цен"""
+        if self.length < 50:
+            return {'regime': 'unknown', 'confidence': 0.0}
+
+        volatility = self.returns.std * 100
+        sma_short, sma_long = self.sma_10.mean, self.sma_30.mean
+        trend_strength = (sma_short - sma_long) / sma_long * 100
+
+        if abs(trend_strength) > 2 and volatility < 5:
+            regime = 'trending_up' if trend_strength > 0 else 'trending_down'
+            confidence = min(abs(trend_strength) / 5, 1.0)
+        elif volatility > 8:
+            regime = 'high_volatility'
+            confidence = min(volatility / 15, 1.0)
+        else:
+            regime = 'sideways'
+            confidence = 1.0 - min(abs(trend_strength) / 2, 0.8)
+
+        return {
+            'regime': regime,
+            'confidence': confidence,
+            'volatility': volatility,
+            'trend_strength': trend_strength
+        }
+
+    # ---- Сериализация ----
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': self.VERSION,
+            'window': self.window,
+            'use_technical_indicators': self.use_technical_indicators,
+            'count': self.count,
+            'last_timestamp': self.last_timestamp,
+            'closes': list(self.closes),
+            'volumes': list(self.volumes),
+            'rsi': self.rsi.to_dict(),
+            'macd': self.macd.to_dict(),
+            'sma_10': self.sma_10.to_dict(),
+            'sma_20': self.sma_20.to_dict(),
+            'sma_30': self.sma_30.to_dict(),
+            'clipped_returns': self.clipped_returns.to_dict(),
+            'returns': self.returns.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StreamingFeatureState':
+        if data.get('version') != cls.VERSION:
+            raise ValueError(f"Неподдерживаемая версия состояния признаков: {data.get('version')}")
+        state = cls(data['window'], data['use_technical_indicators'])
+        state.count = data['count']
+        state.last_timestamp = data['last_timestamp']
+        state.closes.extend(data['closes'])
+        state.volumes.extend(data['volumes'])
+        state.rsi = StreamingRSI.from_dict(data['rsi'])
+        state.macd = StreamingMACD.from_dict(data['macd'])
+        for name in ('sma_10', 'sma_20', 'sma_30', 'clipped_returns', 'returns'):
+            setattr(state, name, RollingWindow.from_dict(data[name]))
+        return state
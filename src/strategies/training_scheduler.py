@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Параллельное обучение моделей по символам в пуле процессов
+Матрица признаков передается процессу через shared_memory (без pickle копии),
+обратно возвращаются модель, скейлер и метрики
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .adaptive_ml import fit_symbol_model
+
+
+def _train_job(symbol: str, shm_name: str, shape, dtype: str, labels: List[int]) -> Dict:
+    """Задача процесса пула: обучение модели одного символа"""
+    start_time = time.time()
+    # Процессы пула используют resource_tracker родителя: блок удаляет родитель
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        features = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+
+    model, scaler, metrics = fit_symbol_model(features, labels)
+    return {
+        'symbol': symbol,
+        'success': True,
+        'model': model,
+        'scaler': scaler,
+        'metrics': metrics,
+        'duration': time.time() - start_time,
+        'pid': os.getpid()
+    }
+
+
+class TrainingScheduler:
+    """Планировщик обучения: задачи отправляются в пул сразу при submit(),
+    результаты забираются по мере готовности через results()
+
+    При max_workers=1 или недоступном пуле процессов обучение выполняется
+    последовательно в текущем процессе.
+    """
+
+    def __init__(self, max_workers: int = None,
+                 on_result: Callable[[Dict, int, int], None] = None):
+        """
+        Args:
+            max_workers: Число процессов (по умолчанию - число ядер)
+            on_result: Обратный вызов (result, done, total) после каждой задачи
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.on_result = on_result
+        self.logger = logging.getLogger(__name__)
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # cancel() вызывается из потока GUI, пока results() забирает задачи в рабочем потоке
+        self._lock = threading.Lock()
+        self._futures: Dict[Future, str] = {}
+        self._segments: Dict[Future, shared_memory.SharedMemory] = {}
+        self._inline: List[tuple] = []
+        self._cancelled = False
+        self.submitted = 0
+
+        if self.max_workers > 1:
+            try:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            except (OSError, NotImplementedError) as e:
+                self.logger.warning(f"Пул процессов недоступен, обучение последовательное: {e}")
+        self.parallel = self._executor is not None
+
+    def submit(self, symbol: str, features, labels) -> bool:
+        """Постановка символа в очередь обучения"""
+        if self._cancelled:
+            return False
+        features = np.ascontiguousarray(features, dtype=np.float64)
+        labels = [int(label) for label in labels]
+        self.submitted += 1
+
+        if self._executor is None:
+            with self._lock:
+                self._inline.append((symbol, features, labels))
+            return True
+
+        shm = shared_memory.SharedMemory(create=True, size=max(features.nbytes, 1))
+        np.ndarray(features.shape, dtype=features.dtype, buffer=shm.buf)[...] = features
+        try:
+            future = self._executor.submit(_train_job, symbol, shm.name, features.shape,
+                                           features.dtype.str, labels)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._release(shm)
+            self.logger.warning(f"Пул процессов недоступен, {symbol} обучается в текущем процессе: {e}")
+            with self._lock:
+                self._inline.append((symbol, features, labels))
+            return True
+
+        with self._lock:
+            self._futures[future] = symbol
+            self._segments[future] = shm
+        return True
+
+    def results(self) -> Iterator[Dict]:
+        """Результаты по мере завершения задач (ошибки - success=False и error)"""
+        total = self.submitted
+        done = 0
+        try:
+            with self._lock:
+                pending = list(self._futures)
+            for future in as_completed(pending):
+                with self._lock:
+                    symbol = self._futures.pop(future, None)
+                    shm = self._segments.pop(future, None)
+                self._release(shm)
+                if future.cancelled():
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'symbol': symbol, 'success': False, 'error': str(e)}
+                done += 1
+                self._notify(result, done, total)
+                yield result
+
+            while not self._cancelled:
+                with self._lock:
+                    if not self._inline:
+                        break
+                    symbol, features, labels = self._inline.pop(0)
+                start_time = time.time()
+                try:
+                    model, scaler, metrics = fit_symbol_model(features, labels)
+                    result = {'symbol': symbol, 'success': True, 'model': model, 'scaler': scaler,
+                              'metrics': metrics, 'duration': time.time() - start_time, 'pid': os.getpid()}
+                except Exception as e:
+                    result = {'symbol': symbol, 'success': False, 'error': str(e)}
+                done += 1
+                self._notify(result, done, total)
+                yield result
+        finally:
+            self.close()
+
+    def _notify(self, result: Dict, done: int, total: int):
+        if self.on_result:
+            try:
+                self.on_result(result, done, total)
+            except Exception as e:
+                self.logger.error(f"Ошибка обработчика результата обучения: {e}")
+
+    def cancel(self):
+        """Отмена задач, которые еще не начали выполняться"""
+        self._cancelled = True
+        with self._lock:
+            self._inline.clear()
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            segments = list(self._segments.values())
+            self._segments.clear()
+            self._futures.clear()
+        for shm in segments:
+            self._release(shm)
+
+    @staticmethod
+    def _release(shm: Optional[shared_memory.SharedMemory]):
+        if shm is None:
+            return
+        try:
+            shm.close()
+            shm.unlink()
+        except (FileNotFoundError, OSError):
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Планировщик циклов торгового потока по крайним срокам
+Задачи запускаются по своему периоду или по закрытию свечи интервала,
+а не через фиксированную паузу. Если запуск не уложился в период,
+пропущенные сроки не наверстываются подряд: перерасход учитывается,
+а период задачи временно увеличивается (обратное давление)
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class ScheduledTask:
+    """Состояние одной задачи планировщика"""
+
+    def __init__(self, name: str, period: float, align: bool = False, offset: float = 0.0,
+                 retry_delay: float = 10.0, max_backoff: int = 8):
+        self.name = name
+        self.period = period
+        self.align = align
+        self.offset = offset
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+
+        self.next_due = 0.0
+        self.backoff = 1
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.total_duration = 0.0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+
+
+class CycleScheduler:
+    """Сроки задач с выравниванием по свечам и учетом перерасхода времени"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+        self._tasks: Dict[str, ScheduledTask] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def add_task(self, name: str, period: float, align: bool = False, offset: float = 0.0,
+                 retry_delay: float = 10.0, max_backoff: int = 8, run_now: bool = True):
+        """
+        Args:
+            name: Имя задачи
+            period: Период, с (для align - длительность свечи)
+            align: Запуск на границах period от начала эпохи (закрытие свечи)
+            offset: Задержка после границы, с (биржа успевает опубликовать закрытую свечу)
+            retry_delay: Повтор после ошибки, с
+            max_backoff: Максимальный множитель периода при перерасходе
+            run_now: Первый запуск сразу, а не на ближайшей границе
+        """
+        task = ScheduledTask(name, period, align, offset, retry_delay, max_backoff)
+        now = self.clock()
+        task.next_due = now if run_now else self._next_deadline(task, now)
+        with self._lock:
+            self._tasks[name] = task
+
+    def _next_deadline(self, task: ScheduledTask, after: float) -> float:
+        """Ближайший срок строго после after с учетом множителя обратного давления"""
+        period = task.period * task.backoff
+        if task.align:
+            boundary = (int((after - task.offset) // task.period) + 1) * task.period + task.offset
+            # При перерасходе пропускаются целые свечи
+            return boundary + (task.backoff - 1) * task.period
+        return after + period
+
+    def trigger(self, name: str, delay: float = 0.0):
+        """Внеочередной запуск задачи через delay секунд (например, после включения торговли)
+
+        Уже назначенный более ранний срок не откладывается
+        """
+        with self._lock:
+            task = self._tasks.get(name)
+            if task is not None:
+                task.next_due = min(task.next_due, self.clock() + delay)
+        self._wakeup.set()
+
+    def due(self) -> List[str]:
+        """Задачи, срок которых наступил (в порядке добавления)"""
+        now = self.clock()
+        with self._lock:
+            return [name for name, task in self._tasks.items() if task.next_due <= now]
+
+    def time_until_next(self) -> float:
+        with self._lock:
+            if not self._tasks:
+                return float('inf')
+            return max(0.0, min(task.next_due for task in self._tasks.values()) - self.clock())
+
+    def wait(self, max_wait: float = 1.0) -> bool:
+        """Ожидание ближайшего срока, внеочередного запуска или max_wait
+
+        Returns:
+            True, если есть задачи к запуску
+        """
+        timeout = min(self.time_until_next(), max_wait)
+        if timeout > 0:
+            self._wakeup.wait(timeout)
+        self._wakeup.clear()
+        return bool(self.due())
+
+    def complete(self, name: str, started: float, failed: bool = False):
+        """Отметка завершения запуска и расчет следующего срока
+
+        Args:
+            name: Имя задачи
+            started: Время начала запуска (clock)
+            failed: Запуск завершился ошибкой (повтор через retry_delay)
+        """
+        finished = self.clock()
+        with self._lock:
+            task = self._tasks[name]
+            duration = finished - started
+            scheduled = task.next_due
+            task.runs += 1
+            task.last_duration = duration
+            task.total_duration += duration
+            task.max_duration = max(task.max_duration, duration)
+
+            if failed:
+                task.failures += 1
+                task.next_due = finished + task.retry_delay
+                return
+
+            if duration > task.period * task.backoff:
+                # Запуск дольше периода: следующий - не раньше чем через увеличенный период
+                task.overruns += 1
+                task.backoff = min(task.backoff * 2, task.max_backoff)
+                self.logger.warning(f"Задача {name} заняла {duration:.1f} с при периоде {task.period:.1f} с, "
+                                    f"период увеличен в {task.backoff} раз")
+            elif task.backoff > 1:
+                task.backoff //= 2
+
+            # Сроки, прошедшие во время запуска, не выполняются подряд
+            if finished - scheduled >= task.period:
+                task.skipped += int((finished - scheduled) // task.period)
+
+            if task.align:
+                task.next_due = self._next_deadline(task, finished)
+            else:
+                # Периодические задачи держат сетку от планового срока, а не от окончания
+                next_due = scheduled + task.period * task.backoff
+                task.next_due = next_due if next_due > finished else self._next_deadline(task, finished)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        now = self.clock()
+        with self._lock:
+            return {
+                name: {
+                    'runs': task.runs,
+                    'failures': task.failures,
+                    'overruns': task.overruns,
+                    'skipped': task.skipped,
+                    'backoff': task.backoff,
+                    'last_ms': round(task.last_duration * 1000, 1),
+                    'avg_ms': round(task.total_duration / task.runs * 1000, 1) if task.runs else 0.0,
+                    'max_ms': round(task.max_duration * 1000, 1),
+                    'next_in_s': round(max(0.0, task.next_due - now), 1),
+                }
+                for name, task in self._tasks.items()
+            }
+
+    def get_task(self, name: str) -> Optional[ScheduledTask]:
+        return self._tasks.get(name)
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Конвейер торгового цикла: загрузка данных -> признаки и предсказание -> риск и лимиты -> ордера
+Этапы работают в отдельных потоках и связаны ограниченными очередями, поэтому медленный
+запрос одного символа не задерживает анализ остальных, а заполненная очередь
+притормаживает предыдущий этап. Потоки загрузки берут символы пачками и актуализируют
+свечи пачки одним пакетным запросом. По каждому этапу считаются пропускная способность
+и глубина входной очереди
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_SENTINEL = object()
+
+
+def available_balance(balance_response: Optional[dict]) -> float:
+    """Доступный баланс из ответа get_wallet_balance (с 'result' или без него)"""
+    if not balance_response:
+        return 0.0
+    if 'result' in balance_response and balance_response['result'].get('list'):
+        accounts = balance_response['result']['list']
+    else:
+        accounts = balance_response.get('list') or []
+    if not accounts:
+        return 0.0
+    try:
+        return float(accounts[0].get('totalAvailableBalance', 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class BalanceSnapshot:
+    """Баланс, запрашиваемый не чаще одного раза за ttl_seconds"""
+
+    def __init__(self, loader: Callable[[], Optional[dict]], ttl_seconds: float = 5.0):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._value: Optional[dict] = None
+        self._loaded_at = 0.0
+        self.loads = 0
+
+    def get(self) -> Optional[dict]:
+        with self._lock:
+            if self._value is None or time.time() - self._loaded_at >= self.ttl_seconds:
+                self._value = self.loader()
+                self._loaded_at = time.time()
+                self.loads += 1
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+
+
+class RiskGate:
+    """Проверка лимитов и расчет размера позиции по снимку баланса
+
+    Размер зарезервированных в цикле ордеров учитывается в дневном лимите,
+    пока исполнитель еще не разместил их
+    """
+
+    def __init__(self, balance: BalanceSnapshot, daily_volume: float = 0.0,
+                 max_daily_volume_percent: float = 0.20, min_confidence: float = 0.65,
+                 min_position_size: float = 10.0, balance_limit: Optional[float] = None):
+        self.balance = balance
+        self.daily_volume = daily_volume
+        self.max_daily_volume_percent = max_daily_volume_percent
+        self.min_confidence = min_confidence
+        self.min_position_size = min_position_size
+        self.balance_limit = balance_limit
+        self.reserved = 0.0
+        self.rejected: Dict[str, int] = {}
+
+    def _reject(self, reason: str) -> None:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return None
+
+    def __call__(self, symbol: str, analysis: dict) -> Optional[dict]:
+        """Ордер {'symbol', 'side', 'size', 'analysis'} или None"""
+        signal = analysis.get('signal')
+        if signal not in ('BUY', 'SELL'):
+            return self._reject('no_signal')
+
+        available = available_balance(self.balance.get())
+        if available <= 0:
+            return self._reject('no_balance')
+
+        if self.daily_volume + self.reserved >= available * self.max_daily_volume_percent:
+            return self._reject('daily_limit')
+
+        confidence = analysis.get('confidence', 0)
+        if confidence < self.min_confidence:
+            return self._reject('confidence')
+
+        if self.balance_limit:
+            available = min(available, self.balance_limit)
+
+        # Размер позиции зависит от уверенности (1-3% от баланса)
+        position_size = available * (0.01 + (confidence - 0.65) * 0.02)
+        if position_size < self.min_position_size:
+            return self._reject('min_size')
+
+        self.reserved += position_size
+        return {'symbol': symbol, 'side': 'Buy' if signal == 'BUY' else 'Sell',
+                'size': position_size, 'analysis': analysis}
+
+
+class KlineFetchStage:
+    """Этап загрузки свечей поверх KlineStore
+
+    prefetch актуализирует окна пачки символов одним refresh_many (через
+    batch_fetcher это один пакет параллельных запросов), fetch читает окно
+    из памяти без запросов к API. Символ пропускается, если результат анализа
+    его последней закрытой свечи уже есть (is_analyzed - кэш анализа стратегии,
+    поэтому переобученная модель анализирует ту же свечу заново). Если биржа
+    не публикует новую закрытую свечу символа за max_publish_attempts попыток,
+    символ ждет следующей свечи
+    """
+
+    def __init__(self, kline_store, category: str = 'spot', interval: str = '4h',
+                 max_publish_attempts: int = 3,
+                 is_analyzed: Optional[Callable[[str, str, int], bool]] = None):
+        self.kline_store = kline_store
+        self.category = category
+        self.interval = interval
+        self.max_publish_attempts = max(1, max_publish_attempts)
+        self.is_analyzed = is_analyzed
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # Закрытые свечи символов, загруженных в текущем цикле
+        self.pending: Dict[str, int] = {}
+        # Попытки дождаться публикации свечи: symbol -> (ожидаемая свеча, попыток)
+        self._publish_attempts: Dict[str, Tuple[int, int]] = {}
+        self.skip_stats = self._new_stats()
+
+    @staticmethod
+    def _new_stats() -> Dict[str, int]:
+        return {'unchanged': 0, 'not_published': 0, 'gave_up': 0}
+
+    def begin_cycle(self):
+        with self._lock:
+            self.pending = {}
+            self.skip_stats = self._new_stats()
+
+    def _skip(self, reason: str) -> None:
+        with self._lock:
+            self.skip_stats[reason] += 1
+        return None
+
+    def _analyzed(self, symbol: str, closed_ts: Optional[int]) -> bool:
+        return closed_ts is not None and self.is_analyzed is not None \
+            and self.is_analyzed(symbol, self.interval, closed_ts)
+
+    def _skip_reason(self, symbol: str, now_ms: int) -> Optional[str]:
+        """Причина пропуска без запроса окна: новая свеча по часам еще не закрылась
+        или попытки дождаться ее публикации исчерпаны"""
+        expected = self.kline_store.expected_last_closed(self.interval, now_ms)
+        if self._analyzed(symbol, expected):
+            with self._lock:
+                self._publish_attempts.pop(symbol, None)
+            return 'unchanged'
+        attempts = self._publish_attempts.get(symbol)
+        if attempts is not None and attempts[0] == expected and attempts[1] >= self.max_publish_attempts:
+            return 'gave_up'
+        return None
+
+    def _not_published(self, symbol: str, now_ms: int) -> None:
+        expected = self.kline_store.expected_last_closed(self.interval, now_ms)
+        with self._lock:
+            candle, attempts = self._publish_attempts.get(symbol, (expected, 0))
+            attempts = attempts + 1 if candle == expected else 1
+            self._publish_attempts[symbol] = (expected, attempts)
+            if attempts >= self.max_publish_attempts:
+                self.logger.warning(f"Свеча {symbol} не опубликована за {attempts} попыток, "
+                                    f"символ ждет следующей свечи")
+            self.skip_stats['not_published' if attempts < self.max_publish_attempts else 'gave_up'] += 1
+        return None
+
+    @property
+    def retry_pending(self) -> bool:
+        """Есть символы, свечу которых стоит запросить повторно до следующей свечи"""
+        return self.skip_stats['not_published'] > 0
+
+    def prefetch(self, symbols: List[str]):
+        """Пакетная актуализация окон символов пачки"""
+        now_ms = self.kline_store.now_ms()
+        keys = [(self.category, symbol, self.interval) for symbol in symbols
+                if self._skip_reason(symbol, now_ms) is None]
+        if keys:
+            self.kline_store.refresh_many(keys)
+
+    def fetch(self, symbol: str) -> Optional[Tuple[List[Dict], Optional[int]]]:
+        """(окно свечей, время последней закрытой свечи) или None, если символ пропускается"""
+        now_ms = self.kline_store.now_ms()
+        reason = self._skip_reason(symbol, now_ms)
+        if reason is not None:
+            return self._skip(reason)
+
+        klines = self.kline_store.get_window(self.category, symbol, self.interval, refresh=False)
+        last_closed = self.kline_store.last_closed_timestamp(self.category, symbol, self.interval, now_ms)
+        if self._analyzed(symbol, last_closed):
+            # Новая закрытая свеча еще не опубликована биржей
+            return self._not_published(symbol, now_ms)
+        if last_closed is not None:
+            with self._lock:
+                self.pending[symbol] = last_closed
+        return klines, last_closed
+
+
+class StageMetrics:
+    """Счетчики одного этапа конвейера"""
+
+    def __init__(self, name: str, input_queue: Optional[queue.Queue] = None):
+        self.name = name
+        self.input_queue = input_queue
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.max_queue_depth = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def record(self, elapsed_s: float, count: int = 1, failed: bool = False):
+        with self._lock:
+            self.processed += count
+            self.errors += int(failed)
+            self.busy_s += elapsed_s
+
+    def observe_depth(self):
+        if self.input_queue is not None:
+            depth = self.input_queue.qsize()
+            with self._lock:
+                self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            wall_s = end - self.started_at if self.started_at else 0.0
+            return {
+                'processed': self.processed,
+                'errors': self.errors,
+                'busy_ms': round(self.busy_s * 1000, 1),
+                'wall_ms': round(wall_s * 1000, 1),
+                'throughput_per_s': round(self.processed / wall_s, 2) if wall_s > 0 else 0.0,
+                'queue_depth': self.input_queue.qsize() if self.input_queue is not None else 0,
+                'max_queue_depth': self.max_queue_depth,
+            }
+
+
+class TradingPipeline:
+    """Торговый цикл из четырех этапов с ограниченными очередями"""
+
+    def __init__(self, fetch: Callable[[str], Optional[dict]],
+                 analyze: Callable[[List[dict]], Dict[str, dict]],
+                 risk: Callable[[str, dict], Optional[dict]],
+                 execute: Callable[[dict], Optional[dict]],
+                 fetch_workers: int = 4, queue_size: int = 32,
+                 batch_size: int = 16, batch_wait: float = 0.05,
+                 prefetch: Optional[Callable[[List[str]], None]] = None, prefetch_chunk: int = 16):
+        """
+        Args:
+            fetch: Данные символа для анализа (market_data) или None
+            analyze: Пакетный анализ списка market_data -> {symbol: analysis}
+            risk: Проверка лимитов -> ордер или None
+            execute: Размещение ордера -> результат сделки или None
+            fetch_workers: Потоков загрузки данных
+            queue_size: Емкость очередей между этапами
+            batch_size: Максимальный пакет символов для одного вызова analyze
+            batch_wait: Сколько ждать дополнения пакета, с
+            prefetch: Пакетная загрузка данных пачки символов перед вызовами fetch
+            prefetch_chunk: Максимальный размер пачки prefetch
+        """
+        self.fetch = fetch
+        self.analyze = analyze
+        self.risk = risk
+        self.execute = execute
+        self.fetch_workers = max(1, fetch_workers)
+        self.queue_size = queue_size
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.prefetch = prefetch
+        self.prefetch_chunk = max(1, prefetch_chunk)
+        self.logger = logging.getLogger(__name__)
+        self._stop = threading.Event()
+        self.metrics: Dict[str, StageMetrics] = {}
+
+    def stop(self):
+        """Прекращение загрузки новых символов; уже полученные данные дорабатываются"""
+        self._stop.set()
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        return {name: stage.snapshot() for name, stage in self.metrics.items()}
+
+    def run(self, symbols: Iterable[str]) -> Dict:
+        """Прогон символов через конвейер
+
+        Returns:
+            {'analyses': {symbol: analysis}, 'orders': [...], 'trades': [...], 'metrics': {...}}
+        """
+        self._stop.clear()
+        symbols_queue: queue.Queue = queue.Queue()
+        features_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        risk_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        orders_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        symbols = list(symbols)
+        for symbol in symbols:
+            symbols_queue.put(symbol)
+        # Пачки делятся между потоками поровну, чтобы один поток не забрал все символы
+        chunk_size = 1
+        if self.prefetch is not None:
+            chunk_size = max(1, min(self.prefetch_chunk, -(-len(symbols) // self.fetch_workers)))
+
+        self.metrics = {
+            'fetch': StageMetrics('fetch', symbols_queue),
+            'analyze': StageMetrics('analyze', features_queue),
+            'risk': StageMetrics('risk', risk_queue),
+            'execute': StageMetrics('execute', orders_queue),
+        }
+        result = {'analyses': {}, 'orders': [], 'trades': []}
+        fetchers_left = [self.fetch_workers]
+        fetchers_lock = threading.Lock()
+
+        def put(q: queue.Queue, item, stage: str):
+            q.put(item)
+            self.metrics[stage].observe_depth()
+
+        def fetch_worker():
+            stage = self.metrics['fetch']
+            try:
+                while not self._stop.is_set():
+                    chunk = []
+                    while len(chunk) < chunk_size:
+                        try:
+                            chunk.append(symbols_queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    if not chunk:
+                        break
+
+                    if self.prefetch is not None:
+                        start_time = time.perf_counter()
+                        failed = False
+                        try:
+                            self.prefetch(chunk)
+                        except Exception as e:
+                            # fetch каждого символа отработает по тому, что уже есть
+                            failed = True
+                            self.logger.error(f"Ошибка пакетной загрузки {len(chunk)} символов: {e}")
+                        stage.record(time.perf_counter() - start_time, count=0, failed=failed)
+
+                    for symbol in chunk:
+                        if self._stop.is_set():
+                            break
+                        start_time = time.perf_counter()
+                        failed = False
+                        market_data = None
+                        try:
+                            market_data = self.fetch(symbol)
+                        except Exception as e:
+                            failed = True
+                            self.logger.error(f"Ошибка загрузки данных {symbol}: {e}")
+                        stage.record(time.perf_counter() - start_time, failed=failed)
+                        if market_data:
+                            put(features_queue, market_data, 'analyze')
+            finally:
+                with fetchers_lock:
+                    fetchers_left[0] -= 1
+                    last = fetchers_left[0] == 0
+                if last:
+                    stage.finished_at = time.time()
+                    features_queue.put(_SENTINEL)
+
+        def analyze_worker():
+            stage = self.metrics['analyze']
+            done = False
+            while not done:
+                item = features_queue.get()
+                if item is _SENTINEL:
+                    break
+                batch = [item]
+                # Пакет дополняется тем, что успело прийти за batch_wait
+                deadline = time.perf_counter() + self.batch_wait
+                while len(batch) < self.batch_size:
+                    try:
+                        item = features_queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                    except queue.Empty:
+                        break
+                    if item is _SENTINEL:
+                        done = True
+                        break
+                    batch.append(item)
+
+                start_time = time.perf_counter()
+                failed = False
+                analyses = {}
+                try:
+                    analyses = self.analyze(batch) or {}
+                except Exception as e:
+                    failed = True
+                    self.logger.error(f"Ошибка пакетного анализа {len(batch)} символов: {e}")
+                stage.record(time.perf_counter() - start_time, count=len(batch), failed=failed)
+
+                for symbol, analysis in analyses.items():
+                    if analysis:
+                        result['analyses'][symbol] = analysis
+                        put(risk_queue, (symbol, analysis), 'risk')
+            stage.finished_at = time.time()
+            risk_queue.put(_SENTINEL)
+
+        def risk_worker():
+            stage = self.metrics['risk']
+            while True:
+                item = risk_queue.get()
+                if item is _SENTINEL:
+                    break
+                symbol, analysis = item
+                start_time = time.perf_counter()
+                failed = False
+                order = None
+                try:
+                    order = self.risk(symbol, analysis)
+                except Exception as e:
+                    failed = True
+                    self.logger.error(f"Ошибка проверки лимитов {symbol}: {e}")
+                stage.record(time.perf_counter() - start_time, failed=failed)
+                if order:
+                    result['orders'].append(order)
+                    put(orders_queue, order, 'execute')
+            stage.finished_at = time.time()
+            orders_queue.put(_SENTINEL)
+
+        def execute_worker():
+            stage = self.metrics['execute']
+            while True:
+                order = orders_queue.get()
+                if order is _SENTINEL:
+                    break
+                start_time = time.perf_counter()
+                failed = False
+                trade = None
+                try:
+                    trade = self.execute(order)
+                except Exception as e:
+                    failed = True
+                    self.logger.error(f"Ошибка размещения ордера {order.get('symbol')}: {e}")
+                stage.record(time.perf_counter() - start_time, failed=failed)
+                if trade:
+                    result['trades'].append(trade)
+            stage.finished_at = time.time()
+
+        threads = [threading.Thread(target=fetch_worker, name=f'pipeline-fetch-{i}', daemon=True)
+                   for i in range(self.fetch_workers)]
+        threads += [threading.Thread(target=target, name=f'pipeline-{name}', daemon=True)
+                    for name, target in (('analyze', analyze_worker), ('risk', risk_worker),
+                                         ('execute', execute_worker))]
+        started_at = time.time()
+        for stage in self.metrics.values():
+            stage.started_at = started_at
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        result['metrics'] = self.get_metrics()
+        return result
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Модуль для загрузки данных тикеров из файла
+Модуль для загрузки данных тикеров из общего хранилища
 """
 
 import json
@@ -9,11 +9,15 @@ import logging
 import datetime
 from pathlib import Path
 
+from src.data.kline_archive import KlineArchive
+from src.data.shared_tickers import SharedTickerTable
+from src.data.ticker_store import TickerStore, TickerStoreReader
+
 
 logger = logging.getLogger(__name__)
 
 class TickerDataLoader:
-    """Класс для загрузки данных тикеров из файла"""
+    """Класс для загрузки данных тикеров из хранилища программы просмотра тикеров"""
     
     def __init__(self, data_path=None):
         """
@@ -35,21 +39,76 @@ class TickerDataLoader:
         self.tickers_data = {}
         self.historical_data = {}
         self.last_update_timestamp = None
+        
+        # Колоночный архив свечей (общий с программой просмотра тикеров)
+        self.archive = KlineArchive(self.data_path / 'kline_archive')
+        
+        # Хранилище тикеров: повторная загрузка читает только изменившиеся символы
+        self.store_reader = TickerStoreReader(TickerStore(self.data_path))
+        
+        # Живая таблица тикеров программы просмотра (подключается при первом обращении)
+        self._live_table = None
 
     def get_data_file_path(self) -> Path:
-        """Возвращает путь к файлу с сохранёнными данными тикеров."""
+        """Возвращает путь к файлу хранилища тикеров."""
+        return self.store_reader.store.path
+    
+    def get_legacy_file_path(self) -> Path:
+        """Возвращает путь к файлу tickers_data.json прежних версий программы просмотра тикеров."""
         return self.data_path / 'tickers_data.json'
     
+    def has_data(self):
+        """Есть ли сохраненные данные тикеров"""
+        return self.store_reader.store.generation() > 0 or self.get_legacy_file_path().exists()
+    
+    def get_generation(self):
+        """Номер текущего поколения хранилища (растет при каждом изменении данных)"""
+        return self.store_reader.store.generation()
+    
+    def has_updates(self):
+        """Изменилось ли хранилище с последней загрузки (без чтения данных)"""
+        return self.store_reader.has_updates()
+    
     def load_tickers_data(self):
         """
-        Загрузка данных тикеров из файла
+        Загрузка данных тикеров: из хранилища читаются только изменения
+        с прошлой загрузки
         
         Returns:
-            dict: Словарь с данными тикеров и временем последнего обновления
+            dict: Словарь с данными тикеров (по символам) и временем последнего обновления
                   или None в случае ошибки
         """
         try:
-            data_file = self.get_data_file_path()
+            reader = self.store_reader
+            changed = reader.refresh()
+            
+            if reader.generation == 0:
+                return self._load_legacy_file()
+            
+            self.tickers_data = reader.tickers
+            self.historical_data = reader.historical
+            self.last_update_timestamp = reader.updated_at
+            
+            update_time = datetime.datetime.fromtimestamp(self.last_update_timestamp)
+            logger.info(f"Загружены данные тикеров (поколение {reader.generation}, "
+                        f"изменено тикеров: {changed['tickers']}, свечей: {changed['historical']}). "
+                        f"Последнее обновление: {update_time}")
+            
+            return {
+                'tickers': self.tickers_data,
+                'historical_data': self.historical_data,
+                'timestamp': self.last_update_timestamp,
+                'update_time': update_time
+            }
+            
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке данных тикеров: {e}")
+            return None
+    
+    def _load_legacy_file(self):
+        """Загрузка tickers_data.json, если хранилище еще не заполнено"""
+        try:
+            data_file = self.get_legacy_file_path()
             
             if not data_file.exists():
                 logger.warning(f"Файл с данными тикеров не найден: {data_file}")
@@ -63,7 +122,10 @@ class TickerDataLoader:
                 logger.error("Некорректная структура данных в файле тикеров")
                 return None
             
-            self.tickers_data = data['tickers']
+            tickers = data['tickers']
+            if isinstance(tickers, list):
+                tickers = {t['symbol']: t for t in tickers if isinstance(t, dict) and 'symbol' in t}
+            self.tickers_data = tickers
             self.historical_data = data['historical_data']
             self.last_update_timestamp = data['timestamp']
             
@@ -99,16 +161,62 @@ class TickerDataLoader:
             return self.tickers_data.get(symbol)
         return self.tickers_data
     
-    def get_historical_data(self, symbol=None):
+    def _get_live_table(self):
+        """Таблица тикеров в разделяемой памяти или None, если производитель не запущен"""
+        table = self._live_table
+        if table is not None and table.closed:
+            # Программа просмотра перезапущена - подключаемся к новой таблице
+            table.close()
+            table = self._live_table = None
+        if table is None:
+            try:
+                table = self._live_table = SharedTickerTable.attach()
+            except (FileNotFoundError, ValueError):
+                return None
+        return table
+    
+    def get_live_ticker(self, symbol):
+        """
+        Живой тикер символа из разделяемой памяти (формат Bybit get_tickers)
+        
+        Returns:
+            dict: Тикер или None, если данных нет
+        """
+        table = self._get_live_table()
+        return table.get(symbol) if table is not None else None
+    
+    def get_live_price(self, symbol):
+        """Последняя цена символа из разделяемой памяти или None"""
+        table = self._get_live_table()
+        return table.get_last_price(symbol) if table is not None else None
+    
+    def get_live_tickers(self):
+        """
+        Все живые тикеры из разделяемой памяти
+        
+        Returns:
+            dict: Тикеры по символам (пустой, если программа просмотра не запущена)
+        """
+        table = self._get_live_table()
+        return table.get_all() if table is not None else {}
+    
+    def get_historical_data(self, symbol=None, interval=None):
         """
         Получение исторических данных конкретного тикера или всех тикеров
         
         Args:
             symbol (str, optional): Символ тикера. Если None, возвращаются данные всех тикеров.
+            interval (str, optional): Интервал в формате API (60, 240, D). Если указан,
+                                      свечи читаются из архива, а при его отсутствии - из файла.
         
         Returns:
             dict: Исторические данные тикера или словарь исторических данных всех тикеров
         """
+        if symbol and interval:
+            klines = self.archive.read_klines(symbol, interval)
+            if klines:
+                return klines
+        
         if not self.historical_data:
             self.load_tickers_data()
         
@@ -116,6 +224,27 @@ class TickerDataLoader:
             return self.historical_data.get(symbol)
         return self.historical_data
     
+    def get_historical_arrays(self, symbol, interval, start_ms=None, end_ms=None):
+        """
+        Колонки свечей из архива без копирования
+        
+        Returns:
+            dict: numpy.memmap срезы timestamp/open/high/low/close/volume
+        """
+        return self.archive.read(symbol, interval, start_ms, end_ms)
+    
+    def save_historical_data(self, symbol, interval, klines):
+        """
+        Дописывание свечей с метками времени (мс) в архив
+        
+        Returns:
+            int: Количество новых свечей в архиве
+        """
+        klines = [k for k in klines if 'timestamp' in k]
+        if not klines:
+            return 0
+        return self.archive.write(symbol, interval, klines)
+    
     def is_data_fresh(self, max_age_minutes=5):
         """
         Проверка свежести данных
@@ -4,7 +4,6 @@
 Модуль для просмотра тикеров Bybit
 """
 
-import json
 import time
 import logging
 import datetime
@@ -32,6 +31,14 @@ class TickerViewerApp:
         self.data_path = Path.home() / "AppData" / "Local" / "BybitTradingBot" / "data"
         self.data_path.mkdir(parents=True, exist_ok=True)
         
+        # Колоночный архив свечей, из которого читают загрузчик данных и тренеры
+        from src.data.kline_archive import KlineArchive
+        self.kline_archive = KlineArchive(self.data_path / 'kline_archive')
+        
+        # Хранилище тикеров для бота и тренеров (пишутся только изменившиеся символы)
+        from src.data.ticker_store import TickerStore
+        self.ticker_store = TickerStore(self.data_path)
+        
         # Данные тикеров
         self.all_tickers = []
         self.tickers_data = {}
@@ -42,6 +49,25 @@ class TickerViewerApp:
         self.is_loading = False
         self.stop_event = threading.Event()
         
+        # Живой снимок тикеров через WebSocket (публичные данные mainnet)
+        self.market_stream = None
+        self._shown_generation = None
+        try:
+            from src.api.market_stream import get_market_stream
+            self.market_stream = get_market_stream(category="spot", testnet=False)
+        except ImportError as e:
+            logger.warning(f"WebSocket поток недоступен, тикеры обновляются через REST: {e}")
+        
+        # Живая таблица тикеров в разделяемой памяти для бота и тренеров
+        self.shared_tickers = None
+        try:
+            from src.data.shared_tickers import SharedTickerTable
+            self.shared_tickers = SharedTickerTable.create()
+            if self.market_stream is not None:
+                self.market_stream.add_callback(self._publish_ticker_event)
+        except Exception as e:
+            logger.warning(f"Таблица тикеров в разделяемой памяти недоступна: {e}")
+        
         # Создание интерфейса
         self.create_widgets()
         
@@ -158,27 +184,31 @@ class TickerViewerApp:
     def on_closing(self):
         """Обработка закрытия приложения"""
         self.stop_event.set()
+        if self.market_stream is not None:
+            self.market_stream.stop()
+        if self.shared_tickers is not None:
+            self.shared_tickers.close()
+            self.shared_tickers = None
         self.root.destroy()
     
+    def _publish_ticker_event(self, event):
+        """Запись тикера из WebSocket потока в разделяемую таблицу"""
+        table = self.shared_tickers
+        if table is not None and event.get('type') == 'ticker':
+            table.update(event['data'])
+    
     def load_saved_data(self):
         """Загрузка сохраненных данных тикеров"""
         try:
-            data_file = self.data_path / 'tickers_data.json'
-            
-            if not data_file.exists():
-                logger.info("Файл с данными тикеров не найден")
-                return
+            data = self.ticker_store.changes_since(0)
             
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if not all(key in data for key in ['timestamp', 'tickers', 'historical_data']):
-                logger.error("Некорректная структура данных в файле тикеров")
+            if not data['generation']:
+                logger.info("Сохраненные данные тикеров не найдены")
                 return
             
-            self.tickers_data = data['tickers']
-            self.historical_data = data['historical_data']
-            last_update = datetime.datetime.fromtimestamp(data['timestamp'])
+            self.tickers_data = list(data['tickers'].values())
+            self.historical_data = data['historical']
+            last_update = datetime.datetime.fromtimestamp(data['updated_at'])
             
             logger.info(f"Загружены сохраненные данные тикеров. Последнее обновление: {last_update}")
             self.status_var.set(f"Загружены сохраненные данные. Последнее обновление: {last_update}")
@@ -189,23 +219,15 @@ class TickerViewerApp:
         except Exception as e:
             logger.error(f"Ошибка при загрузке сохраненных данных: {e}")
     
-    def save_tickers_data(self):
-        """Сохранение данных тикеров в файл для использования основной программой"""
+    def save_tickers_data(self, symbol=None):
+        """Сохранение данных для основной программы: все тикеры или свечи одного символа"""
         try:
-            data_path = self.data_path / 'tickers_data.json'
-            
-            # Подготовка данных для сохранения
-            save_data = {
-                'timestamp': datetime.datetime.now().timestamp(),
-                'tickers': self.tickers_data,
-                'historical_data': self.historical_data
-            }
+            if symbol is not None:
+                generation = self.ticker_store.put_historical(symbol, self.historical_data.get(symbol, []))
+            else:
+                generation = self.ticker_store.put_tickers(self.tickers_data)
             
-            # Сохранение данных в файл
-            with open(data_path, 'w', encoding='utf-8') as f:
-                json.dump(save_data, f, indent=2, default=str)
-            
-            logger.info(f"Данные тикеров сохранены в {data_path}")
+            logger.info(f"Данные тикеров сохранены в {self.ticker_store.path} (поколение {generation})")
             return True
         except Exception as e:
             logger.error(f"Ошибка при сохранении данных тикеров: {e}")
@@ -213,17 +235,28 @@ class TickerViewerApp:
             
     def update_tickers_thread(self):
         """Поток для периодического обновления тикеров"""
+        last_save = time.time()
+        last_rest = time.time()
         while not self.stop_event.is_set():
             try:
-                if not self.is_loading:
+                stream = self.market_stream
+                if stream is not None and len(stream.snapshot) > 0:
+                    # Живой снимок: перерисовка каждые 5 секунд, сохранение в файл раз в 30 секунд
+                    if stream.snapshot.generation != self._shown_generation:
+                        self._shown_generation = stream.snapshot.generation
+                        tickers = [self.format_ticker(t) for t in stream.snapshot.get_tickers()]
+                        save = time.time() - last_save >= 30
+                        self.process_tickers_result(tickers, save=save)
+                        if save:
+                            last_save = time.time()
+                elif not self.is_loading and time.time() - last_rest >= 30:
+                    # Без WebSocket - прежний опрос REST каждые 30 секунд
                     self.refresh_tickers()
-                    # Сохраняем данные после каждого обновления
-                    self.save_tickers_data()
+                    last_rest = time.time()
             except Exception as e:
                 logger.error(f"Ошибка при обновлении тикеров: {e}")
             
-            # Обновление каждые 30 секунд
-            time.sleep(30)
+            self.stop_event.wait(5)
             
     def process_historical_data_result(self, result):
         """Обработка результатов загрузки исторических данных"""
@@ -250,10 +283,10 @@ class TickerViewerApp:
         self.update_ticker_table(self.all_tickers)
         self.status_var.set(f"Загружено {len(klines)} свечей для {symbol}")
         
-        # Автоматически сохраняем данные в файл
-        self.save_tickers_data()
+        # Автоматически сохраняем свечи символа в хранилище
+        self.save_tickers_data(symbol)
             
-    def process_tickers_result(self, result):
+    def process_tickers_result(self, result, save=True):
         """Обработка результатов получения тикеров"""
         if isinstance(result, dict) and "error" in result:
             self.status_var.set(f"Ошибка: {result['error']}")
@@ -272,7 +305,20 @@ class TickerViewerApp:
         self.status_var.set(f"Загружено {len(result)} тикеров")
         
         # Автоматически сохраняем данные в файл
-        self.save_tickers_data()
+        if save:
+            self.save_tickers_data()
+    
+    @staticmethod
+    def format_ticker(ticker):
+        """Преобразование тикера Bybit в формат просмотрщика"""
+        return {
+            "symbol": ticker.get("symbol"),
+            "lastPrice": ticker.get("lastPrice"),
+            "highPrice": ticker.get("highPrice24h"),
+            "lowPrice": ticker.get("lowPrice24h"),
+            "volume": ticker.get("volume24h"),
+            "priceChangePercent": ticker.get("price24hPcnt", "0")
+        }
         
     def get_bybit_tickers(self):
         """Получение данных тикеров через API Bybit"""
@@ -294,18 +340,14 @@ class TickerViewerApp:
                 
             tickers_list = data.get("result", {}).get("list", [])
             
+            # REST снимок заполняет живой поток, дальше обновления идут через WebSocket
+            if self.market_stream is not None and tickers_list:
+                self.market_stream.bootstrap_tickers(tickers_list)
+            if self.shared_tickers is not None and tickers_list:
+                self.shared_tickers.update_many(tickers_list)
+            
             # Преобразуем данные в нужный формат
-            formatted_tickers = []
-            for ticker in tickers_list:
-                formatted_ticker = {
-                    "symbol": ticker.get("symbol"),
-                    "lastPrice": ticker.get("lastPrice"),
-                    "highPrice": ticker.get("highPrice24h"),
-                    "lowPrice": ticker.get("lowPrice24h"),
-                    "volume": ticker.get("volume24h"),
-                    "priceChangePercent": ticker.get("price24hPcnt", "0")
-                }
-                formatted_tickers.append(formatted_ticker)
+            formatted_tickers = [self.format_ticker(ticker) for ticker in tickers_list]
                 
             logger.info(f"Получено {len(formatted_tickers)} тикеров через API Bybit")
             return formatted_tickers
@@ -476,6 +518,14 @@ class TickerViewerApp:
             # Сортировка по времени (от старых к новым)
             formatted_data.sort(key=lambda x: x['timestamp'])
             
+            # Дописываем свечи в архив (метки времени архива в миллисекундах)
+            try:
+                self.kline_archive.write(symbol, api_interval["interval"], [
+                    dict(k, timestamp=int(k['timestamp'] * 1000)) for k in formatted_data
+                ])
+            except Exception as e:
+                logger.warning(f"Не удалось сохранить свечи {symbol} в архив: {e}")
+            
             logger.info(f"Получено {len(formatted_data)} исторических свечей для {symbol}")
             
             return {
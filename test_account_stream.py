@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест приватного WebSocket потока на локальном сервере-заглушке
+Проверяет авторизацию, инкрементальное состояние счета и сверку
+через REST снимок после переподключения; обновления, пришедшие во время
+загрузки снимка, не теряются
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import websockets
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.api.account_stream import AccountStream, AccountState, rest_account_snapshot
+
+API_KEY = "test_key"
+API_SECRET = "test_secret"
+
+
+class PrivateStandInServer:
+    """Локальный сервер, имитирующий приватный WebSocket Bybit v5"""
+
+    def __init__(self):
+        self.connections = 0
+        self.auth_ok = 0
+        self.port = None
+        self._loop = None
+        self._stop = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    async def _handler(self, ws, *args):
+        self.connections += 1
+        conn_no = self.connections
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg.get('op') == 'auth':
+                key, expires, signature = msg['args']
+                expected = hmac.new(API_SECRET.encode(), f"GET/realtime{expires}".encode(),
+                                    hashlib.sha256).hexdigest()
+                success = key == API_KEY and signature == expected
+                self.auth_ok += int(success)
+                await ws.send(json.dumps({"op": "auth", "success": success, "ret_msg": ""}))
+            elif msg.get('op') == 'subscribe':
+                await ws.send(json.dumps({"op": "subscribe", "success": True, "ret_msg": ""}))
+                # Обновления приходят, пока клиент загружает REST снимок
+                await ws.send(json.dumps({"topic": "wallet", "creationTime": 1, "data": [{
+                    "accountType": "UNIFIED", "totalAvailableBalance": "900",
+                    "coin": [{"coin": "USDT", "walletBalance": "900"}]}]}))
+                await ws.send(json.dumps({"topic": "order", "creationTime": 2, "data": [
+                    {"orderId": "o1", "symbol": "BTCUSDT", "category": "spot", "orderStatus": "Filled",
+                     "updatedTime": "5"},
+                    {"orderId": "o2", "symbol": "ETHUSDT", "category": "spot", "orderStatus": "New",
+                     "createdTime": "2"}]}))
+                await ws.send(json.dumps({"topic": "execution", "creationTime": 3, "data": [
+                    {"execId": "e1", "orderId": "o1", "symbol": "BTCUSDT"}]}))
+                if conn_no == 1:
+                    await ws.close()
+                    return
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        async def main():
+            self._stop = asyncio.Event()
+            async with websockets.serve(self._handler, '127.0.0.1', 0) as server:
+                self.port = list(server.sockets)[0].getsockname()[1]
+                self._ready.set()
+                await self._stop.wait()
+
+        self._loop.run_until_complete(main())
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait(5)
+        return f"ws://127.0.0.1:{self.port}"
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join(5)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_account_state_orders_and_wallet_merge():
+    state = AccountState()
+    state.load_snapshot(
+        wallet=[{"accountType": "UNIFIED", "totalAvailableBalance": "1000",
+                 "coin": [{"coin": "USDT", "walletBalance": "1000"}, {"coin": "BTC", "walletBalance": "0.1"}]}],
+        orders=[{"orderId": "o1", "symbol": "BTCUSDT", "category": "spot", "orderStatus": "New"}]
+    )
+    state.apply_wallet([{"accountType": "UNIFIED", "totalAvailableBalance": "950",
+                         "coin": [{"coin": "USDT", "walletBalance": "950"}]}])
+    account = state.get_wallet_balance()['list'][0]
+    assert account['totalAvailableBalance'] == "950"
+    assert {c['coin']: c['walletBalance'] for c in account['coin']} == {"USDT": "950", "BTC": "0.1"}
+
+    state.apply_orders([{"orderId": "o1", "orderStatus": "Filled"}])
+    assert state.get_open_orders(category="spot")['list'] == []
+
+    state.apply_positions([{"category": "linear", "symbol": "BTCUSDT", "size": "0.5"}])
+    assert len(state.get_positions("linear")) == 1
+    state.apply_positions([{"category": "linear", "symbol": "BTCUSDT", "size": "0"}])
+    assert state.get_positions("linear") == []
+
+
+def test_snapshot_replays_updates_received_during_fetch():
+    state = AccountState()
+    state.begin_snapshot()
+    # Пока снимок загружается, поток сообщает об исполнении o1 и новом o2
+    state.apply_orders([{"orderId": "o1", "orderStatus": "Filled", "updatedTime": "5"},
+                        {"orderId": "o2", "orderStatus": "New", "updatedTime": "6"},
+                        {"orderId": "o3", "orderStatus": "New", "updatedTime": "1"}])
+    state.apply_wallet([{"accountType": "UNIFIED", "totalAvailableBalance": "900"}])
+
+    # Снимок сделан раньше исполнения o1, но позже изменения o3
+    state.load_snapshot(
+        wallet=[{"accountType": "UNIFIED", "totalAvailableBalance": "1000", "coin": []}],
+        orders=[{"orderId": "o1", "orderStatus": "New", "updatedTime": "4"},
+                {"orderId": "o3", "orderStatus": "PartiallyFilled", "updatedTime": "2"}]
+    )
+    orders = {o['orderId']: o['orderStatus'] for o in state.get_open_orders()['list']}
+    assert orders == {"o2": "New", "o3": "PartiallyFilled"}
+    assert state.get_wallet_balance()['list'][0]['totalAvailableBalance'] == "900"
+
+    # Следующие обновления применяются без накопления
+    state.apply_orders([{"orderId": "o2", "orderStatus": "Cancelled"}])
+    assert state._replay is None and [o['orderId'] for o in state.get_open_orders()['list']] == ["o3"]
+
+
+def test_failed_positions_request_keeps_state():
+    client = MagicMock()
+    client.get_wallet_balance.return_value = {'list': [{"accountType": "UNIFIED", "coin": []}]}
+    client.get_open_orders.return_value = {'list': []}
+    client.get_positions.side_effect = Exception("HTTP 503")
+    stream = AccountStream(API_KEY, API_SECRET, snapshot_loader=rest_account_snapshot(client))
+    stream.state.load_snapshot(wallet=[], orders=[],
+                               positions=[{"category": "linear", "symbol": "BTCUSDT", "size": "0.5"}])
+
+    # Ошибка REST не превращается в "позиций нет"
+    assert stream.reconcile() is False
+    assert len(stream.state.get_positions("linear")) == 1
+    client.get_positions.assert_called_once_with(category='linear', raise_on_error=True)
+
+
+def test_private_stream_reconciles_after_reconnect():
+    server = PrivateStandInServer()
+    url = server.start()
+    snapshots = []
+    executions = []
+
+    def loader():
+        snapshots.append(time.time())
+        # Снимок "загружается", пока поток присылает обновления этого соединения
+        assert wait_for(lambda: len(executions) >= len(snapshots))
+        return {
+            'wallet': [{"accountType": "UNIFIED", "totalAvailableBalance": "1000",
+                        "coin": [{"coin": "USDT", "walletBalance": "1000"}]}],
+            'orders': [{"orderId": "o1", "symbol": "BTCUSDT", "category": "spot", "orderStatus": "New",
+                        "updatedTime": "1"}],
+            'positions': []
+        }
+
+    stream = AccountStream(API_KEY, API_SECRET, url=url, snapshot_loader=loader,
+                           ping_interval=0.5, reconnect_delay=0.05)
+    stream.add_callback(lambda event: executions.append(event) if event['type'] == 'execution' else None)
+    stream.start()
+    try:
+        # Первое соединение: снимок и обновления, затем разрыв и повторная сверка
+        assert wait_for(lambda: server.connections >= 2 and len(snapshots) >= 2)
+        assert server.auth_ok >= 2
+        assert wait_for(lambda: stream.is_ready and
+                        stream.state.get_wallet_balance()['list'][0]['totalAvailableBalance'] == "900")
+
+        orders = stream.state.get_open_orders(category="spot")['list']
+        assert [o['orderId'] for o in orders] == ["o2"]
+        assert stream.state.get_executions()[0]['execId'] == "e1"
+    finally:
+        stream.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_account_state_orders_and_wallet_merge()
+    test_snapshot_replays_updates_received_during_fetch()
+    test_failed_positions_request_keeps_state()
+    print("✅ Локальное состояние счета обновляется корректно")
+    test_private_stream_reconciles_after_reconnect()
+    print("✅ Приватный поток авторизуется и сверяется после переподключения")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест кэша результатов анализа: повторный вызов на том же окне не пересчитывает
+признаки и предсказание, новая закрытая свеча и переобучение модели сбрасывают результат
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.strategies.adaptive_ml import AdaptiveMLStrategy
+from src.strategies.analysis_cache import AnalysisCache, last_closed_timestamp
+from src.strategies.features import FEATURE_SCHEMA_VERSION
+from src.strategies import model_registry
+from src.strategies.model_registry import ModelRegistry
+
+STEP = 14_400_000
+
+
+def make_klines(last_ts, count=60):
+    return [{'timestamp': last_ts - i * STEP, 'open': 100.0, 'high': 101.0, 'low': 99.0,
+             'close': 100.0 + i % 5, 'volume': 10.0} for i in range(count)]
+
+
+def make_strategy(model_path):
+    config = {'analysis_cache_size': 16, 'streaming_features': False}
+    strategy = AdaptiveMLStrategy('adaptive_ml', config, None, MagicMock(), None,
+                                  model_path=model_path, load_existing=False)
+    strategy.extract_features = MagicMock(return_value=[1.0, 0.0, 0.0])
+    strategy.regime_detector = MagicMock()
+    strategy.regime_detector.detect_regime.return_value = {'regime': 'sideways'}
+    strategy.predict_signals = MagicMock(
+        side_effect=lambda features, regimes: {s: {'signal': 'BUY', 'confidence': 0.7} for s in features})
+    strategy.compile_model = MagicMock(return_value=None)
+    return strategy
+
+
+def fit_model():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(60, 3))
+    y = np.where(X[:, 0] > 0, 1, -1)
+    scaler = StandardScaler().fit(X)
+    return RandomForestClassifier(n_estimators=5, random_state=0).fit(scaler.transform(X), y), scaler
+
+
+def test_lru_eviction_and_keys():
+    cache = AnalysisCache(max_entries=2)
+    keys = [('A', '4h', 1, None), ('B', '4h', 1, None), ('C', '4h', 1, None)]
+    for key in keys:
+        cache.put(key, {'signal': 'BUY'})
+    assert cache.get(keys[0]) is None and cache.get(keys[2]) == {'signal': 'BUY'}
+    assert cache.evictions == 1 and len(cache) == 2
+
+    # Новая свеча символа вытесняет прежний результат
+    cache.put(('C', '4h', 2, None), {'signal': 'SELL'})
+    assert cache.get(keys[2]) is None and len(cache) == 2
+
+    # Время закрытой свечи: явное или предпоследняя свеча окна
+    klines = make_klines(10 * STEP)
+    assert last_closed_timestamp({'klines': klines}) == 9 * STEP
+    assert last_closed_timestamp({'klines': klines, 'last_closed_ts': 5}) == 5
+    assert AnalysisCache.make_key({'symbol': 'A', 'klines': klines[:1]}, None) is None
+
+
+def test_strategy_reuses_results_until_candle_or_model_changes(tmp_path):
+    strategy = make_strategy(tmp_path)
+    market_data = {'symbol': 'BTCUSDT', 'timeframe': '4h', 'klines': make_klines(100 * STEP),
+                   'current_price': 100.0}
+
+    first = strategy.analyze_market(market_data)
+    # Незакрытая свеча изменилась, закрытые - нет
+    market_data['klines'][0]['close'] = 123.0
+    second = strategy.analyze_market(dict(market_data))
+    assert first == second == {'signal': 'BUY', 'confidence': 0.7}
+    assert strategy.predict_signals.call_count == 1
+    assert strategy.extract_features.call_count == 1
+    assert strategy.db_manager.log_analysis.call_count == 1
+
+    # Закрылась новая свеча
+    market_data['klines'] = make_klines(101 * STEP)
+    strategy.analyze_market(market_data)
+    assert strategy.predict_signals.call_count == 2
+
+    # Переобучение модели символа сбрасывает результат
+    model, scaler = fit_model()
+    strategy.apply_trained_model('BTCUSDT', model, scaler, {'accuracy': 0.6})
+    assert len(strategy.analysis_cache) == 0
+    strategy.analyze_market(market_data)
+    strategy.analyze_market(market_data)
+    assert strategy.predict_signals.call_count == 3
+
+    stats = strategy.analysis_cache.get_stats()
+    assert stats['hits'] == 2 and stats['misses'] == 3 and stats['invalidations'] == 1
+
+
+def test_retrain_in_another_process_is_analyzed_again(tmp_path):
+    strategy = make_strategy(tmp_path)
+    market_data = {'symbol': 'BTCUSDT', 'timeframe': '4h', 'klines': make_klines(100 * STEP),
+                   'current_price': 100.0}
+    strategy.analyze_market(market_data)
+    # Проверка пропуска в загрузке свечей не меняет счетчики кэша
+    assert strategy.is_analyzed('BTCUSDT', '4h', 99 * STEP)
+    assert not strategy.is_analyzed('BTCUSDT', '4h', 100 * STEP)
+    assert strategy.analysis_cache.get_stats()['hits'] == 0
+
+    # Процесс обучения записывает модель в тот же каталог реестра
+    trainer = ModelRegistry(strategy.registry.root_path, schema_version=FEATURE_SCHEMA_VERSION)
+    model, scaler = fit_model()
+    trainer.put('BTCUSDT', model, scaler, {'accuracy': 0.6})
+    # Изменения другого процесса видны не позже RACY_MTIME_NS
+    fake_time = MagicMock(time=time.time, time_ns=lambda: time.time_ns() + ModelRegistry.RACY_MTIME_NS)
+    with patch.object(model_registry, 'time', fake_time):
+        assert not strategy.is_analyzed('BTCUSDT', '4h', 99 * STEP)
+    strategy.analyze_market(market_data)
+    assert strategy.predict_signals.call_count == 2
+    assert strategy.is_analyzed('BTCUSDT', '4h', 99 * STEP)
+
+
+if __name__ == "__main__":
+    test_lru_eviction_and_keys()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_strategy_reuses_results_until_candle_or_model_changes(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_retrain_in_another_process_is_analyzed_again(Path(tmp))
+    print("✅ Кэш результатов анализа работает")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест таблицы ml_analysis: типизированные колонки и признаки float32, перенос
+прежней таблицы, свертка старых записей в почасовые агрегаты порциями
+"""
+
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.database.db_manager import DatabaseManager
+
+
+def test_typed_analysis_rows(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'bot.db'))
+    # Запись стратегии: сигнал во вложенном prediction
+    db.log_analysis({
+        'symbol': 'BTCUSDT', 'timeframe': '4h', 'current_price': 65000.0,
+        'features': [65000.0, 0.01, -0.02, 55.5],
+        'regime': {'regime': 'sideways', 'confidence': 0.7, 'volatility': 1.5, 'trend_strength': 0.2},
+        'prediction': {'signal': 'BUY', 'confidence': 0.8, 'model_used': True},
+        'execution_time_ms': 3.5
+    })
+    assert db.flush()
+
+    [row] = db.get_analysis_history('BTCUSDT')
+    assert row['signal'] == 'BUY' and row['confidence'] == 0.8 and row['model_used'] == 1
+    assert row['regime'] == 'sideways' and row['volatility'] == 1.5 and row['feature_count'] == 4
+    assert row['features'] == [65000.0, 0.009999999776482582, -0.019999999552965164, 55.5]
+
+    with db.read_connection('test') as conn:
+        indexes = [r[1] for r in conn.execute("PRAGMA index_list(ml_analysis)")]
+    assert 'idx_ml_analysis_symbol_timestamp' in indexes
+    db.close()
+
+
+def test_legacy_table_is_preserved(tmp_path):
+    db_path = tmp_path / 'bot.db'
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("CREATE TABLE ml_analysis (id INTEGER PRIMARY KEY, symbol TEXT, features TEXT, "
+                     "regime TEXT, prediction TEXT, confidence REAL, signal TEXT)")
+        conn.execute("INSERT INTO ml_analysis (symbol, prediction) VALUES ('BTCUSDT', '{}')")
+
+    db = DatabaseManager(str(db_path))
+    with db.read_connection('test') as conn:
+        assert conn.execute("SELECT COUNT(*) FROM ml_analysis_legacy").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM ml_analysis").fetchone()[0] == 0
+    db.close()
+
+
+def test_retention_rolls_up_in_batches(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'bot.db'))
+    with db.get_connection() as conn:
+        rows = [(f'2020-01-01 {hour:02d}:{minute:02d}:00', 'BTCUSDT', 100.0 + minute, signal, 0.5 + minute / 100)
+                for hour in (10, 11) for minute in range(30) for signal in ('BUY', 'SELL', None)]
+        conn.executemany("INSERT INTO ml_analysis (timestamp, symbol, current_price, signal, confidence) "
+                         "VALUES (?, ?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO system_logs (timestamp, level, component, action) VALUES (?, ?, ?, ?)",
+                         [('2020-01-01 10:00:00', 'INFO', 'TEST', 'old')] * 7)
+        conn.commit()
+    db.log_analysis({'symbol': 'BTCUSDT', 'current_price': 1.0, 'prediction': {'signal': 'BUY'}})
+    db.log_system_action('INFO', 'TEST', 'fresh')
+    assert db.flush()
+
+    # Порции по 50 записей: 180 старых записей анализа удаляются за несколько транзакций
+    removed = db.apply_retention(retention_days=30, batch_size=50)
+    assert removed == {'ml_analysis': 180, 'system_logs': 7}
+
+    with db.read_connection('test') as conn:
+        assert conn.execute("SELECT COUNT(*) FROM ml_analysis").fetchone()[0] == 1
+        hourly = [dict(r) for r in conn.execute("SELECT * FROM ml_analysis_hourly ORDER BY hour")]
+        logs = [dict(r) for r in conn.execute("SELECT * FROM system_logs_hourly")]
+
+    assert [h['hour'] for h in hourly] == ['2020-01-01 10:00:00', '2020-01-01 11:00:00']
+    for h in hourly:
+        assert h['samples'] == 90 and h['buy_signals'] == 30 and h['sell_signals'] == 30
+        assert h['price_min'] == 100.0 and h['price_max'] == 129.0
+        assert abs(h['confidence_sum'] - sum(3 * (0.5 + m / 100) for m in range(30))) < 1e-9
+    assert logs == [{'hour': '2020-01-01 10:00:00', 'level': 'INFO', 'component': 'TEST',
+                     'entries': 7, 'execution_time_sum': 0.0}]
+    db.close()
+
+
+if __name__ == "__main__":
+    for test in (test_typed_analysis_rows, test_legacy_table_is_preserved, test_retention_rolls_up_in_batches):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Таблица анализа и очистка по сроку хранения работают")
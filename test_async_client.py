@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест асинхронного клиента на подмененной HTTP сессии: подпись ровно той строки
+запроса, которая отправлена, обратная связь по лимитам, пересинхронизация часов
+и параллельная загрузка свечей с изоляцией ошибок
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.api.async_bybit_client import AsyncBybitClient
+from src.api.bybit_client import generate_signature
+
+
+class FakeResponse:
+    def __init__(self, data, headers=None):
+        self.data = data
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self, content_type=None):
+        return self.data
+
+
+class FakeSession:
+    """Сессия aiohttp: ответы выбираются обработчиком по пути запроса"""
+
+    closed = False
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append(('GET', url, headers or {}))
+        return self.handler('GET', url, headers or {})
+
+    def post(self, url, data=None, headers=None, **kwargs):
+        self.requests.append(('POST', url, headers or {}))
+        return self.handler('POST', url, headers or {}, data)
+
+    async def close(self):
+        self.closed = True
+
+
+def time_response():
+    return FakeResponse({'retCode': 0, 'result': {'timeSecond': '1700000000'}})
+
+
+def make_client(handler) -> AsyncBybitClient:
+    client = AsyncBybitClient('key', 'secret', testnet=True, max_concurrency=4)
+    client._session = FakeSession(handler)
+    client._semaphore = asyncio.Semaphore(client.max_concurrency)
+    return client
+
+
+def kline_row(ts):
+    return [str(ts), '1', '2', '0.5', '1.5', '10', '15']
+
+
+def test_signed_request_and_limit_headers():
+    def handler(method, url, headers, data=None):
+        if url.endswith('/v5/market/time'):
+            return time_response()
+        return FakeResponse({'retCode': 0, 'result': {'list': [kline_row(2000), kline_row(1000)]}},
+                            {'X-Bapi-Limit-Status': '0', 'X-Bapi-Limit': '5'})
+
+    async def run():
+        client = make_client(handler)
+        klines = await client.get_kline('spot', 'BTCUSDT', '4h', limit=2, start=1000)
+        return client, klines
+
+    client, klines = asyncio.run(run())
+    assert [k['timestamp'] for k in klines] == [2000, 1000]
+    assert klines[0] == {'timestamp': 2000, 'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.5, 'volume': 10.0}
+
+    method, url, headers = client._session.requests[-1]
+    query = urlsplit(url).query
+    # Отправлена ровно подписанная строка запроса с нормализованным интервалом
+    assert query == 'category=spot&interval=240&limit=2&start=1000&symbol=BTCUSDT'
+    assert headers['X-BAPI-SIGN'] == generate_signature(
+        'key', 'secret', client.recv_window, headers['X-BAPI-TIMESTAMP'], query)
+
+    # Исчерпанный лимит эндпоинта учтен лимитером
+    assert client.rate_limiter.endpoint_buckets['/v5/market/kline'].tokens == 0
+    assert client.rate_limiter.try_acquire('/v5/market/kline') > 0
+
+
+def test_timestamp_error_resyncs_clock():
+    order_calls = []
+
+    def handler(method, url, headers, data=None):
+        if url.endswith('/v5/market/time'):
+            return time_response()
+        order_calls.append(data)
+        if len(order_calls) == 1:
+            return FakeResponse({'retCode': 10002, 'retMsg': 'timestamp error'})
+        return FakeResponse({'retCode': 0, 'result': {'orderId': '42'}})
+
+    async def run():
+        client = make_client(handler)
+        result = await client.place_order('spot', 'BTCUSDT', 'Buy', 'Market', '0.001')
+        return client, result
+
+    client, result = asyncio.run(run())
+    assert result == {'orderId': '42'}
+    assert len(order_calls) == 2 and order_calls[0] == order_calls[1]
+    time_requests = [r for r in client._session.requests if r[1].endswith('/v5/market/time')]
+    # Первичная синхронизация и принудительная после ошибки
+    assert len(time_requests) == 8
+    assert client.clock.synced
+
+
+def test_batch_isolates_failed_requests():
+    def handler(method, url, headers, data=None):
+        if url.endswith('/v5/market/time'):
+            return time_response()
+        if 'symbol=BAD' in url:
+            return FakeResponse({'retCode': 10001, 'retMsg': 'symbol invalid'})
+        return FakeResponse({'retCode': 0, 'result': {'list': [kline_row(1000)]}})
+
+    async def run():
+        client = make_client(handler)
+        batch = await client.get_klines_batch([
+            {'category': 'spot', 'symbol': 'BTCUSDT', 'interval': '240', 'limit': 1},
+            {'category': 'spot', 'symbol': 'BAD', 'interval': '240', 'limit': 1},
+        ])
+        bulk = await client.get_klines_bulk([('spot', 'ETHUSDT'), ('spot', 'BAD')], '4h', limit=1)
+        await client.close()
+        return client, batch, bulk
+
+    client, batch, bulk = asyncio.run(run())
+    assert batch[0][0]['timestamp'] == 1000 and batch[1] is None
+    assert bulk == {'ETHUSDT': [batch[0][0]], 'BAD': []}
+    assert client._session is None
+
+
+if __name__ == "__main__":
+    test_signed_request_and_limit_headers()
+    test_timestamp_error_resyncs_clock()
+    test_batch_isolates_failed_requests()
+    print("✅ Асинхронный клиент Bybit работает")
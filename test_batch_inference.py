@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест пакетного предсказания: один predict_proba на модель, сигналы совпадают
+с поштучным предсказанием, метки классов (-1/0/1) отображаются верно
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.strategies.adaptive_ml import AdaptiveMLStrategy
+
+
+class CountingModel:
+    """Обертка модели с подсчетом вызовов predict_proba"""
+
+    calls = 0
+
+    def __init__(self, model):
+        self.model = model
+        self.classes_ = model.classes_
+
+    def predict(self, X):
+        return self.model.predict(X)
+
+    def predict_proba(self, X):
+        CountingModel.calls += 1
+        return self.model.predict_proba(X)
+
+
+def make_strategy(model_path):
+    config = {'use_market_regime': False, 'compiled_inference': True, 'confidence_threshold': 0.0}
+    return AdaptiveMLStrategy('adaptive_ml', config, None, None, None, model_path=model_path, load_existing=False)
+
+
+def fit(seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(300, 12))
+    y = np.where(X[:, 1] > 0.3, 1, np.where(X[:, 1] < -0.3, -1, 0))
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=20, random_state=seed).fit(scaler.transform(X), y)
+    return CountingModel(model), scaler
+
+
+def test_batch_matches_single(tmp_path):
+    strategy = make_strategy(tmp_path)
+    shared_model, shared_scaler = fit(1)
+    for i in range(3):
+        strategy.registry.put(f"SYM{i}USDT", shared_model, shared_scaler, {'accuracy': 0.5})
+    strategy.registry.put("OTHERUSDT", *fit(2), {'accuracy': 0.5})
+
+    rng = np.random.default_rng(3)
+    features = {symbol: rng.normal(size=12).tolist() for symbol in strategy.registry.symbols()}
+    features["NOMODELUSDT"] = [100.0, 0.01, 0.02, 55.0]
+
+    CountingModel.calls = 0
+    batch = strategy.predict_signals(features)
+    # Три символа с общей моделью - один вызов, плюс отдельная модель
+    assert CountingModel.calls == 2
+    assert batch["NOMODELUSDT"]['model_used'] is False
+
+    for symbol in strategy.registry.symbols():
+        artifact = strategy.registry.get(symbol)
+        X = artifact['scaler'].transform([features[symbol]])
+        expected_class = int(artifact['model'].predict(X)[0])
+        expected_signal = {1: 'BUY', -1: 'SELL'}.get(expected_class)
+        assert batch[symbol]['signal'] == expected_signal
+        assert batch[symbol]['confidence'] == artifact['model'].predict_proba(X)[0].max()
+        assert strategy.predict_signal(symbol, features[symbol], {}) == batch[symbol]
+
+
+def test_sell_label_mapping(tmp_path):
+    strategy = make_strategy(tmp_path)
+    model, scaler = fit(4)
+    strategy.registry.put("BTCUSDT", model, scaler, {'accuracy': 0.5})
+
+    # Сильно отрицательное изменение цены - класс -1 (SELL) модели, обученной по истории
+    features = np.zeros(12)
+    features[1] = -3.0
+    prediction = strategy.predict_signal("BTCUSDT", scaler.inverse_transform([features])[0].tolist(), {})
+    assert prediction['signal'] == 'SELL' and prediction['model_used']
+
+    # Класс 2 модели, обученной по сделкам, тоже SELL; уверенность - вероятность класса
+    prediction = strategy._model_prediction(2, 0.8, {})
+    assert prediction['signal'] == 'SELL' and prediction['confidence'] == 0.8
+    assert strategy._model_prediction(0, 0.9, {})['signal'] is None
+
+
+if __name__ == "__main__":
+    for test in (test_batch_matches_single, test_sell_label_mapping):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Пакетное предсказание совпадает с поштучным")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест фоновой пакетной записи в SQLite: журналы не блокируют вызывающий поток,
+фиксируются группами, log_trade не взаимоблокируется с log_system_action
+"""
+
+import sqlite3
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.database.batch_writer import BatchWriter
+from src.database.db_manager import DatabaseManager
+
+
+def count(db_path, table):
+    with sqlite3.connect(str(db_path)) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_group_commit_from_threads(tmp_path):
+    db_path = tmp_path / 'bot.db'
+    db = DatabaseManager(str(db_path))
+
+    def produce(worker):
+        for i in range(250):
+            db.log_system_action('INFO', 'TEST', f'action {worker}-{i}', {'i': i})
+
+    threads = [threading.Thread(target=produce, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Сделка пишет две таблицы; раньше второй вызов ждал ту же блокировку
+    finished = threading.Event()
+    threading.Thread(target=lambda: (db.log_trade({'symbol': 'BTCUSDT', 'side': 'Buy', 'size': 1}),
+                                     finished.set()), daemon=True).start()
+    assert finished.wait(5), "log_trade заблокировался"
+
+    assert db.flush()
+    assert count(db_path, 'system_logs') == 1001
+    assert count(db_path, 'trades') == 1
+    stats = db.writer.get_stats()
+    assert stats['written'] == 1002 and stats['batches'] < 1002 and stats['dropped'] == 0
+
+    with sqlite3.connect(str(db_path)) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+    # После остановки писателя записи идут напрямую
+    db.close()
+    db.log_system_action('INFO', 'TEST', 'after close')
+    assert count(db_path, 'system_logs') == 1002
+
+
+def test_bad_operation_does_not_lose_batch(tmp_path):
+    db_path = tmp_path / 'bot.db'
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("CREATE TABLE items (value INTEGER NOT NULL)")
+
+    writer = BatchWriter(db_path, max_queue=100)
+    writer.submit("INSERT INTO items (value) VALUES (?)", (1,))
+    writer.submit("INSERT INTO items (value) VALUES (?)", (None,))  # нарушение NOT NULL
+    writer.submit("INSERT INTO items (value) VALUES (?)", (3,))
+    assert writer.flush()
+    writer.close()
+
+    assert count(db_path, 'items') == 2
+    assert writer.get_stats()['errors'] == 1
+    assert not writer.submit("INSERT INTO items (value) VALUES (?)", (4,))
+
+
+def test_trade_survives_stalled_writer(tmp_path):
+    db_path = tmp_path / 'bot.db'
+    db = DatabaseManager(str(db_path))
+
+    # Поток-писатель аварийно завершился, очередь заполнена
+    db.writer._queue.put(None)
+    db.writer._thread.join(5)
+    while db.writer.submit("SELECT 1", ()):
+        pass
+
+    # Сделка не теряется: после ожидания места в очереди пишется напрямую
+    db.log_trade({'symbol': 'BTCUSDT', 'side': 'Buy', 'size': 1})
+    assert count(db_path, 'trades') == 1
+
+    # Остановка не зависает на полной очереди
+    closed = threading.Event()
+    threading.Thread(target=lambda: (db.close(), closed.set()), daemon=True).start()
+    assert closed.wait(15), "close() завис"
+
+
+if __name__ == "__main__":
+    for test in (test_group_commit_from_threads, test_bad_operation_does_not_lose_batch,
+                 test_trade_survives_stalled_writer):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Пакетная запись в БД работает без блокировок")
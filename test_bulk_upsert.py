@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест пакетного upsert состояния: полное обновление ~600 символов - одна
+транзакция, неизменившиеся строки пропускаются, исчезнувшие удаляются
+"""
+
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.database.db_manager import DatabaseManager
+
+
+def make_symbols(count, tick_size=0.01):
+    return [{'symbol': f'SYM{i}USDT', 'category': 'spot', 'baseCoin': f'SYM{i}', 'quoteCoin': 'USDT',
+             'priceScale': 2, 'tickSize': tick_size, 'status': 'Trading'} for i in range(count)]
+
+
+def trace_statements(db):
+    statements = []
+    db.pool.acquire().set_trace_callback(statements.append)
+    return statements
+
+
+def test_symbols_refresh_is_one_transaction(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'bot.db'))
+    statements = trace_statements(db)
+
+    stats = db.upsert_available_symbols(make_symbols(600))
+    assert stats == {'written': 600, 'unchanged': 0, 'removed': 0}
+    assert sum(1 for sql in statements if sql.strip().upper() == 'COMMIT') == 1
+
+    # Повтор без изменений ничего не пишет
+    statements.clear()
+    assert db.upsert_available_symbols(make_symbols(600)) == {'written': 0, 'unchanged': 600, 'removed': 0}
+    assert not any(sql.strip().upper().startswith(('INSERT', 'DELETE', 'COMMIT')) for sql in statements)
+
+    # Изменился один символ, два исчезли
+    symbols = make_symbols(598)
+    symbols[5]['tickSize'] = 0.001
+    assert db.upsert_available_symbols(symbols) == {'written': 1, 'unchanged': 597, 'removed': 2}
+    rows = db.get_available_symbols(limit=1000)
+    assert len(rows) == 598
+    assert next(row for row in rows if row['symbol'] == 'SYM5USDT')['tick_size'] == 0.001
+
+    # Новый экземпляр берет хэши из БД
+    db.close()
+    reopened = DatabaseManager(str(tmp_path / 'bot.db'))
+    assert reopened.upsert_available_symbols(symbols)['written'] == 0
+    reopened.close()
+
+
+def test_changes_from_another_process(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'bot.db'))
+    other = DatabaseManager(str(tmp_path / 'bot.db'))
+    db.upsert_available_symbols(make_symbols(3))
+
+    # Другой процесс изменил строку, удалил строку и добавил категорию
+    other.upsert_available_symbols(make_symbols(3, tick_size=0.5)[:2])
+    other.upsert_available_symbols([{'symbol': 'BTCUSDT', 'category': 'linear'}], categories=['linear'])
+
+    assert db.upsert_available_symbols(make_symbols(3)) == {'written': 3, 'unchanged': 0, 'removed': 1}
+    rows = db.get_available_symbols(limit=1000)
+    assert sorted((row['symbol'], row['tick_size']) for row in rows) == [
+        ('SYM0USDT', 0.01), ('SYM1USDT', 0.01), ('SYM2USDT', 0.01)]
+
+    # Обновление одной категории не удаляет остальные
+    other.upsert_available_symbols([{'symbol': 'BTCUSDT', 'category': 'linear'}], categories=['linear'])
+    assert db.upsert_available_symbols(make_symbols(2), categories=['spot'])['removed'] == 1
+    assert sorted(row['symbol'] for row in db.get_available_symbols(limit=1000)) == [
+        'BTCUSDT', 'SYM0USDT', 'SYM1USDT']
+    other.close()
+    db.close()
+
+
+def test_price_history_and_positions(tmp_path):
+    db_path = tmp_path / 'bot.db'
+    # Прежняя база: дубликаты истории цен по символу
+    db = DatabaseManager(str(db_path))
+    db.close()
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("DROP INDEX idx_price_history_symbol_unique")
+        conn.executemany("INSERT INTO price_history (symbol, price) VALUES (?, ?)",
+                         [('BTCUSDT', 1.0), ('BTCUSDT', 2.0)])
+
+    db = DatabaseManager(str(db_path))
+    assert [row['price'] for row in db.get_price_history('BTCUSDT')] == [2.0]
+
+    assert db.upsert_price_history({'BTCUSDT': {'price': 3.0}, 'ETHUSDT': {'price': 4.0}})['written'] == 2
+    assert db.save_price_history('BTCUSDT', {'price': 3.0})
+    assert db.upsert_price_history({'BTCUSDT': {'price': 3.0}})['unchanged'] == 1
+    assert [row['price'] for row in db.get_price_history('BTCUSDT')] == [3.0]
+
+    orders = [{'symbol': 'BTCUSDT', 'category': 'spot', 'side': 'Buy', 'size': '0.1', 'orderId': str(i)}
+              for i in range(3)]
+    assert db.upsert_positions(orders)['written'] == 3
+    assert db.save_positions(orders[1:])
+    assert sorted(row['position_key'] for row in db.get_positions()) == ['1', '2']
+    db.close()
+
+
+if __name__ == "__main__":
+    for test in (test_symbols_refresh_is_one_transaction, test_changes_from_another_process,
+                 test_price_history_and_positions):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Пакетный upsert пропускает неизменившиеся строки")
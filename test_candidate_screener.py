@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест предварительного отбора символов: векторные фильтры по снимку тикеров,
+top_k кандидатов и обязательные символы с позициями
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from config import SCREENER_CONFIG
+from src.strategies.candidate_screener import CandidateScreener
+
+
+def make_ticker(symbol, turnover, change, bid=1.0, ask=1.001):
+    return {'symbol': symbol, 'turnover24h': str(turnover), 'price24hPcnt': str(change),
+            'bid1Price': str(bid), 'ask1Price': str(ask), 'lastPrice': str(bid)}
+
+
+def make_snapshot():
+    tickers = [make_ticker(f'C{i:03d}USDT', 1_000_000 + 10_000 * i, 0.01 * (i % 5)) for i in range(200)]
+    tickers += [
+        make_ticker('THINUSDT', 5_000, 0.02),                    # мал оборот
+        make_ticker('WIDEUSDT', 5_000_000, 0.02, 1.0, 1.1),      # широкий спред
+        make_ticker('PUMPUSDT', 9_000_000, 1.5),                 # аномальный рост
+        make_ticker('BTCUSDC', 90_000_000, 0.01),                # не входит в список
+        {'symbol': 'NOBOOKUSDT', 'turnover24h': '2000000', 'price24hPcnt': '0.01'},
+    ]
+    return tickers
+
+
+def test_filters_and_top_k():
+    tickers = make_snapshot()
+    universe = [t['symbol'] for t in tickers if t['symbol'].endswith('USDT')]
+    screener = CandidateScreener({'top_k': 10, 'min_turnover_24h': 100_000, 'max_spread': 0.01,
+                                  'max_abs_change_24h': 0.5, 'max_change_zscore': 4.0})
+
+    symbols = screener.screen(tickers, universe, position_symbols=['THINUSDT', 'ETHUSDT'])
+
+    # Символы с позициями идут первыми даже без прохождения фильтров
+    assert symbols[:2] == ['THINUSDT', 'ETHUSDT']
+    candidates = symbols[2:]
+    assert len(candidates) == 10
+    assert not {'WIDEUSDT', 'PUMPUSDT', 'BTCUSDC'} & set(candidates)
+
+    stats = screener.last_stats
+    assert stats['universe'] == 204 and stats['candidates'] == 10 and stats['positions'] == 2
+    assert stats['passed']['turnover'] == 203
+    assert stats['passed']['spread'] == 202
+    assert stats['passed']['change_zscore'] == 201   # NOBOOKUSDT без стакана проходит
+    assert set(stats['timings_ms']) == {'parse', 'filter', 'rank'}
+
+    # Ранжирование: больший оборот при одинаковом изменении - выше
+    same_change = [s for s in candidates if s.startswith('C') and int(s[1:4]) % 5 == 4]
+    assert same_change == sorted(same_change, reverse=True)
+
+
+def test_require_model():
+    tickers = make_snapshot()
+    with_model = {'C010USDT', 'C020USDT', 'PUMPUSDT'}
+    screener = CandidateScreener({'top_k': 50, 'require_model': True})
+    symbols = screener.screen(tickers, has_model=lambda symbol: symbol in with_model)
+    assert sorted(symbols) == ['C010USDT', 'C020USDT']
+    assert screener.screen([], ['C010USDT'], ['BTCUSDT']) == ['BTCUSDT']
+
+
+def test_defaults_come_from_config():
+    screener = CandidateScreener({'top_k': 5})
+    assert screener.config == {**SCREENER_CONFIG, 'top_k': 5}
+    assert CandidateScreener().config == SCREENER_CONFIG
+
+
+if __name__ == "__main__":
+    test_filters_and_top_k()
+    test_require_model()
+    test_defaults_come_from_config()
+    print("✅ Предварительный отбор символов работает")
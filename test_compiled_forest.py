@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест скомпилированного леса: вероятности совпадают со sklearn, формат
+переживает сохранение, реестр загружает лес без импорта scikit-learn
+"""
+
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, str(Path(__file__).parent))
+import src.strategies.adaptive_ml as adaptive_ml
+from src.strategies.adaptive_ml import AdaptiveMLStrategy
+from src.strategies.compiled_forest import CompiledForest, compile_forest
+from src.strategies.features import FEATURE_SCHEMA_VERSION
+from src.strategies.model_registry import ModelRegistry
+
+
+def fit(seed, n_estimators=50):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(loc=100.0, scale=20.0, size=(400, 12))
+    y = np.where(X[:, 1] > 110, 1, np.where(X[:, 1] < 90, -1, 0))
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=seed).fit(scaler.transform(X), y)
+    return model, scaler, rng.normal(loc=100.0, scale=25.0, size=(500, 12))
+
+
+def test_parity_with_sklearn():
+    model, scaler, X = fit(1)
+    compiled = compile_forest(model, scaler)
+
+    expected = model.predict_proba(scaler.transform(X))
+    assert np.allclose(compiled.predict_proba(X), expected, rtol=0, atol=1e-12)
+    assert np.array_equal(compiled.predict(X), model.predict(scaler.transform(X)))
+    assert list(compiled.classes_) == [-1, 0, 1]
+
+    # Без скейлера признаки подаются как есть
+    raw = compile_forest(model)
+    assert np.allclose(raw.predict_proba(scaler.transform(X)), expected, rtol=0, atol=1e-12)
+
+    restored = CompiledForest.from_bytes(compiled.to_bytes())
+    assert np.array_equal(restored.predict_proba(X), compiled.predict_proba(X))
+
+
+def test_unsupported_model():
+    try:
+        compile_forest(StandardScaler())
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("ожидалась ошибка ValueError")
+
+
+def test_strategy_uses_compiled_without_sklearn(tmp_path):
+    model, scaler, X = fit(2, n_estimators=20)
+    config = {'use_market_regime': False, 'confidence_threshold': 0.0, 'compiled_inference': True}
+    strategy = AdaptiveMLStrategy('adaptive_ml', config, None, None, None, model_path=tmp_path, load_existing=False)
+    strategy.apply_trained_model("BTCUSDT", model, scaler, {'accuracy': 0.7})
+    registry_path = strategy.registry.root_path
+    assert (registry_path / "BTCUSDT.forest.npz").exists()
+
+    # Новый реестр и отключенный sklearn: предсказание идет по скомпилированному лесу
+    strategy.registry = ModelRegistry(registry_path, schema_version=FEATURE_SCHEMA_VERSION)
+    saved = adaptive_ml.SKLEARN_AVAILABLE
+    adaptive_ml.SKLEARN_AVAILABLE = False
+    try:
+        predictions = strategy.predict_signals({"BTCUSDT": X[0].tolist()})
+    finally:
+        adaptive_ml.SKLEARN_AVAILABLE = saved
+    assert predictions["BTCUSDT"]['model_used']
+    assert strategy.registry.get_stats()['loads'] == 1  # pickle с моделью sklearn не распаковывался
+
+    # То же решение, что и у модели sklearn
+    strategy.compiled_inference = False
+    expected = strategy.predict_signals({"BTCUSDT": X[0].tolist()})["BTCUSDT"]
+    assert predictions["BTCUSDT"]['signal'] == expected['signal']
+    assert abs(predictions["BTCUSDT"]['confidence'] - expected['confidence']) < 1e-12
+
+    # Отдельный процесс: реестр и лес загружаются без импорта sklearn
+    code = (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from src.strategies.model_registry import ModelRegistry\n"
+        "forest = ModelRegistry(sys.argv[2], schema_version=%d).get_compiled('BTCUSDT')\n"
+        "assert forest is not None and forest.predict_proba([[100.0] * 12]).shape == (1, 3)\n"
+        "assert 'sklearn' not in sys.modules\n" % FEATURE_SCHEMA_VERSION
+    )
+    subprocess.run([sys.executable, "-c", code, str(Path(__file__).parent), str(registry_path)], check=True)
+
+
+if __name__ == "__main__":
+    test_parity_with_sklearn()
+    test_unsupported_model()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_strategy_uses_compiled_without_sklearn(Path(tmp))
+    print("✅ Скомпилированный лес совпадает со sklearn")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест пула соединений DatabaseManager: соединения переиспользуются потоком,
+чтение не ждет открытую транзакцию записи, метрики считаются по методам
+"""
+
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.database.db_manager import DatabaseManager
+
+
+def test_reads_reuse_connection_and_skip_writer_lock(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'bot.db'))
+    db.log_trade({'symbol': 'BTCUSDT', 'side': 'Buy', 'size': 1})
+    assert db.flush()
+
+    for _ in range(20):
+        assert len(db.get_recent_trades()) == 1
+        db.get_positions()
+        db.get_available_symbols()
+    assert db.read_pool.opened == 1
+
+    # Открытая транзакция записи не блокирует читателя и не видна ему
+    writer = sqlite3.connect(str(tmp_path / 'bot.db'), isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO trades (symbol, side, order_type, quantity, status) "
+                   "VALUES ('ETHUSDT', 'Sell', 'Market', 1, 'Executed')")
+    start_time = time.perf_counter()
+    trades = db.get_recent_trades()
+    assert time.perf_counter() - start_time < 1.0
+    assert [trade['symbol'] for trade in trades] == ['BTCUSDT']
+    writer.execute("COMMIT")
+    writer.close()
+    assert len(db.get_recent_trades()) == 2
+
+    # Соединение читателя не позволяет писать
+    try:
+        with db.read_connection('test') as conn:
+            conn.execute("DELETE FROM trades")
+    except sqlite3.Error:
+        pass
+    else:
+        raise AssertionError("ожидалась ошибка записи через соединение только для чтения")
+
+    stats = db.get_query_stats()
+    trades_stats = stats['queries']['get_recent_trades']
+    assert trades_stats['count'] == 22 and trades_stats['errors'] == 0
+    assert sum(trades_stats['histogram'].values()) == 22
+    assert stats['queries']['test']['errors'] == 1
+    db.close()
+
+
+def test_thread_connections_are_reaped(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'bot.db'))
+
+    def poll():
+        db.get_recent_trades()
+
+    for _ in range(3):
+        thread = threading.Thread(target=poll)
+        thread.start()
+        thread.join()
+    db.get_recent_trades()
+
+    # Соединения завершившихся потоков закрываются при открытии нового
+    assert db.read_pool.opened == 4 and db.read_pool.size == 1
+    db.close()
+    assert db.read_pool.size == 0
+
+
+if __name__ == "__main__":
+    for test in (test_reads_reuse_connection_and_skip_writer_lock, test_thread_connections_are_reaped):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Пул соединений и метрики запросов работают")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест планировщика торгового потока на подмененных часах: выравнивание по закрытию
+свечи, сетка периодических задач, перерасход времени и внеочередной запуск
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.strategy.cycle_scheduler import CycleScheduler
+
+CANDLE = 4 * 3600
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_aligned_and_periodic_deadlines():
+    clock = FakeClock(100 * CANDLE + 1000)
+    scheduler = CycleScheduler(clock)
+    scheduler.add_task('account', 5)
+    scheduler.add_task('analysis', CANDLE, align=True, offset=15)
+
+    # Первый запуск - сразу, в порядке добавления
+    assert scheduler.due() == ['account', 'analysis']
+    started = clock.now
+    clock.now += 2
+    scheduler.complete('account', started)
+    scheduler.complete('analysis', started)
+
+    # Анализ - через 15 с после закрытия текущей свечи
+    assert scheduler.get_task('analysis').next_due == 101 * CANDLE + 15
+    # Баланс держит сетку от планового срока, а не от окончания запуска
+    assert scheduler.get_task('account').next_due == started + 5
+    assert scheduler.due() == []
+    assert scheduler.time_until_next() == 3
+
+    clock.now = 101 * CANDLE + 15
+    assert 'analysis' in scheduler.due()
+
+
+def test_overrun_backpressure_and_recovery():
+    clock = FakeClock(1000.0)
+    scheduler = CycleScheduler(clock)
+    scheduler.add_task('account', 5, max_backoff=4)
+
+    # Запуск на 12 с: пропущенные сроки не выполняются подряд, период удваивается
+    started = clock.now
+    clock.now += 12
+    scheduler.complete('account', started)
+    task = scheduler.get_task('account')
+    assert task.overruns == 1 and task.skipped == 2 and task.backoff == 2
+    assert task.next_due == clock.now + 10
+    assert scheduler.due() == []
+
+    # Повторный перерасход ограничен max_backoff
+    clock.now = task.next_due
+    started = clock.now
+    clock.now += 30
+    scheduler.complete('account', started)
+    assert task.backoff == 4 and task.overruns == 2
+
+    # Быстрые запуски возвращают исходный период
+    for _ in range(2):
+        clock.now = task.next_due
+        started = clock.now
+        clock.now += 1
+        scheduler.complete('account', started)
+    assert task.backoff == 1
+    assert task.next_due == started + 5
+
+    stats = scheduler.get_stats()['account']
+    assert stats['runs'] == 4 and stats['overruns'] == 2 and stats['max_ms'] == 30000.0
+
+
+def test_failure_retry_and_trigger():
+    clock = FakeClock(100 * CANDLE + 100)
+    scheduler = CycleScheduler(clock)
+    scheduler.add_task('analysis', CANDLE, align=True, offset=15, retry_delay=10, run_now=False)
+    task = scheduler.get_task('analysis')
+    assert task.next_due == 101 * CANDLE + 15
+
+    # Внеочередной запуск (включение торговли) и отложенный повтор
+    scheduler.trigger('analysis')
+    assert scheduler.wait(max_wait=0.01) is True
+    started = clock.now
+    scheduler.complete('analysis', started, failed=True)
+    assert task.failures == 1 and task.next_due == clock.now + 10
+
+    scheduler.complete('analysis', clock.now)
+    scheduler.trigger('analysis', delay=60)
+    assert task.next_due == clock.now + 60
+    # Более ранний срок не откладывается
+    scheduler.trigger('analysis', delay=600)
+    assert task.next_due == clock.now + 60
+
+
+if __name__ == "__main__":
+    test_aligned_and_periodic_deadlines()
+    test_overrun_backpressure_and_recovery()
+    test_failure_retry_and_trigger()
+    print("✅ Планировщик торгового потока работает")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест пакетной матрицы признаков: каждая строка должна совпадать бит в бит
+с AdaptiveMLStrategy.extract_features для соответствующего окна
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.strategies.adaptive_ml import AdaptiveMLStrategy
+from src.strategies.features import build_feature_matrix
+
+
+def make_strategy(use_technical_indicators=True, feature_window=50):
+    # Без загрузки моделей с диска: нужны только параметры извлечения признаков
+    config = {'use_technical_indicators': use_technical_indicators, 'feature_window': feature_window}
+    return AdaptiveMLStrategy('adaptive_ml', config, None, None, None, load_existing=False)
+
+
+def make_klines(count, scale, seed):
+    rng = np.random.default_rng(seed)
+    closes = scale * np.exp(np.cumsum(rng.normal(0, 0.02, count)))
+    volumes = rng.integers(0, 4, count) * rng.random(count) * 1000
+    closes[count // 3:count // 3 + 30] = closes[count // 3]  # участок без движения
+    return [{'open': c, 'high': c * 1.01, 'low': c * 0.99, 'close': c, 'volume': v}
+            for c, v in zip(closes.tolist(), volumes.tolist())]
+
+
+def assert_rows_match(strategy, klines):
+    window = strategy.feature_window
+    matrix = strategy.extract_features_matrix(klines, len(klines) - 1)
+    assert matrix.shape[0] == len(klines) - 1 - window
+    for j in range(window, len(klines) - 1):
+        expected = np.array(strategy.extract_features(klines[j - window:j]), dtype=np.float64)
+        assert np.array_equal(matrix[j - window], expected), f"строка {j - window} отличается"
+
+
+def test_matrix_matches_extract_features():
+    for seed, scale in enumerate((1e-5, 1.0, 65000.0)):
+        assert_rows_match(make_strategy(), make_klines(300, scale, seed))
+
+
+def test_matrix_without_indicators_and_short_windows():
+    klines = make_klines(120, 10.0, 7)
+    assert_rows_match(make_strategy(use_technical_indicators=False), klines)
+    # Окна короче периодов индикаторов: значения по умолчанию, как в extract_features
+    assert_rows_match(make_strategy(feature_window=12), klines)
+    assert_rows_match(make_strategy(feature_window=2), klines)
+
+
+def test_empty_result():
+    assert build_feature_matrix(make_klines(40, 1.0, 0), 50).shape[0] == 0
+
+
+if __name__ == "__main__":
+    test_matrix_matches_extract_features()
+    test_matrix_without_indicators_and_short_windows()
+    test_empty_result()
+    print("✅ Матрица признаков совпадает с extract_features")
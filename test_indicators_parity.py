@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест совпадения векторизованных индикаторов с прежней реализацией на циклах
+Эталонные функции ниже - исходный код TechnicalIndicators до векторизации
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.strategies import indicators
+from src.strategies.adaptive_ml import TechnicalIndicators
+from src.strategies.indicators import VectorizedIndicators
+
+
+# ---- Эталонная реализация ----
+
+def ref_sma(data, period):
+    if len(data) < period:
+        return []
+    return [sum(data[i - period + 1:i + 1]) / period for i in range(period - 1, len(data))]
+
+
+def ref_ema(data, period):
+    if len(data) < period:
+        return []
+    multiplier = 2 / (period + 1)
+    ema_values = [sum(data[:period]) / period]
+    for i in range(period, len(data)):
+        ema_values.append((data[i] * multiplier) + (ema_values[-1] * (1 - multiplier)))
+    return ema_values
+
+
+def ref_rsi(data, period=14):
+    if len(data) < period + 1:
+        return []
+    deltas = [data[i] - data[i-1] for i in range(1, len(data))]
+    gains = [delta if delta > 0 else 0 for delta in deltas]
+    losses = [-delta if delta < 0 else 0 for delta in deltas]
+    avg_gain = sum(gains[:period]) / period
+    avg_loss = sum(losses[:period]) / period
+    rsi_values = []
+    for i in range(period, len(gains)):
+        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+        if avg_loss == 0:
+            rsi_values.append(100)
+        else:
+            rsi_values.append(100 - (100 / (1 + avg_gain / avg_loss)))
+    return rsi_values
+
+
+def ref_macd(data, fast=12, slow=26, signal=9):
+    ema_fast = ref_ema(data, fast)
+    ema_slow = ref_ema(data, slow)
+    if len(ema_fast) < len(ema_slow):
+        ema_slow = ema_slow[len(ema_slow) - len(ema_fast):]
+    elif len(ema_slow) < len(ema_fast):
+        ema_fast = ema_fast[len(ema_fast) - len(ema_slow):]
+    macd_line = [ema_fast[i] - ema_slow[i] for i in range(len(ema_fast))]
+    signal_line = ref_ema(macd_line, signal)
+    histogram = []
+    if signal_line:
+        start_idx = len(macd_line) - len(signal_line)
+        histogram = [macd_line[start_idx + i] - signal_line[i] for i in range(len(signal_line))]
+    return {'macd': macd_line, 'signal': signal_line, 'histogram': histogram}
+
+
+def ref_bollinger(data, period=20, std_dev=2):
+    sma = ref_sma(data, period)
+    if not sma:
+        return {'upper': [], 'middle': [], 'lower': []}
+    upper, lower = [], []
+    for i in range(len(sma)):
+        std = np.std(data[i:i + period])
+        upper.append(sma[i] + std * std_dev)
+        lower.append(sma[i] - std * std_dev)
+    return {'upper': upper, 'middle': sma, 'lower': lower}
+
+
+# ---- Данные ----
+
+def series_cases():
+    rng = np.random.default_rng(42)
+    walk = (100 + np.cumsum(rng.normal(0, 1, 300))).tolist()
+    btc = (60000 * np.exp(np.cumsum(rng.normal(0, 0.01, 500)))).tolist()
+    return {
+        'walk': walk,
+        'btc': btc,
+        'flat': [5.0] * 60,                       # нулевая дисперсия, avg_loss == 0
+        'rising': [float(i) for i in range(1, 80)],
+        'ints': [int(x) for x in walk[:50]],      # целые цены из JSON
+        'short': walk[:10],
+        'empty': [],
+    }
+
+
+def assert_close(actual, expected, scale):
+    assert len(actual) == len(expected)
+    if expected:
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9 * scale)
+
+
+def check_all():
+    for name, data in series_cases().items():
+        scale = max([abs(x) for x in data], default=1.0)
+        for period in (5, 10, 20, 30):
+            assert_close(TechnicalIndicators.sma(data, period), ref_sma(data, period), scale)
+            assert_close(TechnicalIndicators.ema(data, period), ref_ema(data, period), scale)
+        for period in (2, 14):
+            assert_close(TechnicalIndicators.rsi(data, period), ref_rsi(data, period), 100)
+
+        macd, ref = TechnicalIndicators.macd(data), ref_macd(data)
+        for key in ('macd', 'signal', 'histogram'):
+            assert_close(macd[key], ref[key], scale)
+
+        bands, ref = TechnicalIndicators.bollinger_bands(data), ref_bollinger(data)
+        for key in ('upper', 'middle', 'lower'):
+            assert_close(bands[key], ref[key], scale)
+
+
+def test_parity_with_reference():
+    check_all()
+
+
+def test_parity_without_scipy():
+    saved = indicators.SCIPY_AVAILABLE
+    indicators.SCIPY_AVAILABLE = False
+    try:
+        check_all()
+    finally:
+        indicators.SCIPY_AVAILABLE = saved
+
+
+def test_api_returns_lists():
+    data = series_cases()['walk']
+    assert isinstance(TechnicalIndicators.sma(data, 10), list)
+    assert TechnicalIndicators.rsi(data[:5], 14) == []
+    assert TechnicalIndicators.macd(data[:20]) == {'macd': [], 'signal': [], 'histogram': []}
+    assert TechnicalIndicators.bollinger_bands(data[:5]) == {'upper': [], 'middle': [], 'lower': []}
+
+
+def test_batch_rows_match_single_series():
+    # Пачка окон (m, n) дает те же биты, что и расчет по каждому окну отдельно
+    data = np.asarray(series_cases()['btc'])
+    windows = np.lib.stride_tricks.sliding_window_view(data, 50)
+    batch_rsi = VectorizedIndicators.rsi(windows, 14)
+    batch_macd = VectorizedIndicators.macd(windows)['signal']
+    batch_bb = VectorizedIndicators.bollinger_bands(windows)['upper']
+    for i in (0, 7, len(windows) - 1):
+        assert np.array_equal(batch_rsi[i], VectorizedIndicators.rsi(windows[i], 14))
+        assert np.array_equal(batch_macd[i], VectorizedIndicators.macd(windows[i])['signal'])
+        assert np.array_equal(batch_bb[i], VectorizedIndicators.bollinger_bands(windows[i])['upper'])
+
+
+if __name__ == "__main__":
+    test_parity_with_reference()
+    test_parity_without_scipy()
+    test_api_returns_lists()
+    test_batch_rows_match_single_series()
+    print("✅ Векторизованные индикаторы совпадают с прежней реализацией")
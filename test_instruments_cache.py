@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест кэша инструментов: постраничная загрузка, TTL, сохранение в available_symbols,
+списки добавленных/исключенных символов для подписчиков
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.api.bybit_client import BybitClient
+from src.api.instruments_cache import InstrumentsCache
+from src.database.db_manager import DatabaseManager
+
+
+def spot(symbol, status='Trading'):
+    return {'symbol': symbol, 'baseCoin': symbol[:-4], 'quoteCoin': 'USDT', 'status': status,
+            'priceFilter': {'tickSize': '0.01'},
+            'lotSizeFilter': {'basePrecision': '0.0001', 'minOrderQty': '0.001', 'maxOrderQty': '100'}}
+
+
+def linear(symbol):
+    return {'symbol': symbol, 'baseCoin': symbol[:-4], 'quoteCoin': 'USDT', 'status': 'Trading',
+            'priceScale': '2', 'priceFilter': {'minPrice': '0.1', 'maxPrice': '1000000', 'tickSize': '0.1'},
+            'lotSizeFilter': {'qtyStep': '0.001', 'minOrderQty': '0.001', 'maxOrderQty': '500'},
+            'leverageFilter': {'minLeverage': '1', 'maxLeverage': '100', 'leverageStep': '0.01'}}
+
+
+class FakeClient(BybitClient):
+    """Ответы instruments-info по страницам без сетевых запросов"""
+
+    def __init__(self):
+        self.instruments = {'spot': [spot('BTCUSDT'), spot('ETHUSDT'), spot('OLDUSDT')],
+                            'linear': [linear(f'L{i}USDT') for i in range(5)]}
+        self.requests = []
+
+    def _make_request(self, method, endpoint, params=None, body=None):
+        self.requests.append(dict(params))
+        items = self.instruments[params['category']]
+        start = int(params.get('cursor') or 0)
+        page = items[start:start + 2]
+        cursor = str(start + 2) if start + 2 < len(items) else ''
+        return {'list': page, 'nextPageCursor': cursor}
+
+
+def test_cache_pagination_ttl_and_persistence(tmp_path):
+    client = FakeClient()
+    db = DatabaseManager(str(tmp_path / 'bot.db'))
+    cache = InstrumentsCache(client, db, ttl_seconds=3600)
+    diffs = []
+    cache.subscribe(diffs.append)
+
+    assert len(cache.get_instruments('spot')) == 3
+    # spot: 2 страницы, linear: 3 страницы
+    assert len(client.requests) == 5
+    assert cache.symbols('linear') == [f'L{i}USDT' for i in range(5)]
+
+    # Повторные обращения не идут в API до истечения TTL
+    for _ in range(10):
+        cache.get_instruments('spot')
+        cache.ensure_fresh()
+    assert len(client.requests) == 5
+
+    assert cache.tick_size('BTCUSDT') == 0.01 and cache.qty_step('BTCUSDT') == 0.0001
+    assert cache.min_order_qty('L1USDT', 'linear') == 0.001
+    assert cache.categories_for('BTCUSDT') == ['spot'] and cache.get('NOPEUSDT') is None
+    assert len(db.get_available_symbols()) == 8
+    assert diffs == []  # первая загрузка без базы сравнения
+
+    # Листинг и делистинг
+    client.instruments['spot'] = [spot('BTCUSDT'), spot('ETHUSDT'), spot('OLDUSDT', 'Closed'), spot('NEWUSDT')]
+    cache.refresh()
+    assert diffs == [{'category': 'spot', 'listed': ['NEWUSDT'], 'delisted': ['OLDUSDT']}]
+    assert 'OLDUSDT' not in cache.symbols('spot')
+    assert {row['symbol'] for row in db.get_available_symbols('spot')} == {'BTCUSDT', 'ETHUSDT', 'OLDUSDT', 'NEWUSDT'}
+
+    # Новый процесс берет базу из БД: изменения видны относительно сохраненного списка
+    client.instruments['spot'] = [spot('BTCUSDT'), spot('NEWUSDT')]
+    restarted = InstrumentsCache(client, db)
+    assert restarted.symbols('spot') == ['BTCUSDT', 'ETHUSDT', 'NEWUSDT']
+    restarted_diffs = []
+    restarted.subscribe(restarted_diffs.append)
+    restarted.ensure_fresh()
+    assert restarted_diffs == [{'category': 'spot', 'listed': [], 'delisted': ['ETHUSDT']}]
+    db.close()
+
+
+def test_failed_fetch_keeps_previous_list():
+    client = FakeClient()
+    cache = InstrumentsCache(client, categories=('spot',))
+    cache.refresh()
+    client.instruments['spot'] = []
+    assert cache.refresh() == {}
+    assert cache.symbols('spot') == ['BTCUSDT', 'ETHUSDT', 'OLDUSDT']
+
+
+def test_persist_keeps_other_categories(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'bot.db'))
+    db.upsert_available_symbols([{'symbol': 'BTC-26DEC25', 'category': 'option'}])
+    cache = InstrumentsCache(FakeClient(), db, categories=('spot',))
+    cache.refresh()
+    assert {row['category'] for row in db.get_available_symbols()} == {'spot', 'option'}
+    db.close()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        test_cache_pagination_ttl_and_persistence(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_persist_keeps_other_categories(Path(tmp))
+    test_failed_fetch_keeps_previous_list()
+    print("✅ Кэш инструментов работает")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест колоночного архива свечей: дозапись, обновление последней свечи,
+вставка более ранних данных, бинарный поиск по диапазону и диапазоны
+без свечей, которые не запрашиваются повторно
+"""
+
+import asyncio
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.data.async_historical_loader import AsyncHistoricalDataLoader
+from src.data.kline_archive import KlineArchive
+
+STEP = 3_600_000
+
+
+def make_klines(first, count, price=1.0):
+    return [{'timestamp': (first + i) * STEP, 'open': price + i, 'high': price + i + 1,
+             'low': price + i - 1, 'close': price + i + 0.5, 'volume': 10.0 + i}
+            for i in range(count)]
+
+
+def test_append_update_and_range_queries():
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = KlineArchive(tmp)
+
+        # Данные новыми первыми (как в ответе API) - архив хранит по возрастанию
+        assert archive.write('BTCUSDT', '60', list(reversed(make_klines(100, 50)))) == 50
+        columns = archive.read('BTCUSDT', '60')
+        assert isinstance(columns['close'], np.memmap)  # чтение без копирования
+        assert np.all(np.diff(columns['timestamp']) == STEP)
+
+        # Перекрывающаяся дозапись: добавляются только новые, последняя свеча обновляется
+        update = make_klines(149, 11, price=1000.0)
+        assert archive.write('BTCUSDT', '60', update) == 10
+        assert archive.count('BTCUSDT', '60') == 60
+        assert archive.read('BTCUSDT', '60', 149 * STEP, 149 * STEP)['close'][0] == 1000.5
+
+        # Повторная запись уже известных данных ничего не меняет
+        assert archive.write('BTCUSDT', '60', make_klines(120, 10)) == 0
+
+        # Более ранняя история вставляется с сохранением сортировки
+        assert archive.write('BTCUSDT', '60', make_klines(90, 10)) == 10
+        ts = archive.read('BTCUSDT', '60')['timestamp']
+        assert len(ts) == 70 and ts[0] == 90 * STEP and np.all(np.diff(ts) == STEP)
+
+        # Бинарный поиск по включительному диапазону
+        window = archive.read('BTCUSDT', '60', 110 * STEP, 119 * STEP)
+        assert len(window['timestamp']) == 10
+        assert window['timestamp'][0] == 110 * STEP
+
+        klines = archive.read_klines('BTCUSDT', '60', limit=3)
+        assert [k['timestamp'] for k in klines] == [157 * STEP, 158 * STEP, 159 * STEP]
+        assert archive.series() == [('BTCUSDT', '60')]
+
+
+def test_uncommitted_tail_is_ignored():
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = KlineArchive(tmp)
+        archive.write('ETHUSDT', '240', make_klines(0, 5))
+
+        # Имитация прерванной записи: байты в файле есть, длина не зафиксирована
+        with open(archive.series_path('ETHUSDT', '240') / 'timestamp.bin', 'ab') as f:
+            f.write(np.array([999 * STEP], dtype='<i8').tobytes())
+        assert archive.count('ETHUSDT', '240') == 5
+
+        assert archive.write('ETHUSDT', '240', make_klines(5, 2)) == 2
+        assert archive.read('ETHUSDT', '240')['timestamp'][-1] == 6 * STEP
+
+
+def test_internal_gaps_are_refetched():
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = AsyncHistoricalDataLoader(data_cache_path=tmp)
+        archive = loader.archive
+        # Свечи 100..149 без 120..124 и 140
+        klines = [k for k in make_klines(100, 50)
+                  if not 120 * STEP <= k['timestamp'] <= 124 * STEP and k['timestamp'] != 140 * STEP]
+        archive.write('BTCUSDT', '60', klines)
+        assert archive.gaps('BTCUSDT', '60') == [(120 * STEP, 124 * STEP), (140 * STEP, 140 * STEP)]
+        assert archive.gaps('BTCUSDT', '60', 130 * STEP, 149 * STEP) == [(140 * STEP, 140 * STEP)]
+
+        def dt(n):
+            return datetime.fromtimestamp(n * STEP / 1000)
+
+        # Запрошенный диапазон внутри архива: догружаются только пропуски
+        assert loader._missing_ranges('BTCUSDT', '60', dt(110), dt(145)) == [
+            (dt(120), dt(124)), (dt(140), dt(140))]
+        assert loader._split_time_range(dt(140), dt(140), '60') == [(dt(140), dt(140))]
+
+        archive.write('BTCUSDT', '60', make_klines(120, 5) + make_klines(140, 1))
+        assert archive.gaps('BTCUSDT', '60') == []
+        assert loader._missing_ranges('BTCUSDT', '60', dt(110), dt(145)) == []
+
+
+def test_checked_ranges_are_not_refetched():
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = AsyncHistoricalDataLoader(data_cache_path=tmp)
+        # Биржа: листинг на свече 100, торгов не было на 120..124
+        exchange = [k for k in make_klines(100, 50) if not 120 * STEP <= k['timestamp'] <= 124 * STEP]
+        requests = []
+        failing = [True]
+
+        async def fetch_chunk(session, semaphore, symbol, interval, start_time, end_time):
+            requests.append((start_time, end_time))
+            if failing[0]:
+                return None
+            start_ms, end_ms = start_time.timestamp() * 1000, end_time.timestamp() * 1000
+            return [dict(k) for k in exchange if start_ms <= k['timestamp'] <= end_ms]
+
+        def dt(n):
+            return datetime.fromtimestamp(n * STEP / 1000)
+
+        def load(last):
+            return asyncio.run(loader.load_historical_data_bulk('BTCUSDT', '60', dt(50), dt(last)))
+
+        loader._fetch_chunk_data = fetch_chunk
+        # Ошибка запроса не считается подтверждением отсутствия свечей
+        assert load(149) == [] and len(requests) == 1
+        assert loader.archive.checked_ranges('BTCUSDT', '60') == []
+
+        failing[0] = False
+        assert len(load(149)) == 45 and len(requests) == 2
+        assert loader.archive.checked_ranges('BTCUSDT', '60') == [(50 * STEP, 149 * STEP)]
+
+        # До листинга и в пропуске торгов свечей нет: повторных запросов нет
+        assert loader._missing_ranges('BTCUSDT', '60', dt(50), dt(149)) == []
+        assert len(load(149)) == 45 and len(requests) == 2
+
+        # Свечи после последней в архиве по-прежнему догружаются
+        exchange.extend(make_klines(150, 2))
+        assert len(load(151)) == 47 and requests[-1] == (dt(149), dt(151))
+        assert loader.archive.checked_ranges('BTCUSDT', '60') == [(50 * STEP, 151 * STEP)]
+
+
+if __name__ == "__main__":
+    test_append_update_and_range_queries()
+    test_uncommitted_tail_is_ignored()
+    test_internal_gaps_are_refetched()
+    test_checked_ranges_are_not_refetched()
+    print("✅ Колоночный архив свечей работает корректно")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест инкрементального хранилища свечей на синтетической бирже
+Проверяет первичную загрузку окна, запрос только дельты и догрузку пропусков
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.api.kline_store import KlineStore, INTERVAL_MS
+
+STEP = INTERVAL_MS["240"]
+T0 = 1_700_000_000_000 - 1_700_000_000_000 % STEP
+
+
+class SyntheticExchange:
+    """Свечи 4h с ценой, равной номеру свечи; ответ как у get_kline (новые первыми)"""
+
+    def __init__(self, now_ms):
+        self.now_ms = now_ms
+        self.calls = []
+        self.missing = set()  # Свечи, которые биржа "потеряла" при первой выдаче
+
+    def get_kline(self, category, symbol, interval, limit=200, start=None, end=None):
+        self.calls.append({'limit': limit, 'start': start, 'end': end})
+        end = min(end if end is not None else self.now_ms, self.now_ms)
+        last = end - end % STEP
+        first = start if start is not None else last - (limit - 1) * STEP
+        klines = []
+        ts = first
+        while ts <= last:
+            if ts not in self.missing:
+                n = (ts - T0) // STEP
+                klines.append({'timestamp': ts, 'open': n, 'high': n, 'low': n, 'close': n, 'volume': 1.0})
+            ts += STEP
+        return list(reversed(klines[-limit:]))
+
+
+def test_delta_and_gap_fill():
+    exchange = SyntheticExchange(now_ms=T0 + 300 * STEP + 1000)
+    store = KlineStore(exchange.get_kline, window=200, now_ms=lambda: exchange.now_ms, max_staleness=3600)
+
+    # Первичная загрузка: одно полное окно, новые свечи первыми
+    exchange.missing = {T0 + 250 * STEP}
+    window = store.get_window('spot', 'BTCUSDT', '4h')
+    assert exchange.calls[-1] == {'limit': 200, 'start': None, 'end': None}
+    assert window[0]['timestamp'] == T0 + 300 * STEP
+    assert len(window) == 199  # одна свеча пропущена
+
+    # Пропуск догружается отдельным узким запросом
+    exchange.missing = set()
+    store.refresh('spot', 'BTCUSDT', '4h')
+    assert exchange.calls[-1]['start'] == T0 + 250 * STEP
+    assert exchange.calls[-1]['end'] == T0 + 250 * STEP
+    assert len(store.get_window('spot', 'BTCUSDT', '4h', refresh=False)) == 200
+
+    # Свеча не закрылась и данные свежие - запросов нет
+    calls = len(exchange.calls)
+    store.get_window('spot', 'BTCUSDT', '4h')
+    assert len(exchange.calls) == calls
+
+    # Новая свеча: запрашивается только дельта с последней закрытой
+    exchange.now_ms += STEP
+    window = store.get_window('spot', 'BTCUSDT', '4h')
+    delta = exchange.calls[-1]
+    assert delta['start'] == T0 + 300 * STEP and delta['limit'] <= 3
+    assert window[0]['timestamp'] == T0 + 301 * STEP
+    assert len(window) == 200  # окно скользит, старые свечи отбрасываются
+
+    # Итог сравнивается с полной загрузкой того же окна
+    full = exchange.get_kline('spot', 'BTCUSDT', '240', limit=200)
+    assert window == full
+    assert store.full_loads == 1 and store.gap_fills == 1
+
+
+def test_ws_kline_before_first_refresh():
+    exchange = SyntheticExchange(now_ms=T0 + 300 * STEP + 1000)
+    store = KlineStore(exchange.get_kline, window=200, now_ms=lambda: exchange.now_ms, max_staleness=3600)
+
+    # Свеча из WebSocket до первой REST загрузки не создает ряд
+    ws_kline = exchange.get_kline('spot', 'BTCUSDT', '240', limit=1)[0]
+    assert store.merge_ws_kline('spot', 'BTCUSDT', '4h', ws_kline) == 0
+    window = store.get_window('spot', 'BTCUSDT', '4h')
+    assert len(window) == 200 and store.full_loads == 1
+
+    # Ряд, созданный в обход REST загрузки, все равно загружается целиком
+    store.merge('spot', 'ETHUSDT', '4h', [ws_kline], mark_fresh=True)
+    exchange.now_ms += STEP
+    assert len(store.get_window('spot', 'ETHUSDT', '4h')) == 200
+    assert exchange.calls[-1]['limit'] == 200 and exchange.calls[-1]['start'] is None
+
+    # После загрузки свечи из WebSocket сливаются в окно
+    next_kline = dict(ws_kline, timestamp=T0 + 302 * STEP)
+    exchange.now_ms += STEP
+    assert store.merge_ws_kline('spot', 'BTCUSDT', '4h', next_kline) == 1
+
+
+if __name__ == "__main__":
+    test_delta_and_gap_fill()
+    test_ws_kline_before_first_refresh()
+    print("✅ Хранилище свечей загружает только дельту и догружает пропуски")
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест WebSocket потока рыночных данных на локальном сервере-заглушке
+Проверяет пакетную подписку, snapshot/delta тикеров, свечи, fan-out
+и повторную подписку после разрыва соединения
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import websockets
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.api.market_stream import MarketDataStream
+
+
+class StandInServer:
+    """Локальный сервер, имитирующий публичный WebSocket Bybit v5"""
+
+    def __init__(self, drop_first_connection: bool = False):
+        self.drop_first_connection = drop_first_connection
+        self.connections = 0
+        self.subscribe_requests = []  # (номер соединения, args)
+        self.pings = 0
+        self.port = None
+        self._loop = None
+        self._stop = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    async def _handler(self, ws, *args):
+        self.connections += 1
+        conn_no = self.connections
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg.get('op') == 'ping':
+                self.pings += 1
+                await ws.send(json.dumps({"success": True, "ret_msg": "pong", "op": "ping"}))
+                continue
+            if msg.get('op') != 'subscribe':
+                continue
+
+            self.subscribe_requests.append((conn_no, msg['args']))
+            await ws.send(json.dumps({"success": True, "ret_msg": "subscribe", "op": "subscribe"}))
+
+            for topic in msg['args']:
+                symbol = topic.split('.')[-1]
+                if topic.startswith('tickers.'):
+                    await ws.send(json.dumps({
+                        "topic": topic, "type": "snapshot", "ts": 1,
+                        "data": {"symbol": symbol, "lastPrice": "100", "volume24h": "5"}
+                    }))
+                    await ws.send(json.dumps({
+                        "topic": topic, "type": "delta", "ts": 2,
+                        "data": {"symbol": symbol, "lastPrice": str(100 + conn_no)}
+                    }))
+                elif topic.startswith('kline.'):
+                    await ws.send(json.dumps({
+                        "topic": topic, "type": "snapshot", "ts": 3,
+                        "data": [{"start": 1700000000000, "open": "1", "high": "2", "low": "0.5",
+                                  "close": "1.5", "volume": "10", "turnover": "15", "confirm": False}]
+                    }))
+
+            # Разрыв первого соединения после полной подписки
+            if self.drop_first_connection and conn_no == 1 and \
+                    sum(len(a) for n, a in self.subscribe_requests if n == 1) >= 25:
+                await ws.close()
+                return
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        async def main():
+            self._stop = asyncio.Event()
+            async with websockets.serve(self._handler, '127.0.0.1', 0) as server:
+                self.port = list(server.sockets)[0].getsockname()[1]
+                self._ready.set()
+                await self._stop.wait()
+
+        self._loop.run_until_complete(main())
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait(5)
+        return f"ws://127.0.0.1:{self.port}"
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join(5)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_batched_subscribe_snapshot_and_fanout():
+    server = StandInServer()
+    url = server.start()
+    stream = MarketDataStream(url=url, ping_interval=0.2, batch_size=10)
+    events = []
+    stream.add_callback(events.append)
+    q = stream.create_queue()
+
+    symbols = [f"SYM{i}USDT" for i in range(25)]
+    stream.subscribe_tickers(symbols)
+    stream.start()
+    try:
+        assert stream.wait_connected(5)
+        assert wait_for(lambda: len(stream.snapshot) == 25)
+        # 25 топиков уходят тремя запросами по 10/10/5
+        assert [len(a) for _, a in server.subscribe_requests] == [10, 10, 5]
+
+        # delta сливается с предыдущим snapshot
+        assert wait_for(lambda: stream.snapshot.get_last_price('SYM0USDT') == 101.0)
+        ticker = stream.snapshot.get_ticker('SYM0USDT')
+        assert ticker['volume24h'] == '5'
+
+        # Подписка на свечи после подключения отправляется сразу
+        stream.subscribe_klines(['SYM0USDT'], '1h')
+        assert wait_for(lambda: stream.snapshot.get_kline('SYM0USDT', '1h') is not None)
+        assert stream.snapshot.get_kline('SYM0USDT', '60')['close'] == 1.5
+
+        # Heartbeat отправляется и получает ответ
+        assert wait_for(lambda: server.pings >= 1)
+
+        assert wait_for(lambda: q.qsize() == len(events) and len(events) >= 51)
+        assert {e['type'] for e in events} == {'ticker', 'kline'}
+    finally:
+        stream.stop()
+        server.stop()
+
+
+def test_reconnect_resubscribes_all_topics():
+    server = StandInServer(drop_first_connection=True)
+    url = server.start()
+    stream = MarketDataStream(url=url, ping_interval=0.5, reconnect_delay=0.05)
+    symbols = [f"SYM{i}USDT" for i in range(25)]
+    stream.subscribe_tickers(symbols)
+    stream.start()
+    try:
+        assert wait_for(lambda: server.connections >= 2)
+        assert wait_for(lambda: sum(len(a) for n, a in server.subscribe_requests if n == 2) == 25)
+        assert stream.reconnects >= 1
+        # После повторной подписки в снимке данные второго соединения
+        assert wait_for(lambda: stream.snapshot.get_last_price('SYM24USDT') == 102.0)
+    finally:
+        stream.stop()
+        server.stop()
+
+
+def test_is_live_requires_connection_and_fresh_snapshot():
+    stream = MarketDataStream(url="ws://127.0.0.1:1")
+    assert not stream.is_live()
+
+    stream._connected.set()
+    assert not stream.is_live()  # снимок еще пуст
+    stream.snapshot.load_tickers([{'symbol': 'BTCUSDT', 'lastPrice': '100'}])
+    assert stream.is_live(30)
+
+    # Снимок перестал обновляться или соединение потеряно - потребители уходят на REST
+    stream.snapshot.last_update -= 31
+    assert not stream.is_live(30)
+    stream.snapshot.load_tickers([{'symbol': 'BTCUSDT', 'lastPrice': '101'}])
+    stream._connected.clear()
+    assert not stream.is_live(30)
+
+
+if __name__ == "__main__":
+    test_is_live_requires_connection_and_fresh_snapshot()
+    test_batched_subscribe_snapshot_and_fanout()
+    print("✅ Пакетная подписка, snapshot/delta и fan-out работают")
+    test_reconnect_resubscribes_all_topics()
+    print("✅ Переподключение с повторной подпиской работает")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест реестра моделей: файл и запись индекса на символ, ленивая загрузка, вытеснение
+из памяти, изменения из другого процесса и перенос моделей из прежних форматов
+"""
+
+import json
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.strategies.adaptive_ml import AdaptiveMLStrategy
+from src.strategies import model_registry
+from src.strategies.model_registry import ModelRegistry, RegistryView
+
+
+class FakeModel:
+    """Модель-заглушка с полезной нагрузкой заданного размера"""
+
+    def __init__(self, name, size=1024):
+        self.name = name
+        self.payload = b'x' * size
+
+
+class FakeTime:
+    """Реальное время со сдвигом, который тест увеличивает вручную"""
+
+    def __init__(self):
+        self.offset = 0
+
+    def time(self):
+        return time.time() + self.offset / 1e9
+
+    def time_ns(self):
+        return time.time_ns() + self.offset
+
+    def advance(self, ns=ModelRegistry.RACY_MTIME_NS):
+        self.offset += ns
+
+
+def test_lazy_load_and_lru(tmp_path):
+    registry = ModelRegistry(tmp_path, schema_version=1, max_memory_mb=0.25)
+    for i in range(4):
+        registry.put(f"SYM{i}", FakeModel(i, 100_000), None, {'accuracy': 0.5 + i / 10})
+
+    # Артефакт и запись индекса с метриками на символ
+    assert sorted(p.name for p in tmp_path.glob('*.pkl')) == [f"SYM{i}.pkl" for i in range(4)]
+    entry = json.loads((tmp_path / 'SYM2.meta.json').read_text(encoding='utf-8'))
+    assert entry['metrics']['accuracy'] == 0.7
+    assert not list(tmp_path.glob('*.tmp')) and not (tmp_path / 'index.json').exists()
+
+    # Лимит ~250 КБ: в памяти остаются только две последние модели
+    assert registry.get_stats()['resident'] == 2 and registry.evictions == 2
+
+    # Новый экземпляр ничего не распаковывает до первого обращения
+    reopened = ModelRegistry(tmp_path, schema_version=1)
+    models = RegistryView(reopened, 'model')
+    assert len(models) == 4 and reopened.loads == 0
+    assert models['SYM1'].name == 1 and reopened.loads == 1
+    assert models['SYM1'].name == 1 and reopened.hits == 1
+    assert reopened.metrics()['SYM3']['accuracy'] == 0.8
+
+
+def test_schema_mismatch_is_ignored(tmp_path):
+    ModelRegistry(tmp_path, schema_version=1).put("BTCUSDT", FakeModel('old'), None, {'accuracy': 0.9})
+    registry = ModelRegistry(tmp_path, schema_version=2)
+    assert "BTCUSDT" not in registry
+    assert registry.get("BTCUSDT") is None
+    assert "BTCUSDT" not in RegistryView(registry, 'model')
+
+
+def test_changes_from_another_process(tmp_path):
+    fake = FakeTime()
+    with patch.object(model_registry, 'time', fake):
+        _check_changes_from_another_process(tmp_path, fake)
+
+
+def _check_changes_from_another_process(tmp_path, fake):
+    bot = ModelRegistry(tmp_path, schema_version=1)
+    trainer = ModelRegistry(tmp_path, schema_version=1)
+    bot.put("BTCUSDT", FakeModel('btc-v1'), None, {'accuracy': 0.6})
+    trainer.put("ETHUSDT", FakeModel('eth'), None, {'accuracy': 0.5})
+
+    # Записи разных экземпляров не затирают друг друга (видны не позже RACY_MTIME_NS)
+    fake.advance()
+    assert bot.symbols() == trainer.symbols() == ['BTCUSDT', 'ETHUSDT']
+    assert bot.get("ETHUSDT")['model'].name == 'eth'
+
+    # Переобучение в другом процессе: новая версия и сброс модели из памяти
+    version = bot.version("BTCUSDT")
+    assert bot.get("BTCUSDT")['model'].name == 'btc-v1'
+    trainer.put("BTCUSDT", FakeModel('btc-v2'), None, {'accuracy': 0.7})
+    fake.advance()
+    assert bot.version("BTCUSDT") != version
+    assert bot.get("BTCUSDT")['model'].name == 'btc-v2'
+    assert bot.metrics()['BTCUSDT']['accuracy'] == 0.7 and bot.reloads == 1
+
+    trainer.delete("ETHUSDT")
+    fake.advance()
+    assert "ETHUSDT" not in bot and bot.symbols() == ['BTCUSDT']
+
+
+def test_rescan_is_rate_limited_while_racy(tmp_path):
+    fake = FakeTime()
+    with patch.object(model_registry, 'time', fake):
+        bot = ModelRegistry(tmp_path, schema_version=1)
+        trainer = ModelRegistry(tmp_path, schema_version=1)
+        scans = bot.scans
+
+        # Тренер сохраняет модели подряд: каталог все время "свежий", но просмотров не больше одного
+        for i in range(20):
+            trainer.put(f"SYM{i}", FakeModel(i), None, {'accuracy': 0.5})
+            for symbol in RegistryView(bot, 'model'):
+                bot.version(symbol)
+        assert bot.scans - scans <= 1
+
+        # После RACY_MTIME_NS видны все модели, дальше каталог не просматривается
+        fake.advance()
+        assert len(bot.symbols()) == 20
+        scans = bot.scans
+        assert "SYM0" in bot and bot.version("SYM19") is not None
+        assert bot.scans == scans
+
+
+def test_legacy_index_migration(tmp_path):
+    registry = ModelRegistry(tmp_path, schema_version=1)
+    registry.put("BTCUSDT", FakeModel('btc'), None, {'accuracy': 0.6})
+    entry = json.loads(registry.entry_path("BTCUSDT").read_text(encoding='utf-8'))
+    registry.entry_path("BTCUSDT").unlink()
+    (tmp_path / 'index.json').write_text(json.dumps({'models': {'BTCUSDT': entry}}), encoding='utf-8')
+
+    reopened = ModelRegistry(tmp_path, schema_version=1)
+    assert reopened.symbols() == ['BTCUSDT'] and reopened.get("BTCUSDT")['model'].name == 'btc'
+    assert registry.entry_path("BTCUSDT").exists() and not (tmp_path / 'index.json').exists()
+
+
+def test_legacy_pickle_migration(tmp_path):
+    with open(tmp_path / 'adaptive_ml_models.pkl', 'wb') as f:
+        pickle.dump({'BTCUSDT': FakeModel('btc'), 'ETHUSDT': FakeModel('eth')}, f)
+    with open(tmp_path / 'adaptive_ml_scalers.pkl', 'wb') as f:
+        pickle.dump({'BTCUSDT': 'scaler-btc'}, f)
+    with open(tmp_path / 'adaptive_ml_performance.json', 'w') as f:
+        json.dump({'BTCUSDT': 0.6, 'ETHUSDT': 0.55}, f)
+
+    strategy = AdaptiveMLStrategy('adaptive_ml', {}, None, None, None, model_path=tmp_path)
+
+    assert sorted(strategy.models) == ['BTCUSDT', 'ETHUSDT']
+    assert strategy.model_performance == {'BTCUSDT': 0.6, 'ETHUSDT': 0.55}
+    assert strategy.scalers['BTCUSDT'] == 'scaler-btc'
+    assert strategy.get_performance_stats()['models_count'] == 2
+
+
+if __name__ == "__main__":
+    for test in (test_lazy_load_and_lru, test_schema_mismatch_is_ignored, test_changes_from_another_process,
+                 test_rescan_is_rate_limited_while_racy, test_legacy_index_migration,
+                 test_legacy_pickle_migration):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Реестр моделей работает корректно")
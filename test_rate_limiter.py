@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест лимитера запросов на подмененных часах: корзины групп, пополнение токенов
+и заголовки лимитов, которые ограничивают только свой эндпоинт
+"""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent))
+import src.api.bybit_client as bybit_client
+from src.api.bybit_client import RateLimiter, TokenBucket
+
+
+class FakeTime:
+    """Подмена модуля time: monotonic и time идут от одного счетчика"""
+
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_refill():
+    bucket = TokenBucket(2, 4)
+    now = bucket.updated
+    assert bucket.try_acquire(now) == 0 and bucket.try_acquire(now) == 0
+    assert bucket.try_acquire(now) == 0.25
+    # Проверка без списания не тратит токен
+    assert bucket.wait_time(now + 0.25) == 0 and bucket.tokens == 1
+    assert bucket.try_acquire(now + 0.25) == 0
+    assert bucket.try_acquire(now + 10) == 0 and bucket.tokens == 1
+
+
+def test_groups_are_independent():
+    fake = FakeTime()
+    with patch.object(bybit_client, 'time', fake):
+        _check_groups(fake)
+
+
+def _check_groups(fake):
+    limiter = RateLimiter({'order': (2, 1)})
+
+    assert limiter.get_group('/v5/order/create') == 'order'
+    assert limiter.get_group('/v5/execution/list') == 'order'
+    assert limiter.get_group('/v5/unknown') == 'default'
+
+    for _ in range(2):
+        assert limiter.try_acquire('/v5/order/create') == 0
+    assert limiter.try_acquire('/v5/order/create') == 1.0
+    # Рыночные данные не ждут за ордерами
+    assert limiter.try_acquire('/v5/market/kline') == 0
+
+    # wait_if_needed спит ровно до появления токена
+    limiter.wait_if_needed('/v5/order/create')
+    assert fake.now == 1_001.0
+
+
+def test_limit_headers_are_scoped_to_endpoint():
+    fake = FakeTime()
+    with patch.object(bybit_client, 'time', fake):
+        _check_endpoint_headers(fake)
+
+
+def _check_endpoint_headers(fake):
+    limiter = RateLimiter()
+
+    headers = {'X-Bapi-Limit-Status': '0', 'X-Bapi-Limit': '10',
+               'X-Bapi-Limit-Reset-Timestamp': str(int((fake.now + 2) * 1000))}
+    limiter.update_from_headers('/v5/order/create', headers)
+
+    # Исчерпан лимит только /v5/order/create, соседний эндпоинт группы доступен
+    assert limiter.try_acquire('/v5/order/create') == 2.0
+    assert limiter.try_acquire('/v5/order/cancel') == 0
+    assert limiter.buckets['order'].tokens == 9
+
+    # Отказ эндпоинта не списывает токен группы
+    tokens = limiter.buckets['order'].tokens
+    limiter.try_acquire('/v5/order/create')
+    assert limiter.buckets['order'].tokens == tokens
+
+    # После сброса лимита запросы снова проходят
+    fake.now += 2
+    assert limiter.try_acquire('/v5/order/create') == 0
+
+    # Смещение часов сервера учитывается при пересчете времени сброса
+    headers['X-Bapi-Limit-Reset-Timestamp'] = str(int((fake.now + 1) * 1000 + 500))
+    limiter.update_from_headers('/v5/order/create', headers, clock_offset_ms=500)
+    assert limiter.try_acquire('/v5/order/create') == 1.0
+
+    # Остаток ограничивает корзину эндпоинта сверху
+    limiter.update_from_headers('/v5/position/list', {'X-Bapi-Limit-Status': '3', 'X-Bapi-Limit': '50'})
+    assert limiter.endpoint_buckets['/v5/position/list'].tokens == 3
+    assert limiter.endpoint_buckets['/v5/position/list'].capacity == 50
+
+    # Некорректные заголовки игнорируются
+    limiter.update_from_headers('/v5/market/kline', {'X-Bapi-Limit-Status': 'n/a'})
+    limiter.update_from_headers('/v5/market/kline', {})
+    assert '/v5/market/kline' not in limiter.endpoint_buckets
+
+
+if __name__ == "__main__":
+    test_token_bucket_refill()
+    test_groups_are_independent()
+    test_limit_headers_are_scoped_to_endpoint()
+    print("✅ Лимитер запросов работает")
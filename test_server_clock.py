@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест синхронизации часов с сервером на подмененных часах и сессии: выбор замера
+с минимальным RTT, сброс истории при дрейфе и пересинхронизация после ошибки timestamp
+"""
+
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent))
+import src.api.bybit_client as bybit_client
+from src.api.bybit_client import BybitClient, ServerClock
+
+
+class FakeTime:
+    """Подмена модуля time: каждый запрос к серверу занимает заданный RTT"""
+
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeSession:
+    """Сессия /v5/market/time: сервер опережает локальные часы на offset_ms"""
+
+    def __init__(self, fake_time, offset_ms, rtts_ms):
+        self.fake_time = fake_time
+        self.offset_ms = offset_ms
+        self.rtts_ms = list(rtts_ms)
+        self.calls = 0
+
+    def get(self, url, timeout=None, **kwargs):
+        self.calls += 1
+        rtt = self.rtts_ms.pop(0) if self.rtts_ms else 10.0
+        # Асимметричная сеть: ответ сформирован на первой четверти запроса,
+        # поэтому ошибка оценки смещения растет с RTT
+        self.fake_time.now += rtt / 4000
+        server_ms = self.fake_time.now * 1000 + self.offset_ms
+        self.fake_time.now += rtt * 3 / 4000
+        response = MagicMock()
+        response.json.return_value = {'retCode': 0, 'result': {'timeNano': str(int(server_ms * 1_000_000))}}
+        return response
+
+
+def test_parse_server_time():
+    assert ServerClock.parse_server_time({'retCode': 0, 'result': {'timeNano': '1700000000123000000'}}) == 1700000000123
+    assert ServerClock.parse_server_time({'retCode': 0, 'result': {'timeSecond': '1700000000'}}) == 1700000000000
+    assert ServerClock.parse_server_time({'retCode': 10001, 'result': {}}) is None
+    assert ServerClock.parse_server_time({'retCode': 0, 'result': {}}) is None
+
+
+def test_min_rtt_sample_and_drift():
+    fake = FakeTime()
+    with patch.object(bybit_client, 'time', fake):
+        # Медленный замер искажает смещение на 100 мс, берется самый быстрый
+        clock = ServerClock(FakeSession(fake, 250.0, [400.0, 4.0, 80.0, 40.0]), 'https://api', sync_interval=0)
+        assert clock.sync() is True
+        assert abs(clock.rtt_ms - 4.0) < 0.01 and abs(clock.offset_ms - 250.0) < 1.5
+        assert abs(clock.current_ms() - (fake.now * 1000 + 250.0)) < 2
+
+        # Подпись использует смещение без повторного запроса к серверу
+        calls = clock.session.calls
+        clock.now_ms()
+        assert clock.session.calls == calls
+
+        # Часы ушли на 2 с: история сбрасывается, хотя старый замер быстрее
+        clock.session = FakeSession(fake, 2250.0, [20.0] * 4)
+        assert clock.sync() is True
+        assert abs(clock.rtt_ms - 20.0) < 0.01 and abs(clock.offset_ms - 2250.0) < 6
+        assert len(clock.samples) == 4
+
+        # Без ответов сервера смещение сохраняется
+        offset = clock.offset_ms
+        assert clock.add_samples([]) is False
+        assert clock.offset_ms == offset
+
+
+def test_timestamp_error_resyncs_and_retries():
+    fake = FakeTime()
+    with patch.object(bybit_client, 'time', fake):
+        client = BybitClient('key', 'secret', testnet=True, time_sync_interval=0)
+        client.clock.session = FakeSession(fake, 0.0, [])
+        client.session = MagicMock()
+
+        responses = [
+            {'retCode': 10002, 'retMsg': 'invalid request, please check your server timestamp'},
+            {'retCode': 0, 'result': {'list': []}},
+        ]
+        http_responses = []
+        for data in responses:
+            response = MagicMock()
+            response.headers = {}
+            response.json.return_value = data
+            http_responses.append(response)
+        client.session.get.side_effect = http_responses
+
+        assert client._make_request('GET', '/v5/order/realtime', {'category': 'spot'}) == {'list': []}
+        assert client.session.get.call_count == 2
+        # Первая синхронизация при подписи + принудительная после ошибки
+        assert client.clock.session.calls == 2 * client.clock.samples_per_sync
+        first, second = [c.kwargs['headers']['X-BAPI-TIMESTAMP'] for c in client.session.get.call_args_list]
+        assert int(second) > int(first)
+
+
+if __name__ == "__main__":
+    test_parse_server_time()
+    test_min_rtt_sample_and_drift()
+    test_timestamp_error_resyncs_and_retries()
+    print("✅ Синхронизация часов с сервером работает")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест таблицы тикеров в разделяемой памяти: потребитель в другом процессе
+читает слоты без разбора JSON, seqlock не отдает частично записанный слот
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.data.shared_tickers import SharedTickerTable
+
+
+def table_name(suffix):
+    return f'test_tickers_{os.getpid()}_{suffix}'
+
+
+def read_in_child(name, result):
+    table = SharedTickerTable.attach(name)
+    result.put((table.get('BTCUSDT'), len(table.get_all())))
+    table.close()
+
+
+def test_consumer_process_reads_slots():
+    name = table_name('proc')
+    producer = SharedTickerTable.create(name, capacity=16)
+    try:
+        producer.update_many([
+            {'symbol': 'BTCUSDT', 'lastPrice': '65000.5', 'highPrice24h': '66000', 'lowPrice24h': '64000',
+             'volume24h': '1200', 'turnover24h': '78000000', 'price24hPcnt': '0.012'},
+            {'symbol': 'ETHUSDT', 'lastPrice': '3100', 'volume24h': '9000'},
+        ])
+        producer.update({'symbol': 'BTCUSDT', 'lastPrice': '65100', 'highPrice24h': '66000', 'lowPrice24h': '64000',
+                         'volume24h': '1201', 'turnover24h': '78100000', 'price24hPcnt': '0.013'})
+        assert producer.generation == 2 and len(producer) == 2
+
+        context = multiprocessing.get_context('spawn')
+        result = context.Queue()
+        child = context.Process(target=read_in_child, args=(name, result))
+        child.start()
+        ticker, count = result.get(timeout=30)
+        child.join(30)
+
+        assert count == 2
+        assert ticker['lastPrice'] == 65100.0 and ticker['price24hPcnt'] == 0.013
+        assert ticker['seqno'] == 2
+
+        # Потребитель не удалил блок при выходе
+        consumer = SharedTickerTable.attach(name)
+        assert consumer.get_last_price('ETHUSDT') == 3100.0
+        assert consumer.get('SOLUSDT') is None
+        columns = consumer.read_arrays()
+        assert columns['symbols'] == ['BTCUSDT', 'ETHUSDT'] and columns['volume_24h'][1] == 9000.0
+
+        producer.close()
+        assert consumer.closed
+        consumer.close()
+    finally:
+        producer.close()
+
+
+def test_seqlock_never_returns_torn_slot():
+    name = table_name('seqlock')
+    producer = SharedTickerTable.create(name, capacity=4)
+    consumer = SharedTickerTable.attach(name)
+    stop = threading.Event()
+
+    def write():
+        value = 0
+        while not stop.is_set():
+            value += 1
+            producer.update({'symbol': 'BTCUSDT', 'lastPrice': value, 'highPrice24h': value,
+                             'lowPrice24h': value, 'volume24h': value, 'turnover24h': value,
+                             'price24hPcnt': value})
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        reads = 0
+        while reads < 5000:
+            ticker = consumer.get('BTCUSDT')
+            if ticker is None:
+                continue
+            values = {ticker[key] for key in ('lastPrice', 'highPrice24h', 'lowPrice24h',
+                                                 'volume24h', 'turnover24h', 'price24hPcnt')}
+            assert len(values) == 1, f"частично записанный слот: {ticker}"
+            reads += 1
+    finally:
+        stop.set()
+        writer.join()
+        consumer.close()
+        producer.close()
+
+
+if __name__ == "__main__":
+    test_consumer_process_reads_slots()
+    test_seqlock_never_returns_torn_slot()
+    print("✅ Таблица тикеров в разделяемой памяти работает")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест потокового состояния признаков: сравнение с полным пересчетом окна
+через extract_features/detect_regime и восстановление из JSON
+"""
+
+import json
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.strategies.adaptive_ml import AdaptiveMLStrategy, MarketRegimeDetector
+from src.strategies.streaming import StreamingFeatureState
+
+WINDOW = 200
+STEP = 3_600_000
+
+
+def make_strategy():
+    return AdaptiveMLStrategy('adaptive_ml', {'use_technical_indicators': True}, None, None, None,
+                              load_existing=False)
+
+
+def make_klines(count, seed=3):
+    rng = np.random.default_rng(seed)
+    closes = 60000 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    volumes = rng.random(count) * 100
+    return [{'timestamp': i * STEP, 'open': c, 'high': c, 'low': c, 'close': c, 'volume': v}
+            for i, (c, v) in enumerate(zip(closes.tolist(), volumes.tolist()))]
+
+
+def assert_features_close(actual, expected, scale):
+    assert len(actual) == len(expected)
+    np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-6 * scale)
+
+
+def test_state_matches_window_recompute():
+    strategy = make_strategy()
+    klines = make_klines(400)
+    state = StreamingFeatureState(WINDOW)
+
+    # Ровно одно окно: EMA/RSI посеяны так же, как при расчете по окну
+    state.update_many(klines[:WINDOW])
+    assert_features_close(state.features(), strategy.extract_features(klines[:WINDOW]), 60000)
+
+    # Дальше по одной свече: окно скользит, состояние обновляется за O(1)
+    for end in range(WINDOW + 1, len(klines) + 1):
+        state.update(klines[end - 1])
+        window = klines[end - WINDOW:end]
+        assert_features_close(state.features(), strategy.extract_features(window), 60000)
+
+        expected = MarketRegimeDetector().detect_regime([k['close'] for k in window])
+        regime = state.regime()
+        assert regime['regime'] == expected['regime']
+        assert abs(regime['volatility'] - expected['volatility']) < 1e-9
+
+
+def test_state_survives_json_round_trip():
+    klines = make_klines(260)
+    state = StreamingFeatureState(WINDOW)
+    state.update_many(klines[:230])
+    restored = StreamingFeatureState.from_dict(json.loads(json.dumps(state.to_dict())))
+
+    # Повторные свечи пропускаются, новые дают тот же результат
+    assert restored.update(klines[229]) is False
+    state.update_many(klines[230:])
+    restored.update_many(klines[230:])
+    assert_features_close(restored.features(), state.features(), 60000)
+    assert restored.regime()['regime'] == state.regime()['regime']
+
+
+def test_strategy_keeps_one_state_per_symbol():
+    strategy = make_strategy()
+    klines = make_klines(260)
+
+    # Ответ API идет новыми первыми; последняя свеча незакрыта и не учитывается
+    state = strategy.update_feature_state('BTCUSDT', list(reversed(klines[:WINDOW + 1])))
+    assert state.last_timestamp == klines[WINDOW - 1]['timestamp']
+    assert strategy.update_feature_state('BTCUSDT', list(reversed(klines[1:WINDOW + 2]))) is state
+    assert state.count == WINDOW + 1
+
+    # Разрыв в данных - состояние строится заново
+    rebuilt = strategy.update_feature_state('BTCUSDT', klines[WINDOW + 10:])
+    assert rebuilt is not state and rebuilt.last_timestamp == klines[-2]['timestamp']
+
+
+def test_live_analysis_uses_state_by_default():
+    strategy = make_strategy()
+    strategy.db_manager = MagicMock()
+    strategy.extract_features = MagicMock(side_effect=strategy.extract_features)
+    klines = make_klines(WINDOW + 1)
+
+    # Ответ API новыми первыми: признаки из потокового состояния, без пересчета окна
+    result = strategy.analyze_market({'symbol': 'BTCUSDT', 'timeframe': '1h', 'current_price': 1.0,
+                                      'klines': list(reversed(klines))})
+    assert 'reason' not in result and result['regime'] == strategy.feature_states['BTCUSDT'].regime()
+    assert strategy.extract_features.call_count == 0
+    assert strategy.feature_states['BTCUSDT'].last_timestamp == klines[-2]['timestamp']
+
+
+if __name__ == "__main__":
+    test_state_matches_window_recompute()
+    test_state_survives_json_round_trip()
+    test_strategy_keeps_one_state_per_symbol()
+    test_live_analysis_uses_state_by_default()
+    print("✅ Потоковые признаки совпадают с пересчетом окна")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест хранилища тикеров: писатель обновляет только изменившиеся символы,
+читатель получает только строки новее своего поколения
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.data.ticker_store import TickerStore, TickerStoreReader
+from src.tools.ticker_data_loader import TickerDataLoader
+
+
+def make_tickers(count, price=1.0):
+    return [{'symbol': f'SYM{i}USDT', 'lastPrice': price + i, 'volume': 10 * i} for i in range(count)]
+
+
+def test_incremental_changes(tmp_path):
+    store = TickerStore(tmp_path)
+    reader = TickerStoreReader(TickerStore(tmp_path))
+    assert store.generation() == 0 and not reader.has_updates()
+
+    first = store.put_tickers(make_tickers(100))
+    assert first == 1
+    assert reader.refresh() == {'tickers': 100, 'historical': 0}
+    assert len(reader.tickers) == 100
+
+    # Те же данные не создают нового поколения
+    assert store.put_tickers(make_tickers(100)) == first
+    assert not reader.has_updates()
+
+    # Изменились два символа, один пропал
+    tickers = make_tickers(99)
+    tickers[3]['lastPrice'] = 99.0
+    tickers[7]['lastPrice'] = 77.0
+    assert store.put_tickers(tickers) == 2
+    assert reader.has_updates()
+    assert reader.refresh() == {'tickers': 3, 'historical': 0}
+    assert reader.tickers['SYM3USDT']['lastPrice'] == 99.0
+    assert 'SYM99USDT' not in reader.tickers and len(reader.tickers) == 99
+
+    # Свечи пишутся атомарно по символу
+    klines = [{'timestamp': 1700000000 + 3600 * i, 'close': 1.0 + i} for i in range(50)]
+    store.put_historical('SYM1USDT', klines)
+    changes = store.changes_since(2)
+    assert changes['tickers'] == {} and list(changes['historical']) == ['SYM1USDT']
+    reader.refresh()
+    assert reader.historical['SYM1USDT'] == klines
+    assert reader.tickers['SYM1USDT']['lastPrice'] == 2.0
+
+
+def test_loader_reads_store_and_legacy_file(tmp_path):
+    # Файл прежнего формата читается, пока хранилище пустое
+    legacy = {'timestamp': 1700000000.0, 'tickers': make_tickers(3), 'historical_data': {}}
+    (tmp_path / 'tickers_data.json').write_text(json.dumps(legacy), encoding='utf-8')
+    loader = TickerDataLoader(tmp_path)
+    assert loader.has_data()
+    data = loader.load_tickers_data()
+    assert sorted(data['tickers']) == ['SYM0USDT', 'SYM1USDT', 'SYM2USDT']
+
+    store = TickerStore(tmp_path)
+    store.put_tickers(make_tickers(5, price=2.0))
+    assert loader.has_updates() and loader.get_generation() == 1
+    data = loader.load_tickers_data()
+    assert len(data['tickers']) == 5 and loader.get_ticker_data('SYM4USDT')['lastPrice'] == 6.0
+    assert not loader.has_updates()
+
+
+if __name__ == "__main__":
+    for test in (test_incremental_changes, test_loader_reads_store_and_legacy_file):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Хранилище тикеров передает только изменения")
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест конвейера торгового цикла на подмененном BybitClient: медленная загрузка
+одного символа не задерживает остальные, баланс запрашивается один раз,
+дневной лимит учитывает ордера текущего цикла, свечи пачки символов
+актуализируются одним пакетным запросом, символы без новой закрытой свечи
+пропускаются, а ожидание неопубликованной свечи ограничено числом попыток
+"""
+
+import importlib.util
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.api.bybit_client import BybitClient
+from src.api.kline_store import KlineStore
+from src.strategies.analysis_cache import AnalysisCache
+from src.strategy.trading_pipeline import BalanceSnapshot, KlineFetchStage, RiskGate, TradingPipeline
+
+STEP = 14_400_000
+
+
+def make_client():
+    client = MagicMock(spec=BybitClient)
+
+    def get_kline(category, symbol, interval, limit=200):
+        return [{'timestamp': 1700000000000 - i * STEP, 'close': 100.0} for i in range(limit)]
+
+    client.get_kline.side_effect = get_kline
+    client.get_wallet_balance.return_value = {'list': [{'totalAvailableBalance': '10000'}]}
+    client.place_order.side_effect = lambda **order: {'orderId': f"order-{order['symbol']}"}
+    return client
+
+
+def make_pipeline(client, analyzed, **kwargs):
+    def fetch(symbol):
+        klines = client.get_kline(category='spot', symbol=symbol, interval='4h', limit=50)
+        return {'symbol': symbol, 'klines': klines, 'current_price': klines[0]['close']}
+
+    def analyze(batch):
+        analyzed.extend(market_data['symbol'] for market_data in batch)
+        return {md['symbol']: {'signal': 'BUY', 'confidence': 0.8} for md in batch}
+
+    def execute(order):
+        result = client.place_order(category='spot', symbol=order['symbol'], side=order['side'],
+                                    order_type='Market', qty=str(order['size']))
+        return {'symbol': order['symbol'], 'size': order['size'], 'order_result': result}
+
+    risk = RiskGate(BalanceSnapshot(client.get_wallet_balance, ttl_seconds=60))
+    return TradingPipeline(fetch, analyze, risk, execute, **kwargs), risk
+
+
+def make_kline_client(now, lag=(0,)):
+    """BybitClient, отдающий свечи 4h до текущей незакрытой включительно (новые первыми)
+
+    lag[0] - на сколько свечей биржа отстает с публикацией
+    """
+    client = MagicMock(spec=BybitClient)
+
+    def get_kline(category, symbol, interval, limit=200, start=None, end=None):
+        open_ts = (now[0] // STEP - lag[0]) * STEP
+        timestamps = [open_ts - i * STEP for i in range(1000)]
+        timestamps = [ts for ts in timestamps if (start is None or ts >= start) and (end is None or ts <= end)]
+        return [{'timestamp': ts, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0}
+                for ts in timestamps[:limit]]
+
+    client.get_kline.side_effect = get_kline
+    batch_fetcher = MagicMock(side_effect=lambda requests: [
+        get_kline(r['category'], r['symbol'], r['interval'], r['limit'], r.get('start'), r.get('end'))
+        for r in requests])
+    return client, batch_fetcher
+
+
+def test_slow_symbol_does_not_block_others():
+    client = make_client()
+    analyzed = []
+    fast_symbols = [f'S{i:02d}USDT' for i in range(19)]
+    fast_analyzed = threading.Event()
+    slow_waited = []
+    get_kline = client.get_kline.side_effect
+
+    def slow_get_kline(category, symbol, interval, limit=200):
+        if symbol == 'SLOWUSDT':
+            # Ответ по медленному символу приходит только после анализа всех остальных
+            slow_waited.append(fast_analyzed.wait(10))
+        return get_kline(category, symbol, interval, limit)
+
+    client.get_kline.side_effect = slow_get_kline
+    pipeline, risk = make_pipeline(client, analyzed, fetch_workers=4, queue_size=4,
+                                   batch_size=4, batch_wait=0.01)
+    analyze = pipeline.analyze
+
+    def analyze_and_signal(batch):
+        result = analyze(batch)
+        if set(fast_symbols) <= set(analyzed):
+            fast_analyzed.set()
+        return result
+
+    pipeline.analyze = analyze_and_signal
+    symbols = ['SLOWUSDT'] + fast_symbols
+    result = pipeline.run(symbols)
+
+    assert set(result['analyses']) == set(symbols)
+    # Быстрые символы проанализированы, пока загрузка медленного еще ждала
+    assert slow_waited == [True] and analyzed[-1] == 'SLOWUSDT'
+
+    # Баланс запрошен один раз на цикл
+    assert client.get_wallet_balance.call_count == 1
+
+    # Лимит 20% от 10000: ордера по 130 резервируются, пока не наберется 2000
+    assert len(result['orders']) == 16 and len(result['trades']) == 16
+    assert client.place_order.call_count == 16
+    assert risk.rejected == {'daily_limit': 4}
+
+    metrics = result['metrics']
+    assert set(metrics) == {'fetch', 'analyze', 'risk', 'execute'}
+    assert metrics['fetch']['processed'] == 20 and metrics['analyze']['processed'] == 20
+    assert metrics['execute']['processed'] == 16
+    assert all(m['max_queue_depth'] <= 20 for m in metrics.values())
+    assert metrics['analyze']['max_queue_depth'] <= 4
+    assert all(m['queue_depth'] == 0 and m['errors'] == 0 for m in metrics.values())
+
+
+def test_stage_errors_and_stop():
+    client = make_client()
+    client.place_order.side_effect = RuntimeError("API недоступен")
+    pipeline, _ = make_pipeline(client, [], fetch_workers=2)
+    result = pipeline.run([f'S{i}USDT' for i in range(5)])
+    assert len(result['analyses']) == 5 and result['trades'] == []
+    assert result['metrics']['execute']['errors'] == 5
+
+    # Остановка: новые символы не загружаются, полученные данные дорабатываются
+    client = make_client()
+    pipeline, _ = make_pipeline(client, [], fetch_workers=1)
+    get_kline = client.get_kline.side_effect
+
+    def stop_on_first(**kwargs):
+        pipeline.stop()
+        return get_kline(**kwargs)
+
+    client.get_kline.side_effect = stop_on_first
+    result = pipeline.run([f'S{i}USDT' for i in range(50)])
+    assert result['metrics']['fetch']['processed'] == 1 and list(result['analyses']) == ['S0USDT']
+
+
+def make_stage(store, interval, cache, **kwargs):
+    """Этап загрузки, пропускающий символы с результатом в кэше анализа (без версии модели)"""
+    return KlineFetchStage(store, 'spot', interval,
+                           is_analyzed=lambda symbol, timeframe, ts: cache.contains((symbol, timeframe, ts, None)),
+                           **kwargs)
+
+
+def test_prefetch_refreshes_chunk_in_one_batch():
+    now = [2000 * STEP + 1000]
+    client, batch_fetcher = make_kline_client(now)
+    store = KlineStore(fetcher=client.get_kline, window=50, now_ms=lambda: now[0], batch_fetcher=batch_fetcher)
+    cache = AnalysisCache()
+    stage = make_stage(store, '4h', cache)
+
+    def fetch(symbol):
+        fetched = stage.fetch(symbol)
+        if fetched is None:
+            return None
+        klines, last_closed = fetched
+        return {'symbol': symbol, 'timeframe': stage.interval, 'klines': klines, 'last_closed_ts': last_closed}
+
+    analyzed = {}
+
+    def analyze(batch):
+        analyzed.update({md['symbol']: md for md in batch})
+        for md in batch:
+            cache.put(AnalysisCache.make_key(md, None), {'signal': 'HOLD'})
+        return {md['symbol']: {'signal': 'HOLD'} for md in batch}
+
+    pipeline = TradingPipeline(fetch, analyze, lambda symbol, analysis: None, lambda order: None,
+                               fetch_workers=2, prefetch=stage.prefetch, prefetch_chunk=8)
+    symbols = [f'S{i:02d}USDT' for i in range(20)]
+    result = pipeline.run(symbols)
+
+    # 20 символов, 2 потока, пачки по 8: три пакетных запроса и ни одного запроса на символ
+    assert batch_fetcher.call_count == 3
+    assert sorted(len(call.args[0]) for call in batch_fetcher.call_args_list) == [4, 8, 8]
+    assert client.get_kline.call_count == 0
+    assert store.get_stats()['full_loads'] == 20 and store.get_stats()['requests'] == 20
+    assert len(analyzed['S00USDT']['klines']) == 50
+    assert analyzed['S00USDT']['last_closed_ts'] == 1999 * STEP
+    assert result['metrics']['fetch']['processed'] == 20
+
+    # Та же свеча: результаты уже в кэше, символы пропускаются без запросов к API
+    stage.begin_cycle()
+    analyzed.clear()
+    pipeline.run(symbols)
+    assert batch_fetcher.call_count == 3 and analyzed == {}
+    assert stage.skip_stats == {'unchanged': 20, 'not_published': 0, 'gave_up': 0}
+
+    # Новая свеча: только дельта, тоже пакетами
+    now[0] += STEP
+    stage.begin_cycle()
+    pipeline.run(symbols)
+    assert batch_fetcher.call_count == 6
+    assert all(r['kind'] == 'delta' for call in batch_fetcher.call_args_list[3:] for r in call.args[0])
+    assert analyzed['S05USDT']['last_closed_ts'] == 2000 * STEP
+
+
+def test_unpublished_candle_retries_are_capped():
+    # Незакрытая свеча в ответе биржи не видна: окно заканчивается последней закрытой
+    now = [2000 * STEP + 1000]
+    lag = [1]
+    client, batch_fetcher = make_kline_client(now, lag)
+    store = KlineStore(fetcher=client.get_kline, window=50, now_ms=lambda: now[0], batch_fetcher=batch_fetcher)
+    cache = AnalysisCache()
+    stage = make_stage(store, '240', cache, max_publish_attempts=3)
+
+    def cycle(symbols=('BTCUSDT',)):
+        stage.begin_cycle()
+        stage.prefetch(list(symbols))
+        fetched = {symbol: stage.fetch(symbol) for symbol in symbols}
+        for symbol, result in fetched.items():
+            if result is not None:
+                cache.put((symbol, '240', result[1], None), {'signal': 'HOLD'})
+        return fetched
+
+    assert cycle()['BTCUSDT'][1] == 1999 * STEP
+
+    # Свеча закрылась по часам, но биржа ее еще не опубликовала: повтор до трех попыток
+    now[0] += STEP
+    lag[0] = 2
+    for attempt in range(2):
+        assert cycle() == {'BTCUSDT': None}
+        assert stage.skip_stats == {'unchanged': 0, 'not_published': 1, 'gave_up': 0}
+        assert stage.retry_pending
+    assert cycle() == {'BTCUSDT': None}
+    assert stage.skip_stats['gave_up'] == 1 and not stage.retry_pending
+
+    # Дальше до следующей свечи символ не запрашивается
+    requests = batch_fetcher.call_count
+    lag[0] = 1
+    assert cycle() == {'BTCUSDT': None} and stage.skip_stats['gave_up'] == 1
+    assert batch_fetcher.call_count == requests
+
+    # Следующая свеча анализируется как обычно
+    now[0] += STEP
+    assert cycle()['BTCUSDT'][1] == 2001 * STEP
+    assert cycle() == {'BTCUSDT': None} and stage.skip_stats['unchanged'] == 1
+
+    # Граница закрытой свечи считается по интервалу этапа, а не по 4h
+    assert KlineStore.expected_last_closed('240', now[0]) == 2001 * STEP
+    assert KlineStore.expected_last_closed('1h', now[0]) == now[0] // 3_600_000 * 3_600_000 - 3_600_000
+    assert KlineStore.expected_last_closed('M', now[0]) is None
+
+
+def make_worker(client):
+    """TradingWorker без запуска потока и подключения к API"""
+    pytest.importorskip('PySide6')
+    import trading_bot_main
+    from src.strategies.adaptive_ml import AdaptiveMLStrategy
+
+    worker = trading_bot_main.TradingWorker.__new__(trading_bot_main.TradingWorker)
+    trading_bot_main.QThread.__init__(worker)
+    worker.logger = MagicMock()
+    worker.bybit_client = client
+    worker.market_stream = None
+    worker.ml_strategy = MagicMock(spec=AdaptiveMLStrategy)
+    worker.db_manager = MagicMock()
+    worker.trading_enabled = True
+    worker.trade_history = []
+    worker.daily_volume = 0.0
+    worker.kline_store = None
+    worker.kline_fetch = None
+    return worker
+
+
+def test_worker_fetch_reads_prefetched_window():
+    now = [2000 * STEP + 1000]
+    client, batch_fetcher = make_kline_client(now)
+    worker = make_worker(client)
+    worker.kline_store = KlineStore(fetcher=client.get_kline, window=50, now_ms=lambda: now[0],
+                                    batch_fetcher=batch_fetcher)
+    cache = AnalysisCache()
+    worker.kline_fetch = make_stage(worker.kline_store, '4h', cache)
+
+    worker.kline_fetch.prefetch(['BTCUSDT', 'ETHUSDT'])
+    market_data = worker._fetch_market_data('BTCUSDT')
+    assert market_data['symbol'] == 'BTCUSDT' and len(market_data['klines']) == 50
+    assert market_data['last_closed_ts'] == 1999 * STEP and market_data['timeframe'] == '4h'
+    # Окно прочитано из хранилища: запросов на символ нет
+    assert batch_fetcher.call_count == 1 and client.get_kline.call_count == 0
+
+    cache.put(AnalysisCache.make_key(market_data, None), {'signal': 'HOLD'})
+    assert worker._fetch_market_data('BTCUSDT') is None
+    assert worker.kline_fetch.skip_stats['unchanged'] == 1
+
+
+def test_worker_fetch_skips_unpublished_candle():
+    now = [2000 * STEP + 1000]
+    lag = [1]
+    client, batch_fetcher = make_kline_client(now, lag)
+    worker = make_worker(client)
+    worker.kline_store = KlineStore(fetcher=client.get_kline, window=50, now_ms=lambda: now[0],
+                                    batch_fetcher=batch_fetcher)
+    cache = AnalysisCache()
+    worker.kline_fetch = make_stage(worker.kline_store, '240', cache, max_publish_attempts=2)
+
+    worker.kline_fetch.prefetch(['BTCUSDT'])
+    cache.put(AnalysisCache.make_key(worker._fetch_market_data('BTCUSDT'), None), {'signal': 'HOLD'})
+
+    now[0] += STEP
+    lag[0] = 2
+    worker.kline_fetch.prefetch(['BTCUSDT'])
+    assert worker._fetch_market_data('BTCUSDT') is None
+    assert worker.kline_fetch.skip_stats['not_published'] == 1 and worker.kline_fetch.retry_pending
+
+    worker.kline_fetch.begin_cycle()
+    worker.kline_fetch.prefetch(['BTCUSDT'])
+    assert worker._fetch_market_data('BTCUSDT') is None
+    assert worker.kline_fetch.skip_stats['gave_up'] == 1 and not worker.kline_fetch.retry_pending
+
+
+def test_worker_execute_order():
+    client = MagicMock(spec=BybitClient)
+    client.place_order.return_value = {'orderId': '42'}
+    worker = make_worker(client)
+    order = {'symbol': 'BTCUSDT', 'side': 'Buy', 'size': 150.0,
+             'analysis': {'signal': 'BUY', 'confidence': 0.8}}
+
+    trade = worker._execute_order(order, 'session')
+    assert trade['order_result'] == {'orderId': '42'} and trade['side'] == 'Buy'
+    client.place_order.assert_called_once_with(category='spot', symbol='BTCUSDT', side='Buy',
+                                               order_type='Market', qty='150.0')
+    assert worker.daily_volume == 150.0
+    worker.db_manager.log_trade.assert_called_once()
+    assert worker.trade_history == [trade]
+
+    # Ошибка API: сделки нет, дневной объем не меняется
+    client.place_order.side_effect = RuntimeError("API недоступен")
+    assert worker._execute_order(order, 'session') is None
+    assert worker.daily_volume == 150.0
+
+
+if __name__ == "__main__":
+    test_slow_symbol_does_not_block_others()
+    test_stage_errors_and_stop()
+    test_prefetch_refreshes_chunk_in_one_batch()
+    test_unpublished_candle_retries_are_capped()
+    if importlib.util.find_spec('PySide6') is not None:
+        test_worker_fetch_reads_prefetched_window()
+        test_worker_fetch_skips_unpublished_candle()
+        test_worker_execute_order()
+    print("✅ Конвейер торгового цикла работает")
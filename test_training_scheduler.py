@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тест параллельного обучения моделей: результаты пула процессов совпадают
+с последовательным обучением и попадают в модели стратегии
+"""
+
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.strategies.adaptive_ml import AdaptiveMLStrategy
+from src.strategies.training_scheduler import TrainingScheduler
+
+
+def make_dataset(seed):
+    rng = np.random.default_rng(seed)
+    features = rng.normal(size=(240, 12))
+    labels = np.where(features[:, 1] > 0.3, 1, np.where(features[:, 1] < -0.3, -1, 0))
+    return features, labels.tolist()
+
+
+def run_scheduler(max_workers):
+    progress = []
+    scheduler = TrainingScheduler(max_workers=max_workers,
+                                  on_result=lambda result, done, total: progress.append((done, total)))
+    for i in range(4):
+        scheduler.submit(f"SYM{i}USDT", *make_dataset(i))
+    scheduler.submit("BROKENUSDT", np.zeros((1, 12)), [0])  # одна строка - ошибка разбиения
+    results = {result['symbol']: result for result in scheduler.results()}
+    return scheduler, results, progress
+
+
+def test_parallel_matches_sequential():
+    scheduler, parallel, progress = run_scheduler(max_workers=2)
+    assert scheduler.parallel
+    assert sorted(progress) == [(i, 5) for i in range(1, 6)]
+    assert not parallel['BROKENUSDT']['success'] and parallel['BROKENUSDT']['error']
+
+    sequential_scheduler, sequential, _ = run_scheduler(max_workers=1)
+    assert not sequential_scheduler.parallel
+    for i in range(4):
+        symbol = f"SYM{i}USDT"
+        assert parallel[symbol]['success']
+        assert parallel[symbol]['metrics']['accuracy'] == sequential[symbol]['metrics']['accuracy']
+
+        features, _ = make_dataset(i)
+        X = parallel[symbol]['scaler'].transform(features)
+        assert np.array_equal(parallel[symbol]['model'].predict(X), sequential[symbol]['model'].predict(X))
+
+
+def test_results_merge_into_strategy(tmp_path):
+    strategy = AdaptiveMLStrategy('adaptive_ml', {}, None, None, None, model_path=tmp_path, load_existing=False)
+
+    def merge(result, done, total):
+        if result['success']:
+            strategy.apply_trained_model(result['symbol'], result['model'], result['scaler'], result['metrics'])
+
+    with TrainingScheduler(max_workers=2, on_result=merge) as scheduler:
+        scheduler.submit("BTCUSDT", *make_dataset(7))
+        list(scheduler.results())
+
+    assert "BTCUSDT" in strategy.models and "BTCUSDT" in strategy.scalers
+    assert (strategy.registry.root_path / "BTCUSDT.pkl").exists()
+    assert strategy.performance["BTCUSDT"]['samples'] == 240
+    assert strategy.model_performance["BTCUSDT"] == strategy.performance["BTCUSDT"]['accuracy']
+
+
+def test_cancel_from_another_thread():
+    scheduler = TrainingScheduler(max_workers=2)
+    for i in range(12):
+        scheduler.submit(f"SYM{i}USDT", *make_dataset(i))
+
+    # Отмена из другого потока (как из GUI), пока results() забирает задачи
+    errors = []
+    received = []
+
+    def consume():
+        try:
+            for result in scheduler.results():
+                received.append(result['symbol'])
+                if len(received) == 1:
+                    canceller.start()
+        except Exception as e:
+            errors.append(e)
+
+    canceller = threading.Thread(target=scheduler.cancel)
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    consumer.join(60)
+    canceller.join(5)
+    assert not consumer.is_alive() and errors == []
+    assert 1 <= len(received) <= 12 and scheduler.submit("LATEUSDT", *make_dataset(0)) is False
+
+
+if __name__ == "__main__":
+    test_parallel_matches_sequential()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_results_merge_into_strategy(Path(tmp))
+    test_cancel_from_another_thread()
+    print("✅ Параллельное обучение совпадает с последовательным")
@@ -54,6 +54,12 @@ try:
     from database.db_manager import DatabaseManager
     from gui.portfolio_tab import PortfolioTab
     from tools.ticker_data_loader import TickerDataLoader
+    from strategies.candidate_screener import CandidateScreener
+    from strategy.trading_pipeline import (
+        BalanceSnapshot, KlineFetchStage, RiskGate, TradingPipeline, available_balance as get_available_balance
+    )
+    from strategy.cycle_scheduler import CycleScheduler
+    from api.kline_store import INTERVAL_MS
 except ImportError as e:
     print(f"Ошибка импорта модулей: {e}")
     print("Убедитесь, что все файлы находятся в правильных директориях")
@@ -81,10 +87,25 @@ class TradingWorker(QThread):
         
         # Инициализация компонентов
         self.bybit_client = None
+        self.async_client = None  # Асинхронный фасад для параллельной загрузки свечей
+        self.market_stream = None  # Общий WebSocket снимок тикеров (задается главным окном)
+        self.account_stream = None  # Приватный WebSocket поток с локальным состоянием счета
+        self.kline_store = None  # Инкрементальное хранилище свечей (только новые свечи)
+        self.instruments_cache = None  # Кэш инструментов с TTL (available_symbols в БД)
         self.ml_strategy = None
         self.db_manager = None
         self.config_manager = None
         
+        # Предварительный отбор символов и время этапов последнего цикла
+        self.screener = CandidateScreener()
+        self.cycle_stage_timings = {}
+        self.pipeline_metrics = {}  # Пропускная способность и очереди этапов последнего цикла
+        self._pipeline = None
+        
+        # Планировщик задач потока и этап загрузки свечей (пропускает уже проанализированные свечи)
+        self.scheduler = None
+        self.kline_fetch = None
+        
         # Инициализация атрибутов для работы с балансом и историей сделок
         self.trade_history = []
         self.balance_limit_active = False
@@ -123,12 +144,14 @@ class TradingWorker(QThread):
             
             # Инициализация менеджера БД
             self.db_manager = DatabaseManager()
-            # self.db_manager.log_entry({
-            #     'level': 'INFO',
-            #     'logger_name': 'TRADING_WORKER',
-            #     'message': 'Trading worker started',
-            #     'session_id': session_id
-            # }) # Временно закомментировано - блокирует выполнение
+            # Свертка и удаление журналов старше LOG_RETENTION_DAYS в фоне
+            self.db_manager.start_retention_job()
+            self.db_manager.log_entry({
+                'level': 'INFO',
+                'logger_name': 'TRADING_WORKER',
+                'message': 'Trading worker started',
+                'session_id': session_id
+            })
             
             # Инициализация менеджера конфигурации
             try:
@@ -151,12 +174,51 @@ class TradingWorker(QThread):
             )
             init_time = (time.time() - start_time) * 1000
             
-            # self.db_manager.log_entry({
-            #     'level': 'INFO',
-            #     'logger_name': 'API_CLIENT',
-            #     'message': f'Client initialized (testnet: {self.testnet})',
-            #     'session_id': session_id
-            # }) # Временно закомментировано - блокирует выполнение
+            # Асинхронный клиент для параллельной загрузки свечей (общие лимиты и часы)
+            try:
+                from api.async_bybit_client import AsyncBybitFacade
+                self.async_client = AsyncBybitFacade.from_client(self.bybit_client)
+            except ImportError as e:
+                self.log_message.emit(f"⚠️ aiohttp недоступен, свечи загружаются последовательно: {e}")
+                self.async_client = None
+            
+            # Приватный поток: баланс и ордера читаются из локального состояния, REST - только сверка
+            try:
+                from api.account_stream import AccountStream, rest_account_snapshot
+                self.account_stream = AccountStream(
+                    api_key=self.api_key,
+                    api_secret=self.api_secret,
+                    testnet=self.testnet,
+                    snapshot_loader=rest_account_snapshot(self.bybit_client),
+                    clock=self.bybit_client.clock
+                )
+                self.account_stream.start()
+            except ImportError as e:
+                self.log_message.emit(f"⚠️ websockets недоступен, баланс запрашивается через REST: {e}")
+                self.account_stream = None
+            
+            # Хранилище свечей: полное окно загружается один раз, дальше - только дельта
+            from api.kline_store import KlineStore
+            self.kline_store = KlineStore(
+                fetcher=self.bybit_client.get_kline,
+                window=200,
+                now_ms=self.bybit_client.clock.now_ms,
+                batch_fetcher=self.async_client.get_klines_batch if self.async_client else None
+            )
+            if self.market_stream is not None:
+                self.market_stream.add_callback(self._on_market_event)
+            
+            # Список инструментов запрашивается раз в TTL, а не каждый цикл
+            from api.instruments_cache import get_instruments_cache
+            self.instruments_cache = get_instruments_cache(self.bybit_client, self.db_manager)
+            self.instruments_cache.subscribe(self._on_instruments_changed)
+            
+            self.db_manager.log_entry({
+                'level': 'INFO',
+                'logger_name': 'API_CLIENT',
+                'message': f'Client initialized (testnet: {self.testnet})',
+                'session_id': session_id
+            })
             
             # Инициализация ML стратегии
             try:
@@ -167,7 +229,9 @@ class TradingWorker(QThread):
                     'feature_window': 50,
                     'confidence_threshold': 0.65,
                     'use_technical_indicators': True,
-                    'use_market_regime': True
+                    'use_market_regime': True,
+                    'streaming_features': True,
+                    'compiled_inference': True
                 }
                 self.log_message.emit("✅ Конфигурация ML создана")
                 self.log_message.emit("🔧 Создание объекта ML стратегии...")
@@ -187,15 +251,23 @@ class TradingWorker(QThread):
                 self.log_message.emit("✅ TickerDataLoader интегрирован с ML стратегией")
                 
                 self.log_message.emit("✅ Объект ML стратегии создан")
+                
+                # Загрузка свечей пропускает символы, результат анализа которых уже в кэше стратегии
+                from config import CYCLE_SCHEDULER_CONFIG
+                self.kline_fetch = KlineFetchStage(
+                    self.kline_store, 'spot',
+                    interval=CYCLE_SCHEDULER_CONFIG['analysis_interval'],
+                    max_publish_attempts=CYCLE_SCHEDULER_CONFIG['max_publish_attempts'],
+                    is_analyzed=self.ml_strategy.is_analyzed
+                )
                 ml_init_time = (time.time() - start_time) * 1000
                 
-                # Временно закомментировано из-за блокировки
-                # self.db_manager.log_entry({
-                #     'level': 'INFO',
-                #     'logger_name': 'ML_STRATEGY',
-                #     'message': 'ML strategy initialized',
-                #     'session_id': session_id
-                # })
+                self.db_manager.log_entry({
+                    'level': 'INFO',
+                    'logger_name': 'ML_STRATEGY',
+                    'message': 'ML strategy initialized',
+                    'session_id': session_id
+                })
                 self.log_message.emit("✅ ML стратегия инициализирована")
                 print("DEBUG: ML стратегия инициализирована, продолжаем...")
                 self.log_message.emit("🔄 Продолжаем после инициализации ML...")
@@ -219,72 +291,66 @@ class TradingWorker(QThread):
             self.log_message.emit("🔍 Проверка готовности к торговому циклу...")
             print("DEBUG: Дошли до основного цикла")
             
-            # Основной торговый цикл
+            # Планировщик: баланс и позиции обновляются по своему периоду, анализ
+            # запускается по закрытию свечи, а не каждые несколько секунд
+            from config import CYCLE_SCHEDULER_CONFIG as scheduler_config
+            scheduler = self.scheduler = CycleScheduler()
+            scheduler.add_task('account', scheduler_config['account_period_seconds'],
+                               retry_delay=scheduler_config['error_retry_seconds'],
+                               max_backoff=scheduler_config['max_backoff'])
+            scheduler.add_task('analysis', INTERVAL_MS[scheduler_config['analysis_interval']] / 1000,
+                               align=True, offset=scheduler_config['candle_close_delay_seconds'],
+                               retry_delay=scheduler_config['error_retry_seconds'],
+                               max_backoff=scheduler_config['max_backoff'])
+            
+            positions = []
             cycle_count = 0
-            print(f"DEBUG: Перед входом в цикл, self.running = {self.running}")
-            print("DEBUG: Заменяем log_message.emit на print для избежания блокировки...")
             print(f"✅ Входим в торговый цикл, running={self.running}")
-            print("🔄 Начинаем основной цикл while...")
             while self.running:
-                print(f"🔄 Начало итерации цикла #{cycle_count + 1}")
-                try:
-                    print(f"🔄 Цикл #{cycle_count + 1} начат")
-                    cycle_start = time.time()
-                    cycle_count += 1
-                    
-                    # Сброс дневной статистики
-                    print("🔄 Вызов _reset_daily_stats_if_needed()...")
-                    self._reset_daily_stats_if_needed()
-                    print("✅ _reset_daily_stats_if_needed() завершен")
-                    
-                    # Обновление баланса
-                    print("🔄 Обновление баланса...")
-                    balance_info = self._update_balance(session_id)
-                    print(f"✅ Баланс обновлен: {balance_info is not None}")
-                    
-                    # Обновление позиций
-                    print("🔄 Обновление позиций...")
-                    positions = self._update_positions(session_id)
-                    print(f"✅ Позиции обновлены: {len(positions) if positions else 0} позиций")
-                    
-                    # Торговая логика (если включена)
-                    if self.trading_enabled:
-                        print(f"🔄 Выполнение торгового цикла #{cycle_count}...")
-                        self._execute_trading_cycle(session_id, positions)
-                    else:
-                        print(f"⏸️ Торговля отключена (цикл #{cycle_count})")
-                        # Логируем состояние торговли каждые 10 циклов
-                        if cycle_count % 10 == 1:
-                            print("💡 Для включения торговли используйте кнопку 'Включить торговлю' в интерфейсе")
-                    
-                    # Логирование цикла
-                    cycle_time = (time.time() - cycle_start) * 1000
-                    # Временно закомментировано из-за блокировки
-                    # self.db_manager.log_entry({
-                    #     'level': 'DEBUG',
-                    #     'logger_name': 'TRADING_CYCLE',
-                    #     'message': f'Trading cycle {cycle_count} completed (enabled: {self.trading_enabled})',
-                    #     'session_id': session_id
-                    # })
-                    
-                    # Пауза между циклами
-                    self.msleep(5000)  # 5 секунд
-                    
-                except Exception as e:
-                    error_msg = f"Ошибка в торговом цикле: {e}"
-                    self.logger.error(error_msg)
-                    self.error_occurred.emit(error_msg)
-                    
-                    # Логирование ошибки
-                    # Временно закомментировано из-за блокировки
-                    # self.db_manager.log_entry({
-                    #     'level': 'ERROR',
-                    #     'logger_name': 'TRADING_WORKER',
-                    #     'message': f'{type(e).__name__}: {str(e)}',
-                    #     'exception': traceback.format_exc()
-                    # })
-                    
-                    self.msleep(10000)  # 10 секунд при ошибке
+                if not scheduler.wait(scheduler_config['max_sleep_seconds']):
+                    continue
+                
+                for task_name in scheduler.due():
+                    if not self.running:
+                        break
+                    task_start = time.time()
+                    try:
+                        if task_name == 'account':
+                            self._reset_daily_stats_if_needed()
+                            self._update_balance(session_id)
+                            positions = self._update_positions(session_id)
+                        elif self.trading_enabled:
+                            cycle_count += 1
+                            self._execute_trading_cycle(session_id, positions)
+                            
+                            self.db_manager.log_entry({
+                                'level': 'DEBUG',
+                                'logger_name': 'TRADING_CYCLE',
+                                'message': f'Trading cycle {cycle_count} completed, '
+                                           f'scheduler: {scheduler.get_stats()}',
+                                'session_id': session_id
+                            })
+                        scheduler.complete(task_name, task_start)
+                        
+                        # Свечи части символов биржа еще не опубликовала - повтор раньше следующей
+                        # свечи (число попыток на свечу ограничено этапом загрузки)
+                        if task_name == 'analysis' and self.trading_enabled and self.kline_fetch is not None \
+                                and self.kline_fetch.retry_pending:
+                            scheduler.trigger('analysis', delay=scheduler_config['error_retry_seconds'])
+                        
+                    except Exception as e:
+                        scheduler.complete(task_name, task_start, failed=True)
+                        error_msg = f"Ошибка в торговом цикле ({task_name}): {e}"
+                        self.logger.error(error_msg)
+                        self.error_occurred.emit(error_msg)
+                        
+                        # Логирование ошибки
+                        self.db_manager.log_entry({
+                            'level': 'ERROR',
+                            'logger_name': 'TRADING_WORKER',
+                            'message': f'{type(e).__name__}: {str(e)}',
+                            'exception': traceback.format_exc()
+                        })
                     
         except Exception as e:
             error_msg = f"Критическая ошибка торгового потока: {e}"
@@ -292,29 +358,44 @@ class TradingWorker(QThread):
             self.error_occurred.emit(error_msg)
             
             if self.db_manager:
-                # Временно закомментировано из-за блокировки
-                # self.db_manager.log_entry({
-                #     'level': 'CRITICAL',
-                #     'logger_name': 'TRADING_WORKER',
-                #     'message': f'Critical error: {type(e).__name__}: {str(e)}',
-                #     'exception': traceback.format_exc()
-                # })
-                pass
+                self.db_manager.log_entry({
+                    'level': 'CRITICAL',
+                    'logger_name': 'TRADING_WORKER',
+                    'message': f'Critical error: {type(e).__name__}: {str(e)}',
+                    'exception': traceback.format_exc()
+                })
         finally:
             self.running = False
             self.status_updated.emit("Отключено")
             self.log_message.emit("Торговый поток остановлен")
             
+            if self.async_client:
+                self.async_client.close()
+                self.async_client = None
+            
+            if self.account_stream:
+                self.account_stream.stop()
+                self.account_stream = None
+            
+            if self.market_stream is not None:
+                self.market_stream.remove_callback(self._on_market_event)
+            
+            if self.instruments_cache is not None:
+                self.instruments_cache.unsubscribe(self._on_instruments_changed)
+
+            if self.ml_strategy:
+                self.ml_strategy.save_feature_states()
+
             if self.db_manager:
-                # Временно закомментировано из-за блокировки
-                # self.db_manager.log_entry({
-                #     'level': 'INFO',
-                #     'logger_name': 'TRADING_WORKER',
-                #     'message': 'Trading worker stopped',
-                #     'session_id': session_id
-                # })
-                pass
-    
+                self.db_manager.log_entry({
+                    'level': 'INFO',
+                    'logger_name': 'TRADING_WORKER',
+                    'message': 'Trading worker stopped',
+                    'session_id': session_id
+                })
+                # Запись оставшихся журналов и остановка потока-писателя БД
+                self.db_manager.close()
+
     def _reset_daily_stats_if_needed(self):
         """Сброс дневной статистики при смене дня"""
         current_date = datetime.now().date()
@@ -323,19 +404,33 @@ class TradingWorker(QThread):
             self.daily_pnl = 0.0
             self.last_reset_date = current_date
             
-            # self.db_manager.log_entry({
-            #     'level': 'INFO',
-            #     'logger_name': 'TRADING_STATS',
-            #     'message': f'Daily stats reset for date: {current_date}',
-            #     'session_id': getattr(self, 'current_session_id', None)
-            # }) # Временно закомментировано - блокирует выполнение
+            self.db_manager.log_entry({
+                'level': 'INFO',
+                'logger_name': 'TRADING_STATS',
+                'message': f'Daily stats reset for date: {current_date}',
+                'session_id': getattr(self, 'current_session_id', None)
+            })
+    
+    def _get_wallet_balance(self) -> Optional[dict]:
+        """Баланс из приватного потока; REST - пока поток не подключен и не сверен"""
+        if self.account_stream is not None and self.account_stream.is_ready:
+            balance = self.account_stream.state.get_wallet_balance()
+            if balance:
+                return balance
+        return self.bybit_client.get_wallet_balance()
+    
+    def _get_open_orders(self, category: str = "spot") -> Optional[dict]:
+        """Открытые ордера из приватного потока; REST - пока поток не готов"""
+        if self.account_stream is not None and self.account_stream.is_ready:
+            return self.account_stream.state.get_open_orders(category=category)
+        return self.bybit_client.get_open_orders(category=category)
     
     def _update_balance(self, session_id: str) -> Optional[dict]:
         """Обновление информации о балансе"""
         try:
             start_time = time.time()
-            # Получаем реальные данные через API
-            balance_response = self.bybit_client.get_wallet_balance()
+            # Получаем данные из локального состояния счета (или через API)
+            balance_response = self._get_wallet_balance()
             exec_time = (time.time() - start_time) * 1000
             
             # Логируем полный ответ для отладки
@@ -397,8 +492,7 @@ class TradingWorker(QThread):
                     'execution_time_ms': exec_time
                 }
                 
-                # Временно закомментировано - блокирует выполнение
-                # self.db_manager.log_account_snapshot(account_data)
+                self.db_manager.log_account_snapshot(account_data)
                 
                 return balance_info
             else:
@@ -417,8 +511,8 @@ class TradingWorker(QThread):
             
             # Для спотовой торговли получаем открытые ордера вместо позиций
             try:
-                # Получаем открытые ордера через API
-                orders_response = self.bybit_client.get_open_orders(category="spot")
+                # Получаем открытые ордера из локального состояния (или через API)
+                orders_response = self._get_open_orders(category="spot")
                 
                 # Проверяем, что получили корректный ответ
                 if orders_response and 'list' in orders_response:
@@ -465,12 +559,12 @@ class TradingWorker(QThread):
                 except Exception as db_err:
                     self.logger.error(f"Ошибка сохранения спотовых ордеров в БД: {db_err}")
             
-            # self.db_manager.log_entry({
-            #     'level': 'DEBUG',
-            #     'logger_name': 'API_POSITIONS',
-            #     'message': f'Spot orders updated: {len(spot_positions)} active orders',
-            #     'session_id': session_id
-            # }) # Временно закомментировано - блокирует выполнение
+            self.db_manager.log_entry({
+                'level': 'DEBUG',
+                'logger_name': 'API_POSITIONS',
+                'message': f'Spot orders updated: {len(spot_positions)} active orders',
+                'session_id': session_id
+            })
             
             return spot_positions
         except Exception as e:
@@ -501,7 +595,12 @@ class TradingWorker(QThread):
                 self.logger.warning("Торговля отключена. Пропускаем торговый цикл.")
                 return
             
-            # Получение списка доступных символов для торговли
+            # Время этапов цикла (мс): символы, снимок тикеров, отбор и этапы конвейера
+            stages = self.cycle_stage_timings = {}
+            if self.kline_fetch is not None:
+                self.kline_fetch.begin_cycle()
+            
+            # Получение списка символов для анализа после предварительного отбора
             symbols_to_analyze = self._get_trading_symbols(positions)
             self.logger.info(f"Получено {len(symbols_to_analyze)} символов для анализа: {', '.join(symbols_to_analyze[:5])}...")
             
@@ -509,69 +608,155 @@ class TradingWorker(QThread):
                 self.logger.warning("Не найдено символов для анализа. Проверьте подключение к программе просмотра тикеров.")
                 return
             
+            # Живые цены и свечи анализируемых символов из общего WebSocket потока
+            if self.market_stream is not None:
+                self.market_stream.subscribe_tickers(symbols_to_analyze)
+                self.market_stream.subscribe_klines(
+                    symbols_to_analyze, self.kline_fetch.interval if self.kline_fetch is not None else '4h')
+            
+            if self.bybit_client is None or self.ml_strategy is None:
+                self.logger.error("Невозможно анализировать символы: API клиент или ML стратегия не инициализированы")
+                return
+            
+            # Конвейер: загрузка свечей пулом потоков -> пакетный ML анализ -> лимиты по
+            # снимку баланса -> размещение ордеров; этапы связаны ограниченными очередями
+            from config import TRADING_PIPELINE_CONFIG as pipeline_config
+            risk_gate = RiskGate(
+                BalanceSnapshot(self._get_wallet_balance, pipeline_config['balance_ttl_seconds']),
+                daily_volume=self.daily_volume,
+                balance_limit=self.balance_limit_amount if self.balance_limit_active else None
+            )
+            pipeline = self._pipeline = TradingPipeline(
+                fetch=self._fetch_market_data,
+                prefetch=self.kline_fetch.prefetch if self.kline_fetch is not None else None,
+                prefetch_chunk=pipeline_config['prefetch_chunk'],
+                analyze=self.ml_strategy.analyze_markets,
+                risk=risk_gate,
+                execute=lambda order: self._execute_order(order, session_id),
+                fetch_workers=pipeline_config['fetch_workers'],
+                queue_size=pipeline_config['queue_size'],
+                batch_size=pipeline_config['batch_size'],
+                batch_wait=pipeline_config['batch_wait']
+            )
+            try:
+                result = pipeline.run(symbols_to_analyze)
+            finally:
+                self._pipeline = None
+            
+            self.pipeline_metrics = result['metrics']
+            for name, metrics in result['metrics'].items():
+                stages[name] = metrics['busy_ms']
+            
+            analysis_results = result['analyses']
+            skip_stats = {}
+            if self.kline_fetch is not None:
+                skip_stats = self.kline_fetch.skip_stats
+            if sum(skip_stats.values()):
+                self.logger.info(f"Пропущено символов без новых закрытых свечей: {sum(skip_stats.values())} ({skip_stats})")
+            
             for symbol in symbols_to_analyze:
-                try:
-                    # Анализ символа
-                    self.logger.info(f"Анализ символа: {symbol}")
-                    analysis_result = self._analyze_symbol(symbol, session_id)
-                    
-                    if not analysis_result:
-                        self.logger.warning(f"Не получен результат анализа для {symbol}")
+                analysis_result = analysis_results.get(symbol)
+                if not analysis_result:
+                    # Символы без новых свечей пропущены намеренно
+                    if self.kline_fetch is not None and symbol not in self.kline_fetch.pending:
                         continue
-                        
-                    self.logger.info(f"Результат анализа {symbol}: сигнал={analysis_result.get('signal', 'НЕТ')}, уверенность={analysis_result.get('confidence', 0)}")
-                    
-                    if analysis_result and analysis_result.get('signal') in ['BUY', 'SELL']:
-                        # Проверка лимитов (не более 20% баланса в день)
-                        self.logger.info(f"Проверка дневных лимитов для {symbol}")
-                        if self._check_daily_limits(analysis_result):
-                            self.logger.info(f"Выполнение торговой операции для {symbol} с сигналом {analysis_result.get('signal')}")
-                            trade_result = self._execute_trade(symbol, analysis_result, session_id)
-                            
-                            if trade_result:
-                                self.logger.info(f"Успешная торговая операция: {trade_result}")
-                                self.trade_executed.emit(trade_result)
-                                
-                                # Обновление дневной статистики
-                                self.daily_volume += float(trade_result.get('size', 0))
-                                self.logger.info(f"Обновлена дневная статистика: объем={self.daily_volume}")
-                                
-                                # Обучение стратегии на результатах
-                                self.logger.info(f"Обновление производительности стратегии для {symbol}")
-                                self.ml_strategy.update_performance(symbol, trade_result)
-                            else:
-                                self.logger.warning(f"Торговая операция для {symbol} не выполнена")
-                        else:
-                            self.logger.warning(f"Превышены дневные лимиты для {symbol}")
-                    else:
-                        self.logger.info(f"Нет торгового сигнала для {symbol} или сигнал не BUY/SELL")
-                
-                except Exception as e:
-                    self.logger.error(f"Ошибка анализа символа {symbol}: {e}")
-                    self.logger.error(f"Детали ошибки: {traceback.format_exc()}")
+                    self.logger.warning(f"Не получен результат анализа для {symbol}")
                     continue
+                self.logger.info(f"Результат анализа {symbol}: сигнал={analysis_result.get('signal', 'НЕТ')}, уверенность={analysis_result.get('confidence', 0)}")
+            
+            if risk_gate.rejected:
+                self.logger.info(f"Сигналы отклонены проверкой лимитов: {risk_gate.rejected}")
+            self.logger.info(
+                "Конвейер цикла: " + '; '.join(
+                    f"{name}: {m['processed']} шт, {m['throughput_per_s']}/с, очередь max {m['max_queue_depth']}"
+                    for name, m in result['metrics'].items()
+                )
+            )
             
             cycle_time = (time.time() - cycle_start) * 1000
             self.logger.info(f"Торговый цикл завершен за {cycle_time:.2f} мс, проанализировано {len(symbols_to_analyze)} символов")
-            # self.db_manager.log_entry({
-            #     'level': 'DEBUG',
-            #     'logger_name': 'TRADING_CYCLE',
-            #     'message': f'Trading cycle completed: analyzed {len(symbols_to_analyze)} symbols',
-            #     'session_id': session_id
-            # }) # Временно закомментировано - блокирует выполнение
+            self.logger.info(f"Этапы цикла: {', '.join(f'{k}={v:.0f}мс' for k, v in stages.items())}")
+            self.db_manager.log_entry({
+                'level': 'DEBUG',
+                'logger_name': 'TRADING_CYCLE',
+                'message': f'Trading cycle completed: analyzed {len(symbols_to_analyze)} symbols',
+                'session_id': session_id
+            })
                 
         except Exception as e:
             self.logger.error(f"Ошибка выполнения торгового цикла: {e}")
             self.logger.error(f"Детали ошибки: {traceback.format_exc()}")
     
+    def _on_market_event(self, event: dict):
+        """Свечи из WebSocket сразу попадают в хранилище свечей"""
+        if event.get('type') == 'kline' and self.kline_store is not None:
+            self.kline_store.merge_ws_kline('spot', event['symbol'], event['interval'], event['data'])
+    
+    def _on_instruments_changed(self, diff: dict):
+        """Журнал добавленных и исключенных биржей символов"""
+        for action, label in (('listed', 'Новые'), ('delisted', 'Исключены')):
+            symbols = diff.get(action) or []
+            if symbols:
+                self.log_message.emit(f"📋 {label} инструменты {diff['category']}: {', '.join(symbols[:20])}"
+                                      f"{' ...' if len(symbols) > 20 else ''}")
+        if self.db_manager:
+            self.db_manager.log_system_action('INFO', 'INSTRUMENTS', f"Instruments changed: {diff['category']}", diff)
+    
+    def _fetch_market_data(self, symbol: str) -> Optional[dict]:
+        """Этап загрузки конвейера: окно свечей, актуализированное пакетом prefetch
+
+        Символ пропускается, если результат анализа его последней закрытой свечи уже в кэше стратегии
+        """
+        klines, last_closed = None, None
+        if self.kline_fetch is not None:
+            fetched = self.kline_fetch.fetch(symbol)
+            if fetched is None:
+                return None
+            klines, last_closed = fetched
+        market_data = self._prepare_market_data(symbol, klines)
+        if market_data is not None and last_closed is not None:
+            # Ключ кэша анализа стратегии совпадает с проверкой пропуска в kline_fetch
+            market_data['timeframe'] = self.kline_fetch.interval
+            market_data['last_closed_ts'] = last_closed
+        return market_data
+    
+    def _execute_order(self, order: dict, session_id: str) -> Optional[dict]:
+        """Этап исполнения конвейера: ордер, проверенный по лимитам"""
+        symbol = order['symbol']
+        self.logger.info(f"Выполнение торговой операции для {symbol} с сигналом {order['analysis'].get('signal')}")
+        trade_result = self._submit_order(symbol, order['analysis'], order['size'], session_id)
+        
+        if trade_result:
+            self.logger.info(f"Успешная торговая операция: {trade_result}")
+            self.trade_executed.emit(trade_result)
+            
+            # Обновление дневной статистики
+            self.daily_volume += float(trade_result.get('size', 0))
+            self.logger.info(f"Обновлена дневная статистика: объем={self.daily_volume}")
+            
+            # Обучение стратегии на результатах (если стратегия это поддерживает): ошибка
+            # здесь не должна терять уже размещенную сделку
+            update_performance = getattr(self.ml_strategy, 'update_performance', None)
+            if update_performance is not None:
+                try:
+                    update_performance(symbol, trade_result)
+                except Exception as e:
+                    self.logger.error(f"Ошибка обновления статистики стратегии {symbol}: {e}")
+        else:
+            self.logger.warning(f"Торговая операция для {symbol} не выполнена")
+        return trade_result
+    
     def _get_all_available_symbols(self) -> List[str]:
         """Получение всех доступных торговых символов через API"""
         try:
             if not self.bybit_client:
                 return []
             
-            # Получаем все доступные spot инструменты
-            instruments = self.bybit_client.get_instruments_info(category="spot")
+            # Получаем все доступные spot инструменты (из кэша, API - раз в TTL)
+            if self.instruments_cache is not None:
+                instruments = self.instruments_cache.get_instruments("spot")
+            else:
+                instruments = self.bybit_client.get_instruments_info(category="spot")
             
             if not instruments:
                 self.logger.warning("Не удалось получить список инструментов, используем резервный список")
@@ -600,51 +785,86 @@ class TradingWorker(QThread):
             return FALLBACK_TRADING_SYMBOLS
     
     def _get_trading_symbols(self, positions: List[dict]) -> List[str]:
-        """Получение списка символов для анализа"""
+        """Получение списка символов для анализа
+        
+        Символы с позициями анализируются всегда, остальные проходят
+        предварительный отбор по снимку тикеров (top_k лучших кандидатов)
+        """
+        stages = self.cycle_stage_timings
+        
         # Получаем все доступные торговые символы
+        start_time = time.perf_counter()
         all_available_symbols = self._get_all_available_symbols()
+        stages['universe'] = (time.perf_counter() - start_time) * 1000
         
         # Добавляем символы из активных позиций (если они есть)
         position_symbols = [pos.get('symbol') for pos in positions if pos.get('symbol')]
         
+        if self.screener.config.get('enabled', True):
+            # Один снимок тикеров на весь список символов
+            start_time = time.perf_counter()
+            try:
+                tickers = self.bybit_client.get_tickers(category="spot")
+            except Exception as e:
+                self.logger.error(f"Ошибка получения снимка тикеров: {e}")
+                tickers = []
+            stages['tickers'] = (time.perf_counter() - start_time) * 1000
+            
+            if tickers:
+                start_time = time.perf_counter()
+                models = getattr(self.ml_strategy, 'models', None)
+                if models is None:
+                    models = {}
+                final_symbols = self.screener.screen(
+                    tickers, all_available_symbols, position_symbols,
+                    has_model=lambda symbol: symbol in models
+                )
+                stages['screen'] = (time.perf_counter() - start_time) * 1000
+                
+                stats = self.screener.last_stats
+                self.logger.info(
+                    f"Отбор символов: {stats['universe']} в снимке -> {stats['passed']} -> "
+                    f"{stats['candidates']} кандидатов + {stats['positions']} с позициями "
+                    f"({', '.join(f'{k}={v:.1f}мс' for k, v in stats['timings_ms'].items())})"
+                )
+                return final_symbols
+            
+            self.logger.warning("Снимок тикеров недоступен, анализируются все символы")
+        
         # Объединяем все символы, приоритет отдаем символам с позициями
-        priority_symbols = list(set(position_symbols))  # Символы с позициями идут первыми
+        priority_symbols = list(dict.fromkeys(position_symbols))  # Символы с позициями идут первыми
         other_symbols = [s for s in all_available_symbols if s not in priority_symbols]
         
         # Объединяем: сначала символы с позициями, потом остальные
         final_symbols = priority_symbols + other_symbols
         
         self.logger.info(f"Будет анализироваться {len(final_symbols)} торговых символов")
-        return final_symbols  # Возвращаем все доступные символы без ограничений
+        return final_symbols
     
-    def _analyze_symbol(self, symbol: str, session_id: str) -> Optional[dict]:
-        """Анализ конкретного символа"""
+    def _prepare_market_data(self, symbol: str, klines: Optional[List[dict]] = None) -> Optional[dict]:
+        """Данные символа для ML анализа (свечи и текущая цена)
+        
+        Args:
+            symbol: Торговый символ
+            klines: Заранее загруженные свечи (если нет - загружаются синхронно)
+        """
         try:
-            start_time = time.time()
-            
-            # Проверка инициализации клиента API
-            if not hasattr(self, 'bybit_client') or self.bybit_client is None:
-                self.logger.error(f"Невозможно анализировать символ {symbol}: API клиент не инициализирован")
-                return None
-                
-            # Проверка инициализации ML стратегии
-            if not hasattr(self, 'ml_strategy') or self.ml_strategy is None:
-                self.logger.error(f"Невозможно анализировать символ {symbol}: ML стратегия не инициализирована")
-                return None
-            
             # Получение исторических данных с обработкой ошибки Invalid period
+            timeframe = '4h'
             try:
-                klines = self.bybit_client.get_kline(
-                    category='spot',
-                    symbol=symbol,
-                    interval='4h',
-                    limit=200
-                )
+                if not klines:
+                    klines = self.bybit_client.get_kline(
+                        category='spot',
+                        symbol=symbol,
+                        interval='4h',
+                        limit=200
+                    )
             except Exception as kline_error:
                 if "Invalid period" in str(kline_error):
                     self.logger.warning(f"Символ {symbol}: ошибка периода, пробуем альтернативный интервал")
                     # Пробуем альтернативный интервал
                     try:
+                        timeframe = '1h'
                         klines = self.bybit_client.get_kline(
                             category='spot',
                             symbol=symbol,
@@ -662,87 +882,25 @@ class TradingWorker(QThread):
                 self.logger.warning(f"Недостаточно данных для анализа символа {symbol}: получено {len(klines) if klines else 0} свечей")
                 return None
             
-            # ML анализ с обработкой ошибок
-            try:
-                # Формируем словарь данных для анализа
-                market_data = {
-                    'symbol': symbol,
-                    'klines': klines,
-                    'current_price': float(klines[-1]['close']) if klines and len(klines) > 0 else 0.0
-                }
-                analysis = self.ml_strategy.analyze_market(market_data)
-            except Exception as ml_error:
-                self.logger.error(f"Ошибка ML анализа для {symbol}: {ml_error}")
-                return None
-            
-            exec_time = (time.time() - start_time) * 1000
-            
-            # Логирование анализа
-            if analysis:
-                analysis_data = {
-                    'symbol': symbol,
-                    'timeframe': '4h',
-                    'current_price': klines[-1].get('close') if klines else 0,
-                    'features': analysis.get('features', []),
-                    'indicators': analysis.get('indicators', {}),
-                    'regime': analysis.get('regime', {}),
-                    'prediction': analysis.get('prediction', {}),
-                    'signal': analysis.get('signal'),
-                    'confidence': analysis.get('confidence'),
-                    'execution_time_ms': exec_time
-                }
-                
-                try:
-                    if hasattr(self, 'db_manager') and self.db_manager is not None:
-                        self.db_manager.log_analysis(analysis_data)
-                except Exception as db_error:
-                    self.logger.error(f"Ошибка записи анализа в БД для {symbol}: {db_error}")
-            
-            return analysis
+            # Формируем словарь данных для анализа
+            live_price = self.market_stream.snapshot.get_last_price(symbol) if self.market_stream is not None else None
+            if live_price is None and getattr(self.ml_strategy, 'ticker_loader', None) is not None:
+                # Цена из таблицы тикеров программы просмотра в разделяемой памяти
+                live_price = self.ml_strategy.ticker_loader.get_live_price(symbol)
+            return {
+                'symbol': symbol,
+                'timeframe': timeframe,
+                'klines': klines,
+                'current_price': live_price or (float(klines[-1]['close']) if klines and len(klines) > 0 else 0.0)
+            }
             
         except Exception as e:
-            self.logger.error(f"Ошибка анализа символа {symbol}: {e}")
+            self.logger.error(f"Ошибка подготовки данных символа {symbol}: {e}")
             return None
     
-    def _check_daily_limits(self, analysis: dict) -> bool:
-        """Проверка дневных лимитов торговли"""
-        try:
-            # Получение текущего баланса
-            balance_response = self.bybit_client.get_wallet_balance()
-            if not balance_response or not balance_response.get('list'):
-                return False
-            
-            balance_data = balance_response['list'][0]
-            available_balance = float(balance_data.get('totalAvailableBalance', 0))
-            
-            # Проверка лимита 20% от баланса в день
-            daily_limit = available_balance * 0.2
-            
-            if self.daily_volume >= daily_limit:
-                # self.db_manager.log_entry({
-                #     'level': 'WARNING',
-                #     'logger_name': 'TRADING_LIMITS',
-                #     'message': f'Daily trading limit reached: volume {self.daily_volume:.2f}, limit {daily_limit:.2f}',
-                #     'session_id': getattr(self, 'current_session_id', None)
-                # }) # Временно закомментировано - блокирует выполнение
-                return False
-            
-            # Проверка минимальной уверенности
-            confidence = analysis.get('confidence', 0)
-            if confidence < 0.65:  # Повышенный порог уверенности
-                return False
-            
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"Ошибка проверки лимитов: {e}")
-            return False
-    
     def _execute_trade(self, symbol: str, analysis: dict, session_id: str) -> Optional[dict]:
-        """Выполнение торговой операции"""
+        """Выполнение торговой операции (размер позиции по текущему балансу)"""
         try:
-            start_time = time.time()
-            
             signal = analysis.get('signal')
             confidence = analysis.get('confidence', 0)
             
@@ -752,23 +910,11 @@ class TradingWorker(QThread):
                 return None
             
             # Расчет размера позиции
-            balance_resp = self.bybit_client.get_wallet_balance()
+            balance_resp = self._get_wallet_balance()
             if not balance_resp:
                 return None
             
-            # Правильное получение доступного баланса из вложенной структуры
-            available_balance = 0.0
-            if balance_resp:
-                # Проверяем оба формата ответа: с 'result' и без него
-                if 'result' in balance_resp and balance_resp['result'].get('list'):
-                    # Формат с 'result': {'result': {'list': [...]}}
-                    available_balance = float(balance_resp['result']['list'][0].get('totalAvailableBalance', 0))
-                elif 'list' in balance_resp and balance_resp['list']:
-                    # Формат без 'result': {'list': [...]}
-                    available_balance = float(balance_resp['list'][0].get('totalAvailableBalance', 0))
-                else:
-                    self.logger.warning(f"Неожиданный формат ответа баланса: {balance_resp}")
-                    available_balance = 0.0
+            available_balance = get_available_balance(balance_resp)
             
             # Если активен ограничитель баланса, используем его вместо полного баланса
             if hasattr(self, 'balance_limit_active') and hasattr(self, 'balance_limit_amount'):
@@ -783,6 +929,23 @@ class TradingWorker(QThread):
             if position_size < 10:
                 self.logger.info(f"Размер позиции слишком мал: ${position_size:.2f} < $10.00")
                 return None
+        except Exception as e:
+            self.logger.error(f"Ошибка расчета размера позиции {symbol}: {e}")
+            return None
+        
+        return self._submit_order(symbol, analysis, position_size, session_id)
+    
+    def _submit_order(self, symbol: str, analysis: dict, position_size: float, session_id: str) -> Optional[dict]:
+        """Размещение рыночного ордера и запись сделки"""
+        try:
+            start_time = time.time()
+            
+            signal = analysis.get('signal')
+            confidence = analysis.get('confidence', 0)
+            
+            if not self.trading_enabled:
+                self.logger.info(f"Торговля отключена. Сигнал {signal} для {symbol} игнорируется.")
+                return None
             
             # Размещение ордера
             side = 'Buy' if signal == 'BUY' else 'Sell'
@@ -875,14 +1038,17 @@ class TradingWorker(QThread):
             status = "включена" if enabled else "выключена"
             self.log_message.emit(f"🔄 Торговля {status}")
             
+            # После включения анализ не ждет закрытия следующей свечи
+            if enabled and self.scheduler is not None:
+                self.scheduler.trigger('analysis')
+            
             if self.db_manager:
-                pass
-                # self.db_manager.log_entry({
-                #     'level': 'INFO',
-                #     'logger_name': 'TRADING_CONTROL',
-                #     'message': f'Trading toggled: {status}',
-                #     'session_id': getattr(self, 'current_session_id', None)
-                # }) # Временно закомментировано - блокирует выполнение
+                self.db_manager.log_entry({
+                    'level': 'INFO',
+                    'logger_name': 'TRADING_CONTROL',
+                    'message': f'Trading toggled: {status}',
+                    'session_id': getattr(self, 'current_session_id', None)
+                })
         finally:
             self._mutex.unlock()
     
@@ -894,17 +1060,20 @@ class TradingWorker(QThread):
             self.trading_enabled = False
             self.logger.info("Остановка торгового потока запрошена")
             
+            # Текущий цикл не берет новые символы в работу
+            if self._pipeline is not None:
+                self._pipeline.stop()
+            
             # Принудительно завершаем поток, если он не завершается сам
             self.terminate()
             
             if self.db_manager:
-                pass
-                # self.db_manager.log_entry({
-                #     'level': 'INFO',
-                #     'logger_name': 'TRADING_WORKER',
-                #     'message': 'Trading worker stop requested',
-                #     'session_id': getattr(self, 'current_session_id', None)
-                # }) # Временно закомментировано - блокирует выполнение
+                self.db_manager.log_entry({
+                    'level': 'INFO',
+                    'logger_name': 'TRADING_WORKER',
+                    'message': 'Trading worker stop requested',
+                    'session_id': getattr(self, 'current_session_id', None)
+                })
         finally:
             self._mutex.unlock()
 
@@ -915,6 +1084,9 @@ class TradingBotMainWindow(QMainWindow):
     # Сигналы для обновления UI из других потоков
     balance_limit_timer_signal = Signal(int)  # Сигнал для обновления таймера ограничителя баланса
     
+    # Таймер тикеров срабатывает каждые 5 с для живого снимка; REST опрашивается реже
+    TICKER_REST_INTERVAL = 30
+    
     def __init__(self):
         super().__init__()
         
@@ -938,6 +1110,9 @@ class TradingBotMainWindow(QMainWindow):
         
         # Информация о тикерах
         self.last_ticker_update = None
+        self.market_stream = None  # Общий WebSocket поток тикеров
+        self._drawn_ticker_generation = None
+        self._last_ticker_rest = None  # Последний опрос тикеров через REST (time.monotonic)
         
         # Импорт конфигурации
         print("🔄 Загрузка конфигурации...")
@@ -1030,11 +1205,16 @@ class TradingBotMainWindow(QMainWindow):
         self.data_timer.start(120000)  # 120 секунд
         self.logger.info("Таймер полного обновления данных запущен (интервал: 120 секунд)")
         
-        # Таймер для обновления тикеров (каждые 30 секунд)
+        # Таймер перерисовки тикеров из живого WebSocket снимка (каждые 5 секунд)
         self.tickers_timer = QTimer(self)
         self.tickers_timer.timeout.connect(self.auto_update_tickers)
-        self.tickers_timer.start(30000)  # 30 секунд
-        self.logger.info("Таймер обновления тикеров запущен (интервал: 30 секунд)")
+        self.tickers_timer.start(5000)  # 5 секунд
+        self.logger.info("Таймер обновления тикеров запущен (интервал: 5 секунд)")
+        
+        # Таймер счетчиков кэша анализа (каждые 5 секунд)
+        self.analysis_cache_timer = QTimer(self)
+        self.analysis_cache_timer.timeout.connect(self.update_analysis_cache_stats)
+        self.analysis_cache_timer.start(5000)  # 5 секунд
     
     def init_ui(self):
         """Инициализация пользовательского интерфейса"""
@@ -1434,6 +1614,16 @@ class TradingBotMainWindow(QMainWindow):
         stats_layout.addWidget(QLabel("Дневной лимит:"), 1, 2)
         stats_layout.addWidget(self.daily_limit_label, 1, 3)
         
+        # Попадания в кэш результатов анализа ML стратегии
+        self.analysis_cache_hits_label = QLabel("0 / 0")
+        self.analysis_cache_rate_label = QLabel("0%")
+        self.analysis_cache_hits_label.setStyleSheet(stats_style)
+        self.analysis_cache_rate_label.setStyleSheet(stats_style)
+        stats_layout.addWidget(QLabel("Кэш анализа (попадания / промахи):"), 2, 0)
+        stats_layout.addWidget(self.analysis_cache_hits_label, 2, 1)
+        stats_layout.addWidget(QLabel("Доля попаданий:"), 2, 2)
+        stats_layout.addWidget(self.analysis_cache_rate_label, 2, 3)
+        
         layout.addWidget(stats_frame)
         
         # Панель управления
@@ -1969,6 +2159,8 @@ class TradingBotMainWindow(QMainWindow):
                 api_secret=self.api_secret,
                 testnet=self.testnet
             )
+            # Торговый поток читает цены из того же снимка, что и окно
+            self.trading_worker.market_stream = self._get_market_stream()
             print("✅ Торговый поток создан")
             
             # Подключение сигналов
@@ -1991,6 +2183,7 @@ class TradingBotMainWindow(QMainWindow):
                 print("🔄 Передача bybit_client в PortfolioTab...")
                 self.bybit_client = self.trading_worker.bybit_client
                 self.portfolio_tab.set_api_client(self.bybit_client)
+                self.portfolio_tab.set_market_stream(self._get_market_stream())
                 print("✅ bybit_client передан в PortfolioTab")
                 self.add_log_message("✅ API клиент передан в PortfolioTab")
                 
@@ -2557,6 +2750,19 @@ class TradingBotMainWindow(QMainWindow):
         except Exception as e:
             self.add_log_message(f"❌ Ошибка добавления в историю: {e}")
     
+    def update_analysis_cache_stats(self):
+        """Счетчики попаданий и промахов кэша анализа на вкладке обзора"""
+        try:
+            worker = getattr(self, 'trading_worker', None)
+            strategy = getattr(worker, 'ml_strategy', None) if worker else None
+            if strategy is None or not hasattr(self, 'analysis_cache_hits_label'):
+                return
+            stats = strategy.analysis_cache.get_stats()
+            self.analysis_cache_hits_label.setText(f"{stats['hits']} / {stats['misses']}")
+            self.analysis_cache_rate_label.setText(f"{stats['hit_rate']:.0%} ({stats['entries']} записей)")
+        except Exception as e:
+            self.logger.error(f"Ошибка обновления статистики кэша анализа: {e}")
+    
     def update_trading_stats(self):
         """Обновление статистики торговли"""
         try:
@@ -2947,21 +3153,20 @@ class TradingBotMainWindow(QMainWindow):
             self.add_log_message(f"❌ Ошибка при обновлении позиций: {str(e)}")
             
     def update_ticker_info(self, timestamp=None):
-        """Загрузка данных тикеров из файла, созданного программой просмотра тикеров
+        """Загрузка данных тикеров из хранилища, заполняемого программой просмотра тикеров
         
         Args:
             timestamp: Опциональный параметр времени обновления (для совместимости с сигналами)
         """
         try:
-            # Создаем загрузчик данных тикеров
-            ticker_loader = TickerDataLoader()
-            
-            # Проверяем существование файла с данными тикеров
-            import os
-            data_path = os.path.join(os.path.expanduser("~"), "AppData", "Local", "BybitTradingBot", "data", "tickers_data.json")
-            
-            if not os.path.exists(data_path):
-                self.add_log_message("⚠️ Файл с данными тикеров не найден. Запустите программу просмотра тикеров.")
+            # Загрузчик создается один раз: повторные вызовы читают только изменения
+            ticker_loader = getattr(self, 'ticker_loader', None)
+            if ticker_loader is None:
+                ticker_loader = self.ticker_loader = TickerDataLoader()
+            
+            # Проверяем наличие данных тикеров
+            if not ticker_loader.has_data():
+                self.add_log_message("⚠️ Данные тикеров не найдены. Запустите программу просмотра тикеров.")
                 if hasattr(self, 'last_ticker_update_label'):
                     self.last_ticker_update_label.setText("Нет данных (программа тикеров не запущена)")
                     self.last_ticker_update_label.setStyleSheet("font-weight: bold; color: #e74c3c;")
@@ -3685,8 +3890,22 @@ class TradingBotMainWindow(QMainWindow):
             self.add_log_message(f"❌ {error_msg}")
             QMessageBox.critical(self, "Ошибка", error_msg)
     
+    def _get_market_stream(self):
+        """Общий WebSocket поток тикеров для окна, вкладки портфолио и торгового потока"""
+        if self.market_stream is None:
+            try:
+                # Тот же путь модуля, что во вкладке портфолио: один реестр потоков на процесс
+                from src.api.market_stream import get_market_stream
+                self.market_stream = get_market_stream(category='spot', testnet=self.testnet)
+                if hasattr(self, 'portfolio_tab') and self.portfolio_tab:
+                    self.portfolio_tab.set_market_stream(self.market_stream)
+            except ImportError as e:
+                self.logger.warning(f"WebSocket поток недоступен, тикеры обновляются через REST: {e}")
+        return self.market_stream
+    
     def refresh_tickers(self):
         """Обновление данных о тикерах"""
+        current_time = datetime.now()
         try:
             # Проверяем, что клиент API инициализирован
             if not hasattr(self, 'bybit_client') or self.bybit_client is None:
@@ -3695,14 +3914,31 @@ class TradingBotMainWindow(QMainWindow):
                 self.add_log_message(f"❌ {error_msg}")
                 return
                 
-            # Добавляем таймаут для запроса
-            start_time = time.time()
-            # Получаем данные о тикерах от API с указанием категории 'spot'
-            response = self.bybit_client.get_tickers(category='spot')
-            request_time = time.time() - start_time
+            # Берем тикеры из живого снимка; REST - первичное заполнение, поток отключен
+            # или снимок перестал обновляться
+            stream = self._get_market_stream()
+            generation = None
+            if stream is not None and stream.is_live(self.TICKER_REST_INTERVAL):
+                generation = stream.snapshot.generation
+                response = stream.snapshot.get_tickers()
+            else:
+                self._last_ticker_rest = time.monotonic()
+                # Добавляем таймаут для запроса
+                start_time = time.time()
+                # Получаем данные о тикерах от API с указанием категории 'spot'
+                response = self.bybit_client.get_tickers(category='spot')
+                request_time = time.time() - start_time
+                
+                # Логируем время запроса для мониторинга производительности
+                self.logger.debug(f"Запрос тикеров выполнен за {request_time:.2f} сек")
+                
+                if stream is not None and response:
+                    stream.bootstrap_tickers(response)
+                    self.add_log_message(f"📡 WebSocket подписка на {len(response)} тикеров")
             
-            # Логируем время запроса для мониторинга производительности
-            self.logger.debug(f"Запрос тикеров выполнен за {request_time:.2f} сек")
+            # get_tickers и снимок возвращают список тикеров
+            if isinstance(response, list):
+                response = {'list': response}
             
             # Извлекаем список тикеров из структуры ответа API
             # Проверяем различные возможные структуры ответа API
@@ -3749,10 +3985,13 @@ class TradingBotMainWindow(QMainWindow):
                             ticker_count += 1
                 
                 if ticker_count > 0:
+                    # Сообщаем в лог только при изменении набора символов
+                    if len(self.tickers_data) != ticker_count:
+                        self.add_log_message(f"✅ Данные тикеров обновлены ({ticker_count} символов)")
                     self.tickers_data = tickers_dict
+                    self._drawn_ticker_generation = generation
                     self.update_tickers_table()
-                    self.add_log_message(f"✅ Данные тикеров обновлены ({ticker_count} символов)")
-                    self.logger.info(f"Обновлены данные по {ticker_count} тикерам")
+                    self.logger.debug(f"Обновлены данные по {ticker_count} тикерам")
                     
                     # Обновляем информацию о количестве тикеров в интерфейсе
                     if hasattr(self, 'ticker_count_label'):
@@ -3785,9 +4024,18 @@ class TradingBotMainWindow(QMainWindow):
                 self.logger.warning("Невозможно обновить тикеры: API клиент не инициализирован")
                 return
                 
+            # Перерисовываем таблицу только при изменении живого снимка;
+            # без живого потока REST опрашивается раз в TICKER_REST_INTERVAL секунд
+            stream = self._get_market_stream()
+            if stream is not None and stream.is_live(self.TICKER_REST_INTERVAL):
+                if stream.snapshot.generation == self._drawn_ticker_generation:
+                    return
+            elif self._last_ticker_rest is not None and \
+                    time.monotonic() - self._last_ticker_rest < self.TICKER_REST_INTERVAL:
+                return
+            
             # Логируем информацию о запуске автоматического обновления
-            self.logger.info("Запуск автоматического обновления тикеров")
-            self.add_log_message("🔄 Автоматическое обновление тикеров...")
+            self.logger.debug("Запуск автоматического обновления тикеров")
                 
             # Вызываем напрямую метод обновления тикеров
             self.refresh_tickers()
@@ -3820,8 +4068,6 @@ class TradingBotMainWindow(QMainWindow):
             # Обновляем метку в статусной строке
             if hasattr(self, 'ticker_update_label'):
                 self.ticker_update_label.setText(f"Последнее обновление тикеров: {current_time.strftime('%H:%M:%S')}")
-            
-            self.add_log_message("🔄 Автоматическое обновление тикеров выполнено")
         except Exception as e:
             error_msg = f"Ошибка при автоматическом обновлении тикеров: {e}"
             self.logger.error(error_msg)
@@ -3832,10 +4078,10 @@ class TradingBotMainWindow(QMainWindow):
                 # Проверяем, активен ли таймер
                 if not self.tickers_timer.isActive():
                     self.logger.info("Перезапуск таймера обновления тикеров")
-                    self.tickers_timer.start(30000)  # 30 секунд
+                    self.tickers_timer.start(5000)  # 5 секунд
             if hasattr(self, 'tickers_timer') and not self.tickers_timer.isActive():
                 self.logger.info("Перезапуск таймера обновления тикеров после ошибки")
-                self.tickers_timer.start(30000)
+                self.tickers_timer.start(5000)
     
     def update_tickers_table(self):
         """Обновление таблицы тикеров"""
@@ -4239,6 +4485,11 @@ class TradingBotMainWindow(QMainWindow):
                     except:
                         pass
             
+            # Закрываем общий WebSocket поток тикеров
+            if self.market_stream is not None:
+                from src.api.market_stream import stop_market_streams
+                stop_market_streams()
+            
             event.accept()
         else:
             event.ignore()
@@ -6,10 +6,10 @@
 
 import sys
 import os
-import json
 import time
 import logging
 import threading
+import numpy as np
 from datetime import datetime
 from typing import Dict, List, Optional
 from pathlib import Path
@@ -21,8 +21,12 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
     from src.strategies.adaptive_ml import AdaptiveMLStrategy
+    from src.strategies.features import chronological
+    from src.strategies.training_scheduler import TrainingScheduler
     from src.api.bybit_client import BybitClient
+    from src.api.instruments_cache import get_instruments_cache
     from src.tools.ticker_data_loader import TickerDataLoader
+    from src.data.ticker_store import TickerStore
     from config import get_api_credentials, get_ml_config
 except ImportError as e:
     print(f"Ошибка импорта модулей: {e}")
@@ -31,7 +35,7 @@ except ImportError as e:
 
 
 class TickerDataWatcher(FileSystemEventHandler):
-    """Класс для мониторинга изменений в файле tickers_data.json"""
+    """Класс для мониторинга изменений в хранилище тикеров (tickers.db)"""
     
     def __init__(self, trainer):
         self.trainer = trainer
@@ -41,11 +45,17 @@ class TickerDataWatcher(FileSystemEventHandler):
         if event.is_directory:
             return
             
-        if event.src_path.endswith('tickers_data.json'):
+        # В режиме WAL запись меняет tickers.db-wal, а не сам файл базы
+        if Path(event.src_path).name.startswith(TickerStore.FILE_NAME):
             # Проверяем, чтобы не обрабатывать одно и то же изменение несколько раз
             current_time = time.time()
             if current_time - self.last_modified < 5:  # Игнорируем изменения чаще чем раз в 5 секунд
                 return
+            
+            # Запись без новых данных не меняет поколение хранилища
+            loader = self.trainer.ticker_loader
+            if loader is not None and not loader.has_updates():
+                return
                 
             self.last_modified = current_time
             print(f"🔄 Обнаружено обновление данных тикеров: {datetime.now().strftime('%H:%M:%S')}")
@@ -123,7 +133,7 @@ class ConsoleTrainer:
             
             for category in categories_to_check:
                 try:
-                    instruments = self.ml_strategy.api_client.get_instruments_info(category=category)
+                    instruments = get_instruments_cache(self.ml_strategy.api_client).get_instruments(category)
                     if instruments:
                         active_usdt_count = 0
                         for instrument in instruments:
@@ -194,7 +204,7 @@ class ConsoleTrainer:
             # Fallback: загружаем напрямую из API
             print("🔄 Загружаем символы напрямую из API...")
             try:
-                instruments = self.ml_strategy.api_client.get_instruments_info(category='spot')
+                instruments = get_instruments_cache(self.ml_strategy.api_client).get_instruments('spot')
                 if instruments:
                     api_symbols = []
                     for instrument in instruments:
@@ -245,6 +255,35 @@ class ConsoleTrainer:
         else:
             return 'spot'
     
+    def prefetch_klines(self) -> Dict[str, List[Dict]]:
+        """Параллельная загрузка свечей для всех символов через асинхронный клиент"""
+        if not self.symbols:
+            return {}
+        
+        try:
+            from src.api.async_bybit_client import AsyncBybitFacade
+        except ImportError as e:
+            print(f"⚠️ aiohttp недоступен, свечи загружаются последовательно: {e}")
+            return {}
+        
+        facade = AsyncBybitFacade.from_client(self.ml_strategy.api_client)
+        try:
+            start_time = time.time()
+            print(f"⚡ Параллельная загрузка свечей для {len(self.symbols)} символов...")
+            klines_by_symbol = facade.get_klines_bulk(
+                [(self.choose_category(symbol), symbol) for symbol in self.symbols],
+                interval='4h',
+                limit=1000
+            )
+            loaded = sum(1 for klines in klines_by_symbol.values() if klines)
+            print(f"✅ Свечи загружены для {loaded}/{len(self.symbols)} символов за {time.time() - start_time:.1f} с")
+            return klines_by_symbol
+        except Exception as e:
+            print(f"⚠️ Ошибка параллельной загрузки свечей: {e}")
+            return {}
+        finally:
+            facade.close()
+    
     def train_models(self):
         """Обучение моделей"""
         if not self.symbols:
@@ -257,6 +296,14 @@ class ConsoleTrainer:
         failed_trainings = 0
         total_symbols = len(self.symbols)
         
+        # Параллельная загрузка свечей для всех символов одним пакетом
+        prefetched_klines = self.prefetch_klines()
+        
+        # Модели обучаются в пуле процессов, пока готовятся признаки следующих символов
+        scheduler = TrainingScheduler(on_result=self.on_training_result)
+        mode = f"{scheduler.max_workers} процессов" if scheduler.parallel else "последовательно"
+        print(f"⚙️ Обучение моделей: {mode}")
+        
         for i, symbol in enumerate(self.symbols):
             try:
                 print(f"\n[{i+1}/{total_symbols}] 🔄 Обучение модели для {symbol}...")
@@ -265,50 +312,61 @@ class ConsoleTrainer:
                 category = self.choose_category(symbol)
                 
                 # Получаем исторические данные
-                klines = []
-                try:
-                    api_response = self.ml_strategy.api_client.get_klines(
-                        symbol=symbol,
-                        interval='4h',
-                        limit=1000,
-                        category=category
-                    )
+                klines = list(prefetched_klines.get(symbol) or [])
+                if klines:
+                    print(f"📈 Загружены данные для {symbol}: {len(klines)} записей")
+                else:
+                    # Последовательный запрос, если пакетная загрузка не дала данных
+                    try:
+                        api_response = self.ml_strategy.api_client.get_klines(
+                            symbol=symbol,
+                            interval='4h',
+                            limit=1000,
+                            category=category
+                        )
                     
-                    # Извлекаем данные из ответа API
-                    if api_response and isinstance(api_response, dict) and 'list' in api_response:
-                        raw_klines = api_response['list']
-                        # Преобразуем формат API в ожидаемый формат
-                        klines = []
-                        for kline in raw_klines:
-                            klines.append({
-                                'timestamp': int(kline[0]),
-                                'open': float(kline[1]),
-                                'high': float(kline[2]),
-                                'low': float(kline[3]),
-                                'close': float(kline[4]),
-                                'volume': float(kline[5])
-                            })
-                        print(f"📈 Загружены данные для {symbol}: {len(klines)} записей")
-                    elif api_response and isinstance(api_response, list):
-                        klines = api_response
-                        print(f"📈 Загружены данные для {symbol}: {len(klines)} записей")
-                    else:
-                        print(f"⚠️ API не вернул данные для {symbol}")
+                        # Извлекаем данные из ответа API
+                        if api_response and isinstance(api_response, dict) and 'list' in api_response:
+                            raw_klines = api_response['list']
+                            # Преобразуем формат API в ожидаемый формат
+                            klines = []
+                            for kline in raw_klines:
+                                klines.append({
+                                    'timestamp': int(kline[0]),
+                                    'open': float(kline[1]),
+                                    'high': float(kline[2]),
+                                    'low': float(kline[3]),
+                                    'close': float(kline[4]),
+                                    'volume': float(kline[5])
+                                })
+                            print(f"📈 Загружены данные для {symbol}: {len(klines)} записей")
+                        elif api_response and isinstance(api_response, list):
+                            klines = api_response
+                            print(f"📈 Загружены данные для {symbol}: {len(klines)} записей")
+                        else:
+                            print(f"⚠️ API не вернул данные для {symbol}")
                         
-                except Exception as e:
-                    error_msg = str(e)
-                    if "Category is invalid" in error_msg:
-                        print(f"⚠️ Неверная категория для {symbol}: {error_msg}")
-                    elif "Not supported symbols" in error_msg:
-                        print(f"⚠️ Символ {symbol} не поддерживается: {error_msg}")
-                    else:
-                        print(f"⚠️ Ошибка API для {symbol}: {error_msg}")
+                    except Exception as e:
+                        error_msg = str(e)
+                        if "Category is invalid" in error_msg:
+                            print(f"⚠️ Неверная категория для {symbol}: {error_msg}")
+                        elif "Not supported symbols" in error_msg:
+                            print(f"⚠️ Символ {symbol} не поддерживается: {error_msg}")
+                        else:
+                            print(f"⚠️ Ошибка API для {symbol}: {error_msg}")
+                
+                # Пополняем колоночный архив свечей
+                if klines and self.ticker_loader:
+                    try:
+                        self.ticker_loader.save_historical_data(symbol, '240', klines)
+                    except Exception as e:
+                        print(f"⚠️ Ошибка записи архива для {symbol}: {e}")
                 
-                # Если API не дал данных, пытаемся загрузить из кэша
+                # Если API не дал данных, пытаемся загрузить из архива / кэша
                 if not klines or len(klines) < 100:
                     try:
                         if self.ticker_loader:
-                            historical_data = self.ticker_loader.get_historical_data(symbol)
+                            historical_data = self.ticker_loader.get_historical_data(symbol, interval='240')
                             if historical_data and len(historical_data) > len(klines):
                                 klines = historical_data
                                 print(f"📁 Загружены данные из кэша для {symbol}: {len(klines)} записей")
@@ -323,33 +381,23 @@ class ConsoleTrainer:
                     continue
                 
                 # Извлекаем признаки и метки
-                features, labels = [], []
+                # Признаки всех окон klines[j-window:j] строятся одним проходом
                 window = self.ml_strategy.feature_window
-                
-                for j in range(window, len(klines) - 1):
-                    try:
-                        f = self.ml_strategy.extract_features(klines[j-window:j])
-                        if f and len(f) > 0:
-                            features.append(f)
-                            # Создаем метку на основе изменения цены
-                            current_price = float(klines[j]['close'])
-                            future_price = float(klines[j + 1]['close'])
-                            change = (future_price - current_price) / current_price
-                            
-                            # Улучшенный алгоритм генерации меток
-                            # Используем процентили для более сбалансированного распределения
-                            abs_change = abs(change)
-                            
-                            # Фиксированные пороги для лучшего баланса классов
-                            if abs_change > 0.005:  # 0.5% - значимое движение
-                                if change > 0:
-                                    labels.append(1)  # рост
-                                else:
-                                    labels.append(-1)  # падение
-                            else:
-                                labels.append(0)  # боковик
-                    except Exception as e:
-                        continue
+                try:
+                    klines = chronological(klines)
+                    features = self.ml_strategy.extract_features_matrix(klines, len(klines) - 1)
+                    
+                    # Создаем метку на основе изменения цены
+                    closes = np.array([float(k['close']) for k in klines])
+                    current_price = closes[window:len(klines) - 1]
+                    future_price = closes[window + 1:]
+                    change = (future_price - current_price) / current_price
+                    
+                    # Фиксированный порог 0.5% - значимое движение: 1 - рост, -1 - падение, 0 - боковик
+                    labels = np.where(np.abs(change) > 0.005, np.where(change > 0, 1, -1), 0).tolist()
+                except Exception as e:
+                    print(f"⚠️ Ошибка извлечения признаков для {symbol}: {e}")
+                    features, labels = [], []
                 
                 # Проверяем качество данных
                 min_features = 20
@@ -373,32 +421,26 @@ class ConsoleTrainer:
                     failed_trainings += 1
                     continue
                 
-                # Обучаем модель
-                success = self.ml_strategy.train_model(symbol, features, labels)
-                
-                if success:
-                    # Сохраняем модель
-                    try:
-                        self.ml_strategy.save_models()
-                        
-                        # Получаем метрики точности
-                        accuracy = self.ml_strategy.performance.get(symbol, {}).get('accuracy', 0.0)
-                        samples = self.ml_strategy.performance.get(symbol, {}).get('samples', len(features))
-                        
-                        print(f"✅ Модель для {symbol} обучена (точность: {accuracy:.2%}, образцов: {samples})")
-                        successful_trainings += 1
-                        
-                    except Exception as e:
-                        print(f"⚠️ Ошибка сохранения модели для {symbol}: {e}")
-                        failed_trainings += 1
-                else:
-                    print(f"❌ Ошибка обучения модели для {symbol}")
-                    failed_trainings += 1
+                # Обучение выполняется в пуле процессов, результат придет в on_training_result
+                scheduler.submit(symbol, features, labels)
                 
             except Exception as e:
                 print(f"❌ Критическая ошибка при обучении {symbol}: {e}")
                 failed_trainings += 1
         
+        # Сбор результатов по мере готовности
+        for result in scheduler.results():
+            if result['success']:
+                successful_trainings += 1
+            else:
+                failed_trainings += 1
+        
+        if successful_trainings > 0:
+            try:
+                self.ml_strategy.save_models()
+            except Exception as e:
+                print(f"⚠️ Ошибка сохранения моделей: {e}")
+        
         # Итоговая статистика
         print(f"\n🎉 Обучение завершено!")
         print(f"📊 Статистика: успешно {successful_trainings}, ошибок {failed_trainings} из {total_symbols}")
@@ -406,6 +448,18 @@ class ConsoleTrainer:
             success_rate = (successful_trainings / total_symbols) * 100
             print(f"📈 Процент успеха: {success_rate:.1f}%")
     
+    def on_training_result(self, result: Dict, done: int, total: int):
+        """Результат обучения символа из пула процессов"""
+        symbol = result['symbol']
+        if result['success']:
+            self.ml_strategy.apply_trained_model(symbol, result['model'], result['scaler'], result['metrics'])
+            accuracy = result['metrics'].get('accuracy', 0.0)
+            samples = result['metrics'].get('samples', 0)
+            print(f"✅ [{done}/{total}] Модель для {symbol} обучена "
+                  f"(точность: {accuracy:.2%}, образцов: {samples}, {result['duration']:.1f} с)")
+        else:
+            print(f"❌ [{done}/{total}] Ошибка обучения модели для {symbol}: {result.get('error')}")
+    
     def run(self):
         """Запуск консольного тренера"""
         print("🤖 Консольный тренер ML моделей")
@@ -424,7 +478,7 @@ class ConsoleTrainer:
         print("\n✅ Работа завершена!")
     
     def setup_file_monitoring(self):
-        """Настройка мониторинга файла tickers_data.json"""
+        """Настройка мониторинга хранилища тикеров"""
         try:
             # Путь к файлу с данными тикеров
             data_path = Path.home() / "AppData" / "Local" / "BybitTradingBot" / "data"
@@ -439,7 +493,7 @@ class ConsoleTrainer:
             self.observer.schedule(self.file_watcher, str(data_path), recursive=False)
             self.observer.start()
             
-            print(f"👁️ Мониторинг файла tickers_data.json активирован")
+            print(f"👁️ Мониторинг хранилища тикеров {TickerStore.FILE_NAME} активирован")
             print(f"📁 Отслеживаемая директория: {data_path}")
             
         except Exception as e:
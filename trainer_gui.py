@@ -8,6 +8,7 @@ import sys
 import os
 import json
 import time
+import numpy as np
 from datetime import datetime
 from typing import Dict, List, Optional
 from pathlib import Path
@@ -26,7 +27,10 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
     from src.strategies.adaptive_ml import AdaptiveMLStrategy
+    from src.strategies.features import chronological
+    from src.strategies.training_scheduler import TrainingScheduler
     from src.api.bybit_client import BybitClient
+    from src.api.instruments_cache import get_instruments_cache
     from config import get_api_credentials, get_ml_config
 except ImportError as e:
     print(f"Ошибка импорта модулей: {e}")
@@ -46,6 +50,7 @@ class TrainingWorker(QThread):
         self.symbols = symbols
         self.symbol_categories = symbol_categories or {}
         self.is_running = False
+        self.scheduler = None
 
     def run(self):
         """Запуск обучения моделей"""
@@ -57,8 +62,18 @@ class TrainingWorker(QThread):
         successful_trainings = 0
         failed_trainings = 0
         
+        # Параллельная загрузка свечей для всех символов одним пакетом
+        prefetched_klines = self.prefetch_klines()
+        
+        # Модели обучаются в пуле процессов, пока готовятся признаки следующих символов
+        scheduler = TrainingScheduler(on_result=self.on_training_result)
+        self.scheduler = scheduler
+        mode = f"{scheduler.max_workers} процессов" if scheduler.parallel else "последовательно"
+        self.log_updated.emit(f"⚙️ Обучение моделей: {mode}")
+        
         for i, symbol in enumerate(self.symbols):
             if not self.is_running:
+                scheduler.cancel()
                 break
                 
             try:
@@ -67,55 +82,66 @@ class TrainingWorker(QThread):
                 
                 # Получаем исторические данные с правильной категорией
                 category = self.choose_category(symbol)
-                klines = []
-                
-                # Пытаемся получить данные через API с оптимизированной логикой
-                try:
-                    klines_response = self.ml_strategy.api_client.get_klines(category=category, symbol=symbol, interval='60', limit=1000)
-                    if not klines_response or 'list' not in klines_response or not klines_response['list']:
-                        # Пробуем альтернативную категорию только если символ поддерживает несколько категорий
-                        available_categories = self.symbol_categories.get(symbol, [category])
-                        alt_categories = [cat for cat in available_categories if cat != category]
+                klines = list(prefetched_klines.get(symbol) or [])
+                if klines:
+                    self.log_updated.emit(f"✅ Загружено {len(klines)} свечей для {symbol} через API")
+                else:
+                    # Последовательный запрос, если пакетная загрузка не дала данных
+                    # Пытаемся получить данные через API с оптимизированной логикой
+                    try:
+                        klines_response = self.ml_strategy.api_client.get_klines(category=category, symbol=symbol, interval='60', limit=1000)
+                        if not klines_response or 'list' not in klines_response or not klines_response['list']:
+                            # Пробуем альтернативную категорию только если символ поддерживает несколько категорий
+                            available_categories = self.symbol_categories.get(symbol, [category])
+                            alt_categories = [cat for cat in available_categories if cat != category]
                         
-                        if alt_categories:
-                            alt_category = alt_categories[0]
-                            self.log_updated.emit(f"🔄 Пробуем альтернативную категорию '{alt_category}' для {symbol}")
-                            klines_response = self.ml_strategy.api_client.get_klines(category=alt_category, symbol=symbol, interval='60', limit=1000)
-                        else:
-                            self.log_updated.emit(f"⚠️ Символ {symbol} не поддерживается в других категориях")
+                            if alt_categories:
+                                alt_category = alt_categories[0]
+                                self.log_updated.emit(f"🔄 Пробуем альтернативную категорию '{alt_category}' для {symbol}")
+                                klines_response = self.ml_strategy.api_client.get_klines(category=alt_category, symbol=symbol, interval='60', limit=1000)
+                            else:
+                                self.log_updated.emit(f"⚠️ Символ {symbol} не поддерживается в других категориях")
                     
-                    # Извлекаем данные из ответа API
-                    if klines_response and 'list' in klines_response and klines_response['list']:
-                        klines_data = klines_response['list']
-                        # Преобразуем в нужный формат
-                        for kline in klines_data:
-                            klines.append({
-                                'open': float(kline[1]),
-                                'high': float(kline[2]), 
-                                'low': float(kline[3]),
-                                'close': float(kline[4]),
-                                'volume': float(kline[5])
-                            })
-                        self.log_updated.emit(f"✅ Загружено {len(klines)} свечей для {symbol} через API")
-                    else:
-                        self.log_updated.emit(f"⚠️ API не вернул данные для {symbol}")
+                        # Извлекаем данные из ответа API
+                        if klines_response and 'list' in klines_response and klines_response['list']:
+                            klines_data = klines_response['list']
+                            # Преобразуем в нужный формат
+                            for kline in klines_data:
+                                klines.append({
+                                    'timestamp': int(kline[0]),
+                                    'open': float(kline[1]),
+                                    'high': float(kline[2]), 
+                                    'low': float(kline[3]),
+                                    'close': float(kline[4]),
+                                    'volume': float(kline[5])
+                                })
+                            self.log_updated.emit(f"✅ Загружено {len(klines)} свечей для {symbol} через API")
+                        else:
+                            self.log_updated.emit(f"⚠️ API не вернул данные для {symbol}")
                         
-                except Exception as e:
-                    error_msg = str(e)
-                    if "Category is invalid" in error_msg:
-                        self.log_updated.emit(f"⚠️ Неверная категория для {symbol}: API ошибка: {error_msg}")
-                    elif "Not supported symbols" in error_msg:
-                        self.log_updated.emit(f"⚠️ Символ {symbol} не поддерживается: API ошибка: {error_msg}")
-                    elif "Symbol Is Invalid" in error_msg:
-                        self.log_updated.emit(f"⚠️ Ошибка API для {symbol}: API ошибка: {error_msg}")
-                    else:
-                        self.log_updated.emit(f"⚠️ Ошибка API для {symbol}: API ошибка: {error_msg}")
+                    except Exception as e:
+                        error_msg = str(e)
+                        if "Category is invalid" in error_msg:
+                            self.log_updated.emit(f"⚠️ Неверная категория для {symbol}: API ошибка: {error_msg}")
+                        elif "Not supported symbols" in error_msg:
+                            self.log_updated.emit(f"⚠️ Символ {symbol} не поддерживается: API ошибка: {error_msg}")
+                        elif "Symbol Is Invalid" in error_msg:
+                            self.log_updated.emit(f"⚠️ Ошибка API для {symbol}: API ошибка: {error_msg}")
+                        else:
+                            self.log_updated.emit(f"⚠️ Ошибка API для {symbol}: API ошибка: {error_msg}")
                 
-                # Если API не дал данных, пытаемся загрузить из TickerDataLoader
+                # Пополняем колоночный архив свечей
+                if klines and getattr(self.ml_strategy, 'ticker_loader', None):
+                    try:
+                        self.ml_strategy.ticker_loader.save_historical_data(symbol, '60', klines)
+                    except Exception as e:
+                        self.log_updated.emit(f"⚠️ Ошибка записи архива для {symbol}: {e}")
+                
+                # Если API не дал данных, пытаемся загрузить из архива / TickerDataLoader
                 if not klines or len(klines) < 100:
                     try:
                         if hasattr(self.ml_strategy, 'ticker_loader') and self.ml_strategy.ticker_loader:
-                            historical_data = self.ml_strategy.ticker_loader.get_historical_data(symbol)
+                            historical_data = self.ml_strategy.ticker_loader.get_historical_data(symbol, interval='60')
                             if historical_data and len(historical_data) > len(klines):
                                 klines = historical_data
                                 self.log_updated.emit(f"📁 Загружены данные из кэша для {symbol}: {len(klines)} записей")
@@ -135,34 +161,29 @@ class TrainingWorker(QThread):
                 self.progress_updated.emit(symbol, 40)
                 
                 # Извлекаем признаки и метки с улучшенной логикой
-                features, labels = [], []
+                # Признаки всех окон klines[j-window:j] строятся одним проходом
                 window = self.ml_strategy.feature_window
-                
-                for j in range(window, len(klines) - 1):
-                    if not self.is_running:
-                        break
-                        
-                    try:
-                        f = self.ml_strategy.extract_features(klines[j-window:j])
-                        if f and len(f) > 0:
-                            features.append(f)
-                            # Создаем метку на основе изменения цены
-                            current_price = float(klines[j]['close'])
-                            future_price = float(klines[j + 1]['close'])
-                            change = (future_price - current_price) / current_price
-                            
-                            # Адаптивные пороги в зависимости от волатильности
-                            volatility = abs(float(klines[j]['high']) - float(klines[j]['low'])) / current_price
-                            threshold = max(0.001, volatility * 0.5)  # Минимум 0.1%, максимум зависит от волатильности
-                            
-                            if change > threshold:
-                                labels.append(1)  # рост
-                            elif change < -threshold:
-                                labels.append(-1)  # падение
-                            else:
-                                labels.append(0)  # боковик
-                    except Exception as e:
-                        continue  # Пропускаем проблемные данные
+                try:
+                    klines = chronological(klines)
+                    features = self.ml_strategy.extract_features_matrix(klines, len(klines) - 1)
+                    
+                    # Создаем метку на основе изменения цены
+                    closes = np.array([float(k['close']) for k in klines])
+                    highs = np.array([float(k['high']) for k in klines])
+                    lows = np.array([float(k['low']) for k in klines])
+                    current_price = closes[window:len(klines) - 1]
+                    future_price = closes[window + 1:]
+                    change = (future_price - current_price) / current_price
+                    
+                    # Адаптивные пороги в зависимости от волатильности (минимум 0.1%)
+                    volatility = np.abs(highs[window:len(klines) - 1] - lows[window:len(klines) - 1]) / current_price
+                    threshold = np.maximum(0.001, volatility * 0.5)
+                    
+                    # 1 - рост, -1 - падение, 0 - боковик
+                    labels = np.where(change > threshold, 1, np.where(change < -threshold, -1, 0)).tolist()
+                except Exception as e:
+                    self.log_updated.emit(f"⚠️ Ошибка извлечения признаков для {symbol}: {e}")
+                    features, labels = [], []
                 
                 self.progress_updated.emit(symbol, 60)
                 
@@ -184,38 +205,29 @@ class TrainingWorker(QThread):
                 
                 self.progress_updated.emit(symbol, 80)
                 
-                # Обучаем модель
-                success = self.ml_strategy.train_model(symbol, features, labels)
-                
-                if success:
-                    # Сохраняем модель
-                    try:
-                        self.ml_strategy.save_models()
-                        
-                        # Получаем метрики точности
-                        accuracy = self.ml_strategy.performance.get(symbol, {}).get('accuracy', 0.0)
-                        samples = self.ml_strategy.performance.get(symbol, {}).get('samples', len(features))
-                        
-                        self.status_updated.emit(symbol, "Обучена", accuracy)
-                        self.log_updated.emit(f"✅ Модель для {symbol} обучена (точность: {accuracy:.2%}, образцов: {samples})")
-                        successful_trainings += 1
-                        
-                    except Exception as e:
-                        self.log_updated.emit(f"⚠️ Ошибка сохранения модели для {symbol}: {e}")
-                        self.status_updated.emit(symbol, "Ошибка сохранения", 0.0)
-                        failed_trainings += 1
-                else:
-                    self.status_updated.emit(symbol, "Ошибка обучения", 0.0)
-                    self.log_updated.emit(f"❌ Ошибка обучения модели для {symbol}")
-                    failed_trainings += 1
-                
-                self.progress_updated.emit(symbol, 100)
+                # Обучение выполняется в пуле процессов, результат придет в on_training_result
+                if scheduler.submit(symbol, features, labels):
+                    self.status_updated.emit(symbol, "В очереди", 0.0)
                 
             except Exception as e:
                 self.status_updated.emit(symbol, f"Ошибка: {str(e)[:20]}", 0.0)
                 self.log_updated.emit(f"❌ Критическая ошибка при обучении {symbol}: {e}")
                 failed_trainings += 1
         
+        # Сбор результатов по мере готовности
+        for result in scheduler.results():
+            if result['success']:
+                successful_trainings += 1
+            else:
+                failed_trainings += 1
+        self.scheduler = None
+        
+        if successful_trainings > 0:
+            try:
+                self.ml_strategy.save_models()
+            except Exception as e:
+                self.log_updated.emit(f"⚠️ Ошибка сохранения моделей: {e}")
+        
         # Итоговая статистика
         self.log_updated.emit(f"🎉 Обучение завершено!")
         self.log_updated.emit(f"📊 Статистика: успешно {successful_trainings}, ошибок {failed_trainings} из {total_symbols}")
@@ -228,6 +240,53 @@ class TrainingWorker(QThread):
     def stop(self):
         """Остановка обучения"""
         self.is_running = False
+        if self.scheduler is not None:
+            self.scheduler.cancel()
+    
+    def on_training_result(self, result: Dict, done: int, total: int):
+        """Результат обучения символа из пула процессов"""
+        symbol = result['symbol']
+        if result['success']:
+            self.ml_strategy.apply_trained_model(symbol, result['model'], result['scaler'], result['metrics'])
+            accuracy = result['metrics'].get('accuracy', 0.0)
+            samples = result['metrics'].get('samples', 0)
+            self.status_updated.emit(symbol, "Обучена", accuracy)
+            self.log_updated.emit(f"✅ [{done}/{total}] Модель для {symbol} обучена "
+                                  f"(точность: {accuracy:.2%}, образцов: {samples}, {result['duration']:.1f} с)")
+        else:
+            self.status_updated.emit(symbol, "Ошибка обучения", 0.0)
+            self.log_updated.emit(f"❌ [{done}/{total}] Ошибка обучения модели для {symbol}: {result.get('error')}")
+        self.progress_updated.emit(symbol, 100)
+    
+    def prefetch_klines(self) -> Dict[str, List[Dict]]:
+        """Параллельная загрузка свечей для всех символов через асинхронный клиент"""
+        api_client = getattr(self.ml_strategy, 'api_client', None)
+        if api_client is None or not self.symbols:
+            return {}
+        
+        try:
+            from src.api.async_bybit_client import AsyncBybitFacade
+        except ImportError as e:
+            self.log_updated.emit(f"⚠️ aiohttp недоступен, свечи загружаются последовательно: {e}")
+            return {}
+        
+        facade = AsyncBybitFacade.from_client(api_client)
+        try:
+            start_time = time.time()
+            self.log_updated.emit(f"⚡ Параллельная загрузка свечей для {len(self.symbols)} символов...")
+            klines_by_symbol = facade.get_klines_bulk(
+                [(self.choose_category(symbol), symbol) for symbol in self.symbols],
+                interval='60',
+                limit=1000
+            )
+            loaded = sum(1 for klines in klines_by_symbol.values() if klines)
+            self.log_updated.emit(f"✅ Свечи загружены для {loaded}/{len(self.symbols)} символов за {time.time() - start_time:.1f} с")
+            return klines_by_symbol
+        except Exception as e:
+            self.log_updated.emit(f"⚠️ Ошибка параллельной загрузки свечей: {e}")
+            return {}
+        finally:
+            facade.close()
         
     def choose_category(self, symbol: str) -> str:
         """Определение категории для символа с использованием предварительной валидации"""
@@ -263,8 +322,7 @@ class TrainingMonitor(QMainWindow):
         self.pending_training = False
         self.symbol_progress = {}
         self.expected_symbol_count = 0
-        self.last_ticker_file_mtime = None
-        self.ticker_data_file = None
+        self.last_ticker_generation = None
 
         # Инициализация компонентов
         self.init_ml_components()
@@ -291,9 +349,7 @@ class TrainingMonitor(QMainWindow):
             try:
                 from src.tools.ticker_data_loader import TickerDataLoader
                 self.ticker_loader = TickerDataLoader()
-                self.ticker_data_file = self.ticker_loader.get_data_file_path()
-                if self.ticker_data_file.exists():
-                    self.last_ticker_file_mtime = self.ticker_data_file.stat().st_mtime
+                self.last_ticker_generation = self.ticker_loader.get_generation()
             except Exception as e:
                 print(f"Ошибка инициализации TickerDataLoader: {e}")
                 self.ticker_loader = None
@@ -503,13 +559,10 @@ class TrainingMonitor(QMainWindow):
             return
 
         try:
-            data_file = self.ticker_data_file or self.ticker_loader.get_data_file_path()
-            if not data_file.exists():
-                return
-
-            mtime = data_file.stat().st_mtime
-            if self.last_ticker_file_mtime is None or mtime > self.last_ticker_file_mtime:
-                self.last_ticker_file_mtime = mtime
+            # Дешевая проверка счетчика поколений вместо времени изменения файла
+            generation = self.ticker_loader.get_generation()
+            if generation and generation != self.last_ticker_generation:
+                self.last_ticker_generation = generation
                 self.log("📥 Обнаружено обновление данных тикеров. Запускаем автоматическое обучение.")
                 self.handle_new_ticker_data()
         except Exception as e:
@@ -588,7 +641,7 @@ class TrainingMonitor(QMainWindow):
 
             for category in categories:
                 try:
-                    instruments = self.ml_strategy.api_client.get_instruments_info(category=category)
+                    instruments = get_instruments_cache(self.ml_strategy.api_client).get_instruments(category)
                     if instruments:
                         category_symbols = set()
                         for instrument in instruments:
@@ -679,7 +732,7 @@ class TrainingMonitor(QMainWindow):
             # Fallback: загружаем напрямую из API
             self.log("🔄 Загружаем символы напрямую из API...")
             try:
-                instruments = self.ml_strategy.api_client.get_instruments_info(category='spot')
+                instruments = get_instruments_cache(self.ml_strategy.api_client).get_instruments('spot')
                 if instruments:
                     api_symbols = []
                     for instrument in instruments:
@@ -9,6 +9,7 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.api.bybit_client import BybitClient
+from src.api.instruments_cache import InstrumentsCache
 from src.tools.ticker_data_loader import TickerDataLoader
 from config import get_api_credentials
 import json
@@ -42,14 +43,15 @@ def validate_symbols():
     print(f"📊 Всего символов из TickerDataLoader: {len(all_symbols)}")
     print(f"📊 USDT символов для проверки: {len(usdt_symbols)}")
     
-    # Получаем поддерживаемые инструменты для разных категорий
+    # Получаем поддерживаемые инструменты для разных категорий (постранично, один раз)
     categories = ['spot', 'linear']
     supported_symbols = {}
+    instruments_cache = InstrumentsCache(client, categories=categories)
     
     for category in categories:
         print(f"\n🔍 Проверяем категорию '{category}'...")
         try:
-            instruments = client.get_instruments_info(category=category)
+            instruments = instruments_cache.get_instruments(category)
             if instruments:
                 category_symbols = []
                 for instrument in instruments: